@@ -113,10 +113,19 @@ def auto_build():
         "ui",
         "ui.app",
         "ui.dialogs",
+        "ui.log_view",
         "core",
         "core.generator",
         "core.media_generator",
         "core.media_task_manager",
+        "core.novel_writer",
+        "core.http_pool",
+        "core.media_downloader",
+        "core.rate_limiter",
+        "core.media_cache",
+        "core.section_rewriter",
+        "core.events",
+        "core.progress",
         "core.model_manager",
         "core.sanqianliu_generator",
         "core.sanqianliu_interface",
@@ -124,6 +133,15 @@ def auto_build():
         "utils.common",
         "utils.config",
         "utils.quality",
+        "utils.catalog",
+        "utils.quality_features",
+        "utils.quality_cache",
+        "utils.quality_judge",
+        "utils.quality_planner",
+        "utils.novel_index",
+        "utils.metrics",
+        "utils.tracing",
+        "utils.loop_monitor",
         "templates",
         "templates.prompts",
         # 添加 novel_generator 命名空间
@@ -167,10 +167,19 @@ def main():
         "--hidden-import=ui",
         "--hidden-import=ui.app",
         "--hidden-import=ui.dialogs",
+        "--hidden-import=ui.log_view",
         "--hidden-import=core",
         "--hidden-import=core.generator",
         "--hidden-import=core.media_generator",
         "--hidden-import=core.media_task_manager",
+        "--hidden-import=core.novel_writer",
+        "--hidden-import=core.http_pool",
+        "--hidden-import=core.media_downloader",
+        "--hidden-import=core.rate_limiter",
+        "--hidden-import=core.media_cache",
+        "--hidden-import=core.section_rewriter",
+        "--hidden-import=core.events",
+        "--hidden-import=core.progress",
         "--hidden-import=core.model_manager",
         "--hidden-import=core.sanqianliu_generator",
         "--hidden-import=core.sanqianliu_interface",
@@ -178,6 +187,15 @@ def main():
         "--hidden-import=utils.common",
         "--hidden-import=utils.config",
         "--hidden-import=utils.quality",
+        "--hidden-import=utils.catalog",
+        "--hidden-import=utils.quality_features",
+        "--hidden-import=utils.quality_cache",
+        "--hidden-import=utils.quality_judge",
+        "--hidden-import=utils.quality_planner",
+        "--hidden-import=utils.novel_index",
+        "--hidden-import=utils.metrics",
+        "--hidden-import=utils.tracing",
+        "--hidden-import=utils.loop_monitor",
         "--hidden-import=templates",
         "--hidden-import=templates.prompts",
         # novel_generator 命名空间
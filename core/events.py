@@ -0,0 +1,481 @@
+"""
+生成器事件总线
+
+生成器不再直接拼接状态字符串，而是发布带字段的事件：
+- 事件只保存原始字段，format() 在订阅者真正显示时才调用（界面日志在界面线程刷新时才格式化）
+- 订阅时指定最低级别、事件类型和采样间隔；某类事件没有订阅者时 emit() 只做一次字典查找，不创建事件对象
+- 内置订阅者：旧式字符串回调、logging 记录器（写入日志文件）、事件计数、运行指标、JSONL 追踪文件
+- 订阅者抛出的异常只记录日志，不影响生成
+"""
+
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from ..utils.metrics import get_registry
+except ImportError:
+    from utils.metrics import get_registry
+
+logger = logging.getLogger("novel_generator")
+
+# 纯文本状态消息中的诊断信息（响应结构、内容预览等），按 DEBUG 处理
+_DEBUG_PREFIXES = (
+    "API响应结构",
+    "Choice结构",
+    "从message.content获取内容",
+    "从text获取内容",
+    "从根级content获取内容",
+    "从data获取内容",
+    "从response获取内容",
+    "获取到的原始内容",
+    "正在调用AI接口",
+)
+_ERROR_WORDS = ("错误", "失败", "出错", "异常")
+_WARNING_WORDS = ("警告", "重试", "超时")
+
+# 事件中大段文本的预览长度
+PREVIEW_CHARS = 100
+
+
+def guess_level(message: str) -> int:
+    """按内容推断纯文本状态消息的级别"""
+    if message.startswith(_DEBUG_PREFIXES):
+        return logging.DEBUG
+    if any(word in message for word in _ERROR_WORDS):
+        return logging.ERROR
+    if any(word in message for word in _WARNING_WORDS):
+        return logging.WARNING
+    return logging.INFO
+
+
+def _preview(text: Any, limit: int = PREVIEW_CHARS) -> str:
+    text = str(text)
+    return text[:limit] + ("..." if len(text) > limit else "")
+
+
+class Event:
+    """事件基类
+
+    子类是 dataclass，字段只保存原始数据；level 为类属性（StatusMessage 除外），
+    trace_omit 列出写入追踪文件时省略的大字段。
+    """
+
+    level = logging.INFO
+    trace_omit: Tuple[str, ...] = ()
+
+    def format(self) -> str:
+        """渲染为界面/日志文本（只在订阅者需要显示时调用）"""
+        return type(self).__name__
+
+    def __str__(self) -> str:
+        # logging 以 "%s" 引用事件时，只有记录真正输出才会调用
+        return self.format()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可序列化的字段（省略 trace_omit 中的大字段）"""
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if f.name not in self.trace_omit
+        }
+
+
+@dataclass
+class StatusMessage(Event):
+    """没有专门事件类型的状态消息"""
+
+    text: str
+    level: int = logging.INFO
+
+    def format(self) -> str:
+        return self.text
+
+
+@dataclass
+class RequestStarted(Event):
+    """开始一次接口请求"""
+
+    level = logging.DEBUG
+    attempt: int
+    max_retries: int
+
+    def format(self) -> str:
+        if self.attempt == 0:
+            return "正在调用AI接口生成内容..."
+        return f"正在调用AI接口生成内容 (尝试 {self.attempt + 1}/{self.max_retries})..."
+
+
+@dataclass
+class ResponseReceived(Event):
+    """接口返回 200，记录响应结构"""
+
+    level = logging.DEBUG
+    trace_omit = ("result",)
+    result: Any
+
+    def format(self) -> str:
+        if isinstance(self.result, dict):
+            return f"API响应结构: {list(self.result.keys())}"
+        return "API响应结构: non-dict response"
+
+
+@dataclass
+class ContentExtracted(Event):
+    """从响应的某个字段取得了正文"""
+
+    level = logging.DEBUG
+    trace_omit = ("content",)
+    source: str
+    content: Any
+
+    @property
+    def length(self) -> Optional[int]:
+        return len(self.content) if self.content else None
+
+    def format(self) -> str:
+        length = self.length if self.length is not None else "None"
+        return f"从{self.source}获取内容，原始长度: {length}，内容: '{_preview(self.content)}'"
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = super().to_dict()
+        data["length"] = self.length
+        return data
+
+
+@dataclass
+class ResponseUnparsed(Event):
+    """响应中找不到正文或解析出错"""
+
+    level = logging.WARNING
+    trace_omit = ("result",)
+    result: Any
+    error: Optional[str] = None
+
+    def format(self) -> str:
+        if self.error:
+            return f"解析API响应时出错: {self.error}, 原始响应: {_preview(self.result, 500)}"
+        return f"无法解析API响应内容，完整响应: {_preview(self.result, 500)}"
+
+
+@dataclass
+class ContentTooShort(Event):
+    """生成内容过短，将重新生成"""
+
+    level = logging.WARNING
+    length: int
+
+    def format(self) -> str:
+        return f"生成内容过短({self.length}字符)，重新生成..."
+
+
+@dataclass
+class ContentRejected(Event):
+    """模型拒绝生成"""
+
+    level = logging.WARNING
+
+    def format(self) -> str:
+        return "检测到拒绝生成的回复，重新尝试..."
+
+
+@dataclass
+class RequestFailed(Event):
+    """接口返回错误状态码"""
+
+    level = logging.ERROR
+    trace_omit = ("body",)
+    status: int
+    body: str
+
+    def format(self) -> str:
+        return f"API错误: {self.status} - {_preview(self.body, 500)}"
+
+
+@dataclass
+class RateLimited(Event):
+    """接口限流（429）"""
+
+    level = logging.WARNING
+    trace_omit = ("body",)
+    delay: float
+    body: str = ""
+
+    def format(self) -> str:
+        return f"接口限流(429)，{int(self.delay)} 秒后重试"
+
+
+@dataclass
+class RequestRetried(Event):
+    """请求失败后等待重试
+
+    cause 为失败原因的简短标识（http_500、rate_limited、timeout、ClientError 等），便于按原因汇总。
+    """
+
+    level = logging.WARNING
+    attempt: int
+    max_retries: int
+    delay: float
+    cause: str
+
+    def format(self) -> str:
+        return (f"将在 {int(self.delay)} 秒后重试 ({self.cause}，"
+                f"尝试 {self.attempt + 1}/{self.max_retries})...")
+
+
+@dataclass
+class ChunkCompleted(Event):
+    """一段新内容已拼接并保存"""
+
+    novel_id: str
+    genre: str
+    added: int
+    word_count: int
+    target_length: int
+
+    @property
+    def percentage(self) -> float:
+        if not self.target_length:
+            return 0.0
+        return min(100.0, self.word_count / self.target_length * 100)
+
+    def format(self) -> str:
+        return f"小说 {self.genre} 已生成 {self.word_count} 字 ({self.percentage:.1f}%)"
+
+
+@dataclass
+class SummaryStarted(Event):
+    """开始生成小说摘要"""
+
+    novel_id: str
+    word_count: int
+
+    def format(self) -> str:
+        return f"已达到 {self.word_count} 字，生成小说摘要..."
+
+
+@dataclass
+class SummaryCompleted(Event):
+    """摘要生成完成"""
+
+    length: int
+
+    def format(self) -> str:
+        return "摘要生成完成"
+
+
+class Subscription:
+    """一个订阅者及其过滤条件"""
+
+    def __init__(self, bus: "EventBus", handler: Callable[[Event], Any], level: int,
+                 types: Optional[Tuple[type, ...]], sample: Dict[type, int]):
+        self.bus = bus
+        self.handler = handler
+        self.level = level
+        self.types = types
+        self.sample = sample
+        self._counts: Dict[type, int] = {}
+
+    def accepts(self, event_type: type, level: int) -> bool:
+        if level < self.level:
+            return False
+        return self.types is None or issubclass(event_type, self.types)
+
+    def set_level(self, level: int):
+        """修改最低级别"""
+        self.level = level
+        self.bus._invalidate()
+
+    def close(self):
+        """取消订阅"""
+        self.bus.unsubscribe(self)
+
+    def deliver(self, event: Event):
+        every = self.sample.get(type(event))
+        if every:
+            # 采样：每 every 个事件交付 1 个（计数不加锁，偶尔多交付或少交付一个无妨）
+            count = self._counts.get(type(event), 0)
+            self._counts[type(event)] = count + 1
+            if count % every:
+                return
+        try:
+            self.handler(event)
+        except Exception as e:
+            logger.warning(f"事件订阅者处理 {type(event).__name__} 失败: {e}")
+
+
+class EventBus:
+    """同步分发的事件总线（在发布事件的线程中调用订阅者）"""
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+        # (事件类型, 级别) -> 接收该事件的订阅；订阅变化时整体替换为空表
+        self._routes: Dict[Tuple[type, int], Tuple[Subscription, ...]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """是否有任何订阅者"""
+        return bool(self._subscriptions)
+
+    def subscribe(self, handler: Callable[[Event], Any], level: int = logging.INFO,
+                  types: Optional[Iterable[type]] = None,
+                  sample: Optional[Dict[type, int]] = None) -> Subscription:
+        """订阅事件
+
+        Args:
+            handler: 接收事件对象的可调用对象，需要文本时调用 event.format()
+            level: 最低级别
+            types: 只接收这些类型（含子类），None 表示全部
+            sample: 事件类型 -> 采样间隔，例如 {ChunkCompleted: 10} 表示每 10 段交付 1 次
+        """
+        subscription = Subscription(
+            self, handler, level,
+            tuple(types) if types is not None else None,
+            dict(sample or {}),
+        )
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+            self._routes = {}
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+            self._routes = {}
+
+    def _invalidate(self):
+        with self._lock:
+            self._routes = {}
+
+    def _route(self, event_type: type, level: int) -> Tuple[Subscription, ...]:
+        # 先取路由表再读订阅列表：订阅变化时先换列表后换路由表，旧路由不会写进新表
+        routes = self._routes
+        key = (event_type, level)
+        route = routes.get(key)
+        if route is None:
+            route = tuple(s for s in self._subscriptions if s.accepts(event_type, level))
+            routes[key] = route
+        return route
+
+    def wants(self, event_type: type, level: Optional[int] = None) -> bool:
+        """是否有订阅者接收该类型（和级别）的事件"""
+        return bool(self._route(event_type, event_type.level if level is None else level))
+
+    def emit(self, event_type: type, *args, **kwargs):
+        """有订阅者时才创建并分发事件（热路径用这个）"""
+        route = self._route(event_type, event_type.level)
+        if route:
+            event = event_type(*args, **kwargs)
+            for subscription in route:
+                subscription.deliver(event)
+
+    def publish(self, event: Event):
+        """分发已创建的事件（级别取事件实例上的值）"""
+        for subscription in self._route(type(event), event.level):
+            subscription.deliver(event)
+
+
+class CallbackSink:
+    """旧式字符串状态回调：status_callback(message)"""
+
+    def __init__(self, callback: Callable[[str], Any]):
+        self.callback = callback
+
+    def __call__(self, event: Event):
+        self.callback(event.format())
+
+
+class LoggerSink:
+    """写入 logging 记录器（novel_generator 记录器带文件处理器）"""
+
+    def __init__(self, target: Optional[logging.Logger] = None):
+        self.logger = target or logger
+
+    def __call__(self, event: Event):
+        if self.logger.isEnabledFor(event.level):
+            self.logger.log(event.level, "%s", event)
+
+
+class EventCounter:
+    """按事件类型和级别计数，用于汇总统计"""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.by_level: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event):
+        name = type(event).__name__
+        level = logging.getLevelName(event.level)
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.by_level[level] = self.by_level.get(level, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {"events": dict(self.counts), "levels": dict(self.by_level)}
+
+
+class MetricsSink:
+    """把生成器事件计入运行指标（重试原因、错误状态码、被丢弃的内容、生成字数）"""
+
+    EVENT_TYPES = (RequestRetried, RequestFailed, RateLimited, ContentTooShort,
+                   ContentRejected, ResponseUnparsed, ChunkCompleted)
+
+    def __init__(self, registry=None):
+        registry = registry or get_registry()
+        self.retries = registry.counter("llm_retries_total", "接口请求重试次数", ("cause",))
+        self.errors = registry.counter("llm_errors_total", "接口返回的错误状态码", ("status",))
+        self.discarded = registry.counter(
+            "llm_responses_discarded_total", "被丢弃重新生成的响应", ("reason",))
+        self.chars = registry.counter("generated_chars_total", "拼接进小说的字数", ("novel",))
+        self.chunks = registry.counter("generated_chunks_total", "拼接进小说的段数")
+
+    def __call__(self, event: Event):
+        if isinstance(event, RequestRetried):
+            self.retries.inc(cause=event.cause)
+        elif isinstance(event, RequestFailed):
+            self.errors.inc(status=event.status)
+        elif isinstance(event, RateLimited):
+            self.errors.inc(status=429)
+        elif isinstance(event, ContentTooShort):
+            self.discarded.inc(reason="too_short")
+        elif isinstance(event, ContentRejected):
+            self.discarded.inc(reason="refused")
+        elif isinstance(event, ResponseUnparsed):
+            self.discarded.inc(reason="unparsed")
+        elif isinstance(event, ChunkCompleted):
+            self.chars.inc(event.added, novel=event.novel_id)
+            self.chunks.inc()
+
+
+class JsonlTraceSink:
+    """每个事件写一行 JSON：{"ts", "type", "level", ...字段}"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, event: Event):
+        record = {
+            "ts": round(time.time(), 6),
+            "type": type(event).__name__,
+            "level": logging.getLevelName(event.level),
+        }
+        record.update(event.to_dict())
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
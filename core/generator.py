@@ -27,21 +27,90 @@ if parent_dir not in sys.path:
 try:
     from ..templates.prompts import PROMPT_TEMPLATES, ENDING_PROMPTS, GENRE_SPECIFIC_PROMPTS, NOVEL_TYPES, __version__
     from ..utils.config import save_config, load_config
-    from ..utils.common import get_output_dir, get_timestamp
+    from ..utils.common import get_output_dir, get_timestamp, atomic_write_text, atomic_write_json
+    from ..utils.catalog import open_catalog
+    from ..utils.novel_index import NovelIndex
+    from ..utils.quality import QualityScorer, log_chunk_quality
+    from .events import (
+        EventBus, CallbackSink, MetricsSink, StatusMessage, guess_level, RequestStarted, ResponseReceived,
+        ContentExtracted, ResponseUnparsed, ContentTooShort, ContentRejected, RequestFailed,
+        RateLimited, RequestRetried, ChunkCompleted, SummaryStarted, SummaryCompleted,
+    )
+    from .progress import ProgressChannel
+    from ..utils.metrics import get_registry, MetricsServer, SnapshotWriter
+    from ..utils.tracing import get_tracer
+    from ..utils.loop_monitor import LoopMonitor
     from .media_generator import MediaGenerator
+    from .media_cache import MediaCache, cache_dir_for
+    from .novel_writer import NovelWriter
 except ImportError:
     from templates.prompts import PROMPT_TEMPLATES, ENDING_PROMPTS, GENRE_SPECIFIC_PROMPTS, NOVEL_TYPES, __version__
     from utils.config import save_config, load_config
-    from utils.common import get_output_dir, get_timestamp
+    from utils.common import get_output_dir, get_timestamp, atomic_write_text, atomic_write_json
+    from utils.catalog import open_catalog
+    from utils.novel_index import NovelIndex
+    from utils.quality import QualityScorer, log_chunk_quality
+    from core.events import (
+        EventBus, CallbackSink, MetricsSink, StatusMessage, guess_level, RequestStarted, ResponseReceived,
+        ContentExtracted, ResponseUnparsed, ContentTooShort, ContentRejected, RequestFailed,
+        RateLimited, RequestRetried, ChunkCompleted, SummaryStarted, SummaryCompleted,
+    )
+    from core.progress import ProgressChannel
+    from utils.metrics import get_registry, MetricsServer, SnapshotWriter
+    from utils.tracing import get_tracer
+    from utils.loop_monitor import LoopMonitor
     from core.media_generator import MediaGenerator
+    from core.media_cache import MediaCache, cache_dir_for
+    from core.novel_writer import NovelWriter
 
 # 设置日志
 logger = logging.getLogger("novel_generator")
 
+# 运行指标
+_metrics = get_registry()
+LLM_REQUEST_SECONDS = _metrics.histogram(
+    "llm_request_seconds", "接口请求从发出到读完响应的耗时（秒）", ("model", "outcome"))
+LLM_FIRST_BYTE_SECONDS = _metrics.histogram(
+    "llm_time_to_first_byte_seconds", "接口请求从发出到收到响应头的耗时（秒）", ("model",))
+LLM_TOKENS = _metrics.counter("llm_tokens_total", "接口返回的 token 用量", ("model", "direction"))
+LLM_IN_FLIGHT = _metrics.gauge("llm_requests_in_flight", "正在进行的接口请求数")
+NOVEL_CHARS_PER_SECOND = _metrics.gauge(
+    "novel_chars_per_second", "每部小说最近的生成速度（字/秒）", ("novel",))
+CLEANUP_CPU_SECONDS = _metrics.histogram("cleanup_cpu_seconds", "清理一段生成内容的 CPU 时间（秒）")
+SUMMARY_SECONDS = _metrics.histogram("summary_seconds", "生成一次小说摘要的耗时（秒）")
+
+# 流水线追踪（默认关闭，开启后每部小说、每段内容的各阶段写入输出目录的 trace.jsonl）
+_tracer = get_tracer()
+
 # 如果无法导入__version__，设置一个默认值
 if not '__version__' in globals():
     __version__ = "3.6.0"
 
+class _RequestMetrics:
+    """一次接口请求的指标和追踪 span：并发数、首字节时间和总耗时（finish 只记录第一次）"""
+
+    __slots__ = ("model", "start", "finished", "span")
+
+    def __init__(self, model: str, endpoint: str = "", attempt: int = 0):
+        self.model = model
+        self.start = time.perf_counter()
+        self.finished = False
+        self.span = _tracer.span("http", model=model, endpoint=endpoint, attempt=attempt).start()
+        LLM_IN_FLIGHT.inc()
+
+    def first_byte(self):
+        LLM_FIRST_BYTE_SECONDS.observe(time.perf_counter() - self.start, model=self.model)
+
+    def finish(self, outcome: str):
+        if self.finished:
+            return
+        self.finished = True
+        LLM_IN_FLIGHT.dec()
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - self.start, model=self.model, outcome=outcome)
+        self.span.set_tag(outcome=outcome)
+        self.span.finish()
+
+
 class NovelGenerator:
     def __init__(self, api_key: str, model: str = "gpt-4.1",
                  base_url: Optional[str] = None,
@@ -67,13 +136,26 @@ class NovelGenerator:
                  generate_cover: bool = False,
                  generate_music: bool = False,
                  num_cover_images: int = 1,
+                 media_reuse_policy: str = "reuse",
+                 media_variants: int = 3,
+                 output_root: Optional[str] = None,
                  paragraph_length_preference: str = "适中",
                  dialogue_frequency: str = "适中",
                  ending_trigger_ratio: float = 0.90,
                  ending_stop_overrun_ratio: float = 1.02,
                  ending_stop_attempts: int = 3,
                  ending_stop_min_ratio: float = 0.98,
-                 ending_marker_stop: bool = True):
+                 ending_marker_stop: bool = True,
+                 quality_gate: bool = False,
+                 quality_gate_threshold: float = 55.0,
+                 quality_gate_retry_budget: int = 10,
+                 event_bus: Optional[EventBus] = None,
+                 status_level: int = logging.INFO,
+                 progress_channel: Optional[ProgressChannel] = None,
+                 metrics_port: Optional[int] = None,
+                 metrics_snapshot_interval: float = 60.0,
+                 trace: bool = False,
+                 loop_lag_threshold: Optional[float] = None):
         
         # 初始化属性...
         self.api_key = api_key
@@ -88,12 +170,35 @@ class NovelGenerator:
         self.max_tokens = max_tokens
         self.context_length = context_length
         self.status_callback = status_callback
+        # 状态通过事件总线发布；旧式字符串回调作为订阅者接入，低于 status_level 的事件不会为它格式化
+        self.events = event_bus if event_bus is not None else EventBus()
+        if status_callback:
+            self.events.subscribe(CallbackSink(status_callback), level=status_level)
+        # 重试原因、错误状态码、生成字数等计入运行指标
+        self.events.subscribe(MetricsSink(), types=MetricsSink.EVENT_TYPES)
+        # 可选的本机 /metrics 接口和输出目录中的定期指标快照（间隔为 0 时不写）
+        self.metrics_port = metrics_port
+        self.metrics_snapshot_interval = metrics_snapshot_interval
+        self._metrics_server = None
+        self._metrics_snapshots = None
+        # 开启后各阶段耗时写入输出目录的 trace.jsonl（python -m utils.tracing 转换为 Chrome trace）
+        self.trace = trace
+        # 设置后监视事件循环，阻塞超过该秒数时采样调用栈，按位置记入指标和日志
+        self.loop_lag_threshold = loop_lag_threshold
+        self._loop_monitor = None
         self.num_novels = num_novels
         self.random_types = random_types
         self.create_ending = create_ending
         self.continue_from_file = continue_from_file
         self.continue_from_dir = continue_from_dir
         self.progress_callback = progress_callback
+        # 进度通道只传递每部小说的字数、速度和阶段；旧式回调收到合并后的小字典
+        self.progress = progress_channel if progress_channel is not None else ProgressChannel()
+        if progress_callback:
+            self.progress.add_listener(lambda record: progress_callback(record.to_dict()))
+        self.progress.add_listener(
+            lambda record: NOVEL_CHARS_PER_SECOND.set(record.rate, novel=record.novel_id)
+        )
         self.autosave_interval = autosave_interval
         self.novel_types_for_batch = novel_types_for_batch
         self.retry_callback = retry_callback
@@ -101,9 +206,17 @@ class NovelGenerator:
         self.generate_cover = generate_cover
         self.generate_music = generate_music
         self.num_cover_images = num_cover_images
+        self.media_reuse_policy = media_reuse_policy
+        self.media_variants = media_variants
         # 排版偏好
         self.paragraph_length_preference = paragraph_length_preference
         self.dialogue_frequency = dialogue_frequency
+        # 质量闸门：新内容拼接前用启发式评分把关，低分内容在重试预算内重新生成
+        self.quality_gate = quality_gate
+        self.quality_gate_threshold = quality_gate_threshold
+        self.quality_gate_retry_budget = quality_gate_retry_budget  # 每部小说的重试次数上限
+        self.quality_gate_chunk_retries = 2  # 单段内容的重试次数上限
+        self.quality_scorer = QualityScorer() if quality_gate else None
         
         # API相关
         if base_url:
@@ -114,10 +227,21 @@ class NovelGenerator:
         self.session = None
         self.existing_content = {}
         
+        # 输出目录
+        self.output_dir = get_output_dir()
+        
         # 媒体生成器
         self.media_generator = None
         if self.generate_cover or self.generate_music:
-            self.media_generator = MediaGenerator(self.api_key, self.status_callback)
+            # 缓存放在输出根目录（默认为存放本次输出目录的目录）下，与小说媒体目录同一分区，素材可以硬链接
+            media_root = output_root or os.path.dirname(os.path.abspath(self.output_dir))
+            self.media_generator = MediaGenerator(
+                self.api_key, self.update_status, base_url=self.base_url,
+                media_cache=MediaCache(cache_dir_for(media_root), policy=media_reuse_policy,
+                                       variants=media_variants)
+            )
+        # 已提交媒体任务的小说文件
+        self.media_submitted = set()
         
         # 小说生成状态
         self.running = False
@@ -133,12 +257,19 @@ class NovelGenerator:
         self.last_summary_word_count = 0
         self.novel_summaries = []
         
-        # 输出目录
-        self.output_dir = get_output_dir()
-        
         # 续写文件列表
         self.continuation_files = []
         
+        # 输出目录索引（首次使用时打开）
+        self.catalog = None
+        
+        # 生成中小说的结构索引（章节/段落偏移），保存时增量更新
+        self.structure_indexes = {}
+        self._structure_index_lock = threading.Lock()
+        
+        # 后台保存写入器（在事件循环中首次保存时启动）
+        self.writer = None
+        
         # 如果是续写模式，加载现有小说
         if self.continue_from_file:
             self._load_existing_novel()
@@ -152,23 +283,23 @@ class NovelGenerator:
             self.update_status(f"错误：{self.continue_from_dir} 不是有效目录")
             return
         
-        # 查找所有txt文件
-        txt_files = []
-        for root, dirs, files in os.walk(self.continue_from_dir):
-            for file in files:
-                if file.endswith('.txt') and not file.startswith('summary'):
-                    txt_files.append(os.path.join(root, file))
+        # 从索引中查找小说文件（只包含有元数据的小说）
+        catalog = self._get_catalog()
+        if catalog is None:
+            self.update_status(f"错误：无法打开目录 {self.continue_from_dir} 的索引")
+            return
         
-        self.update_status(f"在目录 {self.continue_from_dir} 及其子目录中找到 {len(txt_files)} 个小说文件")
+        # 索引可能落后于磁盘（之后新增、删除或在外部修改的文件），先同步
+        catalog.reconcile(self.continue_from_dir)
+        novels = catalog.list_novels(self.continue_from_dir)
+        self.update_status(f"在目录 {self.continue_from_dir} 及其子目录中找到 {len(novels)} 个小说文件")
         
-        for txt_path in txt_files:
-            meta_path = txt_path.replace('.txt', '_meta.json')
-            
-            # 检查是否存在对应的元数据文件
-            if os.path.exists(meta_path):
+        for novel in novels:
+            txt_path = novel['path']
+            if novel['meta_path']:
                 self.continuation_files.append({
                     'txt_path': txt_path,
-                    'meta_path': meta_path
+                    'meta_path': novel['meta_path']
                 })
                 self.update_status(f"已添加续写文件: {os.path.basename(txt_path)}")
             else:
@@ -197,16 +328,15 @@ class NovelGenerator:
                 current_words = len(self.current_novel_text)
                 if "target_length" not in self.current_novel_setup or self.current_novel_setup["target_length"] <= current_words:
                     self.current_novel_setup["target_length"] = current_words + self.target_length
-                    if self.status_callback:
-                        self.status_callback(f"设置新的目标长度: {self.current_novel_setup['target_length']} 字")
+                    self.update_status(f"设置新的目标长度: {self.current_novel_setup['target_length']} 字")
         except Exception as e:
-            if self.status_callback:
-                self.status_callback(f"加载已有小说失败: {e}")
+            self.update_status(f"加载已有小说失败: {e}")
     
-    def update_status(self, message: str):
-        """更新状态消息"""
-        if self.status_callback:
-            self.status_callback(message)
+    def update_status(self, message: str, level: Optional[int] = None):
+        """发布纯文本状态消息（没有专门事件类型的场合；未指定级别时按内容推断）"""
+        events = self.events
+        if events.active:
+            events.publish(StatusMessage(message, guess_level(message) if level is None else level))
             
     def _create_novel_setup(self, index: int):
         """创建小说设定"""
@@ -1193,6 +1323,8 @@ class NovelGenerator:
     
     async def generate_novel_content(self, novel_setup):
         """生成小说内容"""
+        novel_span = _tracer.span("novel", novel=novel_setup.get("id", "default"),
+                                  genre=novel_setup.get("genre", "")).start()
         try:
             # 确保基本属性初始化
             if not hasattr(self, 'session') or not self.session:
@@ -1234,9 +1366,6 @@ class NovelGenerator:
                 # 如果不是字典，创建一个新的空字典
                 self.existing_content = {}
                 
-            if not hasattr(self, 'save_lock'):
-                self.save_lock = asyncio.Lock()
-                
             # 获取已有内容
             novel_id = novel_setup.get("id", "default")
             current_text = self.existing_content.get(novel_id, "")
@@ -1268,6 +1397,7 @@ class NovelGenerator:
             ending_generated = False  # 真正满足收束条件后才置为 True
             ending_mode = False       # 达到阈值后进入结尾阶段
             ending_attempts = 0       # 结尾段尝试计数
+            chunk_index = 0           # 本次运行生成的段序号（用于追踪）
             
             while (len(current_text) < threshold and 
                   not self.stop_event.is_set() and 
@@ -1276,8 +1406,9 @@ class NovelGenerator:
                 # 等待暂停事件
                 if self.paused:
                     self.update_status("生成已暂停...")
-                    # 暂停时保存当前内容
-                    await self._save_current_novel_async(current_text, novel_setup)
+                    self.progress.update(novel_id, len(current_text), phase="paused")
+                    # 暂停时保存当前内容，并等待落盘
+                    await self._save_current_novel_async(current_text, novel_setup, wait=True)
                     
                     # 等待暂停解除，同时定期检查是否已停止
                     while self.paused and self.running and not self.stop_event.is_set():
@@ -1317,26 +1448,14 @@ class NovelGenerator:
                 # 更新进度
                 progress = min(100.0, (len(current_text) / novel_setup["target_length"]) * 100)
                 novel_setup["percentage"] = progress
-                
-                # 计算生成速度
-                if "start_time" in novel_setup:
-                    elapsed_time = time.time() - novel_setup["start_time"]
-                    if elapsed_time > 0:
-                        chars_per_second = len(current_text) / elapsed_time
-                        remaining_chars = novel_setup["target_length"] - len(current_text)
-                        
-                        if chars_per_second > 0 and remaining_chars > 0:
-                            estimated_time = remaining_chars / chars_per_second
-                            novel_setup["estimated_time"] = estimated_time
-                
-                # 更新进度回调
-                if self.progress_callback:
-                    self.progress_callback(novel_setup)
+                self.progress.update(novel_id, len(current_text), novel_setup["target_length"],
+                                     "ending" if ending_mode else "generating", novel_setup.get("genre"))
                 
                 # 检查是否需要生成摘要
                 if (novel_setup["word_count"] - self.last_summary_word_count >= self.auto_summary_interval 
                     and not self.stop_event.is_set() and self.auto_summary_interval > 0):
-                    self.update_status(f"已达到 {self.auto_summary_interval} 字，生成小说摘要...")
+                    self.events.emit(SummaryStarted, novel_id, novel_setup["word_count"])
+                    self.progress.update(novel_id, len(current_text), phase="summarizing")
                     summary = await self._generate_summary(current_text)
                     if summary:
                         self._save_summary(summary, novel_setup["word_count"], novel_setup)
@@ -1349,7 +1468,8 @@ class NovelGenerator:
                         self.update_status("进行长文本内容质量检查...")
                         # 检查最近生成的部分是否包含过多重复内容或标点符号问题
                         recent_part = current_text[-(cleaning_interval*2):]  # 检查最近生成的两个间隔的内容
-                        cleaned_recent = self._fix_long_text_issues(recent_part)
+                        with _tracer.span("long_text_check"):
+                            cleaned_recent = self._fix_long_text_issues(recent_part)
                         
                         # 如果清理后的内容与原内容差异很大，表示有大量重复或问题
                         if len(cleaned_recent) < len(recent_part) * 0.9:  # 如果删减了10%以上的内容
@@ -1357,6 +1477,7 @@ class NovelGenerator:
                             # 替换原文的这部分内容
                             current_text = current_text[:-(cleaning_interval*2)] + cleaned_recent
                             self.existing_content[novel_id] = current_text
+                            self._reset_structure_index(novel_setup)
                             novel_setup["word_count"] = len(current_text)
                         
                         last_cleaning_check = len(current_text)
@@ -1367,116 +1488,131 @@ class NovelGenerator:
                 # 在进入结尾阶段但尚未满足收束条件时，持续引导模型生成结尾
                 should_create_ending = (ending_mode and not ending_generated)
                 
-                prompt = self.get_prompt(novel_setup, current_text, should_create_ending)
-                
-                # 对于长文本，在提示词中添加额外警告，避免重复
-                if is_long_text:
-                    prompt += "\n\n特别注意：\n1. 当前小说已超过25万字，请确保新生成的内容完全不与之前的内容重复\n2. 避免过多使用标点符号，尤其是连续的感叹号和问号\n3. 保持段落简洁，避免冗长描述\n4. 确保故事推进，不要停滞在同一情节点"
-                
-                self.update_status("正在调用AI接口生成内容...")
+                chunk_index += 1
+                with _tracer.span("chunk", chunk=chunk_index, ending=should_create_ending):
+                    with _tracer.span("prompt"):
+                        prompt = self.get_prompt(novel_setup, current_text, should_create_ending)
+                    
+                        # 对于长文本，在提示词中添加额外警告，避免重复
+                        if is_long_text:
+                            prompt += "\n\n特别注意：\n1. 当前小说已超过25万字，请确保新生成的内容完全不与之前的内容重复\n2. 避免过多使用标点符号，尤其是连续的感叹号和问号\n3. 保持段落简洁，避免冗长描述\n4. 确保故事推进，不要停滞在同一情节点"
                 
-                try:
-                    content = await self._generate_text(prompt)
-                    # 优化内容长度检查，与API调用中的检查保持一致
-                    if not content or len(content.strip()) < 100:
-                        content_length = len(content.strip()) if content else 0
-                        self.update_status(f"生成的内容过短({content_length}字符)，重试...")
-                        if self.retry_callback:
-                            self.retry_callback()
-                        await asyncio.sleep(3)  # 短暂等待后重试
-                        continue
+                    try:
+                        content = await self._generate_text(prompt)
+                        # 优化内容长度检查，与API调用中的检查保持一致
+                        if not content or len(content.strip()) < 100:
+                            content_length = len(content.strip()) if content else 0
+                            self.update_status(f"生成的内容过短({content_length}字符)，重试...")
+                            if self.retry_callback:
+                                self.retry_callback()
+                            await asyncio.sleep(3)  # 短暂等待后重试
+                            continue
                     
-                    # 清理内容
-                    content = self._clean_content(content)
+                        # 清理内容
+                        content = self._clean_content(content)
                     
-                    # 对于长文本，额外检查这段新内容是否与小说尾部有重复
-                    if is_long_text and len(current_text) > 250000:
-                        # 获取小说最后一部分
-                        last_part = current_text[-10000:]  # 检查与最后1万字的重复情况
+                        # 对于长文本，额外检查这段新内容是否与小说尾部有重复
+                        if is_long_text and len(current_text) > 250000:
+                            with _tracer.span("dedup"):
+                                # 获取小说最后一部分
+                                last_part = current_text[-10000:]  # 检查与最后1万字的重复情况
                         
-                        # 计算新内容与小说尾部的相似度
-                        simplified_content = ''.join([c for c in content if c.isalnum()])
-                        simplified_last = ''.join([c for c in last_part if c.isalnum()])
+                                # 计算新内容与小说尾部的相似度
+                                simplified_content = ''.join([c for c in content if c.isalnum()])
+                                simplified_last = ''.join([c for c in last_part if c.isalnum()])
                         
-                        # 计算是否有整段重复
-                        has_duplicate_paragraph = False
-                        content_paragraphs = content.split('\n\n')
-                        for para in content_paragraphs:
-                            if len(para) > 20 and para in last_part:  # 长段落在最近内容中有完全匹配
-                                has_duplicate_paragraph = True
-                                self.update_status("检测到完全重复的段落，正在处理...")
-                                break
+                                # 计算是否有整段重复
+                                has_duplicate_paragraph = False
+                                content_paragraphs = content.split('\n\n')
+                                for para in content_paragraphs:
+                                    if len(para) > 20 and para in last_part:  # 长段落在最近内容中有完全匹配
+                                        has_duplicate_paragraph = True
+                                        self.update_status("检测到完全重复的段落，正在处理...")
+                                        break
                         
-                        # 如果有明显重复，尝试再次生成
-                        if has_duplicate_paragraph or (len(simplified_content) > 100 and self._calculate_similarity(simplified_content, simplified_last) > 0.7):
-                            self.update_status("检测到内容与最近生成的文本有较高重复度，重新生成...")
+                                # 如果有明显重复，尝试再次生成
+                                if has_duplicate_paragraph or (len(simplified_content) > 100 and self._calculate_similarity(simplified_content, simplified_last) > 0.7):
+                                    self.update_status("检测到内容与最近生成的文本有较高重复度，重新生成...")
                             
-                            # 修改提示词，强调不要重复
-                            retry_prompt = prompt + "\n\n非常重要：上次生成的内容与已有文本高度重复，请生成完全不同的内容，不要重复任何已有情节、对话或描述。确保故事向前推进，引入新的情节点或发展方向。"
+                                    # 修改提示词，强调不要重复
+                                    retry_prompt = prompt + "\n\n非常重要：上次生成的内容与已有文本高度重复，请生成完全不同的内容，不要重复任何已有情节、对话或描述。确保故事向前推进，引入新的情节点或发展方向。"
                             
-                            # 重新生成内容
-                            retry_content = await self._generate_text(retry_prompt)
-                            if retry_content and len(retry_content) > 10:
-                                content = self._clean_content(retry_content)
+                                    # 重新生成内容
+                                    retry_content = await self._generate_text(retry_prompt)
+                                    if retry_content and len(retry_content) > 10:
+                                        content = self._clean_content(retry_content)
+                    
+                        # 质量闸门：拼接前检查新内容，避免低质量内容进入上下文和摘要
+                        if self.quality_scorer is not None:
+                            with _tracer.span("quality_gate"):
+                                content = await self._apply_quality_gate(prompt, content, current_text, novel_setup)
                     
-                    # 如果处于结尾阶段，记录一次结尾尝试，不立即停止
-                    if should_create_ending:
-                        ending_attempts += 1
-                        self.update_status(f"结尾段已生成（第 {ending_attempts} 段）")
-                
-                    # 智能合并内容
-                    current_text = self._smart_join_content(current_text, content)
-                    self.existing_content[novel_id] = current_text
+                        # 如果处于结尾阶段，记录一次结尾尝试，不立即停止
+                        if should_create_ending:
+                            ending_attempts += 1
+                            self.update_status(f"结尾段已生成（第 {ending_attempts} 段）")
+                
+                        # 智能合并内容
+                        with _tracer.span("join"):
+                            current_text = self._smart_join_content(current_text, content)
+                        self.existing_content[novel_id] = current_text
                     
-                    # 更新统计
-                    novel_setup["word_count"] = len(current_text)
-                    novel_setup["content"] = current_text
+                        # 更新统计
+                        novel_setup["word_count"] = len(current_text)
+                        novel_setup["content"] = current_text
                     
-                    # 结尾收束判定：达到目标长度一定冗余，或多段结尾后基本达标，或检测到结尾关键词
-                    if ending_mode:
-                        wc = novel_setup["word_count"]
-                        target = novel_setup["target_length"]
-                        content_lower = content.lower()
-                        has_end_marker = any(k in content for k in ["（完）", "全书完", "完结", "终章"]) or any(k in content_lower for k in ["the end", "epilogue"]) 
+                        # 结尾收束判定：达到目标长度一定冗余，或多段结尾后基本达标，或检测到结尾关键词
+                        if ending_mode:
+                            wc = novel_setup["word_count"]
+                            target = novel_setup["target_length"]
+                            content_lower = content.lower()
+                            has_end_marker = any(k in content for k in ["（完）", "全书完", "完结", "终章"]) or any(k in content_lower for k in ["the end", "epilogue"]) 
 
-                        overrun_ratio = getattr(self, 'ending_stop_overrun_ratio', 1.02)
-                        min_ratio = getattr(self, 'ending_stop_min_ratio', 0.98)
-                        attempts_need = getattr(self, 'ending_stop_attempts', 3)
-                        marker_stop = getattr(self, 'ending_marker_stop', True)
+                            overrun_ratio = getattr(self, 'ending_stop_overrun_ratio', 1.02)
+                            min_ratio = getattr(self, 'ending_stop_min_ratio', 0.98)
+                            attempts_need = getattr(self, 'ending_stop_attempts', 3)
+                            marker_stop = getattr(self, 'ending_marker_stop', True)
 
-                        if (wc >= int(target * overrun_ratio)) or \
-                           (ending_attempts >= attempts_need and wc >= int(target * min_ratio)) or \
-                           (marker_stop and has_end_marker):
-                            ending_generated = True
-                            self.update_status("小说结尾生成完成，停止生成")
-                            break
+                            if (wc >= int(target * overrun_ratio)) or \
+                               (ending_attempts >= attempts_need and wc >= int(target * min_ratio)) or \
+                               (marker_stop and has_end_marker):
+                                ending_generated = True
+                                self.update_status("小说结尾生成完成，停止生成")
+                                break
 
-                    # 计算进度
-                    progress = min(100.0, (len(current_text) / novel_setup["target_length"]) * 100)
-                    novel_setup["percentage"] = progress
+                        # 计算进度
+                        progress = min(100.0, (len(current_text) / novel_setup["target_length"]) * 100)
+                        novel_setup["percentage"] = progress
                     
-                    # 每段内容生成后保存 - 不再检查时间间隔，每次都保存
-                    await self._save_current_novel_async(current_text, novel_setup)
-                    last_saved_word_count = len(current_text)
+                        # 每段内容生成后保存 - 不再检查时间间隔，每次都保存
+                        with _tracer.span("save"):
+                            await self._save_current_novel_async(current_text, novel_setup)
+                        added = len(current_text) - last_saved_word_count
+                        last_saved_word_count = len(current_text)
                     
-                    # 打印进度
-                    self.update_status(f"小说 {novel_setup['genre']} 已生成 {len(current_text)} 字 ({progress:.1f}%)")
+                        self.events.emit(ChunkCompleted, novel_id, novel_setup['genre'], added,
+                                         len(current_text), novel_setup["target_length"])
+                        self.progress.update(novel_id, len(current_text))
                     
-                except Exception as e:
-                    self.update_status(f"生成内容时出错: {str(e)}")
+                    except Exception as e:
+                        self.update_status(f"生成内容时出错: {str(e)}")
                     
-                    # 即使生成失败，也尝试保存当前内容，防止丢失
-                    if len(current_text) > last_saved_word_count:
-                        await self._save_current_novel_async(current_text, novel_setup)
-                        last_saved_word_count = len(current_text)
+                        # 即使生成失败，也尝试保存当前内容，防止丢失
+                        if len(current_text) > last_saved_word_count:
+                            await self._save_current_novel_async(current_text, novel_setup)
+                            last_saved_word_count = len(current_text)
                     
-                    if str(e).startswith("API调用失败:"):
-                        if self.retry_callback:
-                            self.retry_callback()
-                    await asyncio.sleep(3)  # 出错后短暂等待
+                        if str(e).startswith("API调用失败:"):
+                            if self.retry_callback:
+                                self.retry_callback()
+                        await asyncio.sleep(3)  # 出错后短暂等待
             
-            # 完成后保存
-            await self._save_current_novel_async(current_text, novel_setup)
+            # 完成后保存，并等待落盘
+            await self._save_current_novel_async(current_text, novel_setup, wait=True)
+            self._release_structure_index(novel_setup)
+            finished = len(current_text) >= novel_setup["target_length"] or ending_generated
+            self.progress.update(novel_id, len(current_text), phase="done" if finished else "stopped")
+            self.progress.flush()
             
             return current_text
             
@@ -1485,54 +1621,118 @@ class NovelGenerator:
             import traceback
             traceback.print_exc()
             return ""
+        finally:
+            novel_span.finish()
             
-    async def _save_current_novel_async(self, current_text, novel_setup):
-        """异步保存当前小说内容，带锁机制防止并发问题"""
+    async def _apply_quality_gate(self, prompt, content, current_text, novel_setup):
+        """质量闸门：用启发式评分检查新生成的内容
+        
+        低于阈值时按最低分维度的改进建议重新生成，单段最多重试 quality_gate_chunk_retries 次，
+        整部小说的重试总数受 quality_gate_retry_budget 限制；仍不达标时保留得分最高的版本。
+        每次评分都写入质量指标日志，统计结果记录在 novel_setup["quality_gate"]。
+        
+        Returns:
+            通过闸门（或得分最高）的内容
+        """
+        stats = novel_setup.setdefault("quality_gate", {"checked": 0, "retried": 0, "below_threshold": 0})
+        doc_id = novel_setup.get("id", "default")
+        genre = novel_setup.get("genre", self.novel_type)
+        context = current_text[-self.quality_scorer.context_window:]
+        chunk_idx = stats["checked"] + 1
+        stats["checked"] += 1
+        
+        best_content, best_score = content, None
+        attempt = 0
+        while True:
+            score = await self.quality_scorer.evaluate_text(content, context, genre, use_llm=False)
+            if best_score is None or score.overall > best_score.overall:
+                best_content, best_score = content, score
+            if score.overall >= self.quality_gate_threshold:
+                log_chunk_quality(doc_id, chunk_idx, attempt, score, "accepted")
+                return content
+            
+            if (attempt >= self.quality_gate_chunk_retries or
+                    stats["retried"] >= self.quality_gate_retry_budget or
+                    self.stop_event.is_set()):
+                break
+            
+            log_chunk_quality(doc_id, chunk_idx, attempt, score, "retry")
+            attempt += 1
+            stats["retried"] += 1
+            self.update_status(
+                f"新内容质量评分偏低({score.overall:.1f}/100)，按建议重新生成"
+                f"（{score.rewrite_suggestion}，第 {attempt} 次）..."
+            )
+            retry_prompt = (prompt + f"\n\n重要：上一次生成的内容质量不达标，请重新创作这一段。"
+                            f"重点改进：{score.rewrite_suggestion}。保持与前文情节连贯，不要重复已有内容。")
+            try:
+                retry_content = await self._generate_text(retry_prompt)
+            except Exception as e:
+                self.update_status(f"重新生成失败: {str(e)}")
+                break
+            if not retry_content or len(retry_content.strip()) < 100:
+                break
+            content = self._clean_content(retry_content)
+        
+        stats["below_threshold"] += 1
+        log_chunk_quality(doc_id, chunk_idx, attempt, best_score, "kept_best")
+        if attempt:
+            self.update_status(f"重试后质量仍未达标，保留得分最高的版本({best_score.overall:.1f}/100)")
+        else:
+            self.update_status(f"质量重试预算已用完，保留当前内容({best_score.overall:.1f}/100)")
+        return best_content
+    
+    async def _save_current_novel_async(self, current_text, novel_setup, wait=False):
+        """异步保存当前小说内容，交给后台写入器合并写入
+        
+        Args:
+            wait: 为 True 时等待内容落盘后返回
+        """
         try:
-            # 使用锁防止并发保存导致的文件冲突
-            async with self.save_lock:
-                # 确定输出目录
-                if hasattr(self, 'main_output_dir') and self.main_output_dir:
-                    output_dir = self.main_output_dir
-                else:
-                    output_dir = self.output_dir
-                
-                # 使用小说ID或索引创建文件名，不再每次生成时间戳
-                if "id" in novel_setup:
-                    filename = f"{novel_setup['genre']}_{novel_setup['id']}.txt"
-                else:
-                    # 如果没有ID，则创建一个固定格式的文件名
-                    protagonist_name = ""
-                    if "protagonist" in novel_setup and novel_setup["protagonist"] and "name" in novel_setup["protagonist"]:
-                        protagonist_name = f"_{novel_setup['protagonist']['name']}"
-                    
-                    novel_index = getattr(self, 'current_novel_index', 0)
-                    filename = f"novel_{novel_index+1}_{novel_setup['genre']}{protagonist_name}.txt"
-                
-                filepath = os.path.join(output_dir, filename)
-                
-                # 保存文本 - 使用异步文件操作防止阻塞
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(
-                    None, 
-                    lambda: self._save_text(current_text, filepath)
-                )
-                
-                # 保存元数据
-                meta_filepath = filepath.replace('.txt', '_meta.json')
-                await loop.run_in_executor(
-                    None,
-                    lambda: self._save_metadata(novel_setup, meta_filepath)
-                )
-                
-                # 更新最后保存时间
-                self.last_save_time = time.time()
+            filepath = self._get_novel_filepath(novel_setup)
+            meta_filepath = filepath.replace('.txt', '_meta.json')
+            
+            # 写入器串行写入并合并同一小说的重复保存，不再阻塞生成流程
+            await self._get_writer().save(current_text, novel_setup, filepath, meta_filepath, wait=wait)
+            
+            # 更新最后保存时间
+            self.last_save_time = time.time()
                 
         except Exception as e:
             self.update_status(f"保存小说时出错: {str(e)}")
             import traceback
             traceback.print_exc()
     
+    def _get_novel_output_dir(self):
+        """当前保存使用的输出目录"""
+        if hasattr(self, 'main_output_dir') and self.main_output_dir:
+            return self.main_output_dir
+        return self.output_dir
+    
+    def _get_novel_filepath(self, novel_setup):
+        """根据小说ID或索引确定小说文件路径，不再每次生成时间戳"""
+        if "id" in novel_setup:
+            filename = f"{novel_setup['genre']}_{novel_setup['id']}.txt"
+        else:
+            # 如果没有ID，则创建一个固定格式的文件名
+            protagonist_name = ""
+            if "protagonist" in novel_setup and novel_setup["protagonist"] and "name" in novel_setup["protagonist"]:
+                protagonist_name = f"_{novel_setup['protagonist']['name']}"
+            
+            novel_index = getattr(self, 'current_novel_index', 0)
+            filename = f"novel_{novel_index+1}_{novel_setup['genre']}{protagonist_name}.txt"
+        
+        return os.path.join(self._get_novel_output_dir(), filename)
+    
+    def _get_writer(self):
+        """获取后台写入器，必要时在当前事件循环中启动"""
+        if self.writer is None or not self.writer.is_running():
+            self.writer = NovelWriter(self._save_novel_files)
+            self.writer.start()
+        return self.writer
+    
+    @CLEANUP_CPU_SECONDS.timed(cpu=True)
+    @_tracer.traced("clean")
     def _clean_content(self, content):
         """清理生成的内容，处理重复内容、标点符号过多等问题，优化空行处理
         
@@ -1746,10 +1946,8 @@ class NovelGenerator:
         return max_len / min(m, n)
     
     def _save_text(self, text, filepath):
-        """保存小说文本"""
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(text)
+        """保存小说文本（原子写入）"""
+        atomic_write_text(filepath, text)
             
     def _save_metadata(self, novel_setup, filepath):
         """保存元数据"""
@@ -1758,12 +1956,76 @@ class NovelGenerator:
         novel_setup["model"] = self.model
         novel_setup["generator_version"] = __version__
         
-        # 确保存在输出目录
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        
-        # 保存到文件
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(novel_setup, f, ensure_ascii=False, indent=2)
+        # 原子写入文件
+        atomic_write_json(filepath, novel_setup)
+    
+    def _get_catalog(self):
+        """获取输出目录索引，续写时使用续写文件所在目录
+
+        向上查找已有索引最多到输出根目录，不会用到输出根目录之外的索引。
+        """
+        if self.catalog is None:
+            if self.continue_from_dir:
+                catalog_dir = self.continue_from_dir
+            elif self.continue_from_file:
+                catalog_dir = os.path.dirname(os.path.abspath(self.continue_from_file))
+            else:
+                catalog_dir = self.output_dir
+            try:
+                self.catalog = open_catalog(catalog_dir, root=self.output_dir)
+            except Exception as e:
+                logger.warning(f"打开输出目录索引失败: {e}")
+                return None
+        return self.catalog
+    
+    def _record_in_catalog(self, filepath, text, novel_setup, status=None):
+        """保存后更新索引，失败时只记录日志，不影响保存"""
+        catalog = self._get_catalog()
+        if catalog is None:
+            return
+        try:
+            catalog.record_novel(filepath, text, novel_setup, status)
+        except Exception as e:
+            logger.warning(f"更新输出目录索引失败: {e}")
+    
+    def _get_structure_index(self, filepath):
+        """获取小说的结构索引，需在写入文本之前调用（磁盘上的索引与文件不一致时从头构建）"""
+        with self._structure_index_lock:
+            index = self.structure_indexes.get(filepath)
+            if index is None:
+                index = NovelIndex.load(filepath)
+                # 保存时按本机换行符重写整个文件，换行符不同的旧索引不能增量更新
+                if index is None or not index.is_current(filepath) or index.newline != os.linesep:
+                    index = NovelIndex()
+                self.structure_indexes[filepath] = index
+            return index
+    
+    def _update_structure_index(self, index, filepath, text):
+        """保存后增量更新结构索引，失败时只记录日志，不影响保存"""
+        try:
+            with self._structure_index_lock:
+                index.update(text)
+                index.save(filepath)
+        except Exception as e:
+            logger.warning(f"更新结构索引失败: {e}")
+    
+    def _reset_structure_index(self, novel_setup):
+        """前文被改写后，下次保存时全量重建结构索引"""
+        with self._structure_index_lock:
+            self.structure_indexes[self._get_novel_filepath(novel_setup)] = NovelIndex()
+    
+    def _release_structure_index(self, novel_setup):
+        """小说生成结束后释放内存中的结构索引（文件保留在小说旁）"""
+        with self._structure_index_lock:
+            self.structure_indexes.pop(self._get_novel_filepath(novel_setup), None)
+    
+    def _save_novel_files(self, text, novel_setup, filepath, meta_filepath, status=None):
+        """保存小说文本和元数据，并更新索引"""
+        structure_index = self._get_structure_index(filepath)
+        self._save_text(text, filepath)
+        self._save_metadata(novel_setup, meta_filepath)
+        self._record_in_catalog(filepath, text, novel_setup, status)
+        self._update_structure_index(structure_index, filepath, text)
     
     async def generate_single_novel(self):
         """生成单本小说"""
@@ -1850,6 +2112,8 @@ class NovelGenerator:
                 # 如果是批量续写模式，使用原始目录作为输出目录
                 self.main_output_dir = self.continue_from_dir
             
+            self._start_metrics()
+            
             # 初始化计数器
             self.completed_novels = 0
             self.current_novel_index = 0
@@ -1913,6 +2177,16 @@ class NovelGenerator:
                 self.update_status(f"保存内容时出错: {str(save_error)}")
             return False
         finally:
+            # 写完所有积压的保存
+            if self.writer is not None:
+                try:
+                    await self.writer.close()
+                except Exception as e:
+                    self.update_status(f"关闭保存写入器时出错: {e}")
+                self.writer = None
+            
+            self._stop_metrics()
+            
             # 确保会话被正确关闭
             if hasattr(self, 'session') and self.session:
                 try:
@@ -1923,6 +2197,41 @@ class NovelGenerator:
                     self.update_status(f"关闭会话时出错: {e}")
                     self.session = None
     
+    def _start_metrics(self):
+        """启动指标接口、定期快照、追踪和事件循环监视（快照和追踪文件写入本次运行的输出目录）"""
+        if self.metrics_port is not None and self._metrics_server is None:
+            try:
+                self._metrics_server = MetricsServer(port=self.metrics_port)
+                self._metrics_server.start()
+                self.update_status(f"指标接口: http://127.0.0.1:{self._metrics_server.port}/metrics")
+            except OSError as e:
+                self._metrics_server = None
+                self.update_status(f"指标接口启动失败: {e}")
+        if self.metrics_snapshot_interval and self._metrics_snapshots is None:
+            path = os.path.join(self._get_novel_output_dir(), "metrics.json")
+            self._metrics_snapshots = SnapshotWriter(path, self.metrics_snapshot_interval)
+            self._metrics_snapshots.start()
+        if self.trace and not _tracer.enabled:
+            path = os.path.join(self._get_novel_output_dir(), "trace.jsonl")
+            _tracer.open(path)
+            self.update_status(f"追踪已开启: {path}")
+        if self.loop_lag_threshold and self._loop_monitor is None:
+            self._loop_monitor = LoopMonitor(threshold=self.loop_lag_threshold).start()
+    
+    def _stop_metrics(self):
+        """停止指标接口，写入最后一次快照，关闭追踪和事件循环监视"""
+        if self._loop_monitor is not None:
+            self._loop_monitor.stop()
+            self._loop_monitor = None
+        if self.trace:
+            _tracer.close()
+        if self._metrics_snapshots is not None:
+            self._metrics_snapshots.stop()
+            self._metrics_snapshots = None
+        if self._metrics_server is not None:
+            self._metrics_server.stop()
+            self._metrics_server = None
+    
     async def _continue_novel_worker(self, index, file_info, semaphore):
         """处理单个续写小说的工作函数"""
         async with semaphore:
@@ -1931,6 +2240,7 @@ class NovelGenerator:
                 
             self.update_status(f"开始续写第 {index+1}/{len(self.continuation_files)} 篇小说: {os.path.basename(file_info['txt_path'])}")
             
+            novel_span = None
             try:
                 # 加载小说内容和元数据
                 with open(file_info['txt_path'], 'r', encoding='utf-8') as f:
@@ -1940,9 +2250,11 @@ class NovelGenerator:
                     novel_setup = json.load(f)
                 
                 # 初始化进度追踪
-                start_time = time.time()
                 current_words = len(existing_content)
                 novel_setup["word_count"] = current_words
+                progress_id = novel_setup.get("id") or os.path.basename(file_info['txt_path'])
+                novel_span = _tracer.span("novel", novel=progress_id, genre=novel_setup.get("genre", "")).start()
+                chunk_index = 0
                 
                 # 如果没有设置目标长度或目标长度小于当前长度，设置一个新的目标
                 if "target_length" not in novel_setup or novel_setup["target_length"] <= current_words:
@@ -1962,9 +2274,9 @@ class NovelGenerator:
                     # 检查暂停状态
                     if self.paused:
                         self.update_status(f"小说 {index+1} 生成已暂停...")
+                        self.progress.update(progress_id, len(full_content), phase="paused")
                         # 暂停时保存当前内容
-                        self._save_text(full_content, file_info['txt_path'])
-                        self._save_metadata(novel_setup, file_info['meta_path'])
+                        await self._get_writer().save(full_content, novel_setup, file_info['txt_path'], file_info['meta_path'], "paused", wait=True)
                         self.update_status(f"小说 {index+1} 内容已保存")
                         
                         # 等待恢复信号
@@ -1973,58 +2285,60 @@ class NovelGenerator:
                             return
                         continue  # 继续检查暂停状态
                     
-                    # 生成续写内容
-                    prompt = self.get_prompt(novel_setup, full_content, self.create_ending)
+                    chunk_index += 1
+                    with _tracer.span("chunk", chunk=chunk_index):
+                        # 生成续写内容
+                        with _tracer.span("prompt"):
+                            prompt = self.get_prompt(novel_setup, full_content, self.create_ending)
                     
-                    # 调用API生成内容 (会话将在 _generate_content 中检查和创建)
-                    content = await self._generate_content(prompt, novel_setup)
+                        # 调用API生成内容 (会话将在 _generate_content 中检查和创建)
+                        content = await self._generate_content(prompt, novel_setup)
                     
-                    if not self.running:
-                        # 停止生成时保存当前内容
-                        self._save_text(full_content, file_info['txt_path'])
-                        self._save_metadata(novel_setup, file_info['meta_path'])
-                        self.update_status(f"生成已停止，内容已保存")
-                        self.update_status(f"小说 {index+1} 的生成已取消")
-                        return
+                        if not self.running:
+                            # 停止生成时保存当前内容
+                            await self._get_writer().save(full_content, novel_setup, file_info['txt_path'], file_info['meta_path'], "stopped", wait=True)
+                            self.progress.update(progress_id, len(full_content), phase="stopped")
+                            self.progress.flush()
+                            self.update_status(f"生成已停止，内容已保存")
+                            self.update_status(f"小说 {index+1} 的生成已取消")
+                            return
                     
-                    if content:
-                        # 清理内容
-                        content = self._clean_content(content)
+                        if content:
+                            # 清理内容
+                            content = self._clean_content(content)
                         
-                        # 合并内容
-                        full_content = self._smart_join_content(full_content, content)
+                            # 合并内容
+                            with _tracer.span("join"):
+                                full_content = self._smart_join_content(full_content, content)
                         
-                        # 更新字数统计
-                        novel_setup["word_count"] = len(full_content)
+                            # 更新字数统计
+                            novel_setup["word_count"] = len(full_content)
                         
-                        # 计算完成百分比
-                        percentage = min(100.0, (novel_setup["word_count"] / novel_setup["target_length"]) * 100)
+                            # 计算完成百分比
+                            percentage = min(100.0, (novel_setup["word_count"] / novel_setup["target_length"]) * 100)
                         
-                        # 计算预计剩余时间
-                        elapsed_time = time.time() - start_time
-                        words_per_second = (novel_setup["word_count"] - current_words) / elapsed_time if elapsed_time > 0 else 0
-                        remaining_words = novel_setup["target_length"] - novel_setup["word_count"]
-                        estimated_time = remaining_words / words_per_second if words_per_second > 0 else 0
+                            # 状态更新（速度和剩余时间由进度通道计算）
+                            self.update_status(f"小说 {index+1} 已生成 {novel_setup['word_count']} 字 ({percentage:.1f}%)")
+                            self.progress.update(progress_id, novel_setup["word_count"], novel_setup["target_length"],
+                                                 "generating", novel_setup.get("genre"))
                         
-                        # 状态更新
-                        self.update_status(f"小说 {index+1} 已生成 {novel_setup['word_count']} 字 ({percentage:.1f}%)")
-                        
-                        # 每次生成内容后都保存，不再检查时间间隔
-                        self._save_text(full_content, file_info['txt_path'])
-                        self._save_metadata(novel_setup, file_info['meta_path'])
-                        last_saved_word_count = len(full_content)
-                        self.last_save_time = time.time()  # 更新保存时间
+                            # 每次生成内容后都提交保存，由写入器合并写入
+                            with _tracer.span("save"):
+                                await self._get_writer().save(full_content, novel_setup, file_info['txt_path'], file_info['meta_path'])
+                            last_saved_word_count = len(full_content)
+                            self.last_save_time = time.time()  # 更新保存时间
                         
                 # 生成完成后保存
                 if len(full_content) > 0:
-                    self._save_text(full_content, file_info['txt_path'])
-                    self._save_metadata(novel_setup, file_info['meta_path'])
+                    await self._get_writer().save(full_content, novel_setup, file_info['txt_path'], file_info['meta_path'], wait=True)
                     self.update_status(f"小说 '{os.path.basename(file_info['txt_path'])}' 续写完成，已保存")
+                    self.progress.update(progress_id, len(full_content), phase="done")
+                    self.progress.flush()
                     
                     # 如果达到目标字数，生成摘要
                     if (not self.stop_event.is_set() and 
                         novel_setup["word_count"] >= novel_setup["target_length"]):
-                        self.update_status(f"已达到目标字数 {novel_setup['target_length']}，生成小说摘要...")
+                        self.events.emit(SummaryStarted, novel_setup.get("id", ""), novel_setup["word_count"])
                         summary = await self._generate_summary(full_content)
                         if summary:
                             self._save_summary(summary, novel_setup["word_count"], novel_setup)
@@ -2036,6 +2350,9 @@ class NovelGenerator:
                 self.update_status(f"续写小说 {index+1} 时出错: {str(e)}")
                 traceback.print_exc()
                 return False
+            finally:
+                if novel_span is not None:
+                    novel_span.finish()
     
     async def _novel_worker(self, index, semaphore):
         """处理单个小说的工作函数"""
@@ -2080,16 +2397,14 @@ class NovelGenerator:
             else:
                 summary_dir = self.output_dir
                 
-            # 查找所有txt和meta文件
-            txt_files = []
-            
-            # 只查找符合novel_开头的文件，避免摘要文件干扰
-            for root, dirs, files in os.walk(summary_dir):
-                for file in files:
-                    if file.startswith('novel_') and file.endswith('.txt'):
-                        txt_files.append(os.path.join(root, file))
+            # 从索引中查询小说，不再逐个读取文件
+            catalog = self._get_catalog()
+            novels = []
+            if catalog is not None:
+                catalog.reconcile(summary_dir)
+                novels = catalog.list_novels(summary_dir)
             
-            if not txt_files:
+            if not novels:
                 self.update_status("未找到任何小说文件，跳过创建汇总")
                 return
             
@@ -2104,43 +2419,33 @@ class NovelGenerator:
                     f.write(f"小说类型: 随机类型\n")
                 else:
                     f.write(f"小说类型: {self.novel_type}\n")
-                f.write(f"生成数量: {len(txt_files)}本\n\n")
+                f.write(f"生成数量: {len(novels)}本\n\n")
                 
-                # 按文件名排序，确保小说按索引顺序显示
-                for txt_file in sorted(txt_files):
-                    # 获取元数据
-                    meta_file = txt_file.replace('.txt', '_meta.json')
-                    if os.path.exists(meta_file):
-                        try:
-                            with open(meta_file, 'r', encoding='utf-8') as mf:
-                                meta = json.load(mf)
-                                
-                            f.write(f"文件: {os.path.basename(txt_file)}\n")
-                            f.write(f"类型: {meta.get('genre', '未知')}\n")
-                            f.write(f"语言: {meta.get('language', '未知')}\n")
-                            f.write(f"字数: {meta.get('word_count', 0)}\n")
-                            
-                            # 读取小说开头和结尾
-                            with open(txt_file, 'r', encoding='utf-8') as tf:
-                                content = tf.read()
-                                if len(content) > 5000:
-                                    # 如果内容超过5000字符，只显示开头和结尾
-                                    f.write(f"开头: {content[:1000]}...\n")
-                                    f.write(f"结尾: ...{content[-1000:]}\n\n")
-                                else:
-                                    # 否则显示全部内容摘要
-                                    f.write(f"内容摘要: {content[:1000]}...\n\n")
-                                    
-                            # 如果有摘要，添加最新的摘要
-                            if "summaries" in meta and meta["summaries"]:
-                                latest_summary = meta["summaries"][-1]
-                                f.write(f"摘要: {latest_summary.get('summary', '无')[:500]}...\n\n")
-                                
-                        except Exception as e:
-                            f.write(f"文件: {os.path.basename(txt_file)} (读取元数据失败: {e})\n\n")
-                    else:
+                # 索引按路径排序，确保小说按索引顺序显示
+                for novel in novels:
+                    filename = os.path.basename(novel['path'])
+                    if not novel['meta_path']:
                         # 没有元数据，只显示文件名
-                        f.write(f"文件: {os.path.basename(txt_file)} (无元数据)\n\n")
+                        f.write(f"文件: {filename} (无元数据)\n\n")
+                        continue
+                    
+                    f.write(f"文件: {filename}\n")
+                    f.write(f"类型: {novel['genre'] or '未知'}\n")
+                    f.write(f"语言: {novel['language'] or '未知'}\n")
+                    f.write(f"字数: {novel['word_count'] or 0}\n")
+                    
+                    # 索引中保存了开头和结尾片段
+                    if (novel['word_count'] or 0) > 5000:
+                        # 如果内容超过5000字符，只显示开头和结尾
+                        f.write(f"开头: {novel['head']}...\n")
+                        f.write(f"结尾: ...{novel['tail']}\n\n")
+                    else:
+                        # 否则显示全部内容摘要
+                        f.write(f"内容摘要: {novel['head']}...\n\n")
+                    
+                    # 如果有摘要，添加最新的摘要
+                    if novel['latest_summary']:
+                        f.write(f"摘要: {novel['latest_summary'][:500]}...\n\n")
             
             self.update_status(f"已创建汇总文件: {summary_file}")
             
@@ -2278,10 +2583,25 @@ class NovelGenerator:
         self.paused = True
         self.pause_event.clear()
         
-        # 立即保存当前所有小说
+        # 立即提交保存当前所有小说，落盘后再报告（不阻塞界面线程）
         try:
-            self._save_all_novels()
-            self.update_status("生成已暂停，内容已保存")
+            futures = self._save_all_novels()
+            if not futures:
+                self.update_status("生成已暂停，内容已保存")
+            else:
+                self.update_status("生成已暂停，正在保存内容...")
+                remaining = [len(futures)]
+                lock = threading.Lock()
+                
+                def on_saved(_):
+                    with lock:
+                        remaining[0] -= 1
+                        done = remaining[0] == 0
+                    if done:
+                        self.update_status("暂停前的内容已保存")
+                
+                for future in futures:
+                    future.add_done_callback(on_saved)
         except Exception as e:
             self.update_status(f"暂停时保存内容失败: {str(e)}")
             traceback.print_exc()
@@ -2407,6 +2727,8 @@ class NovelGenerator:
             return True
         return False 
 
+    @SUMMARY_SECONDS.timed()
+    @_tracer.traced("summary")
     async def _generate_summary(self, text):
         """生成小说摘要"""
         try:
@@ -2483,7 +2805,7 @@ class NovelGenerator:
                     
                     try:
                         final_summary = await self._generate_text(prompt)
-                        self.update_status("摘要生成完成")
+                        self.events.emit(SummaryCompleted, len(final_summary or ""))
                         return final_summary
                     except Exception as e:
                         self.update_status(f"生成最终摘要时出错: {str(e)}")
@@ -2503,7 +2825,7 @@ class NovelGenerator:
                 prompt += text
                 
                 summary = await self._generate_text(prompt)
-                self.update_status("摘要生成完成")
+                self.events.emit(SummaryCompleted, len(summary or ""))
                 return summary
                 
         except Exception as e:
@@ -2648,6 +2970,9 @@ class NovelGenerator:
                 novel_setup["summaries"] = []
             novel_setup["summaries"].append(summary_data)
             self.novel_summaries.append(summary_data)
+            catalog = self._get_catalog()
+            if catalog is not None and novel_id:
+                catalog.record_summary(novel_id, summary)
             combined_summary_filename = f"summaries_{safe_genre}.txt"
             combined_summary_path = os.path.join(output_dir, combined_summary_filename)
             with open(combined_summary_path, 'a', encoding='utf-8') as f:
@@ -2660,6 +2985,7 @@ class NovelGenerator:
         except Exception as e:
             self.update_status(f"保存摘要失败: {str(e)}")
             traceback.print_exc()
+    @_tracer.traced("generate")
     async def _generate_text(self, prompt):
         """生成文本内容的辅助方法，调用现有的_generate_content方法
         
@@ -2692,6 +3018,7 @@ class NovelGenerator:
         """调用API生成内容，增强版，带错误处理和重试机制"""
         max_retries = 50  # 增加最大重试次数，从10改为50
         retry_delay = 1  # 缩短初始重试延迟，从2秒改为1秒
+        events = self.events
         
         for attempt in range(max_retries):
             # 检查是否应该继续尝试
@@ -2704,6 +3031,7 @@ class NovelGenerator:
                 await asyncio.sleep(1)  # 避免CPU过度使用
                 continue  # 暂停状态下不进行API调用，继续检查
             
+            request = None
             try:
                 # 准备请求头
                 headers = {
@@ -2747,8 +3075,7 @@ class NovelGenerator:
                     )
                 
                 # 状态通知
-                attempt_msg = "" if attempt == 0 else f" (尝试 {attempt+1}/{max_retries})"
-                self.update_status(f"正在调用AI接口生成内容{attempt_msg}...")
+                events.emit(RequestStarted, attempt, max_retries)
                 
                 # 发送请求（使用与会话一致的动态超时）
                 total_text_length = sum(len(content) for content in self.existing_content.values())
@@ -2759,59 +3086,64 @@ class NovelGenerator:
                 else:
                     dynamic_timeout = base_timeout
                 
+                request = _RequestMetrics(self.model, self.base_url, attempt)
                 async with self.session.post(
                     self.base_url,
                     headers=headers,
                     json=payload,
                     timeout=aiohttp.ClientTimeout(total=dynamic_timeout)
                 ) as response:
+                    request.first_byte()
                     if response.status == 200:
                         # 成功获取结果
-                        result = await response.json()
+                        body = await response.text()
+                        request.finish("ok")
+                        with _tracer.span("parse"):
+                            result = json.loads(body)
+                        usage = result.get("usage") if isinstance(result, dict) else None
+                        if isinstance(usage, dict):
+                            LLM_TOKENS.inc(usage.get("prompt_tokens") or 0, model=self.model, direction="in")
+                            LLM_TOKENS.inc(usage.get("completion_tokens") or 0, model=self.model, direction="out")
                         
-                        # 增强API响应解析，添加详细日志
-                        self.update_status(f"API响应结构: {list(result.keys()) if isinstance(result, dict) else 'non-dict response'}")
+                        # 响应结构等诊断信息只在有订阅者时才格式化
+                        events.emit(ResponseReceived, result)
                         
                         # 尝试多种可能的响应格式
                         content = None
+                        source = None
                         try:
                             if "choices" in result and len(result["choices"]) > 0:
                                 choice = result["choices"][0]
-                                self.update_status(f"Choice结构: {list(choice.keys()) if isinstance(choice, dict) else 'non-dict choice'}")
-                                
                                 if "message" in choice and "content" in choice["message"]:
                                     content = choice["message"]["content"]
-                                    self.update_status(f"从message.content获取内容，原始长度: {len(content) if content else 'None'}")
+                                    source = "message.content"
                                 elif "text" in choice:
                                     content = choice["text"]
-                                    self.update_status(f"从text获取内容，原始长度: {len(content) if content else 'None'}")
-                                else:
-                                    self.update_status(f"Choice中没有message.content或text字段，choice内容: {choice}")
+                                    source = "text"
                             elif "content" in result:
                                 content = result["content"]
-                                self.update_status(f"从根级content获取内容，原始长度: {len(content) if content else 'None'}")
+                                source = "根级content"
                             elif "data" in result:
                                 content = result["data"]
-                                self.update_status(f"从data获取内容，原始长度: {len(content) if content else 'None'}")
+                                source = "data"
                             elif "response" in result:
                                 content = result["response"]
-                                self.update_status(f"从response获取内容，原始长度: {len(content) if content else 'None'}")
+                                source = "response"
                             
-                            # 详细日志content的值
                             if content is not None:
-                                self.update_status(f"获取到的原始内容: '{content[:100]}{'...' if len(content) > 100 else ''}'")
+                                events.emit(ContentExtracted, source, content)
                             else:
-                                self.update_status(f"无法解析API响应内容，完整响应: {result}")
+                                events.emit(ResponseUnparsed, result)
                                 continue
                                 
                         except Exception as parse_error:
-                            self.update_status(f"解析API响应时出错: {parse_error}, 原始响应: {result}")
+                            events.emit(ResponseUnparsed, result, str(parse_error))
                             continue
                         
                         # 优化内容长度检查逻辑
                         content_length = len(content.strip())
                         if content_length < 100:  # 提高最小长度要求到100字符
-                            self.update_status(f"生成内容过短({content_length}字符)，重新生成...")
+                            events.emit(ContentTooShort, content_length)
                             # 增强提示词，明确要求更长的内容
                             enhanced_prompt = prompt + f"\n\n【重要要求】：请生成至少800字的详细内容，包含丰富的情节描写、人物对话和场景描述。当前生成内容过短({content_length}字符)，需要更充实的内容。"
                             payload["messages"][0]["content"] = enhanced_prompt
@@ -2821,7 +3153,7 @@ class NovelGenerator:
                         # 检查是否只返回了提示或说明文字
                         rejection_keywords = ["无法创作"]
                         if any(keyword in content.lower() for keyword in rejection_keywords):
-                            self.update_status("检测到拒绝生成的回复，重新尝试...")
+                            events.emit(ContentRejected)
                             # 修改提示词，避免触发内容政策
                             enhanced_prompt = "请创作一个积极正面的故事内容，" + prompt.replace("请", "").replace("创作", "写作")
                             payload["messages"][0]["content"] = enhanced_prompt
@@ -2831,25 +3163,35 @@ class NovelGenerator:
                     else:
                         # API返回错误
                         error_text = await response.text()
-                        self.update_status(f"API错误: {response.status} - {error_text}")
+                        request.finish(f"http_{response.status}")
+                        # 指数增长但增长幅度降低，最大约16秒
+                        delay = retry_delay * (1.5 ** min(attempt, 10))
+                        if response.status == 429:
+                            events.emit(RateLimited, delay, error_text)
+                            cause = "rate_limited"
+                        else:
+                            events.emit(RequestFailed, response.status, error_text)
+                            cause = f"http_{response.status}"
                         
                         if attempt < max_retries - 1:
                             # 不是最后一次尝试，等待后重试
-                            delay = retry_delay * (1.5 ** min(attempt, 10))  # 指数增长但增长幅度降低，最大约16秒
-                            self.update_status(f"将在 {int(delay)} 秒后重试...")
+                            events.emit(RequestRetried, attempt, max_retries, delay, cause)
                             
                             # 分段等待，每秒检查一次状态
-                            for _ in range(int(delay)):
-                                # 如果停止或暂停，则不再继续重试
-                                if not self.running or self.stop_event.is_set():
-                                    return ""
-                                await asyncio.sleep(1)
+                            with _tracer.span("backoff", delay=delay):
+                                for _ in range(int(delay)):
+                                    # 如果停止或暂停，则不再继续重试
+                                    if not self.running or self.stop_event.is_set():
+                                        return ""
+                                    await asyncio.sleep(1)
                         else:
                             # 最后一次尝试，调用重试回调
                             if self.retry_callback:
                                 self.retry_callback()
             
             except (aiohttp.ClientError, asyncio.TimeoutError, ssl.SSLError) as e:
+                if request is not None:
+                    request.finish(type(e).__name__)
                 # 使用统一的异步错误处理
                 should_retry = self._handle_async_error(e, "API请求", attempt, max_retries)
                 
@@ -2865,38 +3207,53 @@ class NovelGenerator:
                     
                     # 智能重试延迟
                     delay = min(5 * (2 ** min(attempt, 4)), 30)  # 最大30秒
+                    events.emit(RequestRetried, attempt, max_retries, delay, type(e).__name__)
                     # 分段等待，每秒检查一次状态
-                    for _ in range(int(delay)):
-                        if not self.running or self.stop_event.is_set():
-                            return ""
-                        await asyncio.sleep(1)
+                    with _tracer.span("backoff", delay=delay):
+                        for _ in range(int(delay)):
+                            if not self.running or self.stop_event.is_set():
+                                return ""
+                            await asyncio.sleep(1)
                 else:
                     # 最后一次尝试失败，调用重试回调
                     if self.retry_callback:
                         self.retry_callback()
             
             except Exception as e:
+                if request is not None:
+                    request.finish(type(e).__name__)
                 # 使用统一的异步错误处理
                 should_retry = self._handle_async_error(e, "生成内容", attempt, max_retries)
                 
                 if should_retry and attempt < max_retries - 1:
                     # 智能重试延迟
                     delay = min(3 * (2 ** min(attempt, 3)), 20)  # 未知错误延迟稍短
+                    events.emit(RequestRetried, attempt, max_retries, delay, type(e).__name__)
                     # 分段等待，每秒检查一次状态
-                    for _ in range(int(delay)):
-                        if not self.running or self.stop_event.is_set():
-                            return ""
-                        await asyncio.sleep(1)
+                    with _tracer.span("backoff", delay=delay):
+                        for _ in range(int(delay)):
+                            if not self.running or self.stop_event.is_set():
+                                return ""
+                            await asyncio.sleep(1)
                 else:
                     # 最后一次尝试失败
                     if self.retry_callback:
                         self.retry_callback()
+            finally:
+                # 任务被取消等未经上面处理的退出
+                if request is not None:
+                    request.finish("cancelled")
         
         # 所有重试都失败
         return ""
     
     def _save_all_novels(self):
-        """保存所有正在生成的小说"""
+        """保存所有正在生成的小说
+        
+        Returns:
+            交给写入器、尚未落盘的保存的 Future 列表
+        """
+        futures = []
         if hasattr(self, 'existing_content') and self.existing_content:
             for novel_id, content in self.existing_content.items():
                 # 查找对应的novel_setup
@@ -2918,37 +3275,39 @@ class NovelGenerator:
                     }
                 
                 # 保存内容
-                self._save_current_novel(content, novel_setup)
+                future = self._save_current_novel(content, novel_setup)
+                if future is not None:
+                    futures.append(future)
+        return futures
     
     def _save_current_novel(self, current_text, novel_setup):
-        """保存当前小说内容 - 同步版本，用于兼容旧代码"""
+        """保存当前小说内容 - 同步版本，可在界面线程或事件循环中调用
+        
+        写入器运行时只提交保存、不等待落盘（界面线程不能被磁盘或繁忙的事件循环阻塞），
+        同一文件的所有写入都经过写入器，按提交顺序落盘。
+        
+        Returns:
+            写入器保存的 Future（落盘后完成）；直接写入时为 None
+        """
+        future = None
         try:
-            # 确定输出目录
-            if hasattr(self, 'main_output_dir') and self.main_output_dir:
-                output_dir = self.main_output_dir
-            else:
-                output_dir = self.output_dir
-            
-            # 使用小说ID或索引创建文件名，不再每次生成时间戳
-            if "id" in novel_setup:
-                filename = f"{novel_setup['genre']}_{novel_setup['id']}.txt"
-            else:
-                # 如果没有ID，则创建一个固定格式的文件名
-                protagonist_name = ""
-                if "protagonist" in novel_setup and novel_setup["protagonist"] and "name" in novel_setup["protagonist"]:
-                    protagonist_name = f"_{novel_setup['protagonist']['name']}"
-                
-                novel_index = getattr(self, 'current_novel_index', 0)
-                filename = f"novel_{novel_index+1}_{novel_setup['genre']}{protagonist_name}.txt"
-            
-            filepath = os.path.join(output_dir, filename)
-            
-            # 保存文本
-            self._save_text(current_text, filepath)
-            
-            # 保存元数据
+            output_dir = self._get_novel_output_dir()
+            filepath = self._get_novel_filepath(novel_setup)
             meta_filepath = filepath.replace('.txt', '_meta.json')
-            self._save_metadata(novel_setup, meta_filepath)
+            
+            writer = self.writer
+            submitted = False
+            if writer is not None and writer.is_running():
+                try:
+                    future = writer.save_threadsafe(current_text, novel_setup, filepath, meta_filepath)
+                    future.add_done_callback(self._on_posted_save_done)
+                    submitted = True
+                except RuntimeError:
+                    # 事件循环已关闭，写入器不会再写入这个文件
+                    future = None
+            if not submitted:
+                # 保存文本、元数据并更新索引
+                self._save_novel_files(current_text, novel_setup, filepath, meta_filepath)
             
             # 生成封面和音乐（如果启用）
             if self.media_generator and (self.generate_cover or self.generate_music):
@@ -2961,34 +3320,47 @@ class NovelGenerator:
             self.update_status(f"保存小说时出错: {str(e)}")
             import traceback
             traceback.print_exc()
+        return future
+    
+    def _on_posted_save_done(self, future):
+        """提交给写入器的保存完成后报告失败（写入器已记录日志）"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.update_status(f"保存小说时出错: {error}")
     
     def _generate_media_for_novel(self, novel_setup, output_dir):
-        """为小说生成封面和音乐"""
+        """为小说提交封面和音乐任务，立即返回，由媒体生成器在后台完成"""
         try:
-            image_results = []
-            music_result = None
+            # 每本小说只提交一次（停止、暂停和完成时都会调用保存）
+            media_key = self._get_novel_filepath(novel_setup)
+            if media_key in self.media_submitted:
+                return
+            self.media_submitted.add(media_key)
             
-            # 生成封面图片
             if self.generate_cover:
                 self.update_status("开始生成封面图片...")
-                image_results = self.media_generator.generate_cover_images(novel_setup, self.num_cover_images)
-                if image_results:
-                    self.update_status(f"成功生成 {len(image_results)} 张封面图片")
-                else:
-                    self.update_status("封面图片生成失败或超时")
-            
-            # 生成音乐
             if self.generate_music:
                 self.update_status("开始生成音乐...")
-                music_result = self.media_generator.generate_music(novel_setup)
-                if music_result:
-                    self.update_status("音乐生成完成")
-                else:
-                    self.update_status("音乐生成失败或超时")
             
-            # 保存媒体信息
-            if image_results or music_result:
-                self.media_generator.save_media_info(output_dir, novel_setup, image_results, music_result)
+            future = self.media_generator.submit_novel_media(
+                novel_setup,
+                output_dir,
+                generate_cover=self.generate_cover,
+                num_images=self.num_cover_images,
+                generate_music=self.generate_music,
+                media_info_path=media_key.replace('.txt', '_media_info.json')
+            )
+            
+            def on_done(f):
+                if f.cancelled():
+                    return
+                error = f.exception()
+                if error:
+                    self.update_status(f"生成媒体时出错: {error}")
+            
+            future.add_done_callback(on_done)
             
         except Exception as e:
             self.update_status(f"生成媒体时出错: {str(e)}")
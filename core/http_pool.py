@@ -0,0 +1,50 @@
+"""
+共享 aiohttp 连接池
+
+每个事件循环共用一个 ClientSession，媒体提交、轮询和下载都复用同一组连接，
+避免每次请求重新建立 TLS 连接。
+"""
+
+import asyncio
+import weakref
+import aiohttp
+from typing import Optional
+
+# 每个事件循环一个共享会话
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def create_connector(limit: int = 10, limit_per_host: int = 5) -> aiohttp.TCPConnector:
+    """创建与生成器一致的连接器配置"""
+    return aiohttp.TCPConnector(
+        ssl=False,
+        limit=limit,
+        limit_per_host=limit_per_host,
+        enable_cleanup_closed=True,
+        keepalive_timeout=60,
+        ttl_dns_cache=300
+    )
+
+
+async def get_shared_session(limit: int = 10, limit_per_host: int = 5) -> aiohttp.ClientSession:
+    """获取当前事件循环的共享会话，不存在或已关闭时创建
+
+    单次请求的超时由调用方通过 timeout 参数指定。
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=create_connector(limit, limit_per_host),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30)
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_shared_session():
+    """关闭当前事件循环的共享会话"""
+    loop = asyncio.get_running_loop()
+    session: Optional[aiohttp.ClientSession] = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,191 @@
+"""
+媒体结果缓存
+
+封面和音乐提示词由小说类型、年龄和背景确定性生成，同类小说会得到几乎相同的提示词。
+缓存按规范化提示词的哈希保存生成结果：
+- 复用策略：reuse（始终复用）、variants（在 K 个变体之间轮换）、new（总是重新生成）
+- 素材文件只保存一份（按 SHA-256 命名），小说目录中使用硬链接，无法链接时直接引用缓存文件
+- 缓存目录放在输出根目录下（见 cache_dir_for），与小说媒体目录位于同一分区，硬链接才能成功
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger("novel_generator")
+
+# 复用策略
+POLICY_REUSE = "reuse"
+POLICY_VARIANTS = "variants"
+POLICY_NEW = "new"
+POLICIES = (POLICY_REUSE, POLICY_VARIANTS, POLICY_NEW)
+
+# 输出根目录下的缓存目录名
+CACHE_DIR_NAME = "media_cache"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_cache (
+    kind TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    variant INTEGER NOT NULL,
+    prompt TEXT,
+    asset_path TEXT NOT NULL,
+    sha256 TEXT,
+    result TEXT,
+    created_at REAL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, prompt_hash, variant)
+);
+"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：忽略大小写、多余空白和逗号两侧的空格"""
+    prompt = re.sub(r"\s+", " ", prompt.strip().lower())
+    return re.sub(r"\s*,\s*", ", ", prompt)
+
+
+def prompt_hash(kind: str, prompt: str) -> str:
+    """计算规范化提示词的哈希（区分图片和音乐）"""
+    return hashlib.sha256(f"{kind}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+def link_or_reference(asset_path: str, dest_dir: str) -> str:
+    """把缓存素材硬链接到目标目录，返回小说应引用的路径
+
+    目标已存在（同一文件）时直接使用；跨分区等无法硬链接时返回缓存文件路径本身。
+    """
+    dest_path = os.path.join(dest_dir, os.path.basename(asset_path))
+    try:
+        if os.path.exists(dest_path):
+            if os.path.samefile(asset_path, dest_path):
+                return dest_path
+            os.remove(dest_path)
+        os.makedirs(dest_dir, exist_ok=True)
+        os.link(asset_path, dest_path)
+        return dest_path
+    except OSError:
+        return asset_path
+
+
+def cache_dir_for(output_root: str) -> str:
+    """输出根目录（存放各次运行输出目录的目录）对应的缓存目录（绝对路径）"""
+    return os.path.join(os.path.abspath(output_root), CACHE_DIR_NAME)
+
+
+class MediaCache:
+    """按提示词哈希缓存媒体生成结果（线程安全）"""
+
+    def __init__(self, cache_dir: str, policy: str = POLICY_REUSE, variants: int = 3):
+        """
+        Args:
+            cache_dir: 缓存目录，包含索引数据库和 assets 素材目录；通常为 cache_dir_for(输出根目录)
+            policy: 复用策略 reuse / variants / new
+            variants: variants 策略下每个提示词保留的变体数量
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"未知的媒体复用策略: {policy}")
+        # 转为绝对路径，之后切换工作目录也不影响素材位置
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.asset_dir = os.path.join(self.cache_dir, "assets")
+        self.policy = policy
+        self.variants = max(1, variants)
+        self._lock = threading.Lock()
+        # 每个提示词下一次使用的变体序号（轮换）
+        self._cursor: Dict[tuple, int] = {}
+
+        os.makedirs(self.asset_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "media_cache.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def select_variants(self, kind: str, digest: str, count: int) -> List[Optional[int]]:
+        """为一次请求选择 count 个变体序号，None 表示不使用缓存"""
+        if self.policy == POLICY_NEW:
+            return [None] * count
+        if self.policy == POLICY_REUSE:
+            return list(range(count))
+        # 变体池至少能容纳一次请求的数量，请求之间轮换起点
+        pool = max(self.variants, count)
+        with self._lock:
+            start = self._cursor.get((kind, digest), 0)
+            self._cursor[(kind, digest)] = (start + count) % pool
+        return [(start + i) % pool for i in range(count)]
+
+    def get(self, kind: str, digest: str, variant: int) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，素材文件已丢失时删除条目并返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM media_cache WHERE kind = ? AND prompt_hash = ? AND variant = ?",
+                (kind, digest, variant)
+            ).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row["asset_path"]):
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM media_cache WHERE kind = ? AND prompt_hash = ? AND variant = ?",
+                        (kind, digest, variant)
+                    )
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE media_cache SET hits = hits + 1 WHERE kind = ? AND prompt_hash = ? AND variant = ?",
+                    (kind, digest, variant)
+                )
+        entry = dict(row)
+        entry["result"] = json.loads(entry["result"]) if entry["result"] else {}
+        return entry
+
+    def store(self, kind: str, digest: str, variant: int, prompt: str,
+              result: Dict[str, Any]) -> Optional[str]:
+        """把已下载的结果加入缓存，返回缓存素材路径
+
+        Args:
+            result: 生成结果，必须包含 local_path（已下载文件）和 sha256
+        """
+        local_path = result.get("local_path")
+        sha256 = result.get("sha256")
+        if not local_path or not sha256 or not os.path.exists(local_path):
+            return None
+
+        extension = os.path.splitext(local_path)[1]
+        asset_path = os.path.join(self.asset_dir, f"{sha256}{extension}")
+        if not os.path.exists(asset_path):
+            try:
+                os.link(local_path, asset_path)
+            except OSError:
+                shutil.copy2(local_path, asset_path)
+
+        stored = {key: value for key, value in result.items() if key not in ("local_path", "cached")}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media_cache "
+                "(kind, prompt_hash, variant, prompt, asset_path, sha256, result, created_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (kind, digest, variant, prompt, asset_path, sha256,
+                 json.dumps(stored, ensure_ascii=False), time.time())
+            )
+        return asset_path
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计：条目数和累计命中次数"""
+        with self._lock:
+            entries, hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM media_cache"
+            ).fetchone()
+        return {"entries": entries, "hits": hits}
@@ -0,0 +1,202 @@
+"""
+媒体下载管理器
+
+- 分块流式写入临时文件（.part），内存占用固定
+- 中断后通过 HTTP Range 断点续传
+- 全局并发和单主机并发限制
+- 连接/读取/总时长超时
+- 下载时计算 SHA-256，校验长度和（可选）期望校验值，完成后原子替换到目标路径
+- 读写临时文件和计算校验值在线程中进行，不阻塞媒体轮询所在的事件循环
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from urllib.parse import urlparse
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+try:
+    from .http_pool import get_shared_session
+except ImportError:
+    from core.http_pool import get_shared_session
+
+logger = logging.getLogger("novel_generator")
+
+CHUNK_SIZE = 64 * 1024
+# 攒够这么多字节再交给线程写入一次
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class DownloadError(Exception):
+    """下载失败（重试耗尽或校验不通过）"""
+
+
+class MediaDownloader:
+    """异步下载管理器，必须在同一个事件循环中使用"""
+
+    def __init__(self, max_concurrency: int = 6, per_host_concurrency: int = 3,
+                 total_timeout: float = 600, read_timeout: float = 60, max_retries: int = 3):
+        """
+        Args:
+            max_concurrency: 全局同时下载数
+            per_host_concurrency: 单个主机同时下载数
+            total_timeout: 单次请求总超时（秒）
+            read_timeout: 两次读取之间的最长间隔（秒），防止连接卡死
+            max_retries: 最大重试次数，每次重试从已下载位置续传
+        """
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.total_timeout = total_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphores(self, url: str):
+        """获取全局和主机并发限制"""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._global_semaphore, self._host_semaphores[host]
+
+    async def download(self, url: str, dest_path: str, expected_sha256: Optional[str] = None,
+                       expected_size: Optional[int] = None) -> Dict[str, Any]:
+        """下载文件到 dest_path
+
+        Returns:
+            Dict[str, Any]: {"path", "size", "sha256"}
+
+        Raises:
+            DownloadError: 重试耗尽或校验失败
+        """
+        global_semaphore, host_semaphore = self._semaphores(url)
+        async with global_semaphore, host_semaphore:
+            os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+            part_path = dest_path + ".part"
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await self._download_once(url, dest_path, part_path, expected_size)
+                    if expected_sha256 and result["sha256"] != expected_sha256.lower():
+                        os.remove(dest_path)
+                        raise DownloadError(f"校验值不匹配: {url}")
+                    return result
+                except DownloadError:
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    last_error = e
+                    logger.warning(f"下载中断 ({attempt + 1}/{self.max_retries + 1}) {url}: {e}")
+                    await asyncio.sleep(min(2 ** attempt, 10))
+            raise DownloadError(f"下载失败 {url}: {last_error}")
+
+    async def _download_once(self, url: str, dest_path: str, part_path: str,
+                             expected_size: Optional[int]) -> Dict[str, Any]:
+        """一次下载尝试，存在临时文件时从断点续传"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        session = await get_shared_session()
+        timeout = aiohttp.ClientTimeout(total=self.total_timeout, sock_connect=30, sock_read=self.read_timeout)
+
+        async with session.get(url, headers=headers, timeout=timeout) as response:
+            if response.status == 416 and offset:
+                # 临时文件已经完整
+                total_size = offset
+            elif response.status == 206 and offset:
+                total_size = self._total_size(response, offset)
+            elif response.status == 200:
+                # 服务器不支持续传，重新下载
+                offset = 0
+                total_size = response.content_length
+            elif 400 <= response.status < 500 and response.status not in (408, 429):
+                # 客户端错误（链接失效等）重试无意义
+                raise DownloadError(f"HTTP {response.status}: {url}")
+            else:
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=response.status, message=f"HTTP {response.status}"
+                )
+
+            if offset:
+                digest = await asyncio.to_thread(self._hash_existing, part_path)
+            else:
+                digest = hashlib.sha256()
+            size = offset
+            if response.status != 416:
+                f = await asyncio.to_thread(open, part_path, 'ab' if offset else 'wb')
+                try:
+                    buffer, buffered = [], 0
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        buffer.append(chunk)
+                        buffered += len(chunk)
+                        size += len(chunk)
+                        if buffered >= WRITE_BUFFER_SIZE:
+                            await asyncio.to_thread(self._write_block, f, digest, b"".join(buffer))
+                            buffer, buffered = [], 0
+                    if buffer:
+                        await asyncio.to_thread(self._write_block, f, digest, b"".join(buffer))
+                    await asyncio.to_thread(self._sync_close, f)
+                except BaseException:
+                    # 已收到的部分写入临时文件供续传
+                    await asyncio.to_thread(self._close_partial, f, b"".join(buffer))
+                    raise
+
+        expected = expected_size or total_size
+        if expected and size != expected:
+            if size > expected:
+                # 临时文件已损坏，下次从头下载
+                os.remove(part_path)
+            # 长度不足时保留临时文件供下次续传
+            raise aiohttp.ClientPayloadError(f"长度不符: {size}/{expected}")
+
+        os.replace(part_path, dest_path)
+        return {"path": dest_path, "size": size, "sha256": digest.hexdigest()}
+
+    @staticmethod
+    def _total_size(response: aiohttp.ClientResponse, offset: int) -> Optional[int]:
+        """从 Content-Range 或 Content-Length 推算完整大小"""
+        content_range = response.headers.get("Content-Range", "")
+        if "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total.isdigit():
+                return int(total)
+        if response.content_length is not None:
+            return offset + response.content_length
+        return None
+
+    @staticmethod
+    def _write_block(f, digest, data: bytes):
+        """写入一块数据并更新校验值（在线程中调用）"""
+        f.write(data)
+        digest.update(data)
+
+    @staticmethod
+    def _sync_close(f):
+        """落盘并关闭临时文件（在线程中调用）"""
+        try:
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    @staticmethod
+    def _close_partial(f, data: bytes):
+        """下载中断时写入缓冲中剩余的数据并关闭（在线程中调用）"""
+        try:
+            if data:
+                f.write(data)
+        finally:
+            f.close()
+
+    @staticmethod
+    def _hash_existing(path: str):
+        """续传前先计算已下载部分的校验值"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest
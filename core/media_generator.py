@@ -1,18 +1,137 @@
-import http.client
 import json
 import time
 import os
-import urllib.request
-from typing import Dict, Any, List, Optional
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from urllib.parse import urlparse
+from typing import Dict, Any, List, Optional, Tuple
+
+import aiohttp
+
+try:
+    from .http_pool import get_shared_session, close_shared_session
+    from .media_downloader import MediaDownloader, DownloadError
+    from .media_task_manager import MediaTaskManager, PENDING_STATUSES
+    from .rate_limiter import get_limiter
+    from .media_cache import MediaCache, cache_dir_for, prompt_hash, link_or_reference
+    from ..utils.metrics import get_registry
+    from ..utils.common import atomic_write_json
+except ImportError:
+    from core.http_pool import get_shared_session, close_shared_session
+    from core.media_downloader import MediaDownloader, DownloadError
+    from core.media_task_manager import MediaTaskManager, PENDING_STATUSES
+    from core.rate_limiter import get_limiter
+    from core.media_cache import MediaCache, cache_dir_for, prompt_hash, link_or_reference
+    from utils.metrics import get_registry
+    from utils.common import atomic_write_json
+
+logger = logging.getLogger("novel_generator")
+
+_metrics = get_registry()
+MEDIA_REQUEST_SECONDS = _metrics.histogram(
+    "media_request_seconds", "媒体接口请求耗时（秒）", ("endpoint", "outcome"))
+MEDIA_JOB_SECONDS = _metrics.histogram(
+    "media_job_seconds", "媒体任务从登记到结束的耗时（秒）", ("kind", "status"),
+    buckets=(10, 30, 60, 120, 300, 600, 900, 1800, 3600))
+
+# MidJourney 任务状态
+MJ_SUCCESS = "SUCCESS"
+MJ_FAILURE = "FAILURE"
+MJ_IN_PROGRESS = ("IN_PROGRESS", "SUBMITTED", "NOT_START")
+
+# Suno 任务状态
+SUNO_SUCCESS = ("complete", "SUCCESS")
+SUNO_FAILURE = ("failed", "FAILURE")
+
+# 单次批量查询的最大任务数
+POLL_BATCH_SIZE = 50
+
+# 自适应轮询间隔（秒）：进度越接近完成查询越频繁
+MIN_POLL_INTERVAL = 2
+MUSIC_POLL_INTERVAL = 5
+
+
+def _progress_percent(progress: Any) -> Optional[float]:
+    """把 "45%" 形式的进度转换为数字"""
+    try:
+        return float(str(progress).strip().rstrip('%'))
+    except (TypeError, ValueError):
+        return None
+
+
+class MediaJob:
+    """一个等待完成的媒体任务"""
+
+    __slots__ = ("kind", "task_id", "local_id", "future", "started_at", "timeout", "last_progress", "next_poll_at")
+
+    def __init__(self, kind: str, task_id: str, future: asyncio.Future, timeout: float, first_poll_delay: float,
+                 local_id: Optional[str] = None):
+        self.kind = kind
+        self.task_id = task_id
+        self.local_id = local_id
+        self.future = future
+        self.started_at = time.time()
+        self.timeout = timeout
+        self.last_progress = None
+        self.next_poll_at = self.started_at + first_poll_delay
 
 
 class MediaGenerator:
-    """媒体生成器：处理封面图片和音乐生成"""
+    """媒体生成器：处理封面图片和音乐生成
+
+    所有网络请求都在独立的后台事件循环中通过共享 aiohttp 连接池完成。
+    提交任务后立即返回，由后台轮询器等待任务完成并下载结果，小说生成不会等待媒体。
+    """
     
-    def __init__(self, api_key: str, status_callback=None):
+    def __init__(self, api_key: str, status_callback=None, base_url: Optional[str] = None,
+                 poll_interval: float = 10, job_timeout: float = 600,
+                 task_manager: Optional[MediaTaskManager] = None,
+                 media_cache: Optional[MediaCache] = None, output_root: Optional[str] = None):
+        """
+        Args:
+            media_cache: 媒体结果缓存，未提供时在 output_root 下创建
+            output_root: 输出根目录，未提供时为当前目录
+        """
         self.api_key = api_key
-        "api.openai.com"
+        self.base_url = self._normalize_base_url(base_url)
         self.status_callback = status_callback
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        
+        # 后台事件循环
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        
+        # 等待完成的任务（只在后台事件循环中访问）
+        self._jobs: Dict[str, MediaJob] = {}
+        self._poller_task: Optional[asyncio.Task] = None
+        
+        # 下载管理器（属于后台事件循环）
+        self.downloader = MediaDownloader()
+        
+        # 任务持久化：提交的任务在程序退出后仍可恢复
+        self.task_manager = task_manager or MediaTaskManager()
+        
+        # 媒体接口共享限流器（提交、轮询和恢复任务共用）
+        self.limiter = get_limiter("media")
+        
+        # 按提示词缓存生成结果，同类小说复用封面和音乐
+        self.media_cache = media_cache or MediaCache(cache_dir_for(output_root or os.getcwd()))
+        # 进行中的缓存槽位 (kind, prompt_hash, variant) -> Future，相同请求共享同一个任务
+        self._inflight: Dict[Tuple[str, str, int], asyncio.Future] = {}
+        
+    @staticmethod
+    def _normalize_base_url(base_url: Optional[str]) -> str:
+        """只保留协议和主机部分，例如 https://api.openai.com"""
+        if not base_url:
+            return "https://api.openai.com"
+        if "://" not in base_url:
+            base_url = f"https://{base_url}"
+        parsed = urlparse(base_url)
+        return f"{parsed.scheme}://{parsed.netloc}"
         
     def update_status(self, message: str):
         """更新状态信息"""
@@ -21,9 +140,126 @@ class MediaGenerator:
         else:
             print(message)
     
+    # ---- 后台事件循环 ----
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """启动（或复用）后台事件循环线程"""
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+                
+                self._thread = threading.Thread(target=run, name="media_generator", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                self._jobs = {}
+                self._poller_task = None
+                self._inflight = {}
+                self.downloader = MediaDownloader()
+            return self._loop
+    
+    def run_coroutine(self, coro) -> concurrent.futures.Future:
+        """在后台事件循环中运行协程，立即返回 Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+    
+    def shutdown(self, timeout: float = 5):
+        """取消未完成的轮询，关闭共享会话并停止后台事件循环"""
+        with self._loop_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_pending(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"取消媒体任务轮询失败: {e}")
+        try:
+            asyncio.run_coroutine_threadsafe(close_shared_session(), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"关闭媒体会话失败: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+    
+    async def _cancel_pending(self):
+        """停止轮询器并取消所有等待中的任务（任务记录保持待处理，下次启动时恢复）"""
+        poller, self._poller_task = self._poller_task, None
+        if poller is not None and not poller.done():
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+        jobs, self._jobs = list(self._jobs.values()), {}
+        for job in jobs:
+            if not job.future.done():
+                job.future.cancel()
+    
+    # ---- 非阻塞入口 ----
+    
+    def submit_novel_media(self, novel_setup: Dict[str, Any], output_dir: str, generate_cover: bool = True,
+                           num_images: int = 1, generate_music: bool = False,
+                           media_info_path: Optional[str] = None) -> concurrent.futures.Future:
+        """提交小说的封面和音乐任务，立即返回
+
+        Args:
+            media_info_path: 这本小说的媒体信息文件，默认按小说ID命名（见 media_info_path()）
+
+        Returns:
+            concurrent.futures.Future: 全部完成并保存媒体信息后得到 (image_results, music_result)
+        """
+        # 元数据在生成过程中仍会变化，提交时复制一份
+        novel_setup = json.loads(json.dumps(novel_setup, ensure_ascii=False))
+        if media_info_path:
+            # 随任务记录保存，恢复的任务写回同一个文件
+            novel_setup["media_info_path"] = media_info_path
+        return self.run_coroutine(
+            self.process_novel_media(novel_setup, output_dir, generate_cover, num_images, generate_music)
+        )
+    
+    async def process_novel_media(self, novel_setup: Dict[str, Any], output_dir: str, generate_cover: bool = True,
+                                  num_images: int = 1, generate_music: bool = False
+                                  ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """生成小说的封面和音乐并保存媒体信息（novel_setup 中的 media_info_path 指定信息文件）"""
+        image_results: List[Dict[str, Any]] = []
+        music_result = None
+        try:
+            # 封面和音乐同时提交，总耗时接近最慢的单个任务
+            async def no_images():
+                return []
+            
+            async def no_music():
+                return None
+            
+            image_results, music_result = await asyncio.gather(
+                self.generate_cover_images_async(novel_setup, num_images, output_dir) if generate_cover else no_images(),
+                self.generate_music_async(novel_setup, output_dir) if generate_music else no_music()
+            )
+            if generate_cover:
+                if image_results:
+                    self.update_status(f"成功生成 {len(image_results)} 张封面图片")
+                else:
+                    self.update_status("封面图片生成失败或超时")
+            if generate_music:
+                if music_result:
+                    self.update_status("音乐生成完成")
+                else:
+                    self.update_status("音乐生成失败或超时")
+            if image_results or music_result:
+                self.save_media_info(output_dir, novel_setup, image_results, music_result)
+        except Exception as e:
+            self.update_status(f"生成媒体时出错: {str(e)}")
+            logger.exception("生成媒体时出错")
+        return image_results, music_result
+    
+    # ---- 同步兼容接口（阻塞调用线程，不可在后台事件循环中调用） ----
+    
     def generate_cover_images(self, novel_setup: Dict[str, Any], num_images: int = 1) -> List[Dict[str, Any]]:
         """
-        生成封面图片
+        生成封面图片（阻塞直到完成）
         
         Args:
             novel_setup: 小说设置信息
@@ -32,317 +268,563 @@ class MediaGenerator:
         Returns:
             List[Dict[str, Any]]: 生成的图片结果列表
         """
+        return self.run_coroutine(self.generate_cover_images_async(novel_setup, num_images)).result()
+    
+    def generate_music(self, novel_setup: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        生成音乐（阻塞直到完成）
+        
+        Args:
+            novel_setup: 小说设置信息
+            
+        Returns:
+            Optional[Dict[str, Any]]: 生成的音乐结果
+        """
+        return self.run_coroutine(self.generate_music_async(novel_setup)).result()
+    
+    # ---- API 请求 ----
+    
+    async def _api_request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                           timeout: float = 30, endpoint: Optional[str] = None) -> Any:
+        """通过共享连接池调用媒体接口，返回解析后的 JSON
+
+        Args:
+            endpoint: 指标中使用的接口名，路径里带任务ID时传入不含ID的形式
+        """
+        await self.limiter.acquire()
+        session = await get_shared_session()
+        headers = {
+            'Accept': 'application/json',
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with session.request(
+                method,
+                f"{self.base_url}{path}",
+                json=payload,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                text = await response.text()
+                outcome = f"http_{response.status}"
+                return json.loads(text)
+        finally:
+            MEDIA_REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                          endpoint=endpoint or path, outcome=outcome)
+    
+    async def submit_image_task(self, prompt: str) -> Optional[str]:
+        """提交 MidJourney 任务，返回任务ID"""
+        response = await self._api_request("POST", "/mj/submit/imagine", {
+            "prompt": prompt,
+            "base64": False
+        })
+        self.update_status(f"MidJourney API响应: {response}")
+        
+        # MidJourney返回code=1表示成功
+        if isinstance(response, dict) and response.get("code") == 1 and response.get("result"):
+            return response["result"]
+        error_msg = response.get("description", response.get("error", "API调用失败")) if isinstance(response, dict) else response
+        self.update_status(f"封面图片任务提交失败：{error_msg}")
+        return None
+    
+    async def submit_music_task(self, prompt: str) -> Optional[str]:
+        """提交 Suno 任务，返回任务ID"""
+        response = await self._api_request("POST", "/suno/submit/music", {
+            "prompt": prompt,
+            "make_instrumental": False,
+            "wait_audio": False
+        })
+        self.update_status(f"Suno API响应: {response}")
+        
+        # Suno返回code='success'表示成功，任务ID在data字段
+        if isinstance(response, dict) and response.get("code") == "success" and response.get("data"):
+            return response["data"]
+        error_msg = response.get("message", response.get("error", "API调用失败")) if isinstance(response, dict) else response
+        self.update_status(f"音乐任务提交失败：{error_msg}")
+        return None
+    
+    # ---- 生成流程 ----
+    
+    async def generate_cover_images_async(self, novel_setup: Dict[str, Any], num_images: int = 1,
+                                          output_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+        """提交封面任务，等待后台轮询器返回结果后并行下载到小说输出目录
+
+        相同提示词的封面按缓存策略复用，全部槽位同时开始，总耗时接近最慢的单个任务。
+        """
         try:
             # 根据小说信息生成封面提示词
             prompt = self._generate_cover_prompt(novel_setup)
             self.update_status(f"正在生成封面图片，提示词：{prompt}")
             
-            image_results = []
+            digest = prompt_hash("image", prompt)
+            variants = self.media_cache.select_variants("image", digest, num_images)
+            self.update_status(f"正在提交 {num_images} 张封面图片任务...")
             
-            for i in range(num_images):
-                self.update_status(f"正在生成第 {i+1}/{num_images} 张封面图片...")
-                
-                # 调用MidJourney API生成图片
-                conn = http.client.HTTPSConnection(self.base_url)
-                payload = json.dumps({
-                    "prompt": prompt,
-                    "base64": False
-                })
-                headers = {
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                }
-                
-                try:
-                    conn.request("POST", "/mj/submit/imagine", payload, headers)
-                    res = conn.getresponse()
-                    data = res.read()
-                    response = json.loads(data.decode("utf-8"))
-                    conn.close()
-                    
-                    self.update_status(f"MidJourney API响应: {response}")
-                    
-                    # 修正API响应判断逻辑：MidJourney返回code=1表示成功
-                    if response.get("code") == 1 and response.get("result"):
-                        task_id = response["result"]
-                        self.update_status(f"封面图片 {i+1} 任务提交成功，任务ID: {task_id}")
-                        
-                        # 等待任务完成（10分钟）
-                        result = self.wait_for_image_completion(task_id, timeout=600)  # 10分钟
-                        if result:
-                            image_results.append(result)
-                            self.update_status(f"封面图片 {i+1} 生成成功")
-                        else:
-                            self.update_status(f"封面图片 {i+1} 等待超时，请稍后手动查询任务状态 (任务ID: {task_id})")
-                    else:
-                        error_msg = response.get("description", response.get("error", "API调用失败"))
-                        self.update_status(f"封面图片 {i+1} 生成失败：{error_msg}")
-                        
-                except Exception as e:
-                    self.update_status(f"封面图片 {i+1} 生成失败：{str(e)}")
-                    continue
-                    
+            async def produce(index: int) -> Optional[Dict[str, Any]]:
+                task_id = await self.submit_image_task(prompt)
+                if not task_id:
+                    return None
+                self.update_status(f"封面图片 {index+1} 任务提交成功，任务ID: {task_id}")
+                local_id = self.task_manager.add_image_task(
+                    task_id, self._novel_info(novel_setup), prompt, output_dir or ""
+                )
+                result = await self._wait_and_download_image(task_id, output_dir, local_id)
+                if not result:
+                    self.update_status(f"封面图片任务未完成，请稍后手动查询任务状态 (任务ID: {task_id})")
+                return result
+            
+            results = await asyncio.gather(
+                *(self._cached_media("image", prompt, digest, variant, output_dir,
+                                     lambda index=i: produce(index))
+                  for i, variant in enumerate(variants)),
+                return_exceptions=True
+            )
+            image_results = []
+            for i, result in enumerate(results):
+                if isinstance(result, Exception):
+                    self.update_status(f"封面图片 {i+1} 生成失败：{str(result)}")
+                elif result:
+                    image_results.append(result)
             return image_results
             
         except Exception as e:
             self.update_status(f"生成封面图片时出错: {str(e)}")
             return []
     
-    def generate_music(self, novel_setup: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """
-        生成音乐
-        
-        Args:
-            novel_setup: 小说设置信息
-            
-        Returns:
-            Optional[Dict[str, Any]]: 生成的音乐结果
-        """
+    async def generate_music_async(self, novel_setup: Dict[str, Any],
+                                   output_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """提交音乐任务，等待后台轮询器返回结果后下载到小说输出目录"""
         try:
             # 根据小说信息生成音乐提示词
             prompt = self._generate_music_prompt(novel_setup)
             self.update_status(f"正在生成音乐，提示词：{prompt}")
             
-            # 调用Suno API生成音乐
-            conn = http.client.HTTPSConnection(self.base_url)
-            payload = json.dumps({
-                "prompt": prompt,
-                "make_instrumental": False,
-                "wait_audio": False
-            })
-            headers = {
-                'Accept': 'application/json',
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            conn.request("POST", "/suno/submit/music", payload, headers)
-            res = conn.getresponse()
-            data = res.read()
-            response = json.loads(data.decode("utf-8"))
-            conn.close()
-            
-            self.update_status(f"Suno API响应: {response}")
-            
-            # 修正API响应判断逻辑：Suno返回code='success'表示成功，任务ID在data字段
-            if response.get("code") == "success" and response.get("data"):
-                task_id = response["data"]  # Suno直接返回任务ID字符串
+            async def produce() -> Optional[Dict[str, Any]]:
+                task_id = await self.submit_music_task(prompt)
+                if not task_id:
+                    return None
                 self.update_status(f"音乐任务提交成功，任务ID: {task_id}")
+                local_id = self.task_manager.add_music_task(
+                    task_id, self._novel_info(novel_setup), prompt, output_dir or ""
+                )
                 
-                # 等待任务完成（10分钟）
-                result = self.wait_for_music_completion(task_id, timeout=600)  # 10分钟
+                result = await self.wait_for_job("music", task_id, local_id=local_id)
                 if result:
                     self.update_status("音乐生成成功")
-                    return result
+                    if result.get("audio_url"):
+                        await self.download_music(result, output_dir)
+                        self.task_manager.update_task_status(local_id, "success", result)
+                    else:
+                        self.update_status("未找到音乐下载链接")
                 else:
-                    self.update_status(f"音乐等待超时，请稍后手动查询任务状态 (任务ID: {task_id})")
-                    return None
-            else:
-                error_msg = response.get("message", response.get("error", "API调用失败"))
-                self.update_status(f"音乐生成失败：{error_msg}")
-                return None
+                    self.update_status(f"音乐未完成，请稍后手动查询任务状态 (任务ID: {task_id})")
+                return result
+            
+            digest = prompt_hash("music", prompt)
+            variant = self.media_cache.select_variants("music", digest, 1)[0]
+            return await self._cached_media("music", prompt, digest, variant, output_dir, produce)
                 
         except Exception as e:
             self.update_status(f"生成音乐时出错: {str(e)}")
             return None
     
-    def wait_for_image_completion(self, task_id: str, timeout: int = 600) -> Optional[Dict[str, Any]]:
+    async def _cached_media(self, kind: str, prompt: str, digest: str, variant: Optional[int],
+                            output_dir: Optional[str], produce) -> Optional[Dict[str, Any]]:
+        """按缓存槽位获取媒体结果
+
+        命中缓存时直接链接素材；同一槽位已有任务在进行时等待它的结果；
+        否则调用 produce() 生成并写入缓存。variant 为 None 时不使用缓存。
         """
-        等待图片生成完成
+        if variant is None:
+            return await produce()
         
-        Args:
-            task_id: 任务ID
-            timeout: 超时时间（秒）
-            
-        Returns:
-            Optional[Dict[str, Any]]: 完成的任务结果
-        """
-        start_time = time.time()
-        check_interval = 10  # 每10秒检查一次
+        entry = await asyncio.get_running_loop().run_in_executor(
+            None, self.media_cache.get, kind, digest, variant
+        )
+        if entry:
+            self.update_status(f"复用已生成的{'封面' if kind == 'image' else '音乐'}: {os.path.basename(entry['asset_path'])}")
+            return self._attach_asset(entry["result"], entry["asset_path"], output_dir)
         
-        self.update_status(f"等待图片任务完成: {task_id}，最长等待10分钟")
+        key = (kind, digest, variant)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            result = await asyncio.shield(inflight)
+            asset_path = result.get("cache_path") if result else None
+            if not asset_path:
+                return result
+            return self._attach_asset(result, asset_path, output_dir)
         
-        while time.time() - start_time < timeout:
+        inflight = asyncio.get_running_loop().create_future()
+        self._inflight[key] = inflight
+        result = None
+        try:
+            result = await produce()
+            if result and result.get("local_path"):
+                asset_path = await asyncio.get_running_loop().run_in_executor(
+                    None, self.media_cache.store, kind, digest, variant, prompt, result
+                )
+                if asset_path:
+                    result["cache_path"] = asset_path
+            return result
+        finally:
+            del self._inflight[key]
+            if not inflight.done():
+                inflight.set_result(result)
+    
+    def _attach_asset(self, result: Dict[str, Any], asset_path: str, output_dir: Optional[str]) -> Dict[str, Any]:
+        """把缓存素材链接到小说的媒体目录，返回该小说使用的结果副本"""
+        kind = "image" if "imageUrl" in result else "music"
+        attached = dict(result)
+        attached["local_path"] = link_or_reference(asset_path, self._media_dir(output_dir, kind))
+        attached["cache_path"] = asset_path
+        attached["cached"] = True
+        return attached
+    
+    async def _wait_and_download_image(self, task_id: str, output_dir: Optional[str],
+                                       local_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """等待图片任务完成并下载"""
+        result = await self.wait_for_job("image", task_id, local_id=local_id)
+        if result:
+            await self.download_image(result, output_dir)
+            if local_id:
+                self.task_manager.update_task_status(local_id, "success", result)
+        return result
+    
+    @staticmethod
+    def _novel_info(novel_setup: Dict[str, Any]) -> Dict[str, Any]:
+        """任务记录中保存的小说信息（恢复任务时用于写入媒体信息）"""
+        keys = ("id", "genre", "novel_type", "protagonist_name", "background", "language", "media_info_path")
+        return {key: novel_setup.get(key) for key in keys if novel_setup.get(key) is not None}
+    
+    # ---- 后台轮询器 ----
+    
+    async def wait_for_job(self, kind: str, task_id: str, timeout: Optional[float] = None,
+                           local_id: Optional[str] = None, first_poll_delay: Optional[float] = None
+                           ) -> Optional[Dict[str, Any]]:
+        """登记任务并等待轮询器得到结果（失败或超时返回 None）"""
+        job = self._jobs.get(task_id)
+        if job is None:
+            if first_poll_delay is None:
+                first_poll_delay = MUSIC_POLL_INTERVAL if kind == "music" else self.poll_interval
+            job = MediaJob(kind, task_id, asyncio.get_running_loop().create_future(),
+                           timeout or self.job_timeout, first_poll_delay, local_id)
+            self._jobs[task_id] = job
+            self.update_status(f"等待{'图片' if kind == 'image' else '音乐'}任务完成: {task_id}，最长等待{int(job.timeout)}秒")
+        if self._poller_task is None or self._poller_task.done():
+            self._poller_task = asyncio.get_running_loop().create_task(self._poll_loop())
+        return await asyncio.shield(job.future)
+    
+    def _finish_job(self, job: MediaJob, result: Optional[Dict[str, Any]], status: str = "success",
+                    error: Optional[str] = None):
+        """结束任务，更新任务记录并通知等待方"""
+        if self._jobs.get(job.task_id) is job:
+            del self._jobs[job.task_id]
+            MEDIA_JOB_SECONDS.observe(time.time() - job.started_at, kind=job.kind, status=status)
+        if job.local_id:
             try:
-                # 使用批量查询接口检查任务状态
-                conn = http.client.HTTPSConnection(self.base_url)
-                payload = json.dumps({
-                    "ids": [task_id]
-                })
-                headers = {
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                }
-                conn.request("POST", "/mj/task/list-by-condition", payload, headers)
-                res = conn.getresponse()
-                data = res.read()
-                response = json.loads(data.decode("utf-8"))
-                conn.close()
-                
-                # 修正响应解析：根据API文档，返回的是任务列表
-                task_info = None
-                if isinstance(response, list) and len(response) > 0:
-                    task_info = response[0]
-                elif isinstance(response, dict) and "data" in response:
-                    # 如果返回格式是 {"data": [...]}
-                    data_list = response.get("data", [])
-                    if isinstance(data_list, list) and len(data_list) > 0:
-                        task_info = data_list[0]
-                
-                if task_info:
-                    status = task_info.get("status")
-                    progress = task_info.get("progress", "0%")
-                    elapsed_time = int(time.time() - start_time)
-                    remaining_time = timeout - elapsed_time
-                    
-                    self.update_status(f"图片任务进度: {progress}, 状态: {status}, 已等待: {elapsed_time}秒, 剩余: {remaining_time}秒")
-                    
-                    if status == "SUCCESS":
-                        self.update_status(f"图片任务 {task_id} 完成！耗时: {elapsed_time}秒")
-                        # 自动下载图片
-                        downloaded_path = self.download_image(task_info)
-                        if downloaded_path:
-                            self.update_status(f"图片下载成功: {downloaded_path}")
-                            task_info["local_path"] = downloaded_path
-                        return task_info
-                    elif status == "FAILURE":
-                        failure_reason = task_info.get("failReason", "未知原因")
-                        self.update_status(f"图片任务 {task_id} 失败: {failure_reason}")
-                        return None
-                    elif status in ["IN_PROGRESS", "SUBMITTED"]:
-                        # 任务还在进行中，继续等待
-                        pass
-                    else:
-                        self.update_status(f"图片任务状态未知: {status}")
-                else:
-                    self.update_status(f"图片任务查询响应格式异常: {response}")
-                
+                self.task_manager.update_task_status(job.local_id, status, result, error)
             except Exception as e:
-                self.update_status(f"检查图片任务状态时出错: {str(e)}")
+                logger.warning(f"更新媒体任务记录失败: {e}")
+        if not job.future.done():
+            job.future.set_result(result)
+    
+    def _next_poll_interval(self, job: MediaJob) -> float:
+        """根据上报进度决定下次查询间隔"""
+        if job.kind == "music":
+            return MUSIC_POLL_INTERVAL
+        percent = _progress_percent(job.last_progress)
+        if percent is None or percent <= 0:
+            # 排队中，按默认间隔查询
+            return self.poll_interval
+        if percent >= 90:
+            return MIN_POLL_INTERVAL
+        if percent >= 50:
+            return max(MIN_POLL_INTERVAL, self.poll_interval * 0.4)
+        return max(MIN_POLL_INTERVAL, self.poll_interval * 0.6)
+    
+    async def _poll_loop(self):
+        """批量轮询所有未完成的任务，直到全部结束"""
+        while self._jobs:
+            now = time.time()
             
-            # 等待一段时间再检查
-            time.sleep(check_interval)
-        
-        self.update_status(f"图片任务 {task_id} 超时")
-        return None
+            # 结束已超时的任务
+            for job in list(self._jobs.values()):
+                if now - job.started_at >= job.timeout:
+                    self.update_status(f"{'图片' if job.kind == 'image' else '音乐'}任务 {job.task_id} 超时")
+                    self._finish_job(job, None, "timeout", "等待超时")
+            jobs = list(self._jobs.values())
+            if not jobs:
+                break
+            
+            next_poll_at = min(job.next_poll_at for job in jobs)
+            if next_poll_at > now:
+                await asyncio.sleep(min(next_poll_at - now, self.poll_interval))
+                continue
+            
+            # 任意一个任务到期时，同类任务一次批量查询全部刷新
+            due_kinds = {job.kind for job in jobs if job.next_poll_at <= now}
+            polls = []
+            if "image" in due_kinds:
+                polls.append(self._poll_image_jobs([job for job in jobs if job.kind == "image"]))
+            if "music" in due_kinds:
+                polls.append(self._poll_music_jobs([job for job in jobs if job.kind == "music"]))
+            await asyncio.gather(*polls, return_exceptions=True)
+            
+            now = time.time()
+            for job in jobs:
+                if job.kind in due_kinds:
+                    job.next_poll_at = now + self._next_poll_interval(job)
     
-    def wait_for_music_completion(self, task_id: str, timeout: int = 600) -> Optional[Dict[str, Any]]:
-        """
-        等待音乐生成完成
+    @staticmethod
+    def _extract_image_tasks(response: Any) -> List[Dict[str, Any]]:
+        """解析 list-by-condition 响应：任务列表或 {"data": [...]}"""
+        if isinstance(response, list):
+            return [t for t in response if isinstance(t, dict)]
+        if isinstance(response, dict) and isinstance(response.get("data"), list):
+            return [t for t in response["data"] if isinstance(t, dict)]
+        return []
+    
+    async def _poll_image_jobs(self, jobs: List[MediaJob]):
+        """用 ids 列表一次查询多个图片任务"""
+        for start in range(0, len(jobs), POLL_BATCH_SIZE):
+            batch = {job.task_id: job for job in jobs[start:start + POLL_BATCH_SIZE]}
+            try:
+                response = await self._api_request("POST", "/mj/task/list-by-condition", {"ids": list(batch)})
+            except Exception as e:
+                self.update_status(f"检查图片任务状态时出错: {str(e)}")
+                continue
+            tasks = self._extract_image_tasks(response)
+            if not tasks:
+                self.update_status(f"图片任务查询响应格式异常: {response}")
+                continue
+            handlers = []
+            for task_info in tasks:
+                job = batch.get(task_info.get("id"))
+                if job is None and len(batch) == 1:
+                    # 部分接口不返回 id，单任务查询时直接对应
+                    job = next(iter(batch.values()))
+                if job is not None:
+                    handlers.append(self._handle_image_task(job, task_info, int(time.time() - job.started_at)))
+            await asyncio.gather(*handlers, return_exceptions=True)
+    
+    async def _handle_image_task(self, job: MediaJob, task_info: Dict[str, Any], elapsed_time: int):
+        """处理一次图片任务状态"""
+        status = task_info.get("status")
+        progress = task_info.get("progress", "0%")
+        if progress != job.last_progress:
+            self.update_status(f"图片任务 {job.task_id} 进度: {progress}, 状态: {status}, 已等待: {elapsed_time}秒, 剩余: {int(job.timeout) - elapsed_time}秒")
+        job.last_progress = progress
         
-        Args:
-            task_id: 任务ID
-            timeout: 超时时间（秒）
-            
+        if status == MJ_SUCCESS:
+            self.update_status(f"图片任务 {job.task_id} 完成！耗时: {elapsed_time}秒")
+            self._finish_job(job, task_info)
+        elif status == MJ_FAILURE:
+            fail_reason = task_info.get('failReason', '未知原因')
+            self.update_status(f"图片任务 {job.task_id} 失败: {fail_reason}")
+            self._finish_job(job, None, "failure", fail_reason)
+        elif status not in MJ_IN_PROGRESS:
+            self.update_status(f"图片任务状态未知: {status}")
+    
+    @staticmethod
+    def _parse_music_data(task_data: Any) -> Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """解析 Suno fetch 返回的 data 字段
+
         Returns:
-            Optional[Dict[str, Any]]: 完成的任务结果
+            (状态, 任务数据, 第一首音乐)，状态为 pending / success / failure
         """
-        start_time = time.time()
-        check_interval = 10  # 每10秒检查一次
+        # data是字符串说明任务还在处理中
+        if isinstance(task_data, str):
+            return "pending", None, None
+        if isinstance(task_data, dict):
+            status = task_data.get("status", "UNKNOWN")
+            data_array = task_data.get("data", [])
+            first_music = None
+            if isinstance(data_array, list) and data_array and isinstance(data_array[0], dict):
+                first_music = data_array[0]
+            if status in SUNO_SUCCESS:
+                return "success", task_data, first_music
+            if status in SUNO_FAILURE:
+                return "failure", task_data, None
+            return "pending", task_data, None
+        if isinstance(task_data, list) and task_data and isinstance(task_data[0], dict):
+            first_item = task_data[0]
+            if "audio_url" in first_item or first_item.get("status") in SUNO_SUCCESS:
+                return "success", first_item, first_item
+            return "pending", first_item, None
+        return "pending", None, None
+    
+    async def _poll_music_jobs(self, jobs: List[MediaJob]):
+        """批量查询音乐任务，接口不支持批量时逐个并发查询"""
+        for start in range(0, len(jobs), POLL_BATCH_SIZE):
+            batch = {job.task_id: job for job in jobs[start:start + POLL_BATCH_SIZE]}
+            items = None
+            if len(batch) > 1:
+                try:
+                    response = await self._api_request("POST", "/suno/fetch", {"ids": list(batch)})
+                    if isinstance(response, dict) and response.get("code") == "success" and isinstance(response.get("data"), list):
+                        items = [item for item in response["data"] if isinstance(item, dict) and item.get("task_id") in batch]
+                except Exception as e:
+                    logger.debug(f"Suno 批量查询失败，改为逐个查询: {e}")
+            
+            if items:
+                await asyncio.gather(
+                    *(self._handle_music_data(batch[item["task_id"]], item,
+                                              int(time.time() - batch[item["task_id"]].started_at))
+                      for item in items),
+                    return_exceptions=True
+                )
+            else:
+                await asyncio.gather(*(self._poll_music_job(job) for job in batch.values()), return_exceptions=True)
+    
+    async def _poll_music_job(self, job: MediaJob):
+        """查询单个音乐任务状态"""
+        try:
+            response = await self._api_request("GET", f"/suno/fetch/{job.task_id}", endpoint="/suno/fetch/{id}")
+        except Exception as e:
+            self.update_status(f"检查音乐任务状态时出错: {str(e)}")
+            return
+        if not (isinstance(response, dict) and response.get("code") == "success" and response.get("data")):
+            return
+        await self._handle_music_data(job, response["data"], int(time.time() - job.started_at))
+    
+    async def _handle_music_data(self, job: MediaJob, task_data: Any, elapsed_time: int):
+        """处理一次音乐任务状态"""
+        state, result, first_music = self._parse_music_data(task_data)
+        if state == "pending":
+            if job.last_progress != "pending":
+                self.update_status(f"音乐任务 {job.task_id} 处理中, 已等待: {elapsed_time}秒, 剩余: {int(job.timeout) - elapsed_time}秒")
+            job.last_progress = "pending"
+        elif state == "failure":
+            self.update_status(f"音乐任务 {job.task_id} 失败")
+            self._finish_job(job, None, "failure", "音乐生成失败")
+        else:
+            self.update_status(f"音乐任务 {job.task_id} 完成！耗时: {elapsed_time}秒")
+            # 有音乐文件时返回第一个音乐文件的数据（包含 audio_url 和 title）
+            self._finish_job(job, first_music or result)
+    
+    # ---- 恢复未完成的任务 ----
+    
+    def start_reconciler(self) -> Optional[concurrent.futures.Future]:
+        """在后台恢复上次退出时仍未完成的任务，立即返回"""
+        pending = self.task_manager.get_pending_tasks()
+        if not pending:
+            return None
+        self.update_status(f"发现 {len(pending)} 个未完成的媒体任务，正在后台恢复...")
+        return self.run_coroutine(self.reconcile_pending_tasks(pending))
+    
+    async def reconcile_pending_tasks(self, tasks: Optional[List[Dict[str, Any]]] = None) -> int:
+        """重新跟踪未完成的任务直到结束，下载结果并更新任务记录，返回成功数量"""
+        if tasks is None:
+            tasks = self.task_manager.get_pending_tasks()
+        results = await asyncio.gather(*(self._resume_task(task) for task in tasks), return_exceptions=True)
+        succeeded = sum(1 for result in results if result and not isinstance(result, Exception))
+        if tasks:
+            self.update_status(f"媒体任务恢复完成：{succeeded}/{len(tasks)} 个成功")
+        return succeeded
+    
+    async def _resume_task(self, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """恢复单个任务：交给批量轮询器，完成后下载并写入媒体信息"""
+        local_id = task["local_id"]
+        api_task_id = task.get("api_task_id")
+        if not api_task_id:
+            self.task_manager.update_task_status(local_id, "error", error="缺少接口任务ID")
+            return None
         
-        self.update_status(f"等待音乐任务完成: {task_id}，最长等待10分钟")
+        # 已提交很久的任务很可能已经完成，立即查询
+        result = await self.wait_for_job(task["type"], api_task_id, local_id=local_id, first_poll_delay=0)
+        if not result:
+            return None
         
-        while time.time() - start_time < timeout:
-            try:
-                # 使用单个任务查询接口
-                conn = http.client.HTTPSConnection(self.base_url)
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json',
-                    'Authorization': f'Bearer {self.api_key}'
-                }
-                
-                conn.request("GET", f"/suno/fetch/{task_id}", "", headers)
-                res = conn.getresponse()
-                data = res.read()
-                response = json.loads(data.decode("utf-8"))
-                conn.close()
-                
-                # 解析音乐任务响应
-                if response.get("code") == "success" and response.get("data"):
-                    task_data = response["data"]
-                    
-                    # 添加调试信息
-                    self.update_status(f"音乐API响应数据类型: {type(task_data)}, 内容: {str(task_data)[:200]}...")
-                    
-                    # 如果data是字符串，说明任务还在处理中
-                    if isinstance(task_data, str):
-                        elapsed_time = int(time.time() - start_time)
-                        remaining_time = timeout - elapsed_time
-                        self.update_status(f"音乐任务进度: 处理中, 状态: IN_PROGRESS, 已等待: {elapsed_time}秒, 剩余: {remaining_time}秒")
-                    elif isinstance(task_data, dict):
-                        # 如果data是字典，说明任务完成
-                        status = task_data.get("status", "UNKNOWN")
-                        elapsed_time = int(time.time() - start_time)
-                        remaining_time = timeout - elapsed_time
-                        
-                        self.update_status(f"音乐任务进度: 100%, 状态: {status}, 已等待: {elapsed_time}秒, 剩余: {remaining_time}秒")
-                        
-                        # 检查是否有data数组包含音乐链接
-                        data_array = task_data.get("data", [])
-                        has_audio_url = False
-                        audio_url = None
-                        
-                        if isinstance(data_array, list) and len(data_array) > 0:
-                            # 检查第一个音乐文件
-                            first_music = data_array[0]
-                            if isinstance(first_music, dict) and "audio_url" in first_music:
-                                has_audio_url = True
-                                audio_url = first_music["audio_url"]
-                        
-                        self.update_status(f"任务数据包含audio_url: {has_audio_url}")
-                        if has_audio_url:
-                            self.update_status(f"找到音乐下载链接: {audio_url}")
-                        
-                        if status in ["complete", "SUCCESS"] and has_audio_url:
-                            self.update_status(f"音乐任务 {task_id} 完成！耗时: {elapsed_time}秒")
-                            # 自动下载音乐 - 传递第一个音乐文件的数据
-                            downloaded_path = self.download_music(data_array[0])
-                            if downloaded_path:
-                                self.update_status(f"音乐下载成功: {downloaded_path}")
-                                task_data["local_path"] = downloaded_path
-                            return task_data
-                        elif status in ["complete", "SUCCESS"]:
-                            self.update_status(f"音乐任务 {task_id} 完成！耗时: {elapsed_time}秒")
-                            self.update_status("未找到音乐下载链接")
-                            return task_data
-                        elif status in ["failed", "FAILURE"]:
-                            self.update_status(f"音乐任务 {task_id} 失败")
-                            return None
-                    elif isinstance(task_data, list) and len(task_data) > 0:
-                        # 如果data是列表，取第一个元素
-                        first_item = task_data[0]
-                        self.update_status(f"音乐任务返回列表，第一个元素类型: {type(first_item)}")
-                        if isinstance(first_item, dict):
-                            status = first_item.get("status", "UNKNOWN")
-                            has_audio_url = "audio_url" in first_item
-                            self.update_status(f"列表第一个元素状态: {status}, 包含audio_url: {has_audio_url}")
-                            
-                            if has_audio_url or status in ["complete", "SUCCESS"]:
-                                elapsed_time = int(time.time() - start_time)
-                                self.update_status(f"音乐任务 {task_id} 完成！耗时: {elapsed_time}秒")
-                                # 自动下载音乐
-                                downloaded_path = self.download_music(first_item)
-                                if downloaded_path:
-                                    self.update_status(f"音乐下载成功: {downloaded_path}")
-                                    first_item["local_path"] = downloaded_path
-                                return first_item
-                
-            except Exception as e:
-                self.update_status(f"检查音乐任务状态时出错: {str(e)}")
-            
-            # 等待一段时间再检查
-            time.sleep(check_interval)
+        output_dir = task.get("output_dir") or None
+        if task["type"] == "image":
+            await self.download_image(result, output_dir)
+        elif result.get("audio_url"):
+            await self.download_music(result, output_dir)
+        self.task_manager.update_task_status(local_id, "success", result)
         
-        self.update_status(f"音乐任务 {task_id} 超时")
-        return None
+        if output_dir:
+            self.append_media_info(output_dir, task.get("novel_info") or {}, task["type"], result)
+        return result
+    
+    # ---- 任务管理对话框接口 ----
+    
+    def get_all_tasks(self) -> List[Dict[str, Any]]:
+        """获取所有任务记录"""
+        return self.task_manager.get_all_tasks()
+    
+    def get_pending_tasks(self) -> List[Dict[str, Any]]:
+        """获取未完成的任务记录"""
+        return self.task_manager.get_pending_tasks()
+    
+    def get_completed_tasks(self) -> List[Dict[str, Any]]:
+        """获取已完成的任务记录"""
+        return self.task_manager.get_completed_tasks()
+    
+    def get_task_summary(self) -> Dict[str, int]:
+        """获取任务统计"""
+        return self.task_manager.get_task_summary()
+    
+    def query_task_by_id(self, local_id: str, timeout: float = 120) -> Optional[Dict[str, Any]]:
+        """立即查询一个任务的状态（阻塞调用线程），完成时下载结果"""
+        task = self.task_manager.get_task(local_id)
+        if not task:
+            return None
+        return self.run_coroutine(self._query_tasks_once([task])).result(timeout).get(local_id)
+    
+    def batch_query_pending_tasks(self, timeout: float = 300) -> List[Dict[str, Any]]:
+        """批量查询一次所有未完成的任务（阻塞调用线程），返回已结束的任务"""
+        tasks = self.task_manager.get_pending_tasks()
+        if not tasks:
+            return []
+        self.run_coroutine(self._query_tasks_once(tasks)).result(timeout)
+        return [
+            task for task in (self.task_manager.get_task(t["local_id"]) for t in tasks)
+            if task and task["status"] not in PENDING_STATUSES
+        ]
     
-    def download_image(self, task_info: Dict[str, Any]) -> Optional[str]:
+    async def _query_tasks_once(self, tasks: List[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """对给定任务执行一次批量查询，返回 local_id -> 结果"""
+        loop = asyncio.get_running_loop()
+        jobs = [
+            MediaJob(task["type"], task["api_task_id"], loop.create_future(), self.job_timeout, 0, task["local_id"])
+            for task in tasks if task.get("api_task_id")
+        ]
+        await asyncio.gather(
+            self._poll_image_jobs([job for job in jobs if job.kind == "image"]),
+            self._poll_music_jobs([job for job in jobs if job.kind == "music"]),
+        )
+        
+        results = {}
+        task_by_id = {task["local_id"]: task for task in tasks}
+        for job in jobs:
+            result = job.future.result() if job.future.done() else None
+            if result:
+                output_dir = task_by_id[job.local_id].get("output_dir") or None
+                if job.kind == "image":
+                    await self.download_image(result, output_dir)
+                elif result.get("audio_url"):
+                    await self.download_music(result, output_dir)
+                self.task_manager.update_task_status(job.local_id, "success", result)
+            results[job.local_id] = result
+        return results
+    
+    @staticmethod
+    def _media_dir(output_dir: Optional[str], kind: str) -> str:
+        """媒体文件目录：小说输出目录下的 media，未指定时使用 downloads"""
+        if output_dir:
+            return os.path.join(output_dir, "media")
+        return os.path.join("downloads", "images" if kind == "image" else "music")
+    
+    async def download_image(self, task_info: Dict[str, Any], output_dir: Optional[str] = None) -> Optional[str]:
         """
-        下载图片到本地
+        下载图片到小说输出目录
         
         Args:
             task_info: 任务信息，包含imageUrl
+            output_dir: 小说输出目录
             
         Returns:
             Optional[str]: 下载的本地文件路径
@@ -353,10 +835,6 @@ class MediaGenerator:
                 self.update_status("未找到图片下载链接")
                 return None
             
-            # 创建下载目录
-            download_dir = "downloads/images"
-            os.makedirs(download_dir, exist_ok=True)
-            
             # 生成文件名
             task_id = task_info.get("id", "unknown")
             file_extension = ".png"
@@ -366,24 +844,27 @@ class MediaGenerator:
                 file_extension = ".webp"
             
             filename = f"cover_{task_id}{file_extension}"
-            local_path = os.path.join(download_dir, filename)
+            local_path = os.path.join(self._media_dir(output_dir, "image"), filename)
             
-            # 下载文件
+            # 流式下载，支持断点续传
             self.update_status(f"正在下载图片: {image_url}")
-            urllib.request.urlretrieve(image_url, local_path)
+            download = await self.downloader.download(image_url, local_path)
+            task_info["local_path"] = download["path"]
+            task_info["sha256"] = download["sha256"]
+            self.update_status(f"图片下载成功: {download['path']}")
+            return download["path"]
             
-            return local_path
-            
-        except Exception as e:
+        except (DownloadError, OSError) as e:
             self.update_status(f"下载图片失败: {str(e)}")
             return None
     
-    def download_music(self, task_data: Dict[str, Any]) -> Optional[str]:
+    async def download_music(self, task_data: Dict[str, Any], output_dir: Optional[str] = None) -> Optional[str]:
         """
-        下载音乐到本地
+        下载音乐到小说输出目录
         
         Args:
             task_data: 任务数据，包含audio_url
+            output_dir: 小说输出目录
             
         Returns:
             Optional[str]: 下载的本地文件路径
@@ -394,25 +875,23 @@ class MediaGenerator:
                 self.update_status("未找到音乐下载链接")
                 return None
             
-            # 创建下载目录
-            download_dir = "downloads/music"
-            os.makedirs(download_dir, exist_ok=True)
-            
             # 生成文件名
             task_id = task_data.get("id", "unknown")
-            title = task_data.get("title", "music")
+            title = task_data.get("title") or "music"
             # 清理文件名中的非法字符
             safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
             filename = f"{safe_title}_{task_id}.mp3"
-            local_path = os.path.join(download_dir, filename)
+            local_path = os.path.join(self._media_dir(output_dir, "music"), filename)
             
-            # 下载文件
+            # 流式下载，支持断点续传
             self.update_status(f"正在下载音乐: {audio_url}")
-            urllib.request.urlretrieve(audio_url, local_path)
+            download = await self.downloader.download(audio_url, local_path)
+            task_data["local_path"] = download["path"]
+            task_data["sha256"] = download["sha256"]
+            self.update_status(f"音乐下载成功: {download['path']}")
+            return download["path"]
             
-            return local_path
-            
-        except Exception as e:
+        except (DownloadError, OSError) as e:
             self.update_status(f"下载音乐失败: {str(e)}")
             return None
     
@@ -480,16 +959,34 @@ class MediaGenerator:
         
         return type_music.get(novel_type, "Epic orchestral music")
     
+    @staticmethod
+    def media_info_path(output_dir: str, novel_info: Dict[str, Any]) -> str:
+        """小说的媒体信息文件
+
+        同一目录下并发生成多本小说，每本小说各用一个文件：优先使用 novel_info 中的
+        media_info_path（生成器传入与正文同名的 _media_info.json），否则按小说ID命名。
+        """
+        path = (novel_info or {}).get("media_info_path")
+        if path:
+            return path
+        novel_id = (novel_info or {}).get("id")
+        name = f"media_info_{novel_id}.json" if novel_id is not None else "media_info.json"
+        return os.path.join(output_dir, name)
+    
     def save_media_info(self, output_dir: str, novel_setup: Dict[str, Any], 
-                       image_results: List[Dict[str, Any]], music_result: Optional[Dict[str, Any]]):
+                       image_results: List[Dict[str, Any]], music_result: Optional[Dict[str, Any]]
+                       ) -> Optional[str]:
         """
-        保存媒体信息到JSON文件
+        保存媒体信息到这本小说的JSON文件（原子写入）
         
         Args:
             output_dir: 输出目录
             novel_setup: 小说设置信息
             image_results: 图片生成结果
             music_result: 音乐生成结果
+            
+        Returns:
+            str: 媒体信息文件路径，保存失败时为 None
         """
         try:
             media_info = {
@@ -511,6 +1008,9 @@ class MediaGenerator:
                     "status": img_result.get("status"),
                     "image_url": img_result.get("imageUrl"),
                     "local_path": img_result.get("local_path"),
+                    "sha256": img_result.get("sha256"),
+                    "cache_path": img_result.get("cache_path"),
+                    "cached": img_result.get("cached", False),
                     "prompt": img_result.get("prompt"),
                     "progress": img_result.get("progress")
                 }
@@ -523,16 +1023,70 @@ class MediaGenerator:
                     "title": music_result.get("title"),
                     "audio_url": music_result.get("audio_url"),
                     "local_path": music_result.get("local_path"),
+                    "sha256": music_result.get("sha256"),
+                    "cache_path": music_result.get("cache_path"),
+                    "cached": music_result.get("cached", False),
                     "duration": music_result.get("duration")
                 }
                 media_info["music"] = music_info
             
             # 保存到文件
-            media_file_path = os.path.join(output_dir, "media_info.json")
-            with open(media_file_path, 'w', encoding='utf-8') as f:
-                json.dump(media_info, f, ensure_ascii=False, indent=2)
+            media_file_path = self.media_info_path(output_dir, novel_setup)
+            atomic_write_json(media_file_path, media_info)
             
             self.update_status(f"媒体信息已保存到: {media_file_path}")
+            return media_file_path
+            
+        except Exception as e:
+            self.update_status(f"保存媒体信息失败: {str(e)}")
+            return None
+    
+    def append_media_info(self, output_dir: str, novel_info: Dict[str, Any], kind: str, result: Dict[str, Any]):
+        """把恢复完成的任务结果追加到这本小说已有的媒体信息文件"""
+        media_file_path = self.media_info_path(output_dir, novel_info)
+        try:
+            media_info = None
+            if os.path.exists(media_file_path):
+                with open(media_file_path, 'r', encoding='utf-8') as f:
+                    media_info = json.load(f)
+            if not isinstance(media_info, dict):
+                media_info = {
+                    "novel_info": {
+                        "type": novel_info.get("novel_type", ""),
+                        "protagonist": novel_info.get("protagonist_name", ""),
+                        "background": novel_info.get("background", "")
+                    },
+                    "images": [],
+                    "music": None,
+                    "generation_time": time.strftime("%Y-%m-%d %H:%M:%S")
+                }
+            
+            if kind == "image":
+                images = media_info.setdefault("images", [])
+                if any(image.get("task_id") == result.get("id") for image in images):
+                    return
+                images.append({
+                    "index": len(images) + 1,
+                    "task_id": result.get("id"),
+                    "status": result.get("status"),
+                    "image_url": result.get("imageUrl"),
+                    "local_path": result.get("local_path"),
+                    "sha256": result.get("sha256"),
+                    "prompt": result.get("prompt"),
+                    "progress": result.get("progress")
+                })
+            else:
+                media_info["music"] = {
+                    "task_id": result.get("id"),
+                    "title": result.get("title"),
+                    "audio_url": result.get("audio_url"),
+                    "local_path": result.get("local_path"),
+                    "sha256": result.get("sha256"),
+                    "duration": result.get("duration")
+                }
+            
+            atomic_write_json(media_file_path, media_info)
+            self.update_status(f"媒体信息已更新: {media_file_path}")
             
         except Exception as e:
-            self.update_status(f"保存媒体信息失败: {str(e)}") 
\ No newline at end of file
+            self.update_status(f"更新媒体信息失败: {str(e)}")
@@ -2,268 +2,382 @@
 # -*- coding: utf-8 -*-
 """
 媒体任务管理器 - 负责管理媒体生成任务的持久化存储和查询
+
+任务保存在 SQLite 中，按状态、类型和创建时间建立索引；
+统计摘要使用增量计数，不再每次扫描全部任务。首次启动时自动导入旧的 media_tasks.json。
 """
 
 import json
 import os
 import time
+import sqlite3
 import logging
+import threading
+from collections import Counter
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
 logger = logging.getLogger("novel_generator")
 
+# 任务状态分组
+PENDING_STATUSES = ("submitted", "queued", "running", "in_progress")
+COMPLETED_STATUSES = ("success", "complete")
+FAILED_STATUSES = ("failure", "error", "timeout")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_tasks (
+    local_id TEXT PRIMARY KEY,
+    api_task_id TEXT,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    prompt TEXT,
+    novel_info TEXT,
+    output_dir TEXT,
+    created_at TEXT,
+    created_ts REAL,
+    updated_at TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_media_tasks_status ON media_tasks(status, created_ts);
+CREATE INDEX IF NOT EXISTS idx_media_tasks_type ON media_tasks(type, created_ts);
+CREATE INDEX IF NOT EXISTS idx_media_tasks_created ON media_tasks(created_ts);
+CREATE INDEX IF NOT EXISTS idx_media_tasks_api_id ON media_tasks(api_task_id);
+CREATE TABLE IF NOT EXISTS media_tasks_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = (
+    "local_id", "api_task_id", "type", "status", "prompt", "novel_info", "output_dir",
+    "created_at", "created_ts", "updated_at", "result", "error",
+)
+
+
+def _placeholders(values) -> str:
+    """生成 IN 查询的占位符"""
+    return ", ".join("?" for _ in values)
+
+
 class MediaTaskManager:
     """媒体任务管理器"""
-    
-    def __init__(self, tasks_file: str = "media_tasks.json"):
+
+    def __init__(self, tasks_file: str = "media_tasks.json", db_file: Optional[str] = None):
+        """
+        Args:
+            tasks_file: 旧版 JSON 任务文件，存在时首次启动导入
+            db_file: SQLite 数据库文件，默认与 tasks_file 同名（.db）
+        """
         self.tasks_file = tasks_file
-        self.tasks = self._load_tasks()
-    
-    def _load_tasks(self) -> Dict[str, Any]:
-        """加载任务数据"""
-        if os.path.exists(self.tasks_file):
+        self.db_file = db_file or os.path.splitext(tasks_file)[0] + ".db"
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(os.path.abspath(self.db_file))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
             try:
-                with open(self.tasks_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"加载任务文件失败: {e}")
-        return {"image_tasks": {}, "music_tasks": {}}
-    
-    def _save_tasks(self):
-        """保存任务数据"""
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+        self._import_json_tasks()
+
+        # (类型, 状态) -> 数量，用于统计摘要
+        self._counts: Counter = Counter()
+        with self._lock:
+            for row in self._conn.execute("SELECT type, status, COUNT(*) FROM media_tasks GROUP BY type, status"):
+                self._counts[(row[0], row[1])] = row[2]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    # ---- 序列化 ----
+
+    @staticmethod
+    def _to_row(task: Dict[str, Any]) -> tuple:
+        """任务字典转换为数据库行"""
+        created_at = task.get("created_at") or datetime.now().isoformat()
         try:
-            with open(self.tasks_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+            created_ts = datetime.fromisoformat(created_at).timestamp()
+        except (TypeError, ValueError):
+            created_ts = time.time()
+        return (
+            task["local_id"],
+            task.get("api_task_id"),
+            task.get("type", "image"),
+            task.get("status", "submitted"),
+            task.get("prompt"),
+            json.dumps(task.get("novel_info"), ensure_ascii=False),
+            task.get("output_dir"),
+            created_at,
+            created_ts,
+            task.get("updated_at") or created_at,
+            json.dumps(task.get("result"), ensure_ascii=False),
+            task.get("error"),
+        )
+
+    @staticmethod
+    def _to_task(row: sqlite3.Row) -> Dict[str, Any]:
+        """数据库行转换为任务字典（与旧版 JSON 结构一致）"""
+        task = dict(row)
+        task.pop("created_ts", None)
+        for key in ("novel_info", "result"):
+            try:
+                task[key] = json.loads(task[key]) if task[key] else None
+            except ValueError:
+                pass
+        return task
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        """执行查询并返回任务列表"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._to_task(row) for row in rows]
+
+    def _import_json_tasks(self):
+        """导入旧版 media_tasks.json（只导入一次）"""
+        if not os.path.exists(self.tasks_file):
+            return
+        with self._lock:
+            imported = self._conn.execute(
+                "SELECT value FROM media_tasks_meta WHERE key = 'imported_json'"
+            ).fetchone()
+        if imported:
+            return
+        try:
+            with open(self.tasks_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
         except Exception as e:
-            logger.error(f"保存任务文件失败: {e}")
-    
-    def add_image_task(self, task_id: str, novel_info: Dict[str, Any], 
+            logger.warning(f"加载任务文件失败: {e}")
+            return
+
+        rows = []
+        for group in ("image_tasks", "music_tasks"):
+            for local_id, task in (data.get(group) or {}).items():
+                task = dict(task)
+                task.setdefault("local_id", local_id)
+                task.setdefault("type", "image" if group == "image_tasks" else "music")
+                rows.append(self._to_row(task))
+
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO media_tasks ({', '.join(_COLUMNS)}) VALUES ({_placeholders(_COLUMNS)})",
+                    rows
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO media_tasks_meta (key, value) VALUES ('imported_json', ?)",
+                    (datetime.now().isoformat(),)
+                )
+        logger.info(f"已从 {self.tasks_file} 导入 {len(rows)} 个媒体任务")
+
+    # ---- 写入 ----
+
+    def _add_task(self, task_type: str, prefix: str, task_id: str, novel_info: Dict[str, Any],
+                  prompt: str, output_dir: str) -> str:
+        """添加任务并返回本地任务标识"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            sequence = sum(n for (t, _), n in self._counts.items() if t == task_type)
+            while True:
+                local_id = f"{prefix}_{int(time.time())}_{sequence}"
+                task_info = {
+                    "local_id": local_id,
+                    "api_task_id": task_id,
+                    "type": task_type,
+                    "status": "submitted",
+                    "prompt": prompt,
+                    "novel_info": novel_info,
+                    "output_dir": output_dir,
+                    "created_at": now,
+                    "updated_at": now,
+                    "result": None,
+                    "error": None
+                }
+                try:
+                    with self._conn:
+                        self._conn.execute(
+                            f"INSERT INTO media_tasks ({', '.join(_COLUMNS)}) VALUES ({_placeholders(_COLUMNS)})",
+                            self._to_row(task_info)
+                        )
+                    break
+                except sqlite3.IntegrityError:
+                    sequence += 1
+            self._counts[(task_type, "submitted")] += 1
+        return local_id
+
+    def add_image_task(self, task_id: str, novel_info: Dict[str, Any],
                        prompt: str, output_dir: str) -> str:
         """
         添加图片生成任务
-        
+
         Args:
             task_id: 任务ID
             novel_info: 小说信息
             prompt: 生成提示词
             output_dir: 输出目录
-            
+
         Returns:
             str: 本地任务标识
         """
-        local_id = f"img_{int(time.time())}_{len(self.tasks['image_tasks'])}"
-        
-        task_info = {
-            "local_id": local_id,
-            "api_task_id": task_id,
-            "type": "image",
-            "status": "submitted",
-            "prompt": prompt,
-            "novel_info": novel_info,
-            "output_dir": output_dir,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-            "result": None,
-            "error": None
-        }
-        
-        self.tasks["image_tasks"][local_id] = task_info
-        self._save_tasks()
-        
+        local_id = self._add_task("image", "img", task_id, novel_info, prompt, output_dir)
         logger.info(f"已保存图片任务: {local_id} (API ID: {task_id})")
         return local_id
-    
-    def add_music_task(self, task_id: str, novel_info: Dict[str, Any], 
+
+    def add_music_task(self, task_id: str, novel_info: Dict[str, Any],
                        prompt: str, output_dir: str) -> str:
         """
         添加音乐生成任务
-        
+
         Args:
             task_id: 任务ID
             novel_info: 小说信息
             prompt: 生成提示词
             output_dir: 输出目录
-            
+
         Returns:
             str: 本地任务标识
         """
-        local_id = f"music_{int(time.time())}_{len(self.tasks['music_tasks'])}"
-        
-        task_info = {
-            "local_id": local_id,
-            "api_task_id": task_id,
-            "type": "music",
-            "status": "submitted",
-            "prompt": prompt,
-            "novel_info": novel_info,
-            "output_dir": output_dir,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-            "result": None,
-            "error": None
-        }
-        
-        self.tasks["music_tasks"][local_id] = task_info
-        self._save_tasks()
-        
+        local_id = self._add_task("music", "music", task_id, novel_info, prompt, output_dir)
         logger.info(f"已保存音乐任务: {local_id} (API ID: {task_id})")
         return local_id
-    
-    def update_task_status(self, local_id: str, status: str, result: Optional[Dict] = None, 
+
+    def update_task_status(self, local_id: str, status: str, result: Optional[Dict] = None,
                           error: Optional[str] = None):
         """
         更新任务状态
-        
+
         Args:
             local_id: 本地任务ID
             status: 新状态
             result: 任务结果
             error: 错误信息
         """
-        task = self.get_task(local_id)
-        if task:
-            task["status"] = status
-            task["updated_at"] = datetime.now().isoformat()
-            
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT type, status FROM media_tasks WHERE local_id = ?", (local_id,)
+            ).fetchone()
+            if row is None:
+                return
+
+            assignments = ["status = ?", "updated_at = ?"]
+            params: List[Any] = [status, datetime.now().isoformat()]
             if result:
-                task["result"] = result
+                assignments.append("result = ?")
+                params.append(json.dumps(result, ensure_ascii=False))
             if error:
-                task["error"] = error
-            
-            # 更新到对应的任务列表中
-            if task["type"] == "image":
-                self.tasks["image_tasks"][local_id] = task
-            else:
-                self.tasks["music_tasks"][local_id] = task
-            
-            self._save_tasks()
-            logger.info(f"任务 {local_id} 状态更新为: {status}")
-    
+                assignments.append("error = ?")
+                params.append(error)
+            params.append(local_id)
+
+            with self._conn:
+                self._conn.execute(
+                    f"UPDATE media_tasks SET {', '.join(assignments)} WHERE local_id = ?", params
+                )
+            self._counts[(row["type"], row["status"])] -= 1
+            self._counts[(row["type"], status)] += 1
+        logger.info(f"任务 {local_id} 状态更新为: {status}")
+
+    # ---- 查询 ----
+
     def get_task(self, local_id: str) -> Optional[Dict[str, Any]]:
         """获取任务信息"""
-        if local_id in self.tasks["image_tasks"]:
-            return self.tasks["image_tasks"][local_id]
-        elif local_id in self.tasks["music_tasks"]:
-            return self.tasks["music_tasks"][local_id]
-        return None
-    
+        tasks = self._query("SELECT * FROM media_tasks WHERE local_id = ?", (local_id,))
+        return tasks[0] if tasks else None
+
+    def get_tasks_by_status(self, statuses, task_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按状态（及类型）查询任务，按创建时间倒序"""
+        statuses = tuple(statuses)
+        sql = f"SELECT * FROM media_tasks WHERE status IN ({_placeholders(statuses)})"
+        params: List[Any] = list(statuses)
+        if task_type:
+            sql += " AND type = ?"
+            params.append(task_type)
+        sql += " ORDER BY created_ts DESC"
+        return self._query(sql, params)
+
     def get_pending_tasks(self) -> List[Dict[str, Any]]:
         """获取所有待处理的任务"""
-        pending = []
-        
-        for task in self.tasks["image_tasks"].values():
-            if task["status"] in ["submitted", "queued", "running", "in_progress"]:
-                pending.append(task)
-        
-        for task in self.tasks["music_tasks"].values():
-            if task["status"] in ["submitted", "queued", "running", "in_progress"]:
-                pending.append(task)
-        
-        return pending
-    
+        return self.get_tasks_by_status(PENDING_STATUSES)
+
     def get_completed_tasks(self) -> List[Dict[str, Any]]:
         """获取所有已完成的任务"""
-        completed = []
-        
-        for task in self.tasks["image_tasks"].values():
-            if task["status"] in ["success", "complete"]:
-                completed.append(task)
-        
-        for task in self.tasks["music_tasks"].values():
-            if task["status"] in ["success", "complete"]:
-                completed.append(task)
-        
-        return completed
-    
+        return self.get_tasks_by_status(COMPLETED_STATUSES)
+
     def get_failed_tasks(self) -> List[Dict[str, Any]]:
         """获取所有失败的任务"""
-        failed = []
-        
-        for task in self.tasks["image_tasks"].values():
-            if task["status"] in ["failure", "error", "timeout"]:
-                failed.append(task)
-        
-        for task in self.tasks["music_tasks"].values():
-            if task["status"] in ["failure", "error", "timeout"]:
-                failed.append(task)
-        
-        return failed
-    
-    def get_all_tasks(self) -> List[Dict[str, Any]]:
-        """获取所有任务"""
-        all_tasks = []
-        all_tasks.extend(self.tasks["image_tasks"].values())
-        all_tasks.extend(self.tasks["music_tasks"].values())
-        
-        # 按创建时间排序
-        all_tasks.sort(key=lambda x: x["created_at"], reverse=True)
-        return all_tasks
-    
+        return self.get_tasks_by_status(FAILED_STATUSES)
+
+    def get_all_tasks(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取所有任务（按创建时间倒序）"""
+        sql = "SELECT * FROM media_tasks ORDER BY created_ts DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._query(sql)
+
     def clean_old_tasks(self, days: int = 7):
         """清理旧任务（默认7天前的）"""
         cutoff_time = time.time() - (days * 24 * 60 * 60)
-        
-        # 清理图片任务
-        to_remove = []
-        for local_id, task in self.tasks["image_tasks"].items():
-            created_timestamp = datetime.fromisoformat(task["created_at"]).timestamp()
-            if created_timestamp < cutoff_time:
-                to_remove.append(local_id)
-        
-        for local_id in to_remove:
-            del self.tasks["image_tasks"][local_id]
-            logger.info(f"已清理旧图片任务: {local_id}")
-        
-        # 清理音乐任务
-        to_remove = []
-        for local_id, task in self.tasks["music_tasks"].items():
-            created_timestamp = datetime.fromisoformat(task["created_at"]).timestamp()
-            if created_timestamp < cutoff_time:
-                to_remove.append(local_id)
-        
-        for local_id in to_remove:
-            del self.tasks["music_tasks"][local_id]
-            logger.info(f"已清理旧音乐任务: {local_id}")
-        
-        if to_remove:
-            self._save_tasks()
-    
+        with self._lock:
+            removed = self._conn.execute(
+                "SELECT type, status, COUNT(*) FROM media_tasks WHERE created_ts < ? GROUP BY type, status",
+                (cutoff_time,)
+            ).fetchall()
+            with self._conn:
+                self._conn.execute("DELETE FROM media_tasks WHERE created_ts < ?", (cutoff_time,))
+            for task_type, status, count in removed:
+                self._counts[(task_type, status)] -= count
+        total = sum(row[2] for row in removed)
+        if total:
+            logger.info(f"已清理 {total} 个旧媒体任务")
+
     def export_tasks(self, filename: str = None) -> str:
-        """导出任务数据"""
+        """导出任务数据（旧版 JSON 结构）"""
         if not filename:
             filename = f"media_tasks_export_{int(time.time())}.json"
-        
+
+        tasks = {"image_tasks": {}, "music_tasks": {}}
+        for task in self._query("SELECT * FROM media_tasks ORDER BY created_ts"):
+            group = "image_tasks" if task["type"] == "image" else "music_tasks"
+            tasks[group][task["local_id"]] = task
+
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
+                json.dump(tasks, f, ensure_ascii=False, indent=2)
             logger.info(f"任务数据已导出到: {filename}")
             return filename
         except Exception as e:
             logger.error(f"导出任务数据失败: {e}")
             return ""
-    
+
     def get_task_summary(self) -> Dict[str, int]:
-        """获取任务统计摘要"""
+        """获取任务统计摘要（增量计数，不扫描任务表）"""
+        with self._lock:
+            counts = dict(self._counts)
+
         summary = {
             "total": 0,
             "pending": 0,
             "completed": 0,
             "failed": 0,
-            "image_tasks": len(self.tasks["image_tasks"]),
-            "music_tasks": len(self.tasks["music_tasks"])
+            "image_tasks": 0,
+            "music_tasks": 0
         }
-        
-        all_tasks = self.get_all_tasks()
-        summary["total"] = len(all_tasks)
-        
-        for task in all_tasks:
-            status = task["status"]
-            if status in ["submitted", "queued", "running", "in_progress"]:
-                summary["pending"] += 1
-            elif status in ["success", "complete"]:
-                summary["completed"] += 1
-            elif status in ["failure", "error", "timeout"]:
-                summary["failed"] += 1
-        
-        return summary 
\ No newline at end of file
+        for (task_type, status), count in counts.items():
+            summary["total"] += count
+            summary["image_tasks" if task_type == "image" else "music_tasks"] += count
+            if status in PENDING_STATUSES:
+                summary["pending"] += count
+            elif status in COMPLETED_STATUSES:
+                summary["completed"] += count
+            elif status in FAILED_STATUSES:
+                summary["failed"] += count
+
+        return summary
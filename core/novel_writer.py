@@ -0,0 +1,222 @@
+"""
+小说保存写入器
+
+所有小说保存都经过同一个后台写入任务：
+- 有界队列，生成速度不再受磁盘延迟影响，积压过多时才会反压
+- 同一本小说在合并窗口内的多次保存只写最后一次
+- 写入由调用方提供的函数完成（原子写入：临时文件 + fsync + rename）
+- 调用方可以选择等待写入落盘；其他线程（界面线程）提交后立即返回，通过 Future 得知结果
+"""
+
+import os
+import copy
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Any, Optional
+
+try:
+    from ..utils.metrics import get_registry
+    from ..utils.tracing import get_tracer
+except ImportError:
+    from utils.metrics import get_registry
+    from utils.tracing import get_tracer
+
+logger = logging.getLogger("novel_generator")
+
+_metrics = get_registry()
+SAVE_SECONDS = _metrics.histogram("novel_save_seconds", "一次小说保存（正文和元数据）的写入耗时（秒）")
+SAVE_QUEUE_DEPTH = _metrics.gauge("novel_save_queue_depth", "等待写入的小说保存数")
+SAVES_COALESCED = _metrics.counter("novel_saves_coalesced_total", "被合并掉的重复保存次数")
+
+_tracer = get_tracer()
+
+
+class _PendingSave:
+    """等待写入的保存请求（同一文件的后续请求会覆盖内容）"""
+
+    __slots__ = ("args", "waiters", "first_at")
+
+    def __init__(self, args, first_at):
+        self.args = args
+        self.waiters = []
+        self.first_at = first_at
+
+
+class NovelWriter:
+    """单一后台写入任务，合并同一文件的重复保存"""
+
+    def __init__(self, write_func: Callable[..., None], coalesce_window: float = 0.5,
+                 max_pending: int = 64):
+        """
+        Args:
+            write_func: 实际写入函数 write_func(text, novel_setup, filepath, meta_filepath, status)，在后台线程中执行
+            coalesce_window: 合并窗口（秒），窗口内对同一文件的保存只写最后一次
+            max_pending: 队列上限，超过时 save() 会等待
+        """
+        self.write_func = write_func
+        self.coalesce_window = coalesce_window
+        self.max_pending = max_pending
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, _PendingSave] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[_PendingSave] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        # 其他线程提交、尚未完成的保存（flush/close 需要等它们进入队列并写完）
+        self._threadsafe: set = set()
+        self._threadsafe_lock = threading.Lock()
+        self.writes = 0
+        self.coalesced = 0
+
+    def start(self):
+        """在当前事件循环中启动写入任务"""
+        if self.is_running():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        # 单线程执行器，保证写入顺序
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="novel_writer")
+        self._task = self._loop.create_task(self._run())
+
+    def is_running(self) -> bool:
+        """写入任务是否正在运行"""
+        return (self._task is not None and not self._task.done()
+                and self._loop is not None and not self._loop.is_closed())
+
+    def in_loop_thread(self) -> bool:
+        """当前线程是否为写入任务所在的事件循环线程"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def save(self, text: str, novel_setup: Dict[str, Any], filepath: str,
+                   meta_filepath: str, status: Optional[str] = None, wait: bool = False):
+        """提交一次保存
+
+        Args:
+            wait: 为 True 时等待数据落盘后返回
+        """
+        # 元数据在事件循环中仍会被修改，提交时复制一份
+        args = (text, copy.deepcopy(novel_setup), filepath, meta_filepath, status)
+        waiter = self._loop.create_future()
+        # 不等待的调用方不会读取结果，这里标记异常已处理（错误已记录日志）
+        waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        pending = self._pending.get(filepath)
+        if pending is not None:
+            # 同一文件已在等待写入，直接替换内容
+            pending.args = args
+            pending.waiters.append(waiter)
+            self.coalesced += 1
+            SAVES_COALESCED.inc()
+        else:
+            pending = _PendingSave(args, time.monotonic())
+            pending.waiters.append(waiter)
+            self._pending[filepath] = pending
+            SAVE_QUEUE_DEPTH.set(len(self._pending))
+            await self._queue.put(filepath)
+
+        if wait:
+            await waiter
+
+    def save_threadsafe(self, text: str, novel_setup: Dict[str, Any], filepath: str,
+                        meta_filepath: str, status: Optional[str] = None) -> concurrent.futures.Future:
+        """从任意线程（例如界面线程）提交保存并立即返回，返回的 Future 在落盘后完成
+
+        调用方不应阻塞等待这个 Future（写入任务所在的事件循环可能正忙）。
+
+        Raises:
+            RuntimeError: 事件循环已关闭
+        """
+        result = concurrent.futures.Future()
+
+        async def _submit():
+            try:
+                await self.save(text, novel_setup, filepath, meta_filepath, status, wait=True)
+                result.set_result(True)
+            except Exception as e:
+                result.set_exception(e)
+
+        with self._threadsafe_lock:
+            self._threadsafe.add(result)
+        result.add_done_callback(self._forget_threadsafe)
+        try:
+            self._loop.call_soon_threadsafe(lambda: self._loop.create_task(_submit()))
+        except RuntimeError:
+            result.cancel()
+            raise
+        return result
+
+    def _forget_threadsafe(self, future: concurrent.futures.Future):
+        with self._threadsafe_lock:
+            self._threadsafe.discard(future)
+
+    async def flush(self):
+        """等待所有已提交的保存写入完成（包括其他线程提交、还未进入队列的保存）"""
+        with self._threadsafe_lock:
+            submitted = list(self._threadsafe)
+        if submitted:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in submitted), return_exceptions=True)
+
+        pendings = list(self._pending.values())
+        if self._inflight is not None:
+            pendings.append(self._inflight)
+        waiters = [w for p in pendings for w in p.waiters]
+        if waiters:
+            await asyncio.gather(*waiters, return_exceptions=True)
+
+    async def close(self):
+        """写完所有积压的保存后停止写入任务"""
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._executor.shutdown(wait=True)
+
+    async def _run(self):
+        """后台写入循环"""
+        while True:
+            filepath = await self._queue.get()
+            try:
+                pending = self._pending.get(filepath)
+                if pending is None:
+                    continue
+
+                # 等到合并窗口结束，让窗口内的后续保存合并进来
+                delay = pending.first_at + self.coalesce_window - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                # 取出最新内容；写入期间到达的新保存会重新排队
+                self._pending.pop(filepath, None)
+                SAVE_QUEUE_DEPTH.set(len(self._pending))
+                self._inflight = pending
+                try:
+                    with SAVE_SECONDS.time(), _tracer.span("write", track="写入器", file=os.path.basename(filepath)):
+                        await self._loop.run_in_executor(self._executor, self.write_func, *pending.args)
+                    self.writes += 1
+                    error = None
+                except Exception as e:
+                    logger.error(f"保存小说失败 {filepath}: {e}")
+                    error = e
+                finally:
+                    self._inflight = None
+
+                for waiter in pending.waiters:
+                    if waiter.done():
+                        continue
+                    if error is None:
+                        waiter.set_result(True)
+                    else:
+                        waiter.set_exception(error)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,217 @@
+"""
+生成进度通道
+
+生成循环每一轮只上报几个数字（小说 id、字数、目标字数、阶段），不再把整个 novel_setup（含全文和摘要）交给回调：
+- 通道按小说保存最新状态，并根据最近一段时间的字数变化计算速度和预计剩余时间
+- 界面线程定时调用 take_changes() 取出变化过的记录，两次取之间的多次更新自然合并为一次
+- 旧式回调作为监听者接入：每部小说最多每 min_interval 秒通知一次，阶段变化时立即通知
+- aggregate() 汇总所有并发小说的总字数、总速度和整体剩余时间
+"""
+
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# 阶段 -> 界面显示名
+PHASE_LABELS = {
+    "generating": "生成中",
+    "summarizing": "生成摘要",
+    "ending": "生成结尾",
+    "paused": "已暂停",
+    "done": "已完成",
+    "stopped": "已停止",
+}
+
+# 已结束的阶段不计入进行中的小说
+FINISHED_PHASES = ("done", "stopped")
+
+
+@dataclass
+class ProgressRecord:
+    """一部小说的进度（rate 为字/秒，eta 为秒，无法估计时为 None）"""
+
+    novel_id: str
+    word_count: int
+    target_length: int
+    phase: str = "generating"
+    genre: str = ""
+    rate: float = 0.0
+    eta: Optional[float] = None
+
+    @property
+    def percentage(self) -> float:
+        if not self.target_length:
+            return 0.0
+        return min(100.0, self.word_count / self.target_length * 100)
+
+    @property
+    def finished(self) -> bool:
+        return self.phase in FINISHED_PHASES
+
+    def to_dict(self) -> Dict[str, object]:
+        """旧式进度回调使用的字典（保留 id、percentage、estimated_time 等原有键名）"""
+        data = asdict(self)
+        data["id"] = self.novel_id
+        data["percentage"] = self.percentage
+        data["estimated_time"] = self.eta or 0
+        return data
+
+
+@dataclass
+class AggregateProgress:
+    """所有小说的汇总进度"""
+
+    novels: int = 0
+    active: int = 0
+    word_count: int = 0
+    target_length: int = 0
+    rate: float = 0.0
+    eta: Optional[float] = None
+
+    @property
+    def percentage(self) -> float:
+        if not self.target_length:
+            return 0.0
+        return min(100.0, self.word_count / self.target_length * 100)
+
+
+class _NovelState:
+    """通道内部的单部小说状态"""
+
+    def __init__(self, record: ProgressRecord):
+        self.record = record
+        self.samples: Deque[Tuple[float, int]] = deque()
+        self.last_notified = float("-inf")
+        self.notified_phase: Optional[str] = None
+        self.pending = False
+
+
+class ProgressChannel:
+    """线程安全的进度通道"""
+
+    def __init__(self, min_interval: float = 0.5, rate_window: float = 120.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            min_interval: 监听者收到同一部小说两次通知的最短间隔（秒）
+            rate_window: 计算速度时参考的时间窗口（秒）
+            clock: 单调时钟
+        """
+        self.min_interval = min_interval
+        self.rate_window = rate_window
+        self.clock = clock
+        self._states: Dict[str, _NovelState] = {}
+        self._changed: Dict[str, ProgressRecord] = {}
+        self._listeners: List[Callable[[ProgressRecord], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[ProgressRecord], None]):
+        """添加监听者（在上报进度的线程中调用，按 min_interval 合并）"""
+        self._listeners.append(listener)
+
+    def update(self, novel_id: str, word_count: int, target_length: Optional[int] = None,
+               phase: Optional[str] = None, genre: Optional[str] = None):
+        """上报一部小说的进度（任意线程均可调用）
+
+        target_length/phase/genre 为 None 时沿用上一次的值。
+        """
+        now = self.clock()
+        with self._lock:
+            state = self._states.get(novel_id)
+            if state is None:
+                state = _NovelState(ProgressRecord(novel_id, word_count, target_length or 0))
+                self._states[novel_id] = state
+            previous = state.record
+
+            samples = state.samples
+            if not samples or samples[-1][1] != word_count:
+                samples.append((now, word_count))
+            while len(samples) > 2 and now - samples[0][0] > self.rate_window:
+                samples.popleft()
+            rate = 0.0
+            if len(samples) > 1 and samples[-1][0] > samples[0][0]:
+                rate = max(0.0, (samples[-1][1] - samples[0][1]) / (samples[-1][0] - samples[0][0]))
+
+            target = previous.target_length if target_length is None else target_length
+            remaining = target - word_count
+            if remaining <= 0:
+                eta = 0.0
+            elif rate > 0:
+                eta = remaining / rate
+            else:
+                eta = None
+
+            record = ProgressRecord(
+                novel_id,
+                word_count,
+                target,
+                previous.phase if phase is None else phase,
+                previous.genre if genre is None else genre,
+                rate,
+                eta,
+            )
+            state.record = record
+            self._changed[novel_id] = record
+
+            notify = False
+            if self._listeners:
+                if record.phase != state.notified_phase or now - state.last_notified >= self.min_interval:
+                    notify = True
+                    state.last_notified = now
+                    state.notified_phase = record.phase
+                    state.pending = False
+                else:
+                    state.pending = True
+
+        if notify:
+            self._notify(record)
+
+    def flush(self):
+        """把合并期间没有通知的最新进度立即通知监听者"""
+        with self._lock:
+            records = []
+            for state in self._states.values():
+                if state.pending:
+                    state.pending = False
+                    state.last_notified = self.clock()
+                    state.notified_phase = state.record.phase
+                    records.append(state.record)
+        for record in records:
+            self._notify(record)
+
+    def _notify(self, record: ProgressRecord):
+        for listener in list(self._listeners):
+            listener(record)
+
+    def take_changes(self) -> List[ProgressRecord]:
+        """取出上次调用以来变化过的小说的最新进度"""
+        with self._lock:
+            changed = list(self._changed.values())
+            self._changed = {}
+        return changed
+
+    def records(self) -> List[ProgressRecord]:
+        """所有小说的最新进度"""
+        with self._lock:
+            return [state.record for state in self._states.values()]
+
+    def aggregate(self) -> AggregateProgress:
+        """汇总所有小说：速度为进行中小说之和，剩余时间取进行中小说的最大值"""
+        total = AggregateProgress()
+        etas = []
+        for record in self.records():
+            total.novels += 1
+            total.word_count += record.word_count
+            total.target_length += record.target_length
+            if record.finished:
+                continue
+            total.active += 1
+            total.rate += record.rate
+            etas.append(record.eta)
+        if etas and all(eta is not None for eta in etas):
+            total.eta = max(etas)
+        elif not total.active and total.novels:
+            total.eta = 0.0
+        return total
@@ -0,0 +1,67 @@
+"""
+共享限流器
+
+令牌桶限流，可在多个线程和事件循环之间共享：令牌计算在线程锁内完成，等待使用 asyncio.sleep。
+同一名称的限流器全局唯一，例如媒体提交、轮询和恢复任务共用 "media" 限流器。
+"""
+
+import time
+import asyncio
+import threading
+from typing import Dict
+
+
+class AsyncRateLimiter:
+    """令牌桶限流器"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def _reserve(self) -> float:
+        """预留一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            self.waits += 1
+            return -self._tokens / self.rate
+
+    async def acquire(self):
+        """获取一个令牌，不足时等待"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+_limiters: Dict[str, AsyncRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str, rate: float = 2.0, burst: int = 5) -> AsyncRateLimiter:
+    """获取指定名称的共享限流器，首次获取时按参数创建"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = AsyncRateLimiter(rate, burst)
+            _limiters[name] = limiter
+        return limiter
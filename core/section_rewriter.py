@@ -0,0 +1,368 @@
+"""
+低分小节批量重写
+
+无界面的批量重写引擎：
+- 选中的小节在共享限流器下并发生成重写内容
+- 按小节在小说文件中的偏移生成补丁集；偏移处的原文与分析时不一致的小节跳过
+- 整个补丁集一次原子写入，写入前先追加撤销日志，可以整批撤销；写入和撤销都保留文件原有的换行符
+- 写入后更新结构索引，只重新评分受影响的章节
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import contextlib
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+try:
+    from .rate_limiter import get_limiter
+    from ..utils.common import atomic_write_text
+    from ..utils.novel_index import NovelIndex, detect_newline
+    from ..utils.quality import log_rewrite_event
+except ImportError:
+    from core.rate_limiter import get_limiter
+    from utils.common import atomic_write_text
+    from utils.novel_index import NovelIndex, detect_newline
+    from utils.quality import log_rewrite_event
+
+logger = logging.getLogger("novel_generator")
+
+REWRITE_PROMPT = """
+请根据以下改进建议重写这段小说内容：
+
+改进建议：{suggestion}
+
+原文内容：
+{text}
+
+要求：
+1. 保持原文的主要情节和人物设定
+2. 根据改进建议进行优化
+3. 保持字数相近（{word_count}字左右）
+4. 提高可读性和连贯性
+"""
+
+
+def journal_path_for(txt_path: str) -> str:
+    """小说正文对应的重写撤销日志路径"""
+    return txt_path.replace('.txt', '_rewrite_journal.jsonl')
+
+
+def text_hash(text: str) -> str:
+    """全文哈希，撤销前用来确认文件没有再被改动"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def build_rewrite_prompt(section) -> str:
+    """小节重写提示词"""
+    return REWRITE_PROMPT.format(
+        suggestion=section.score.rewrite_suggestion,
+        text=section.text,
+        word_count=section.score.word_count,
+    )
+
+
+@dataclass
+class RewritePatch:
+    """一个小节的替换（start/end 为在小说全文中的字符偏移）"""
+
+    chapter_idx: int
+    section_idx: int
+    start: int
+    end: int
+    original: str
+    score: float = 0.0
+    replacement: Optional[str] = None
+
+
+@dataclass
+class RewriteResult:
+    """一次批量重写的结果"""
+
+    applied: List[RewritePatch] = field(default_factory=list)
+    failed: List[RewritePatch] = field(default_factory=list)  # 没有生成出内容
+    skipped: List[Tuple[int, int]] = field(default_factory=list)  # (章节, 小节)：原文已变化
+    doc_quality: Any = None  # 增量重新评分后的 DocumentQuality
+
+
+def chapter_offsets(index: NovelIndex) -> Dict[int, int]:
+    """章节号 -> 章节在全文中的起始偏移
+
+    章节文本是去掉首尾空白的切片，标题本身不以空白开头，所以小节偏移加上章节起点就是全文偏移；
+    没有章节结构时全文作为第 1 章分析，起点为 0。
+    """
+    chapters = index.chapters()
+    if not chapters:
+        return {1: 0}
+    return {chapter.number: chapter.start for chapter in chapters}
+
+
+def locate_sections(text: str, index: NovelIndex, targets) -> Tuple[List[RewritePatch], List[Tuple[int, int]]]:
+    """把 (ChapterQuality, SectionQuality) 转换为全文偏移上的补丁
+
+    Returns:
+        (补丁列表, 跳过的 (章节, 小节) 列表)；偏移处的原文与分析结果不一致时跳过
+    """
+    offsets = chapter_offsets(index)
+    patches, skipped = [], []
+    for chapter, section in targets:
+        base = offsets.get(chapter.idx)
+        original = section.text
+        if base is not None and original:
+            start, end = base + section.start_pos, base + section.end_pos
+            if text[start:end] == original:
+                patches.append(RewritePatch(chapter.idx, section.idx, start, end,
+                                            original, section.score.overall))
+                continue
+        skipped.append((chapter.idx, section.idx))
+    patches.sort(key=lambda p: p.start)
+    for previous, patch in zip(patches, patches[1:]):
+        if patch.start < previous.end:
+            raise ValueError(f"小节范围重叠: 第{previous.chapter_idx}章小节{previous.section_idx} "
+                             f"与第{patch.chapter_idx}章小节{patch.section_idx}")
+    return patches, skipped
+
+
+def apply_patches(text: str, patches: List[RewritePatch]) -> Tuple[str, List[Tuple[int, int]]]:
+    """按偏移一次拼出新全文
+
+    Args:
+        patches: 按 start 排序、互不重叠且都有 replacement 的补丁
+
+    Returns:
+        (新全文, 每个补丁替换内容在新全文中的 (start, end))
+    """
+    pieces, spans = [], []
+    pos = shift = 0
+    for patch in patches:
+        pieces.append(text[pos:patch.start])
+        pieces.append(patch.replacement)
+        new_start = patch.start + shift
+        spans.append((new_start, new_start + len(patch.replacement)))
+        shift += len(patch.replacement) - (patch.end - patch.start)
+        pos = patch.end
+    pieces.append(text[pos:])
+    return "".join(pieces), spans
+
+
+def _append_journal(journal_path: str, entry: Dict[str, Any]):
+    """追加一条撤销记录并落盘"""
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_journal(journal_path: str) -> List[str]:
+    """读取撤销日志的非空行"""
+    if not os.path.exists(journal_path):
+        return []
+    with open(journal_path, "r", encoding="utf-8") as f:
+        return [line for line in f.read().splitlines() if line.strip()]
+
+
+def _drop_last_journal_entry(journal_path: str):
+    """删除最后一条撤销记录"""
+    lines = _read_journal(journal_path)[:-1]
+    if lines:
+        atomic_write_text(journal_path, "\n".join(lines) + "\n")
+    elif os.path.exists(journal_path):
+        os.remove(journal_path)
+
+
+def write_patched(novel_path: str, text: str, patches: List[RewritePatch]) -> Tuple[str, NovelIndex]:
+    """应用补丁集：先写撤销日志，再原子写入新全文并重建结构索引
+
+    Returns:
+        (新全文, 新结构索引)
+    """
+    new_text, spans = apply_patches(text, patches)
+    newline = detect_newline(novel_path)
+    journal_path = journal_path_for(novel_path)
+    _append_journal(journal_path, {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "before_hash": text_hash(text),
+        "after_hash": text_hash(new_text),
+        "patches": [
+            {"chapter": p.chapter_idx, "section": p.section_idx,
+             "start": start, "end": end, "original": p.original}
+            for p, (start, end) in zip(patches, spans)
+        ],
+    })
+    try:
+        atomic_write_text(novel_path, new_text, newline)
+    except BaseException:
+        # 文件没有写成，撤销记录作废
+        _drop_last_journal_entry(journal_path)
+        raise
+
+    index = NovelIndex.build(new_text, newline)
+    try:
+        index.save(novel_path)
+    except OSError as e:
+        logger.warning(f"保存结构索引失败: {e}")
+    return new_text, index
+
+
+def undo_last_rewrite(novel_path: str) -> int:
+    """撤销最近一次批量重写
+
+    Returns:
+        恢复的小节数
+
+    Raises:
+        ValueError: 没有可撤销的记录，或文件在重写之后又被修改过
+    """
+    journal_path = journal_path_for(novel_path)
+    lines = _read_journal(journal_path)
+    if not lines:
+        raise ValueError("没有可撤销的重写记录")
+    entry = json.loads(lines[-1])
+
+    with open(novel_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    newline = detect_newline(novel_path)
+    if text_hash(text) != entry["after_hash"]:
+        raise ValueError("小说在重写之后已被修改，无法撤销")
+
+    restored = [
+        RewritePatch(p["chapter"], p["section"], p["start"], p["end"],
+                     text[p["start"]:p["end"]], replacement=p["original"])
+        for p in entry["patches"]
+    ]
+    old_text, _ = apply_patches(text, restored)
+    if text_hash(old_text) != entry["before_hash"]:
+        raise ValueError("撤销记录与文件内容不一致")
+
+    atomic_write_text(novel_path, old_text, newline)
+    _drop_last_journal_entry(journal_path)
+    try:
+        NovelIndex.build(old_text, newline).save(novel_path)
+    except OSError as e:
+        logger.warning(f"保存结构索引失败: {e}")
+    return len(restored)
+
+
+class BatchRewriter:
+    """并发生成重写内容并一次性应用到小说文件"""
+
+    def __init__(self, generator, scorer=None, concurrency: int = 4,
+                 rate: float = 1.0, burst: int = 4):
+        """
+        Args:
+            generator: NovelGenerator，用它的接口配置生成重写内容
+            scorer: QualityScorer，用于应用后增量重新评分；为 None 时不评分
+            concurrency: 同时进行的重写请求数
+            rate: 每秒发起的请求数（"rewrite" 共享限流器，首次创建时生效）
+            burst: 限流器允许的突发请求数
+        """
+        self.generator = generator
+        self.scorer = scorer
+        self.concurrency = max(1, concurrency)
+        self.limiter = get_limiter("rewrite", rate, burst)
+
+    async def rewrite_text(self, section) -> Optional[str]:
+        """生成一个小节的重写内容，失败时返回 None（调用方需已进入 _running()）"""
+        async with self.limiter:
+            content = await self.generator._generate_text(build_rewrite_prompt(section))
+        return content.strip() if content and content.strip() else None
+
+    @contextlib.asynccontextmanager
+    async def _running(self):
+        """生成接口只在运行状态下发起请求：期间把生成器置为运行状态，结束后恢复
+
+        生成器原本没有运行时，退出时关闭本次事件循环上创建的会话。
+        """
+        generator = self.generator
+        was_running = generator.running
+        generator.running = True
+        try:
+            yield
+        finally:
+            generator.running = was_running
+            if not was_running:
+                await generator.close_session()
+
+    async def rewrite_one(self, section) -> Optional[str]:
+        """单独重写一个小节（界面逐个重写时使用），失败时返回 None"""
+        async with self._running():
+            return await self.rewrite_text(section)
+
+    async def generate(self, patches: List[RewritePatch], sections: Dict[Tuple[int, int], Any],
+                       progress: Optional[Callable[[int, int], None]] = None):
+        """并发生成所有补丁的 replacement
+
+        Args:
+            sections: (章节, 小节) -> SectionQuality，提供提示词所需的评分和建议
+            progress: 每完成一个小节调用 progress(已完成数, 总数)
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done = 0
+
+        async def worker(patch):
+            nonlocal done
+            async with semaphore:
+                patch.replacement = await self.rewrite_text(
+                    sections[(patch.chapter_idx, patch.section_idx)]
+                )
+            done += 1
+            if progress:
+                progress(done, len(patches))
+
+        async with self._running():
+            await asyncio.gather(*(worker(patch) for patch in patches))
+
+    async def run(self, novel_path: str, doc_quality, targets,
+                  progress: Optional[Callable[[int, int], None]] = None) -> RewriteResult:
+        """重写 targets 中的小节并应用到文件
+
+        Args:
+            doc_quality: 分析结果（章节文本需仍然挂在结果上）
+            targets: [(ChapterQuality, SectionQuality)]
+        """
+        with open(novel_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        index = NovelIndex.for_novel(novel_path, text)
+        patches, skipped = locate_sections(text, index, targets)
+        result = RewriteResult(skipped=skipped)
+        if skipped:
+            logger.warning(f"{len(skipped)} 个小节的原文已变化，跳过重写")
+
+        doc_id = os.path.basename(novel_path)
+        for patch in patches:
+            log_rewrite_event(doc_id, patch.chapter_idx, patch.section_idx, patch.score, "rewrite_requested")
+
+        sections = {(chapter.idx, section.idx): section for chapter, section in targets}
+        await self.generate(patches, sections, progress)
+        result.applied = [p for p in patches if p.replacement]
+        result.failed = [p for p in patches if not p.replacement]
+        if not result.applied:
+            return result
+
+        result.doc_quality = self.apply(novel_path, text, doc_quality, result.applied)
+        return result
+
+    def apply(self, novel_path: str, text: str, doc_quality, patches: List[RewritePatch]):
+        """把已生成 replacement 的补丁写入文件，返回增量重新评分后的结果（没有 scorer 时为 None）
+
+        Args:
+            text: 生成补丁时读取的全文；文件已不是这份内容时拒绝写入
+        """
+        with open(novel_path, "r", encoding="utf-8") as f:
+            current = f.read()
+        if current != text:
+            raise ValueError("重写期间小说文件已被修改，未应用任何重写")
+
+        new_text, index = write_patched(novel_path, text, patches)
+        doc_id = os.path.basename(novel_path)
+        for patch in patches:
+            log_rewrite_event(doc_id, patch.chapter_idx, patch.section_idx, patch.score, "rewrite_applied")
+
+        if self.scorer is None:
+            return None
+        chapters = index.split_chapters(new_text) or [(1, new_text)]
+        return self.scorer.rescore_document(doc_quality, chapters)
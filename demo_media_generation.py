@@ -205,14 +205,14 @@ def demo_media_generation():
                 print(f"\n💾 保存媒体信息...")
                 
                 # 使用模拟数据保存媒体信息
-                generator.media_generator.save_media_info(
+                media_info_path = generator.media_generator.save_media_info(
                     output_dir, 
                     novel_setup, 
                     mock_image_results if demo_config["generate_cover"] else [],
                     mock_music_result if demo_config["generate_music"] else None
                 )
                 
-                print(f"✅ 媒体信息已保存到: media_info.json")
+                print(f"✅ 媒体信息已保存到: {media_info_path}")
         
         print("\n" + "=" * 50)
         print("🎉 演示完成！")
@@ -227,7 +227,7 @@ def demo_media_generation():
         print(f"\n🔗 查看结果: {os.path.abspath(output_dir)}")
         
         # 显示媒体信息内容
-        media_info_path = os.path.join(output_dir, "media_info.json")
+        media_info_path = generator.media_generator.media_info_path(output_dir, novel_setup)
         if os.path.exists(media_info_path):
             print(f"\n📋 媒体信息内容:")
             with open(media_info_path, 'r', encoding='utf-8') as f:
@@ -141,5 +141,8 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # 打包后的程序在 Windows 上以 spawn 方式启动质量分析子进程，需要先处理子进程入口
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
 
@@ -134,13 +134,13 @@ class NovelGenerator:
         self.current_content = f"# {title}\n\n## 大纲\n\n{outline}\n\n## 正文\n\n"
         self.current_length = len(self.current_content)
         
-        # 更新进度（使用临时变量避免线程问题）
+        # 进度只携带新增的文本（appended），界面自行追加，不再每次传递全文
         progress_data = {
             'progress': 5,
             'current_length': self.current_length,
             'target_length': self.target_length,
             'status': 'paused' if self.is_paused else 'generating',
-            'content': self.current_content
+            'appended': self.current_content
         }
         if progress_callback:
             progress_callback(progress_data)
@@ -155,20 +155,21 @@ class NovelGenerator:
             chapter_title, chapter_content = await self._generate_chapter(i, outline)
             
             # 添加到当前内容
-            self.current_content += f"\n### 第{i}章 {chapter_title}\n\n{chapter_content}\n\n"
+            chapter_text = f"\n### 第{i}章 {chapter_title}\n\n{chapter_content}\n\n"
+            self.current_content += chapter_text
             self.current_length = len(self.current_content)
             
             # 保存当前进度
             self._save_progress()
             
-            # 更新进度（使用临时变量避免线程问题）
+            # 更新进度
             progress = int(5 + (i / chapter_count) * 90)
             progress_data = {
                 'progress': progress,
                 'current_length': self.current_length,
                 'target_length': self.target_length,
                 'status': 'paused' if self.is_paused else 'generating',
-                'content': self.current_content
+                'appended': chapter_text
             }
             if progress_callback:
                 progress_callback(progress_data)
@@ -180,16 +181,17 @@ class NovelGenerator:
         # 生成结局
         if self.create_ending and self.is_running:
             ending = await self._generate_ending(title, outline, self.current_content)
-            self.current_content += f"\n## 结局\n\n{ending}\n"
+            ending_text = f"\n## 结局\n\n{ending}\n"
+            self.current_content += ending_text
             self.current_length = len(self.current_content)
             
-            # 更新进度（使用临时变量避免线程问题）
+            # 更新进度
             progress_data = {
                 'progress': 100,
                 'current_length': self.current_length,
                 'target_length': self.target_length,
                 'status': 'paused' if self.is_paused else 'generating',
-                'content': self.current_content
+                'appended': ending_text
             }
             if progress_callback:
                 progress_callback(progress_data)
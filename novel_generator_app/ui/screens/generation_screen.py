@@ -36,14 +36,16 @@ except ImportError:
                         # 模拟生成内容
                         time.sleep(0.5)  # 减慢模拟速度
                         self.current_progress += 1
-                        self.current_content += f"这是生成的小说内容，当前进度 {self.current_progress}%\n"
+                        appended = f"这是生成的小说内容，当前进度 {self.current_progress}%\n"
+                        self.current_content += appended
                         
                         if progress_callback:
                             progress_callback({
                                 'progress': self.current_progress,
                                 'current_length': len(self.current_content),
                                 'target_length': self.target_length,
-                                'status': 'generating'
+                                'status': 'generating',
+                                'appended': appended
                             })
                     
                     time.sleep(0.1)
@@ -95,8 +97,13 @@ class GenerationScreen(Screen):
         self.generator = None
         self.start_time = None
         self.timer = None
-        self._temp_content = ""  # 临时存储内容，避免线程问题
+        # 生成线程提交的最新进度和待追加的文本，由界面线程在下一帧合并处理
+        self._progress_lock = threading.Lock()
+        self._latest_progress = None
+        self._pending_text = []
         super(GenerationScreen, self).__init__(**kwargs)
+        # 同一帧内多次触发只执行一次
+        self._progress_trigger = Clock.create_trigger(self._do_update_progress)
         
     def on_enter(self):
         """屏幕进入时调用"""
@@ -108,7 +115,9 @@ class GenerationScreen(Screen):
         self.is_paused = False
         self.progress = 0
         self.current_length = 0
-        self._temp_content = ""
+        with self._progress_lock:
+            self._latest_progress = None
+            self._pending_text = []
         self.target_length = params.get('target_length', 20000)
         self.status = "正在初始化..."
         
@@ -149,37 +158,35 @@ class GenerationScreen(Screen):
     
     def safe_update_progress(self, progress_data):
         """
-        安全地更新进度（在主线程中）
+        提交进度（生成线程调用），实际的界面更新合并到下一帧在主线程中执行
         
         Args:
-            progress_data (dict): 进度数据
+            progress_data (dict): 进度数据，appended 为本次新增的文本
         """
-        # 保存内容到临时变量
-        if 'content' in progress_data:
-            self._temp_content = progress_data['content']
-            
-        # 使用Clock在主线程中调度UI更新
-        Clock.schedule_once(lambda dt: self._do_update_progress(progress_data), 0)
+        with self._progress_lock:
+            self._latest_progress = progress_data
+            if progress_data.get('appended'):
+                self._pending_text.append(progress_data['appended'])
+        self._progress_trigger()
     
-    def _do_update_progress(self, progress_data):
+    def _do_update_progress(self, dt=None):
         """
-        在主线程中执行实际的UI更新
-        
-        Args:
-            progress_data (dict): 进度数据
+        在主线程中执行实际的UI更新：只显示最新的进度，并一次追加期间新增的全部文本
         """
+        with self._progress_lock:
+            progress_data = self._latest_progress
+            pending_text = "".join(self._pending_text)
+            self._pending_text = []
+        if progress_data is None:
+            return
+        
         self.progress = progress_data.get('progress', 0)
         self.current_length = progress_data.get('current_length', 0)
         self.status = progress_data.get('status', '生成中')
         
-        # 更新小说内容显示
-        if hasattr(self, 'ids') and self.ids and hasattr(self.ids, 'novel_content'):
-            if 'content' in progress_data:
-                self.ids.novel_content.text = progress_data['content']
-            elif self._temp_content:
-                self.ids.novel_content.text = self._temp_content
-            elif self.generator:
-                self.ids.novel_content.text = self.generator.get_current_content()
+        # 追加新内容，不再整体替换文本
+        if pending_text and hasattr(self, 'ids') and self.ids and hasattr(self.ids, 'novel_content'):
+            self.ids.novel_content.text += pending_text
     
     def update_timer(self, dt):
         """更新计时器"""
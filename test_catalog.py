@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试输出目录索引
+验证保存更新、目录查询、摘要更新和并行重建
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.catalog import NovelCatalog, open_catalog, find_catalog_path, CATALOG_FILENAME
+
+
+def _write_novel(directory, name, text, setup=None):
+    """写入测试小说及其元数据"""
+    os.makedirs(directory, exist_ok=True)
+    txt_path = os.path.join(directory, name)
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    if setup is not None:
+        with open(txt_path.replace('.txt', '_meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(setup, f, ensure_ascii=False)
+    return txt_path
+
+
+def test_record_and_query():
+    """测试保存后更新索引与查询"""
+    print("=== 测试索引更新与查询 ===")
+    with tempfile.TemporaryDirectory() as root:
+        catalog = NovelCatalog(os.path.join(root, CATALOG_FILENAME))
+        run_dir = os.path.join(root, "novel_output_1")
+        text = "开头" * 3000 + "结尾"
+        setup = {"id": "abc", "genre": "玄幻", "language": "中文", "target_length": 5000}
+        path = _write_novel(run_dir, "玄幻_abc.txt", text, setup)
+
+        catalog.record_novel(path, text, setup)
+        novels = catalog.list_novels(run_dir)
+        assert len(novels) == 1
+        assert novels[0]["word_count"] == len(text)
+        assert novels[0]["status"] == "completed"
+        assert novels[0]["head"] == text[:1000]
+        assert novels[0]["tail"] == text[-1000:]
+
+        assert catalog.record_summary("abc", "这是摘要") == 1
+        catalog.record_novel(path, text, setup, "paused")
+        novel = catalog.list_novels(run_dir)[0]
+        assert novel["latest_summary"] == "这是摘要"
+        assert novel["status"] == "paused"
+
+        assert catalog.list_novels(os.path.join(root, "novel_output_2")) == []
+        assert catalog.latest_novel(root)["path"] == os.path.abspath(path)
+        catalog.close()
+    print("✅ 索引更新与查询正常")
+
+
+def test_rebuild():
+    """测试从磁盘重建索引"""
+    print("=== 测试索引重建 ===")
+    with tempfile.TemporaryDirectory() as root:
+        for i in range(20):
+            _write_novel(os.path.join(root, f"run_{i % 3}"), f"novel_{i}.txt", "内容" * (i + 1),
+                         {"id": str(i), "genre": "都市", "target_length": 100})
+        _write_novel(root, "summary.txt", "汇总")
+        _write_novel(os.path.join(root, "run_0"), "summary_都市_0_2000.txt", "单次摘要")
+        _write_novel(os.path.join(root, "run_0"), "summaries_都市.txt", "累计摘要")
+        _write_novel(root, "orphan.txt", "没有元数据")
+
+        catalog = open_catalog(root, max_workers=4)
+        assert find_catalog_path(os.path.join(root, "run_1"), root) == os.path.join(root, CATALOG_FILENAME)
+        novels = catalog.list_novels(root)
+        assert len(novels) == 21
+        assert len([n for n in novels if n["meta_path"]]) == 20
+        assert catalog.rebuild(os.path.join(root, "run_0")) == 7
+        assert catalog.count(root) == 21
+        catalog.close()
+    print("✅ 索引重建正常")
+
+
+def test_reconcile():
+    """测试索引与磁盘同步：新增、修改、删除的文件"""
+    print("=== 测试索引与磁盘同步 ===")
+    with tempfile.TemporaryDirectory() as root:
+        a_path = _write_novel(root, "a.txt", "甲" * 10, {"id": "a", "target_length": 100})
+        catalog = open_catalog(root)
+        assert [os.path.basename(n["path"]) for n in catalog.list_novels(root)] == ["a.txt"]
+
+        b_path = _write_novel(root, "b.txt", "乙" * 20, {"id": "b", "target_length": 100})
+        c_path = _write_novel(root, "c.txt", "丙" * 5)
+        os.remove(a_path)
+        with open(c_path, 'a', encoding='utf-8') as f:
+            f.write("丙" * 5)
+
+        assert catalog.reconcile(root) == {"added": 2, "updated": 0, "removed": 1}
+        novels = {os.path.basename(n["path"]): n for n in catalog.list_novels(root)}
+        assert sorted(novels) == ["b.txt", "c.txt"]
+        assert novels["b.txt"]["word_count"] == 20 and novels["b.txt"]["meta_path"]
+        assert novels["c.txt"]["word_count"] == 10 and not novels["c.txt"]["meta_path"]
+
+        # 外部修改和后补的元数据文件
+        with open(b_path, 'a', encoding='utf-8') as f:
+            f.write("乙" * 100)
+        _write_novel(root, "c.txt", "丙" * 10, {"id": "c", "target_length": 100})
+        assert catalog.reconcile(root) == {"added": 0, "updated": 2, "removed": 0}
+        novels = {os.path.basename(n["path"]): n for n in catalog.list_novels(root)}
+        assert novels["b.txt"]["word_count"] == 120
+        assert novels["c.txt"]["meta_path"]
+
+        # 没有变化时不重新读取
+        assert catalog.reconcile(root) == {"added": 0, "updated": 0, "removed": 0}
+        catalog.close()
+    print("✅ 索引与磁盘同步正常")
+
+
+def test_summary_files_excluded():
+    """测试同一运行目录中的摘要文件不被当作小说，也不会成为最近的小说"""
+    print("=== 测试排除摘要文件 ===")
+    with tempfile.TemporaryDirectory() as root:
+        run_dir = os.path.join(root, "novel_output_1")
+        novel_path = _write_novel(run_dir, "奇幻_1.txt", "正文" * 50, {"id": "1", "target_length": 1000})
+        catalog = open_catalog(root)
+
+        # 每次摘要后追加的累计摘要文件比小说更新
+        summaries = _write_novel(run_dir, "summaries_奇幻.txt", "第一次摘要")
+        _write_novel(run_dir, "summary_奇幻_1_2000.txt", "单次摘要")
+        _write_novel(os.path.join(run_dir, "summary"), "summary.txt", "汇总")
+        stat = os.stat(novel_path)
+        os.utime(summaries, (stat.st_atime + 60, stat.st_mtime + 60))
+
+        assert catalog.reconcile(root) == {"added": 0, "updated": 0, "removed": 0}
+        assert [n["path"] for n in catalog.list_novels(root)] == [os.path.abspath(novel_path)]
+        assert catalog.latest_novel(run_dir)["path"] == os.path.abspath(novel_path)
+        assert catalog.rebuild(root) == 1
+        catalog.close()
+    print("✅ 摘要文件已排除")
+
+
+def test_search_stops_at_root():
+    """测试向上查找索引不会越过输出根目录"""
+    print("=== 测试索引查找范围 ===")
+    with tempfile.TemporaryDirectory() as parent:
+        NovelCatalog(os.path.join(parent, CATALOG_FILENAME)).close()
+        output_root = os.path.join(parent, "output")
+        run_dir = os.path.join(output_root, "novel_output_1")
+        _write_novel(run_dir, "新小说.txt", "内容", {"id": "n"})
+
+        assert find_catalog_path(run_dir, output_root) is None
+        assert find_catalog_path(run_dir) is None
+        catalog = open_catalog(output_root, root=output_root)
+        assert catalog.db_path == os.path.join(os.path.abspath(output_root), CATALOG_FILENAME)
+        assert catalog.count(run_dir) == 1
+        assert find_catalog_path(run_dir, output_root) == catalog.db_path
+        catalog.close()
+    print("✅ 索引查找范围正常")
+
+
+if __name__ == "__main__":
+    print("开始测试输出目录索引...")
+
+    try:
+        test_record_and_query()
+        test_rebuild()
+        test_reconcile()
+        test_summary_files_excluded()
+        test_search_stops_at_root()
+        print("\n✅ 所有索引测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
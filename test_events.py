@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试生成器事件总线
+验证按级别和类型过滤、按类型采样、set_level 使缓存的路由失效，
+以及订阅者抛出的异常不影响其他订阅者和发布方
+"""
+
+import sys
+import os
+import logging
+from dataclasses import dataclass
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.events import (
+    EventBus, Event, StatusMessage, RequestStarted, RequestRetried, RequestFailed,
+    ContentTooShort, ChunkCompleted, MetricsSink,
+)
+from utils.metrics import MetricsRegistry
+
+
+class _Collector:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event):
+        self.events.append(event)
+
+    @property
+    def types(self):
+        return [type(e).__name__ for e in self.events]
+
+
+@dataclass
+class _CountedEvent(Event):
+    """记录创建次数，用于验证没有订阅者时不创建事件"""
+
+    level = logging.DEBUG
+    created = 0
+    value: int
+
+    def __post_init__(self):
+        type(self).created += 1
+
+
+@dataclass
+class _RetriedSubclass(RequestRetried):
+    pass
+
+
+def _chunk(word_count):
+    return dict(novel_id="1", genre="奇幻", added=100, word_count=word_count, target_length=1000)
+
+
+def test_level_filtering():
+    """测试低于订阅级别的事件不交付，没有订阅者时不创建事件"""
+    print("=== 测试按级别过滤 ===")
+    bus = EventBus()
+    assert not bus.active
+    _CountedEvent.created = 0
+    bus.emit(_CountedEvent, 1)
+    assert _CountedEvent.created == 0
+
+    collector = _Collector()
+    bus.subscribe(collector, level=logging.WARNING)
+    bus.emit(RequestStarted, 0, 3)
+    bus.emit(_CountedEvent, 2)
+    bus.emit(ContentTooShort, 12)
+    bus.emit(RequestFailed, 500, "server error")
+    # StatusMessage 的级别取实例上的值
+    bus.publish(StatusMessage("普通消息"))
+    bus.publish(StatusMessage("生成失败", logging.ERROR))
+
+    assert _CountedEvent.created == 0
+    assert collector.types == ["ContentTooShort", "RequestFailed", "StatusMessage"]
+    assert collector.events[-1].format() == "生成失败"
+    assert not bus.wants(RequestStarted) and bus.wants(RequestFailed)
+    assert bus.wants(StatusMessage, logging.ERROR) and not bus.wants(StatusMessage, logging.INFO)
+    print("✅ 按级别过滤正常")
+
+
+def test_type_filtering():
+    """测试只接收指定类型（含子类）的事件"""
+    print("=== 测试按类型过滤 ===")
+    bus = EventBus()
+    retries = _Collector()
+    everything = _Collector()
+    bus.subscribe(retries, level=logging.DEBUG, types=[RequestRetried])
+    bus.subscribe(everything, level=logging.DEBUG)
+
+    bus.emit(RequestStarted, 0, 3)
+    bus.emit(RequestRetried, 0, 3, 2.0, "timeout")
+    bus.emit(_RetriedSubclass, 1, 3, 4.0, "http_500")
+    bus.emit(ChunkCompleted, **_chunk(100))
+
+    assert retries.types == ["RequestRetried", "_RetriedSubclass"]
+    assert [e.cause for e in retries.events] == ["timeout", "http_500"]
+    assert everything.types == ["RequestStarted", "RequestRetried", "_RetriedSubclass", "ChunkCompleted"]
+    # 同一个事件对象交付给所有订阅者
+    assert retries.events[0] is everything.events[1]
+    print("✅ 按类型过滤正常")
+
+
+def test_per_type_sampling():
+    """测试按类型采样：每 N 个交付 1 个，其他类型不受影响"""
+    print("=== 测试按类型采样 ===")
+    bus = EventBus()
+    sampled = _Collector()
+    full = _Collector()
+    bus.subscribe(sampled, sample={ChunkCompleted: 3})
+    bus.subscribe(full)
+
+    for i in range(7):
+        bus.emit(ChunkCompleted, **_chunk((i + 1) * 100))
+        bus.publish(StatusMessage(f"消息 {i}"))
+
+    chunks = [e.word_count for e in sampled.events if isinstance(e, ChunkCompleted)]
+    assert chunks == [100, 400, 700]
+    assert sum(isinstance(e, StatusMessage) for e in sampled.events) == 7
+    assert len(full.events) == 14
+    print("✅ 按类型采样正常")
+
+
+def test_set_level_invalidates_routes():
+    """测试修改级别和取消订阅后不再使用缓存的路由"""
+    print("=== 测试修改级别使路由失效 ===")
+    bus = EventBus()
+    collector = _Collector()
+    subscription = bus.subscribe(collector, level=logging.WARNING)
+
+    bus.emit(RequestStarted, 0, 3)
+    assert not bus.wants(RequestStarted)
+    assert collector.events == []
+
+    subscription.set_level(logging.DEBUG)
+    assert bus.wants(RequestStarted)
+    bus.emit(RequestStarted, 1, 3)
+    assert collector.types == ["RequestStarted"]
+
+    subscription.set_level(logging.ERROR)
+    bus.emit(RequestStarted, 2, 3)
+    bus.emit(ContentTooShort, 5)
+    bus.emit(RequestFailed, 502, "bad gateway")
+    assert collector.types == ["RequestStarted", "RequestFailed"]
+
+    subscription.close()
+    assert not bus.active and not bus.wants(RequestFailed)
+    bus.emit(RequestFailed, 503, "unavailable")
+    assert len(collector.events) == 2
+    print("✅ 修改级别使路由失效")
+
+
+def test_subscriber_exception_contained():
+    """测试订阅者抛出的异常只记录警告，后面的订阅者照常收到事件"""
+    print("=== 测试订阅者异常 ===")
+
+    class _Warnings(logging.Handler):
+        def __init__(self):
+            super().__init__(logging.WARNING)
+            self.messages = []
+
+        def emit(self, record):
+            self.messages.append(record.getMessage())
+
+    def broken(event):
+        raise RuntimeError("显示失败")
+
+    bus = EventBus()
+    collector = _Collector()
+    bus.subscribe(broken)
+    bus.subscribe(collector)
+    warnings = _Warnings()
+    logger = logging.getLogger("novel_generator")
+    logger.addHandler(warnings)
+    try:
+        bus.emit(ChunkCompleted, **_chunk(500))
+        bus.publish(StatusMessage("继续生成"))
+    finally:
+        logger.removeHandler(warnings)
+
+    assert collector.types == ["ChunkCompleted", "StatusMessage"]
+    assert len(warnings.messages) == 2
+    assert "ChunkCompleted" in warnings.messages[0] and "显示失败" in warnings.messages[0]
+    print("✅ 订阅者异常不影响生成")
+
+
+def test_metrics_sink():
+    """测试运行指标订阅者按原因和状态码计数"""
+    print("=== 测试事件计入运行指标 ===")
+    registry = MetricsRegistry()
+    bus = EventBus()
+    bus.subscribe(MetricsSink(registry), level=logging.DEBUG, types=MetricsSink.EVENT_TYPES)
+
+    bus.emit(RequestRetried, 0, 3, 2.0, "timeout")
+    bus.emit(RequestRetried, 1, 3, 4.0, "timeout")
+    bus.emit(RequestFailed, 500, "server error")
+    bus.emit(ContentTooShort, 12)
+    bus.emit(ChunkCompleted, **_chunk(100))
+    bus.emit(ChunkCompleted, **_chunk(200))
+
+    assert registry.get("llm_retries_total").value(cause="timeout") == 2
+    assert registry.get("llm_errors_total").value(status=500) == 1
+    assert registry.get("llm_responses_discarded_total").value(reason="too_short") == 1
+    assert registry.get("generated_chars_total").value(novel="1") == 200
+    assert registry.get("generated_chunks_total").value() == 2
+    print("✅ 事件计入运行指标正常")
+
+
+if __name__ == "__main__":
+    print("开始测试事件总线...")
+
+    try:
+        test_level_filtering()
+        test_type_filtering()
+        test_per_type_sampling()
+        test_set_level_invalidates_routes()
+        test_subscriber_exception_contained()
+        test_metrics_sink()
+        print("\n✅ 所有事件总线测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试事件循环阻塞检测
+在已知的项目函数中用 time.sleep 阻塞事件循环，验证 summary() 指向该位置、
+event_loop_blocked_seconds{site} 记录了阻塞，以及正常调度时不记录阻塞
+"""
+
+import sys
+import os
+import time
+import asyncio
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.loop_monitor import LoopMonitor, LOOP_BLOCKED_SECONDS, LOOP_LAG_SECONDS
+
+BLOCK_SITE = "test_loop_monitor.py:_blocking_save"
+
+
+def _blocking_save(seconds):
+    """模拟在事件循环中同步写文件"""
+    time.sleep(seconds)
+
+
+def _blocked(site):
+    """event_loop_blocked_seconds 中该位置的 (次数, 总时长)"""
+    for sample in LOOP_BLOCKED_SECONDS.samples():
+        if sample["labels"] == {"site": site}:
+            return sample["count"], sample["sum"]
+    return 0, 0.0
+
+
+def _lag_count():
+    return sum(sample["count"] for sample in LOOP_LAG_SECONDS.samples())
+
+
+class _Warnings(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_block_attributed_to_site():
+    """测试阻塞按项目内函数归因，计入指标和汇总，第一次出现时日志附带调用栈"""
+    print("=== 测试阻塞位置 ===")
+    count_before, seconds_before = _blocked(BLOCK_SITE)
+    warnings = _Warnings()
+    logger = logging.getLogger("novel_generator")
+    logger.addHandler(warnings)
+
+    async def run():
+        monitor = LoopMonitor(threshold=0.1, interval=0.02).start()
+        try:
+            await asyncio.sleep(0.1)
+            _blocking_save(0.4)
+            await asyncio.sleep(0.1)
+            _blocking_save(0.3)
+            await asyncio.sleep(0.1)
+        finally:
+            monitor.stop()
+        return monitor
+
+    try:
+        monitor = asyncio.run(run())
+    finally:
+        logger.removeHandler(warnings)
+
+    summary = monitor.summary()
+    assert summary[0]["site"] == BLOCK_SITE, summary
+    top = summary[0]
+    assert top["blocks"] == 2
+    assert 0.6 <= top["seconds"] < 1.0
+    assert 0.35 <= top["max_seconds"] < 0.6
+    assert not monitor.running
+
+    count, seconds = _blocked(BLOCK_SITE)
+    assert count - count_before == 2
+    assert abs((seconds - seconds_before) - top["seconds"]) < 1e-9
+
+    block_logs = [m for m in warnings.messages if m.startswith("事件循环阻塞 ") and BLOCK_SITE in m]
+    assert len(block_logs) == 2
+    # 第一次附带调用栈，指向阻塞的那一行
+    assert "time.sleep(seconds)" in block_logs[0]
+    assert "\n" not in block_logs[1]
+    assert any(m.startswith("事件循环阻塞汇总") and BLOCK_SITE in m for m in warnings.messages)
+    print("✅ 阻塞位置正常")
+
+
+def test_no_block_when_idle():
+    """测试只有异步等待时只记录调度延迟，不记录阻塞"""
+    print("=== 测试正常调度 ===")
+    lags_before = _lag_count()
+
+    async def run():
+        monitor = LoopMonitor(threshold=0.2, interval=0.01).start()
+        # 重复 start 不创建第二个心跳
+        assert monitor.start() is monitor
+        try:
+            for _ in range(10):
+                await asyncio.sleep(0.02)
+        finally:
+            monitor.stop()
+            monitor.stop()
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert monitor.summary() == []
+    assert _lag_count() - lags_before >= 5
+    print("✅ 正常调度时不记录阻塞")
+
+
+if __name__ == "__main__":
+    print("开始测试事件循环阻塞检测...")
+
+    try:
+        test_block_attributed_to_site()
+        test_no_block_when_idle()
+        print("\n✅ 所有阻塞检测测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
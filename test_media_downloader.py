@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试媒体下载管理器
+用本机的 aiohttp 测试服务器验证 Range 续传、416 处理、SHA-256 校验、
+临时文件长度异常时重新下载，以及单主机和全局并发限制
+"""
+
+import sys
+import os
+import asyncio
+import hashlib
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from aiohttp import web
+
+from core.media_downloader import MediaDownloader, DownloadError
+from core.http_pool import close_shared_session
+
+DATA = bytes(range(256)) * 1024  # 256KB
+DATA_SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class _Concurrency:
+    """同时进行的请求数及其最大值"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+
+    def enter(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+
+    def exit(self):
+        self.active -= 1
+
+
+class _FileServer:
+    """提供 /file 下载的本机服务器，记录请求的 Range 和并发数
+
+    ignore_range: 忽略 Range 头，总是返回完整文件
+    truncate_once: 第一次请求只发送一半数据就断开连接
+    delay: 每次响应前等待的秒数，用于观察并发
+    total: 多个服务器共享的并发计数，用于观察全局并发
+    """
+
+    def __init__(self, ignore_range=False, truncate_once=False, delay=0.0, total=None):
+        self.ignore_range = ignore_range
+        self.truncate_once = truncate_once
+        self.delay = delay
+        self.ranges = []
+        self.statuses = []
+        self.concurrency = _Concurrency()
+        self.total = total or _Concurrency()
+        self.runner = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/file"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/file", self._handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def _handle(self, request):
+        self.ranges.append(request.headers.get("Range"))
+        self.concurrency.enter()
+        self.total.enter()
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            return await self._respond(request)
+        finally:
+            self.concurrency.exit()
+            self.total.exit()
+
+    async def _respond(self, request):
+        start = 0
+        range_header = request.headers.get("Range")
+        if range_header and not self.ignore_range:
+            start = int(range_header[len("bytes="):].rstrip("-"))
+            if start >= len(DATA):
+                self.statuses.append(416)
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{len(DATA)}"})
+        body = DATA[start:]
+        status = 206 if start else 200
+        self.statuses.append(status)
+        response = web.StreamResponse(status=status)
+        response.content_length = len(body)
+        if start:
+            response.headers["Content-Range"] = f"bytes {start}-{len(DATA) - 1}/{len(DATA)}"
+        await response.prepare(request)
+        if self.truncate_once:
+            self.truncate_once = False
+            await response.write(body[:len(body) // 2])
+            # 等客户端读完已发送的部分再断开
+            await asyncio.sleep(0.2)
+            request.transport.close()
+            return response
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+
+def _run(coro_factory, **server_kwargs):
+    """启动测试服务器，执行 coro_factory(server, root)，结束后关闭服务器和共享会话"""
+    async def main():
+        server = await _FileServer(**server_kwargs).start()
+        try:
+            with tempfile.TemporaryDirectory() as root:
+                return await coro_factory(server, root)
+        finally:
+            await close_shared_session()
+            await server.stop()
+    return asyncio.run(main())
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_download_and_checksum():
+    """测试完整下载的内容和校验值，期望校验值不符时报错并删除文件"""
+    print("=== 测试下载和校验值 ===")
+
+    async def scenario(server, root):
+        downloader = MediaDownloader()
+        dest = os.path.join(root, "media", "a.bin")
+        result = await downloader.download(server.url, dest, expected_sha256=DATA_SHA256.upper(),
+                                           expected_size=len(DATA))
+        assert result == {"path": dest, "size": len(DATA), "sha256": DATA_SHA256}
+        assert _read(dest) == DATA
+        assert not os.path.exists(dest + ".part")
+
+        bad = os.path.join(root, "media", "b.bin")
+        try:
+            await downloader.download(server.url, bad, expected_sha256="0" * 64)
+            assert False, "校验值不符时应抛出 DownloadError"
+        except DownloadError as e:
+            assert "校验值" in str(e)
+        assert not os.path.exists(bad) and not os.path.exists(bad + ".part")
+        # 校验失败不重试
+        assert server.ranges == [None, None]
+
+    _run(scenario)
+    print("✅ 下载和校验值正常")
+
+
+def test_range_resume():
+    """测试存在临时文件时从断点续传，校验值覆盖完整文件"""
+    print("=== 测试断点续传 ===")
+
+    async def scenario(server, root):
+        dest = os.path.join(root, "a.bin")
+        offset = 100000
+        with open(dest + ".part", "wb") as f:
+            f.write(DATA[:offset])
+        result = await MediaDownloader().download(server.url, dest, expected_sha256=DATA_SHA256)
+        assert server.ranges == [f"bytes={offset}-"]
+        assert server.statuses == [206]
+        assert result["size"] == len(DATA) and result["sha256"] == DATA_SHA256
+        assert _read(dest) == DATA
+
+    _run(scenario)
+    print("✅ 断点续传正常")
+
+
+def test_server_ignores_range():
+    """测试服务器不支持续传（返回 200）时从头下载，不与旧的临时文件拼接"""
+    print("=== 测试服务器不支持续传 ===")
+
+    async def scenario(server, root):
+        dest = os.path.join(root, "a.bin")
+        with open(dest + ".part", "wb") as f:
+            f.write(b"x" * 5000)
+        result = await MediaDownloader().download(server.url, dest, expected_sha256=DATA_SHA256)
+        assert server.ranges == ["bytes=5000-"] and server.statuses == [200]
+        assert result["size"] == len(DATA)
+        assert _read(dest) == DATA
+
+    _run(scenario, ignore_range=True)
+    print("✅ 服务器不支持续传时重新下载")
+
+
+def test_range_not_satisfiable():
+    """测试临时文件已完整时服务器返回 416，直接校验并完成"""
+    print("=== 测试 416 ===")
+
+    async def scenario(server, root):
+        dest = os.path.join(root, "a.bin")
+        with open(dest + ".part", "wb") as f:
+            f.write(DATA)
+        result = await MediaDownloader().download(server.url, dest, expected_sha256=DATA_SHA256,
+                                                  expected_size=len(DATA))
+        assert server.statuses == [416]
+        assert result == {"path": dest, "size": len(DATA), "sha256": DATA_SHA256}
+        assert _read(dest) == DATA and not os.path.exists(dest + ".part")
+
+    _run(scenario)
+    print("✅ 416 时使用已完整的临时文件")
+
+
+def test_oversized_part_restarts():
+    """测试临时文件比期望长度长时删除并重新下载"""
+    print("=== 测试临时文件长度异常 ===")
+
+    async def scenario(server, root):
+        dest = os.path.join(root, "a.bin")
+        with open(dest + ".part", "wb") as f:
+            f.write(DATA + b"stale")
+        result = await MediaDownloader().download(server.url, dest, expected_sha256=DATA_SHA256,
+                                                  expected_size=len(DATA))
+        # 第一次续传请求越界，长度不符后删除临时文件，第二次从头下载
+        assert server.ranges == [f"bytes={len(DATA) + 5}-", None]
+        assert server.statuses == [416, 200]
+        assert result["size"] == len(DATA) and _read(dest) == DATA
+
+    _run(scenario)
+    print("✅ 长度异常的临时文件被重新下载")
+
+
+def test_truncated_response_resumes():
+    """测试响应中途断开后保留已收到的部分，重试时从断点续传"""
+    print("=== 测试中断后续传 ===")
+
+    async def scenario(server, root):
+        dest = os.path.join(root, "a.bin")
+        result = await MediaDownloader().download(server.url, dest, expected_sha256=DATA_SHA256)
+        assert len(server.ranges) == 2 and server.ranges[0] is None
+        resumed_from = int(server.ranges[1][len("bytes="):].rstrip("-"))
+        assert resumed_from == len(DATA) // 2
+        assert server.statuses == [200, 206]
+        assert result["sha256"] == DATA_SHA256 and _read(dest) == DATA
+
+    _run(scenario, truncate_once=True)
+    print("✅ 中断后从断点续传")
+
+
+def test_concurrency_limits():
+    """测试单主机并发和全局并发限制"""
+    print("=== 测试并发限制 ===")
+
+    async def scenario(server, root):
+        # 端口不同即为不同主机
+        other = await _FileServer(delay=0.2, total=server.total).start()
+        try:
+            # 单主机限制生效：全局限制足够大时每个主机最多 2 个
+            downloader = MediaDownloader(max_concurrency=10, per_host_concurrency=2)
+            jobs = []
+            for i in range(4):
+                jobs.append(downloader.download(server.url, os.path.join(root, f"a{i}.bin")))
+                jobs.append(downloader.download(other.url, os.path.join(root, f"b{i}.bin")))
+            results = await asyncio.gather(*jobs)
+            assert all(r["sha256"] == DATA_SHA256 for r in results)
+            assert server.concurrency.max_active == 2 and other.concurrency.max_active == 2
+            assert server.total.max_active == 4
+
+            # 全局限制生效：两个主机合计最多 3 个
+            server.total.max_active = 0
+            downloader = MediaDownloader(max_concurrency=3, per_host_concurrency=2)
+            jobs = []
+            for i in range(4):
+                jobs.append(downloader.download(server.url, os.path.join(root, f"c{i}.bin")))
+                jobs.append(downloader.download(other.url, os.path.join(root, f"d{i}.bin")))
+            results = await asyncio.gather(*jobs)
+            assert all(r["size"] == len(DATA) for r in results)
+            assert server.total.max_active == 3
+        finally:
+            await other.stop()
+        assert len(server.ranges) == 8 and len(other.ranges) == 8
+
+    _run(scenario, delay=0.2)
+    print("✅ 并发限制正常")
+
+
+if __name__ == "__main__":
+    print("开始测试媒体下载管理器...")
+
+    try:
+        test_download_and_checksum()
+        test_range_resume()
+        test_server_ignores_range()
+        test_range_not_satisfiable()
+        test_oversized_part_restarts()
+        test_truncated_response_resumes()
+        test_concurrency_limits()
+        print("\n✅ 所有媒体下载测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
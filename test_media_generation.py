@@ -86,8 +86,8 @@ def test_media_generation():
             "gpt_description_prompt": music_prompt
         }
         
-        media_generator.save_media_info(output_dir, novel_setup, mock_image_results, mock_music_result)
-        print(f"媒体信息已保存到: {output_dir}/media_info.json")
+        media_info_path = media_generator.save_media_info(output_dir, novel_setup, mock_image_results, mock_music_result)
+        print(f"媒体信息已保存到: {media_info_path}")
     else:
         print("\n请设置有效的API密钥以测试实际的API调用功能")
     
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试媒体生成器的后台轮询器
+用假的媒体接口验证批量轮询、空响应和失败时的退避、通过 Future 返回结果、
+每本小说单独的媒体信息文件、相同提示词从缓存复用并硬链接到新小说，
+shutdown 取消未完成的轮询，以及恢复上次退出时未完成的任务
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+import concurrent.futures
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import core.media_generator as media_generator
+from core.media_generator import MediaGenerator
+from core.media_task_manager import MediaTaskManager
+from core.media_cache import cache_dir_for
+
+
+class _FakeDownloader:
+    """把下载地址写成本地文件的假下载器"""
+
+    def __init__(self):
+        self.urls = []
+
+    async def download(self, url, path):
+        self.urls.append(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = url.encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(data)
+        return {"path": path, "sha256": hashlib.sha256(data).hexdigest()}
+
+    async def close(self):
+        pass
+
+
+class _FakeMediaGenerator(MediaGenerator):
+    """用脚本化响应代替网络请求的媒体生成器
+
+    image_states: 图片任务ID -> 状态列表，每次查询取下一个，最后一个重复使用
+    poll_script: 图片批量查询依次返回的特殊结果（"empty" 空列表、"error" 抛出异常）
+    """
+
+    def __init__(self, root, **kwargs):
+        kwargs.setdefault("status_callback", lambda message: None)
+        kwargs.setdefault("task_manager", MediaTaskManager(os.path.join(root, "media_tasks.json")))
+        kwargs.setdefault("output_root", root)
+        super().__init__("test-key", **kwargs)
+        self.calls = []
+        self.image_states = {}
+        self.poll_script = []
+        self.fake_downloader = _FakeDownloader()
+        self._submitted = 0
+
+    def _ensure_loop(self):
+        loop = super()._ensure_loop()
+        self.downloader = self.fake_downloader
+        return loop
+
+    async def _api_request(self, method, path, payload=None, timeout=30, endpoint=None):
+        self.calls.append((time.monotonic(), method, path, payload))
+        if path == "/mj/submit/imagine":
+            self._submitted += 1
+            return {"code": 1, "result": f"img-{self._submitted}"}
+        if path == "/suno/submit/music":
+            self._submitted += 1
+            return {"code": "success", "data": f"mus-{self._submitted}"}
+        if path == "/mj/task/list-by-condition":
+            if self.poll_script:
+                step = self.poll_script.pop(0)
+                if step == "error":
+                    raise ConnectionError("接口暂时不可用")
+                return []
+            tasks = []
+            for task_id in payload["ids"]:
+                states = self.image_states.setdefault(task_id, ["SUCCESS"])
+                status = states.pop(0) if len(states) > 1 else states[0]
+                task = {"id": task_id, "status": status, "progress": "100%" if status == "SUCCESS" else "0%"}
+                if status == "SUCCESS":
+                    task["imageUrl"] = f"https://example.com/{task_id}.png"
+                tasks.append(task)
+            return tasks
+        if path.startswith("/suno/fetch/"):
+            task_id = path.rsplit("/", 1)[1]
+            return {"code": "success", "data": {"status": "complete", "data": [
+                {"id": task_id, "title": "主题曲", "audio_url": f"https://example.com/{task_id}.mp3"}]}}
+        raise AssertionError(f"意外的请求: {method} {path}")
+
+    def poll_calls(self):
+        return [call for call in self.calls if call[2] == "/mj/task/list-by-condition"]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_batch_poll():
+    """测试多个任务在一次批量请求中查询"""
+    print("=== 测试批量轮询 ===")
+    with tempfile.TemporaryDirectory() as root:
+        gen = _FakeMediaGenerator(root, poll_interval=0.05)
+        try:
+            async def wait_all():
+                return await asyncio.gather(*(
+                    gen.wait_for_job("image", task_id, first_poll_delay=0)
+                    for task_id in ("a", "b", "c")))
+
+            results = gen.run_coroutine(wait_all()).result(timeout=5)
+            assert [r["id"] for r in results] == ["a", "b", "c"]
+            polls = gen.poll_calls()
+            assert len(polls) == 1
+            assert sorted(polls[0][3]["ids"]) == ["a", "b", "c"]
+        finally:
+            gen.shutdown()
+            gen.task_manager.close()
+            gen.media_cache.close()
+    print("✅ 批量轮询正常")
+
+
+def test_backoff_on_empty_or_failed_batch():
+    """测试批量查询为空或失败时按轮询间隔退避，不会连续重试"""
+    print("=== 测试轮询退避 ===")
+    with tempfile.TemporaryDirectory() as root:
+        interval = 0.2
+        gen = _FakeMediaGenerator(root, poll_interval=interval)
+        gen.poll_script = ["empty", "error"]
+        try:
+            result = gen.run_coroutine(gen.wait_for_job("image", "a", first_poll_delay=0)).result(timeout=5)
+            assert result["status"] == "SUCCESS"
+            times = [call[0] for call in gen.poll_calls()]
+            # 空响应、异常、成功各一次，相邻两次之间至少间隔一个轮询周期
+            assert len(times) == 3
+            for earlier, later in zip(times, times[1:]):
+                assert later - earlier >= interval * 0.9, later - earlier
+        finally:
+            gen.shutdown()
+            gen.task_manager.close()
+            gen.media_cache.close()
+    print("✅ 轮询退避正常")
+
+
+def test_results_through_future():
+    """测试提交后立即返回，结果通过 Future 交付，每本小说写入自己的媒体信息文件"""
+    print("=== 测试结果通过 Future 返回 ===")
+    original_music_interval = media_generator.MUSIC_POLL_INTERVAL
+    media_generator.MUSIC_POLL_INTERVAL = 0.05
+    with tempfile.TemporaryDirectory() as root:
+        output_dir = os.path.join(root, "output")
+        gen = _FakeMediaGenerator(root, poll_interval=0.05)
+        try:
+            novels = [
+                {"id": "1", "genre": "奇幻", "novel_type": "奇幻冒险", "protagonist_name": "林逸", "background": "魔法大陆"},
+                {"id": "2", "genre": "科幻", "novel_type": "科幻未来", "protagonist_name": "苏晴", "background": "星际殖民地"},
+            ]
+            futures = []
+            start = time.monotonic()
+            for novel in novels:
+                path = os.path.join(output_dir, f"{novel['genre']}_{novel['id']}_media_info.json")
+                futures.append(gen.submit_novel_media(novel, output_dir, generate_cover=True, num_images=1,
+                                                      generate_music=True, media_info_path=path))
+            assert time.monotonic() - start < 0.5
+            assert all(isinstance(f, concurrent.futures.Future) for f in futures)
+
+            for novel, future in zip(novels, futures):
+                image_results, music_result = future.result(timeout=5)
+                assert len(image_results) == 1 and image_results[0]["status"] == "SUCCESS"
+                assert os.path.isfile(image_results[0]["local_path"])
+                assert music_result["audio_url"].endswith(".mp3")
+
+                # 两本小说同时生成也各自保存，互不覆盖
+                path = os.path.join(output_dir, f"{novel['genre']}_{novel['id']}_media_info.json")
+                with open(path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+                assert info["novel_info"]["protagonist"] == novel["protagonist_name"]
+                assert info["images"][0]["task_id"] == image_results[0]["id"]
+                assert info["music"]["task_id"] == music_result["id"]
+            assert not os.path.exists(os.path.join(output_dir, "media_info.json"))
+            assert not [name for name in os.listdir(output_dir) if name.endswith(".tmp")]
+
+            # 任务记录中保存了信息文件路径，恢复的任务写回同一个文件
+            tasks = gen.task_manager.get_all_tasks()
+            assert {t["novel_info"]["media_info_path"] for t in tasks} == {
+                os.path.join(output_dir, "奇幻_1_media_info.json"),
+                os.path.join(output_dir, "科幻_2_media_info.json")}
+        finally:
+            media_generator.MUSIC_POLL_INTERVAL = original_music_interval
+            gen.shutdown()
+            gen.task_manager.close()
+            gen.media_cache.close()
+    print("✅ 结果通过 Future 返回正常")
+
+
+def test_cache_hit_hardlinked():
+    """测试相同提示词的第二次请求从输出根目录下的缓存取得，并硬链接到新小说的媒体目录"""
+    print("=== 测试媒体缓存复用 ===")
+    with tempfile.TemporaryDirectory() as root:
+        gen = _FakeMediaGenerator(root, poll_interval=0.05)
+        try:
+            assert gen.media_cache.cache_dir == cache_dir_for(root) == os.path.join(root, "media_cache")
+            setup = {"genre": "奇幻", "novel_type": "奇幻冒险", "protagonist_name": "林逸", "background": "魔法大陆"}
+            first_dir = os.path.join(root, "run_1")
+            second_dir = os.path.join(root, "run_2")
+
+            first, _ = gen.submit_novel_media(dict(setup, id="1"), first_dir).result(timeout=5)
+            submits = [call for call in gen.calls if call[2] == "/mj/submit/imagine"]
+            assert len(submits) == 1 and not first[0].get("cached")
+
+            second, _ = gen.submit_novel_media(dict(setup, id="2"), second_dir).result(timeout=5)
+            submits = [call for call in gen.calls if call[2] == "/mj/submit/imagine"]
+            assert len(submits) == 1
+            assert len(gen.fake_downloader.urls) == 1
+
+            image = second[0]
+            assert image["cached"] is True
+            assert os.path.dirname(image["local_path"]) == os.path.join(second_dir, "media")
+            assert os.path.dirname(image["cache_path"]) == gen.media_cache.asset_dir
+            assert os.path.samefile(image["local_path"], image["cache_path"])
+            assert os.path.samefile(first[0]["local_path"], image["cache_path"])
+            assert gen.media_cache.stats() == {"entries": 1, "hits": 1}
+        finally:
+            gen.shutdown()
+            gen.task_manager.close()
+            gen.media_cache.close()
+    print("✅ 媒体缓存复用正常")
+
+
+def test_shutdown_cancels_pending_polls():
+    """测试 shutdown 取消等待中的任务和轮询器，任务记录保持待处理"""
+    print("=== 测试关闭时取消轮询 ===")
+    with tempfile.TemporaryDirectory() as root:
+        gen = _FakeMediaGenerator(root, poll_interval=0.05)
+        gen.image_states["slow"] = ["IN_PROGRESS"]
+        try:
+            local_id = gen.task_manager.add_image_task("slow", {"id": "1"}, "prompt", root)
+            future = gen.run_coroutine(gen.wait_for_job("image", "slow", local_id=local_id, first_poll_delay=0))
+            assert _wait_for(lambda: len(gen.poll_calls()) >= 2)
+
+            gen.shutdown()
+            assert future.cancelled()
+            calls = len(gen.poll_calls())
+            time.sleep(0.2)
+            assert len(gen.poll_calls()) == calls
+            assert gen.task_manager.get_task(local_id)["status"] in media_generator.PENDING_STATUSES
+        finally:
+            gen.shutdown()
+            gen.task_manager.close()
+            gen.media_cache.close()
+    print("✅ 关闭时取消轮询正常")
+
+
+def test_reconcile_pending_tasks():
+    """测试恢复上次未完成的任务：完成的下载并写回媒体信息，失败和缺少任务ID的记为失败"""
+    print("=== 测试恢复未完成的任务 ===")
+    with tempfile.TemporaryDirectory() as root:
+        output_dir = os.path.join(root, "output")
+        info_path = os.path.join(output_dir, "奇幻_1_media_info.json")
+        gen = _FakeMediaGenerator(root, poll_interval=0.05)
+        gen.image_states["bad"] = ["FAILURE"]
+        try:
+            novel_info = {"id": "1", "novel_type": "奇幻冒险", "protagonist_name": "林逸", "media_info_path": info_path}
+            manager = gen.task_manager
+            image_id = manager.add_image_task("img-old", novel_info, "封面", output_dir)
+            music_id = manager.add_music_task("mus-old", novel_info, "主题曲", output_dir)
+            failed_id = manager.add_image_task("bad", novel_info, "插图", output_dir)
+            missing_id = manager.add_image_task("", novel_info, "插图", output_dir)
+            assert len(manager.get_pending_tasks()) == 4
+
+            succeeded = gen.run_coroutine(gen.reconcile_pending_tasks()).result(timeout=5)
+            assert succeeded == 2
+            assert manager.get_pending_tasks() == []
+            assert manager.get_task(image_id)["status"] == "success"
+            assert manager.get_task(music_id)["status"] == "success"
+            assert manager.get_task(failed_id)["status"] == "failure"
+            assert manager.get_task(missing_id)["status"] == "error"
+            assert sorted(gen.fake_downloader.urls) == [
+                "https://example.com/img-old.png", "https://example.com/mus-old.mp3"]
+
+            # 结果写回这本小说原来的媒体信息文件
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            assert [image["task_id"] for image in info["images"]] == ["img-old"]
+            assert os.path.isfile(info["images"][0]["local_path"])
+            assert info["music"]["task_id"] == "mus-old"
+            assert os.path.isfile(info["music"]["local_path"])
+
+            # 没有未完成的任务时什么也不做
+            assert gen.run_coroutine(gen.reconcile_pending_tasks()).result(timeout=5) == 0
+        finally:
+            gen.shutdown()
+            gen.task_manager.close()
+            gen.media_cache.close()
+    print("✅ 恢复未完成的任务正常")
+
+
+def test_start_reconciler_in_background():
+    """测试 start_reconciler 立即返回 Future，没有未完成的任务时返回 None"""
+    print("=== 测试后台恢复 ===")
+    with tempfile.TemporaryDirectory() as root:
+        messages = []
+        gen = _FakeMediaGenerator(root, poll_interval=0.05, status_callback=messages.append)
+        gen.image_states["slow"] = ["IN_PROGRESS", "IN_PROGRESS", "SUCCESS"]
+        try:
+            assert gen.start_reconciler() is None
+            assert not gen.calls
+
+            local_id = gen.task_manager.add_image_task("slow", {"id": "2"}, "封面", os.path.join(root, "output"))
+            start = time.monotonic()
+            future = gen.start_reconciler()
+            assert isinstance(future, concurrent.futures.Future)
+            assert time.monotonic() - start < 0.5
+            assert any("发现 1 个未完成的媒体任务" in m for m in messages)
+
+            assert future.result(timeout=5) == 1
+            assert len(gen.poll_calls()) == 3
+            assert gen.task_manager.get_task(local_id)["status"] == "success"
+            assert any("媒体任务恢复完成：1/1 个成功" in m for m in messages)
+            assert os.path.isfile(os.path.join(root, "output", "media_info_2.json"))
+        finally:
+            gen.shutdown()
+            gen.task_manager.close()
+            gen.media_cache.close()
+    print("✅ 后台恢复正常")
+
+
+if __name__ == "__main__":
+    print("开始测试媒体生成器...")
+
+    try:
+        test_batch_poll()
+        test_backoff_on_empty_or_failed_batch()
+        test_results_through_future()
+        test_cache_hit_hardlinked()
+        test_shutdown_cancels_pending_polls()
+        test_reconcile_pending_tasks()
+        test_start_reconciler_in_background()
+        print("\n✅ 所有媒体生成器测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试媒体任务管理器的 SQLite 存储
+验证旧版 JSON 导入、状态更新、统计摘要以及重新打开数据库后数据一致
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.media_task_manager import MediaTaskManager
+
+
+def _legacy_tasks():
+    """旧版 media_tasks.json 的内容"""
+    return {
+        "image_tasks": {
+            "img_1700000000_0": {
+                "api_task_id": "mj-1",
+                "status": "submitted",
+                "prompt": "fantasy cover",
+                "novel_info": {"id": "1", "novel_type": "奇幻冒险"},
+                "output_dir": "output/run_1",
+                "created_at": "2023-11-14T22:13:20",
+                "result": None,
+                "error": None,
+            },
+            "img_1700000100_1": {
+                "api_task_id": "mj-2",
+                "status": "success",
+                "prompt": "sci-fi cover",
+                "novel_info": {"id": "2", "novel_type": "科幻未来"},
+                "output_dir": "output/run_1",
+                "created_at": "2023-11-14T22:15:00",
+                "result": {"imageUrl": "https://example.com/2.png"},
+                "error": None,
+            },
+        },
+        "music_tasks": {
+            "music_1700000200_0": {
+                "api_task_id": "suno-1",
+                "status": "timeout",
+                "prompt": "epic music",
+                "novel_info": {"id": "1"},
+                "output_dir": "output/run_1",
+                "created_at": "2023-11-14T22:16:40",
+                "result": None,
+                "error": "等待超时",
+            },
+        },
+    }
+
+
+def _scan_summary(manager):
+    """逐个任务统计，用于核对增量计数"""
+    tasks = manager.get_all_tasks()
+    return {
+        "total": len(tasks),
+        "pending": len(manager.get_pending_tasks()),
+        "completed": len(manager.get_completed_tasks()),
+        "failed": len(manager.get_failed_tasks()),
+        "image_tasks": sum(1 for t in tasks if t["type"] == "image"),
+        "music_tasks": sum(1 for t in tasks if t["type"] == "music"),
+    }
+
+
+def test_legacy_json_import():
+    """测试首次启动导入旧版 JSON，之后不重复导入"""
+    print("=== 测试导入旧版任务文件 ===")
+    with tempfile.TemporaryDirectory() as root:
+        tasks_file = os.path.join(root, "media_tasks.json")
+        with open(tasks_file, 'w', encoding='utf-8') as f:
+            json.dump(_legacy_tasks(), f, ensure_ascii=False)
+
+        manager = MediaTaskManager(tasks_file)
+        try:
+            assert manager.db_file == os.path.join(root, "media_tasks.db")
+            assert len(manager.get_all_tasks()) == 3
+
+            task = manager.get_task("img_1700000100_1")
+            assert task["type"] == "image" and task["api_task_id"] == "mj-2"
+            assert task["novel_info"] == {"id": "2", "novel_type": "科幻未来"}
+            assert task["result"] == {"imageUrl": "https://example.com/2.png"}
+            assert manager.get_task("music_1700000200_0")["type"] == "music"
+
+            # 按创建时间倒序
+            assert [t["local_id"] for t in manager.get_all_tasks()] == [
+                "music_1700000200_0", "img_1700000100_1", "img_1700000000_0"]
+            assert [t["local_id"] for t in manager.get_pending_tasks()] == ["img_1700000000_0"]
+        finally:
+            manager.close()
+
+        # 旧文件之后的改动不会再次导入
+        data = _legacy_tasks()
+        data["image_tasks"]["img_1700000300_2"] = dict(data["image_tasks"]["img_1700000000_0"],
+                                                       api_task_id="mj-3")
+        with open(tasks_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        manager = MediaTaskManager(tasks_file)
+        try:
+            assert len(manager.get_all_tasks()) == 3
+            assert manager.get_task("img_1700000300_2") is None
+        finally:
+            manager.close()
+    print("✅ 导入旧版任务文件正常")
+
+
+def test_status_updates():
+    """测试状态更新改变分组，保存结果和错误信息"""
+    print("=== 测试状态更新 ===")
+    with tempfile.TemporaryDirectory() as root:
+        manager = MediaTaskManager(os.path.join(root, "media_tasks.json"))
+        try:
+            image_id = manager.add_image_task("mj-1", {"id": "1"}, "cover", root)
+            music_id = manager.add_music_task("suno-1", {"id": "1"}, "music", root)
+            other_id = manager.add_image_task("mj-2", {"id": "2"}, "cover", root)
+            assert image_id != other_id
+            assert len(manager.get_pending_tasks()) == 3
+            created = manager.get_task(image_id)
+            assert created["status"] == "submitted" and created["result"] is None
+
+            manager.update_task_status(image_id, "success", {"imageUrl": "https://example.com/1.png"})
+            manager.update_task_status(music_id, "failure", error="音乐生成失败")
+            manager.update_task_status(other_id, "in_progress")
+            manager.update_task_status("img_missing", "success")
+
+            task = manager.get_task(image_id)
+            assert task["status"] == "success"
+            assert task["result"] == {"imageUrl": "https://example.com/1.png"}
+            assert task["updated_at"] >= created["updated_at"]
+            assert manager.get_task(music_id)["error"] == "音乐生成失败"
+            assert [t["local_id"] for t in manager.get_completed_tasks()] == [image_id]
+            assert [t["local_id"] for t in manager.get_failed_tasks()] == [music_id]
+            assert [t["local_id"] for t in manager.get_pending_tasks()] == [other_id]
+            assert [t["local_id"] for t in manager.get_tasks_by_status(("success", "failure"), "music")] == [music_id]
+
+            # 不带结果的更新保留已有结果
+            manager.update_task_status(image_id, "complete")
+            assert manager.get_task(image_id)["result"] == {"imageUrl": "https://example.com/1.png"}
+        finally:
+            manager.close()
+    print("✅ 状态更新正常")
+
+
+def test_summary_counts():
+    """测试增量统计摘要与逐个统计一致"""
+    print("=== 测试统计摘要 ===")
+    with tempfile.TemporaryDirectory() as root:
+        tasks_file = os.path.join(root, "media_tasks.json")
+        with open(tasks_file, 'w', encoding='utf-8') as f:
+            json.dump(_legacy_tasks(), f, ensure_ascii=False)
+        manager = MediaTaskManager(tasks_file)
+        try:
+            summary = manager.get_task_summary()
+            assert summary == {"total": 3, "pending": 1, "completed": 1, "failed": 1,
+                               "image_tasks": 2, "music_tasks": 1}
+
+            new_id = manager.add_music_task("suno-2", {"id": "3"}, "music", root)
+            manager.update_task_status("img_1700000000_0", "running")
+            manager.update_task_status("img_1700000000_0", "success")
+            manager.update_task_status(new_id, "error", error="缺少接口任务ID")
+            summary = manager.get_task_summary()
+            assert summary == _scan_summary(manager)
+            assert summary == {"total": 4, "pending": 0, "completed": 2, "failed": 2,
+                               "image_tasks": 2, "music_tasks": 2}
+
+            # 清理旧任务后计数同步减少（导入的任务创建于 2023 年）
+            manager.clean_old_tasks(days=7)
+            summary = manager.get_task_summary()
+            assert summary == _scan_summary(manager)
+            assert summary == {"total": 1, "pending": 0, "completed": 0, "failed": 1,
+                               "image_tasks": 0, "music_tasks": 1}
+        finally:
+            manager.close()
+    print("✅ 统计摘要正常")
+
+
+def test_reopen_sees_same_data():
+    """测试关闭后重新打开数据库得到相同的任务和统计"""
+    print("=== 测试重新打开数据库 ===")
+    with tempfile.TemporaryDirectory() as root:
+        tasks_file = os.path.join(root, "media_tasks.json")
+        manager = MediaTaskManager(tasks_file)
+        image_id = manager.add_image_task("mj-1", {"id": "1", "media_info_path": "a_media_info.json"}, "cover", root)
+        music_id = manager.add_music_task("suno-1", {"id": "1"}, "music", root)
+        manager.update_task_status(music_id, "success", {"audio_url": "https://example.com/1.mp3"})
+        tasks = manager.get_all_tasks()
+        summary = manager.get_task_summary()
+        manager.close()
+
+        reopened = MediaTaskManager(tasks_file)
+        try:
+            assert reopened.get_all_tasks() == tasks
+            assert reopened.get_task_summary() == summary
+            assert reopened.get_task(image_id)["novel_info"]["media_info_path"] == "a_media_info.json"
+            assert [t["local_id"] for t in reopened.get_pending_tasks()] == [image_id]
+
+            # 重新打开后新增的任务不会与已有的本地ID冲突
+            another = reopened.add_image_task("mj-2", {"id": "2"}, "cover", root)
+            assert another not in (image_id, music_id)
+            assert reopened.get_task_summary()["image_tasks"] == 2
+        finally:
+            reopened.close()
+    print("✅ 重新打开数据库正常")
+
+
+if __name__ == "__main__":
+    print("开始测试媒体任务管理器...")
+
+    try:
+        test_legacy_json_import()
+        test_status_updates()
+        test_summary_counts()
+        test_reopen_sees_same_data()
+        print("\n✅ 所有媒体任务管理器测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试运行指标
+验证 Prometheus 文本格式中直方图的桶是累计的、标签值被正确转义，
+以及 /metrics 接口和快照文件的输出
+"""
+
+import sys
+import os
+import json
+import tempfile
+import urllib.request
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.metrics import MetricsRegistry, MetricsServer, SnapshotWriter, _Metric
+
+
+def _sample_lines(text, name):
+    """指标名为 name 的样本行：[(名称和标签, 数值)]"""
+    lines = []
+    for line in text.splitlines():
+        if line.startswith("#") or not line.startswith(name):
+            continue
+        series, value = line.rsplit(" ", 1)
+        lines.append((series, value))
+    return lines
+
+
+def test_histogram_buckets_cumulative():
+    """测试直方图的 _bucket 行为累计计数，+Inf 桶等于 _count"""
+    print("=== 测试累计的直方图桶 ===")
+    registry = MetricsRegistry()
+    histogram = registry.histogram("request_seconds", "请求耗时", ("model",), buckets=(1, 5, 10))
+    for value in (0.5, 0.7, 3, 7, 7, 8, 20):
+        histogram.observe(value, model="a")
+    histogram.observe(4, model="b")
+
+    text = registry.render_prometheus()
+    assert "# HELP request_seconds 请求耗时" in text
+    assert "# TYPE request_seconds histogram" in text
+
+    lines = dict(_sample_lines(text, "request_seconds"))
+    assert lines['request_seconds_bucket{model="a",le="1"}'] == "2"
+    assert lines['request_seconds_bucket{model="a",le="5"}'] == "3"
+    assert lines['request_seconds_bucket{model="a",le="10"}'] == "6"
+    assert lines['request_seconds_bucket{model="a",le="+Inf"}'] == "7"
+    assert lines['request_seconds_count{model="a"}'] == "7"
+    assert float(lines['request_seconds_sum{model="a"}']) == 0.5 + 0.7 + 3 + 7 + 7 + 8 + 20
+
+    # 每个标签组合的桶单调不减
+    b_buckets = [int(value) for series, value in _sample_lines(text, "request_seconds_bucket")
+                 if 'model="b"' in series]
+    assert b_buckets == [0, 1, 1, 1]
+
+    # 快照中的 buckets 仍是各桶自己的数量
+    sample = next(s for s in histogram.samples() if s["labels"] == {"model": "a"})
+    assert sample["buckets"] == [2, 1, 3, 1]
+    print("✅ 直方图桶为累计计数")
+
+
+def test_label_escaping():
+    """测试标签值中的反斜杠、双引号和换行被转义"""
+    print("=== 测试标签转义 ===")
+    registry = MetricsRegistry()
+    counter = registry.counter("errors_total", "错误次数", ("message",))
+    counter.inc(message='path C:\\novels\\"奇幻"\nline2')
+    counter.inc(2, message="plain")
+    gauge = registry.gauge("queue_depth", "队列长度")
+    gauge.set(3)
+
+    text = registry.render_prometheus()
+    lines = dict(_sample_lines(text, "errors_total"))
+    assert lines['errors_total{message="path C:\\\\novels\\\\\\"奇幻\\"\\nline2"}'] == "1"
+    assert lines['errors_total{message="plain"}'] == "2"
+    # 转义后每个样本仍然只占一行
+    assert len(_sample_lines(text, "errors_total")) == 2
+    assert dict(_sample_lines(text, "queue_depth"))["queue_depth"] == "3"
+    assert text.endswith("\n")
+    print("✅ 标签转义正常")
+
+
+def test_server_and_snapshot():
+    """测试 /metrics 接口和快照文件输出同一份指标"""
+    print("=== 测试指标接口和快照 ===")
+    registry = MetricsRegistry()
+    registry.counter("generated_chunks_total", "拼接进小说的段数").inc(5)
+
+    server = MetricsServer(registry, port=0)
+    server.start()
+    try:
+        base = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(base + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read().decode("utf-8") == registry.render_prometheus()
+        with urllib.request.urlopen(base + "/metrics.json", timeout=5) as response:
+            data = json.loads(response.read().decode("utf-8"))
+        assert data["metrics"]["generated_chunks_total"]["samples"][0]["value"] == 5
+    finally:
+        server.stop()
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "metrics.json")
+        writer = SnapshotWriter(path, interval=3600, registry=registry)
+        writer.start()
+        writer.stop()
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        assert snapshot["metrics"]["generated_chunks_total"]["type"] == "counter"
+    print("✅ 指标接口和快照正常")
+
+
+def test_metric_base_abstract():
+    """测试指标基类不能直接实例化，子类必须实现 samples()"""
+    print("=== 测试指标基类 ===")
+    try:
+        _Metric("base_metric")
+        assert False, "指标基类不应能实例化"
+    except TypeError:
+        pass
+
+    class _Incomplete(_Metric):
+        kind = "counter"
+
+    try:
+        _Incomplete("incomplete_metric")
+        assert False, "未实现 samples() 的子类不应能实例化"
+    except TypeError:
+        pass
+    print("✅ 指标基类为抽象类")
+
+
+if __name__ == "__main__":
+    print("开始测试运行指标...")
+
+    try:
+        test_histogram_buckets_cumulative()
+        test_label_escaping()
+        test_server_and_snapshot()
+        test_metric_base_abstract()
+        print("\n✅ 所有运行指标测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
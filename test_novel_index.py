@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试小说结构索引
+验证增量更新与全量构建结果一致（包括整理末尾空白后的追加）、
+CRLF 文件按字节偏移读取章节，以及文件被外部修改后 is_current 失效
+"""
+
+import sys
+import os
+import time
+import random
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.novel_index import NovelIndex, detect_newline, index_path_for
+
+PARAGRAPHS = [
+    "林逸走进城门，街上的灯火次第亮起。",
+    "“站住！”守卫横过长枪，喝问来人的身份。",
+    "夜色渐深，风声在屋檐间呼啸而过。",
+    "Chapter 3 is mentioned here but is not a heading.",
+]
+
+
+def _novel(chapters=3):
+    parts = []
+    for number in range(1, chapters + 1):
+        parts.append(f"第{number}章 第{number}段旅程\n\n")
+        parts.append("\n\n".join(PARAGRAPHS[(number + i) % len(PARAGRAPHS)] for i in range(3)))
+        parts.append("\n\n")
+    return "".join(parts)
+
+
+def _write(path, text, newline=None):
+    with open(path, 'w', encoding='utf-8', newline=newline) as f:
+        f.write(text)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_update_equals_build():
+    """测试逐次追加（含整理末尾空白）时增量更新与全量构建一致"""
+    print("=== 测试增量更新 ===")
+    rng = random.Random(3)
+    text = ""
+    index = NovelIndex()
+    incremental = 0
+    for step in range(400):
+        r = rng.random()
+        if r < 0.15:
+            add = f"第{step}章 新的旅程\n\n"
+        elif r < 0.3:
+            # 生成器保存前会整理末尾空白，再接上新的段落
+            text = text.rstrip()
+            add = "\n\n" + rng.choice(PARAGRAPHS)
+        elif r < 0.35:
+            # 整理空白后直接续写，最后一段被延长
+            text = text.rstrip()
+            add = rng.choice(PARAGRAPHS)
+        elif r < 0.4:
+            # 标题还没写完换行，下次追加时才完整
+            add = f"第{step}章 未完的标题"
+        elif r < 0.45:
+            add = "  \n"
+        else:
+            add = rng.choice(PARAGRAPHS) * rng.randint(1, 3) + rng.choice(["", "\n", "\n\n", "\n\n\n  "])
+        text += add
+        incremental += index.update(text)
+        assert index.to_dict() == NovelIndex.build(text).to_dict(), step
+    assert incremental > 300
+    assert index.chapter_count > 10
+
+    # 前文被改动时退回全量重建
+    edited = text.replace(PARAGRAPHS[0], "城门紧闭。", 1)
+    assert index.update(edited) is False
+    assert index.to_dict() == NovelIndex.build(edited).to_dict()
+    print("✅ 增量更新与全量构建一致")
+
+
+def test_read_chapter_crlf():
+    """测试 CRLF 和 LF 文件都能按字节偏移读出正确的章节"""
+    print("=== 测试按字节偏移读取章节 ===")
+    text = _novel()
+    with tempfile.TemporaryDirectory() as root:
+        for newline in ("\r\n", "\n"):
+            path = os.path.join(root, f"novel_{len(newline)}.txt")
+            _write(path, text, newline)
+            assert detect_newline(path) == newline
+
+            content = _read(path)
+            index = NovelIndex.for_novel(path, content)
+            assert index.newline == newline
+            expected = index.split_chapters(content)
+            assert len(expected) == 3
+            for number, chapter_text in expected:
+                assert index.read_chapter(path, number) == chapter_text
+
+            # 索引文件记录了换行符，重新加载后仍然按字节读取正确
+            loaded = NovelIndex.load(path)
+            assert loaded.is_current(path) and loaded.newline == newline
+            assert loaded.read_chapter(path, 2) == expected[1][1]
+            with open(path, "rb") as f:
+                assert loaded.byte_length == len(f.read())
+    print("✅ 按字节偏移读取章节正常")
+
+
+def test_is_current_after_external_edit():
+    """测试文件被外部修改后索引失效，for_novel 重建"""
+    print("=== 测试外部修改后的索引 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "novel.txt")
+        _write(path, _novel(2))
+        index = NovelIndex.for_novel(path)
+        assert os.path.exists(index_path_for(path))
+        assert index.is_current(path)
+        assert NovelIndex.load(path).is_current(path)
+
+        # 大小不变但修改时间变化
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+        assert not index.is_current(path)
+
+        # 内容被改动
+        time.sleep(0.01)
+        _write(path, _novel(3))
+        assert not index.is_current(path)
+        rebuilt = NovelIndex.for_novel(path)
+        assert rebuilt.chapter_count == 3
+        assert rebuilt.is_current(path) and NovelIndex.load(path).chapter_count == 3
+
+        # 文件被删除
+        os.remove(path)
+        assert not rebuilt.is_current(path)
+    print("✅ 外部修改后的索引处理正常")
+
+
+if __name__ == "__main__":
+    print("开始测试小说结构索引...")
+
+    try:
+        test_update_equals_build()
+        test_read_chapter_crlf()
+        test_is_current_after_external_edit()
+        print("\n✅ 所有结构索引测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试小说保存写入器
+验证合并写入、等待落盘、关闭时写完积压、跨线程提交和写入失败时保留旧文件
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.novel_writer import NovelWriter
+from utils.common import atomic_write_text, atomic_write_json
+
+
+class _RecordingWrite:
+    """记录每次实际写入的写入函数（用原子写入落盘）"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+
+    def __call__(self, text, novel_setup, filepath, meta_filepath, status=None):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise OSError("磁盘已满")
+        atomic_write_text(filepath, text)
+        atomic_write_json(meta_filepath, novel_setup)
+        self.calls.append((filepath, text, status))
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_coalesce():
+    """测试合并窗口内的多次保存只写一次最新内容"""
+    print("=== 测试合并写入 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "novel.txt")
+        meta = os.path.join(root, "novel_meta.json")
+        write = _RecordingWrite()
+
+        async def run():
+            writer = NovelWriter(write, coalesce_window=0.2)
+            writer.start()
+            setup = {"id": "n", "word_count": 0}
+            for i in range(1, 6):
+                setup["word_count"] = i
+                await writer.save("内容" * i, setup, path, meta)
+            # 提交后修改元数据不影响已提交的内容
+            setup["word_count"] = 99
+            await writer.close()
+            return writer
+
+        writer = asyncio.run(run())
+        assert len(write.calls) == 1
+        assert writer.writes == 1 and writer.coalesced == 4
+        assert _read(path) == "内容" * 5
+        with open(meta, 'r', encoding='utf-8') as f:
+            assert json.load(f)["word_count"] == 5
+    print("✅ 合并写入正常")
+
+
+def test_wait_until_on_disk():
+    """测试 wait=True 在数据落盘后才返回"""
+    print("=== 测试等待落盘 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "novel.txt")
+        meta = os.path.join(root, "novel_meta.json")
+        write = _RecordingWrite(delay=0.1)
+
+        async def run():
+            writer = NovelWriter(write, coalesce_window=0.05)
+            writer.start()
+            await writer.save("第一版", {"id": "n"}, path, meta, wait=True)
+            assert _read(path) == "第一版"
+            await writer.save("第二版", {"id": "n"}, path, meta)
+            assert _read(path) == "第一版"
+            await writer.save("第三版", {"id": "n"}, path, meta, status="paused", wait=True)
+            assert _read(path) == "第三版"
+            await writer.close()
+
+        asyncio.run(run())
+        assert write.calls[-1] == (path, "第三版", "paused")
+    print("✅ 等待落盘正常")
+
+
+def test_close_flushes_pending():
+    """测试 close() 写完所有积压的保存"""
+    print("=== 测试关闭时写完积压 ===")
+    with tempfile.TemporaryDirectory() as root:
+        write = _RecordingWrite(delay=0.02)
+        paths = [os.path.join(root, f"novel_{i}.txt") for i in range(5)]
+
+        async def run():
+            writer = NovelWriter(write, coalesce_window=0.5)
+            writer.start()
+            for i, path in enumerate(paths):
+                await writer.save(f"小说{i}", {"id": str(i)}, path, path.replace('.txt', '_meta.json'))
+            await writer.close()
+            assert not writer.is_running()
+
+        asyncio.run(run())
+        assert len(write.calls) == 5
+        for i, path in enumerate(paths):
+            assert _read(path) == f"小说{i}"
+    print("✅ 关闭时写完积压正常")
+
+
+def test_threadsafe_save_flushed_on_close():
+    """测试其他线程提交的保存不阻塞提交线程，并在 close() 前写完"""
+    print("=== 测试跨线程提交 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "novel.txt")
+        write = _RecordingWrite(delay=0.2)
+        futures = []
+
+        async def run():
+            writer = NovelWriter(write, coalesce_window=0.05)
+            writer.start()
+
+            def ui_thread():
+                start = time.monotonic()
+                futures.append(writer.save_threadsafe("界面保存", {"id": "n"}, path,
+                                                      path.replace('.txt', '_meta.json'), "paused"))
+                futures.append(time.monotonic() - start)
+
+            thread = threading.Thread(target=ui_thread)
+            thread.start()
+            thread.join()
+            await writer.close()
+
+        asyncio.run(run())
+        future, elapsed = futures
+        assert elapsed < 0.1
+        assert future.result(timeout=0) is True
+        assert _read(path) == "界面保存"
+    print("✅ 跨线程提交正常")
+
+
+def test_failed_write_keeps_old_file():
+    """测试写入失败时旧文件保持不变，等待方收到异常"""
+    print("=== 测试写入失败 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "novel.txt")
+        atomic_write_text(path, "旧内容")
+
+        # 原子写入在替换前失败：旧文件不变，不留下临时文件
+        original_replace = os.replace
+
+        def broken_replace(src, dst):
+            raise OSError("替换失败")
+
+        os.replace = broken_replace
+        try:
+            try:
+                atomic_write_text(path, "新内容")
+                assert False, "应当抛出异常"
+            except OSError:
+                pass
+        finally:
+            os.replace = original_replace
+        assert _read(path) == "旧内容"
+        assert os.listdir(root) == ["novel.txt"]
+
+        # 写入器中的失败传给等待方，之后的保存照常写入
+        async def run():
+            write = _RecordingWrite(fail=True)
+            writer = NovelWriter(write, coalesce_window=0.01)
+            writer.start()
+            try:
+                await writer.save("新内容", {"id": "n"}, path, path.replace('.txt', '_meta.json'), wait=True)
+                assert False, "应当抛出异常"
+            except OSError:
+                pass
+            assert _read(path) == "旧内容"
+            write.fail = False
+            await writer.save("新内容", {"id": "n"}, path, path.replace('.txt', '_meta.json'), wait=True)
+            await writer.close()
+
+        asyncio.run(run())
+        assert _read(path) == "新内容"
+    print("✅ 写入失败时保留旧文件")
+
+
+if __name__ == "__main__":
+    print("开始测试小说保存写入器...")
+
+    try:
+        test_coalesce()
+        test_wait_until_on_disk()
+        test_close_flushes_pending()
+        test_threadsafe_save_flushed_on_close()
+        test_failed_write_keeps_old_file()
+        print("\n✅ 所有写入器测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
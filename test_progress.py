@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试生成进度通道
+用可控时钟验证每部小说按 min_interval 合并通知、阶段变化立即通知、flush() 补发，
+以及速度、预计剩余时间和 aggregate() 的计算
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.progress import ProgressChannel
+
+
+class _Clock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def _channel(**kwargs):
+    clock = _Clock()
+    channel = ProgressChannel(clock=clock, **kwargs)
+    notified = []
+    channel.add_listener(notified.append)
+    return channel, clock, notified
+
+
+def test_coalescing_per_novel():
+    """测试每部小说在 min_interval 内只通知一次，不同小说互不影响"""
+    print("=== 测试按小说合并通知 ===")
+    channel, clock, notified = _channel(min_interval=1.0)
+
+    channel.update("a", 100, 1000, phase="generating")
+    for words in (200, 300, 400):
+        clock.advance(0.2)
+        channel.update("a", words)
+    channel.update("b", 50, 500, phase="generating")
+    assert [(r.novel_id, r.word_count) for r in notified] == [("a", 100), ("b", 50)]
+
+    clock.advance(0.4)  # 距 a 的上次通知已满 1 秒，b 还不满
+    channel.update("a", 500)
+    channel.update("b", 60)
+    assert [(r.novel_id, r.word_count) for r in notified[2:]] == [("a", 500)]
+
+    clock.advance(0.99)
+    channel.update("a", 600)
+    assert len(notified) == 3
+
+    # 界面轮询不受合并影响：每部小说取出最新一次
+    changes = {r.novel_id: r.word_count for r in channel.take_changes()}
+    assert changes == {"a": 600, "b": 60}
+    assert channel.take_changes() == []
+    print("✅ 按小说合并通知正常")
+
+
+def test_phase_change_notifies_immediately():
+    """测试阶段变化时不等 min_interval 立即通知"""
+    print("=== 测试阶段变化立即通知 ===")
+    channel, clock, notified = _channel(min_interval=10.0)
+
+    channel.update("a", 900, 1000, phase="generating", genre="奇幻")
+    clock.advance(0.1)
+    channel.update("a", 950)
+    clock.advance(0.1)
+    channel.update("a", 1000, phase="summarizing")
+    clock.advance(0.1)
+    channel.update("a", 1000, phase="done")
+
+    assert [r.phase for r in notified] == ["generating", "summarizing", "done"]
+    assert [r.word_count for r in notified] == [900, 1000, 1000]
+    # 未指定的字段沿用上一次的值
+    assert notified[-1].genre == "奇幻" and notified[-1].target_length == 1000
+    assert notified[-1].finished
+    print("✅ 阶段变化立即通知")
+
+
+def test_flush_delivers_pending():
+    """测试 flush() 只补发被合并掉的最新进度，并重新开始计时"""
+    print("=== 测试 flush ===")
+    channel, clock, notified = _channel(min_interval=5.0)
+
+    channel.update("a", 100, 1000)
+    channel.update("b", 100, 1000)
+    clock.advance(1)
+    channel.update("a", 200)
+    channel.update("a", 300)
+    assert len(notified) == 2
+
+    channel.flush()
+    assert [(r.novel_id, r.word_count) for r in notified[2:]] == [("a", 300)]
+    channel.flush()
+    assert len(notified) == 3
+
+    # flush 之后从补发时刻重新计算间隔
+    clock.advance(4.9)
+    channel.update("a", 400)
+    assert len(notified) == 3
+    clock.advance(0.1)
+    channel.update("a", 500)
+    assert notified[-1].word_count == 500
+    print("✅ flush 正常")
+
+
+def test_rate_and_eta():
+    """测试速度按 rate_window 内的字数变化计算，剩余时间由速度推出"""
+    print("=== 测试速度和预计剩余时间 ===")
+    channel, clock, _ = _channel(rate_window=60.0)
+
+    channel.update("a", 0, 10000)
+    record = channel.records()[0]
+    assert record.rate == 0.0 and record.eta is None
+
+    clock.advance(10)
+    channel.update("a", 500)
+    record = channel.records()[0]
+    assert record.rate == 50.0
+    assert record.eta == (10000 - 500) / 50.0
+    assert record.to_dict()["estimated_time"] == record.eta
+    assert record.to_dict()["percentage"] == 5.0
+
+    # 字数不变时不增加样本，速度按已有样本计算
+    clock.advance(10)
+    channel.update("a", 500)
+    assert channel.records()[0].rate == 50.0
+
+    # 超出窗口的旧样本被丢弃：速度只反映最近的变化
+    clock.advance(30)
+    channel.update("a", 1500)
+    assert channel.records()[0].rate == 1500 / 50.0
+    clock.advance(30)
+    channel.update("a", 2500)
+    record = channel.records()[0]
+    assert record.rate == (2500 - 500) / 60.0
+    assert record.eta == (10000 - 2500) / record.rate
+
+    # 达到目标后剩余时间为 0
+    clock.advance(10)
+    channel.update("a", 10000)
+    assert channel.records()[0].eta == 0.0
+    print("✅ 速度和预计剩余时间正常")
+
+
+def test_aggregate():
+    """测试汇总：字数累加，速度为进行中小说之和，剩余时间取最大值"""
+    print("=== 测试汇总进度 ===")
+    channel, clock, _ = _channel()
+    assert channel.aggregate().novels == 0 and channel.aggregate().eta is None
+
+    channel.update("a", 0, 1000)
+    channel.update("b", 0, 2000)
+    channel.update("c", 0, 500)
+    clock.advance(10)
+    channel.update("a", 100)   # 10 字/秒，剩余 90 秒
+    channel.update("b", 500)   # 50 字/秒，剩余 30 秒
+    channel.update("c", 500, phase="done")
+
+    total = channel.aggregate()
+    assert (total.novels, total.active) == (3, 2)
+    assert total.word_count == 1100 and total.target_length == 3500
+    assert total.rate == 60.0
+    assert total.eta == 90.0
+    assert abs(total.percentage - 1100 / 3500 * 100) < 1e-9
+
+    # 有进行中的小说无法估计时，整体剩余时间也无法估计
+    channel.update("d", 0, 1000)
+    assert channel.aggregate().eta is None
+
+    # 全部结束后剩余时间为 0
+    for novel_id in ("a", "b", "d"):
+        channel.update(novel_id, 0 if novel_id == "d" else 1000, phase="stopped")
+    total = channel.aggregate()
+    assert total.active == 0 and total.rate == 0.0 and total.eta == 0.0
+    print("✅ 汇总进度正常")
+
+
+if __name__ == "__main__":
+    print("开始测试进度通道...")
+
+    try:
+        test_coalescing_per_novel()
+        test_phase_change_notifies_immediately()
+        test_flush_delivers_pending()
+        test_rate_and_eta()
+        test_aggregate()
+        print("\n✅ 所有进度通道测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试质量评分的持久化缓存
+验证重新分析只为改动过的段落提取特征，以及评分器版本变化使旧条目失效
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import utils.quality as quality
+from utils.quality import QualityScorer
+from utils.quality_cache import QualityCache
+from test_quality_parallel import _make_chapters, _normalize
+
+
+class _CountingExtract:
+    """统计实际提取特征的段落"""
+
+    def __init__(self):
+        self.original = quality.extract_features
+        self.texts = []
+
+    def __call__(self, text):
+        self.texts.append(text)
+        return self.original(text)
+
+    def __enter__(self):
+        quality.extract_features = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        quality.extract_features = self.original
+        return False
+
+
+def _section_texts(chapters):
+    scorer = QualityScorer()
+    return {text[start:end] for _, text in chapters for start, end in scorer.split_text_into_spans(text)}
+
+
+def _evaluate(chapters, cache=None):
+    scorer = QualityScorer(max_workers=1, cache=cache)
+    return asyncio.run(scorer.evaluate_document("doc", chapters, "奇幻"))
+
+
+def _edit(chapters):
+    """改写第 2 章的第一段"""
+    edited = list(chapters)
+    idx, text = edited[1]
+    first, rest = text.split("\n\n", 1)
+    edited[1] = (idx, "晨雾散去，城门缓缓打开，商队的驼铃声响彻长街。" + first + "\n\n" + rest)
+    return edited
+
+
+def test_rerun_rescores_changed_sections():
+    """测试重新分析只为新增或改动的段落提取特征，结果与不用缓存时一致"""
+    print("=== 测试只重新评分改动的段落 ===")
+    chapters = _make_chapters(count=4)
+    edited = _edit(chapters)
+    with tempfile.TemporaryDirectory() as root:
+        db_path = os.path.join(root, "quality_cache.db")
+
+        cache = QualityCache(db_path)
+        with _CountingExtract() as extract:
+            first = _evaluate(chapters, cache)
+        assert set(extract.texts) == _section_texts(chapters)
+        cache.close()
+
+        # 重新打开缓存，内容不变时不再提取任何特征
+        cache = QualityCache(db_path)
+        with _CountingExtract() as extract:
+            again = _evaluate(chapters, cache)
+        assert extract.texts == []
+        assert cache.misses == 0 and cache.hits == len(_section_texts(chapters))
+        assert _normalize(again) == _normalize(first)
+
+        # 改动一段后只提取改动的段落
+        with _CountingExtract() as extract:
+            after_edit = _evaluate(edited, cache)
+        changed = _section_texts(edited) - _section_texts(chapters)
+        assert changed and set(extract.texts) == changed
+        assert len(extract.texts) == len(changed)
+        cache.close()
+
+    assert _normalize(after_edit) == _normalize(_evaluate(edited))
+    print("✅ 只重新评分改动的段落")
+
+
+def test_scorer_version_invalidates():
+    """测试评分器版本变化后旧条目不再命中，purge 清除旧版本条目"""
+    print("=== 测试评分器版本使缓存失效 ===")
+    chapters = _make_chapters(count=3)
+    sections = _section_texts(chapters)
+    original_version = quality.SCORER_VERSION
+    with tempfile.TemporaryDirectory() as root:
+        cache = QualityCache(os.path.join(root, "quality_cache.db"))
+        try:
+            _evaluate(chapters, cache)
+
+            quality.SCORER_VERSION = original_version + "-next"
+            cache.hits = cache.misses = 0
+            with _CountingExtract() as extract:
+                _evaluate(chapters, cache)
+            assert set(extract.texts) == sections
+            assert cache.hits == 0
+
+            assert cache.purge(quality.SCORER_VERSION) == len(sections)
+            with _CountingExtract() as extract:
+                _evaluate(chapters, cache)
+            assert extract.texts == []
+
+            # 改回旧版本：旧条目已被清除，需要重新提取
+            quality.SCORER_VERSION = original_version
+            with _CountingExtract() as extract:
+                _evaluate(chapters, cache)
+            assert set(extract.texts) == sections
+        finally:
+            quality.SCORER_VERSION = original_version
+            cache.close()
+    print("✅ 评分器版本使缓存失效")
+
+
+if __name__ == "__main__":
+    print("开始测试质量评分缓存...")
+
+    try:
+        test_rerun_rescores_changed_sections()
+        test_scorer_version_invalidates()
+        print("\n✅ 所有质量缓存测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
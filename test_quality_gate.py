@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试生成过程中的质量闸门
+验证低于阈值的内容会重新生成、重试预算得到遵守，以及闸门指标的记录
+"""
+
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.generator import NovelGenerator
+from utils.quality import QualityScore, GATE_SCORE, GATE_OUTCOMES
+
+
+class _ScriptedScorer:
+    """按内容开头的标记返回预设分数的评分器"""
+
+    context_window = 2000
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.evaluated = []
+
+    async def evaluate_text(self, text, context=None, genre="", use_llm=None):
+        self.evaluated.append(text)
+        overall = next(score for mark, score in self.scores.items() if text.startswith(mark))
+        return QualityScore(overall, overall, overall, overall, overall,
+                            rewrite_suggestion="加强段落衔接", word_count=len(text))
+
+
+def _chunk(mark):
+    return mark + "，少年沿着山路走向远方的城镇。" * 10
+
+
+def _create_generator(scores, retries, budget=10, threshold=60.0):
+    """创建启用质量闸门、用脚本化评分和重新生成的生成器"""
+    generator = NovelGenerator(
+        api_key="test-key-for-testing",
+        quality_gate=True,
+        quality_gate_threshold=threshold,
+        quality_gate_retry_budget=budget,
+        status_callback=lambda message: None,
+    )
+    generator.quality_scorer = _ScriptedScorer(scores)
+    prompts = []
+    pending = list(retries)
+
+    async def fake_generate_text(prompt):
+        prompts.append(prompt)
+        return _chunk(pending.pop(0))
+
+    generator._generate_text = fake_generate_text
+    return generator, prompts
+
+
+def _outcomes():
+    return {outcome: GATE_OUTCOMES.value(outcome=outcome) for outcome in ("accepted", "retry", "kept_best")}
+
+
+def _score_count():
+    return sum(sample["count"] for sample in GATE_SCORE.samples())
+
+
+def test_below_threshold_regenerated():
+    """测试低于阈值的内容按建议重新生成，达标的版本被采用"""
+    print("=== 测试低分内容重新生成 ===")
+    generator, prompts = _create_generator({"初稿": 40, "重写": 75}, retries=["重写"])
+    novel_setup = {"id": "1", "genre": "奇幻"}
+    before, scores_before = _outcomes(), _score_count()
+
+    content = asyncio.run(generator._apply_quality_gate("写下一段", _chunk("初稿"), "前文", novel_setup))
+
+    assert content.startswith("重写")
+    assert len(prompts) == 1 and "加强段落衔接" in prompts[0]
+    assert novel_setup["quality_gate"] == {"checked": 1, "retried": 1, "below_threshold": 0}
+    after = _outcomes()
+    assert after["retry"] - before["retry"] == 1
+    assert after["accepted"] - before["accepted"] == 1
+    assert after["kept_best"] == before["kept_best"]
+    assert _score_count() - scores_before == 2
+
+    # 达标的内容直接通过，不重新生成
+    content = asyncio.run(generator._apply_quality_gate("写下一段", _chunk("重写"), "前文", novel_setup))
+    assert content.startswith("重写") and len(prompts) == 1
+    assert novel_setup["quality_gate"]["checked"] == 2
+    print("✅ 低分内容重新生成正常")
+
+
+def test_retry_budget_respected():
+    """测试单段重试上限和整部小说的重试预算，用尽后保留得分最高的版本"""
+    print("=== 测试重试预算 ===")
+    scores = {"初稿": 30, "重写一": 45, "重写二": 35, "重写三": 40}
+    generator, prompts = _create_generator(scores, retries=["重写一", "重写二", "重写三"], budget=3)
+    novel_setup = {"id": "1", "genre": "奇幻"}
+    before = _outcomes()
+
+    # 第一段用掉单段上限的 2 次重试，保留得分最高的第一次重写
+    first = asyncio.run(generator._apply_quality_gate("写下一段", _chunk("初稿"), "前文", novel_setup))
+    assert first.startswith("重写一")
+    assert len(prompts) == generator.quality_gate_chunk_retries == 2
+
+    # 第二段只剩 1 次预算，第三段不再重试
+    second = asyncio.run(generator._apply_quality_gate("写下一段", _chunk("初稿"), "前文", novel_setup))
+    assert second.startswith("重写三")
+    third = asyncio.run(generator._apply_quality_gate("写下一段", _chunk("初稿"), "前文", novel_setup))
+    assert third.startswith("初稿")
+
+    assert len(prompts) == 3
+    assert novel_setup["quality_gate"] == {"checked": 3, "retried": 3, "below_threshold": 3}
+    after = _outcomes()
+    assert after["retry"] - before["retry"] == 3
+    assert after["kept_best"] - before["kept_best"] == 3
+    assert after["accepted"] == before["accepted"]
+    print("✅ 重试预算正常")
+
+
+if __name__ == "__main__":
+    print("开始测试质量闸门...")
+
+    try:
+        test_below_threshold_regenerated()
+        test_retry_budget_respected()
+        print("\n✅ 所有质量闸门测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试批量 LLM 评审
+验证模型输出的修复解析（代码块、截断、外层对象、越界 id、尾逗号）、
+按数量和 token 分批，以及 token 预算的预留和结算
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.quality_judge import (
+    JudgeItem, TokenBudget, plan_batches, parse_judgement, estimate_tokens, _load_json,
+    SECTION_CHARS,
+)
+
+
+def _entry(idx, score=80, suggestion="保持"):
+    return {"id": idx, "readability": score, "coherence": score, "canon_consistency": score,
+            "genre_fit": score, "rewrite_suggestion": suggestion}
+
+
+def _array(*entries):
+    return json.dumps(list(entries), ensure_ascii=False)
+
+
+def test_load_json_repair():
+    """测试代码块、前后说明文字、尾逗号和截断数组的修复"""
+    print("=== 测试 JSON 修复 ===")
+    expected = [_entry(1), _entry(2, 60)]
+    body = _array(*expected)
+
+    assert _load_json(body) == expected
+    assert _load_json(f"```json\n{body}\n```") == expected
+    assert _load_json(f"好的，评分如下：\n```\n{body}\n```\n以上。") == expected
+    assert _load_json(f"评分结果：{body} 希望对你有帮助") == expected
+
+    # 尾逗号
+    assert _load_json(body[:-1] + ",]") == expected
+    assert _load_json(body.replace('"保持"}', '"保持",}', 1)) == expected
+
+    # 截断：保留完整的对象
+    truncated = body[:-1] + ', {"id": 3, "readability": 7'
+    assert _load_json(truncated) == expected
+    assert _load_json('[{"id": 1, "readabil') is None
+
+    assert _load_json("无法评估") is None
+    assert _load_json("") is None
+    print("✅ JSON 修复正常")
+
+
+def test_parse_judgement():
+    """测试按 id 对应片段，外层对象、单个对象和越界 id 的处理"""
+    print("=== 测试解析评审结果 ===")
+    # id 顺序与返回顺序无关
+    results = parse_judgement(_array(_entry(2, 60), _entry(1, 90)), 2)
+    assert results[0]["readability"] == 90 and results[1]["readability"] == 60
+
+    # 外层对象包裹数组
+    wrapped = json.dumps({"results": [_entry(1, 70), _entry(2, 50)]})
+    results = parse_judgement(f"```json\n{wrapped}\n```", 2)
+    assert [results[i]["coherence"] for i in (0, 1)] == [70, 50]
+
+    # 只有一个片段时直接返回对象
+    results = parse_judgement(json.dumps(_entry(1, 66)), 1)
+    assert results == {0: {**{k: 66.0 for k in ("readability", "coherence", "canon_consistency", "genre_fit")},
+                           "rewrite_suggestion": "保持"}}
+
+    # 越界或缺失的 id 按位置对应
+    entries = [_entry(7, 40), _entry(None, 50), _entry(0, 60)]
+    del entries[1]["id"]
+    results = parse_judgement(_array(*entries), 3)
+    assert [results[i]["readability"] for i in (0, 1, 2)] == [40, 50, 60]
+    # 重复的 id 只取第一个，已有结果的片段不被覆盖
+    results = parse_judgement(_array(_entry(1, 40), _entry(1, 90)), 2)
+    assert list(results) == [0] and results[0]["readability"] == 40
+    results = parse_judgement(_array(_entry(1), _entry(2), _entry(5)), 2)
+    assert sorted(results) == [0, 1]
+
+    # 分数限制在 0～100，缺少维度或非数值的条目丢弃
+    bad = _entry(2)
+    del bad["genre_fit"]
+    nan = _entry(3)
+    nan["coherence"] = "NaN"
+    odd = _entry(1, 150)
+    odd["readability"] = "-5"
+    odd["rewrite_suggestion"] = ["不是字符串"]
+    results = parse_judgement(_array(odd, bad, nan), 3)
+    assert list(results) == [0]
+    assert results[0]["readability"] == 0.0 and results[0]["coherence"] == 100.0
+    assert results[0]["rewrite_suggestion"] == ""
+
+    # 截断加尾逗号：解析出完整的条目
+    truncated = _array(_entry(1, 75), _entry(2, 65))[:-1] + ', {"id": 3, "read'
+    assert sorted(parse_judgement(truncated, 3)) == [0, 1]
+    assert parse_judgement("抱歉，我无法完成", 2) == {}
+    assert parse_judgement('"只是字符串"', 1) == {}
+    print("✅ 解析评审结果正常")
+
+
+def test_plan_batches():
+    """测试连续片段按数量和估计 token 数分批，过长的片段单独成批"""
+    print("=== 测试分批 ===")
+    items = [JudgeItem("字" * 100) for _ in range(7)]
+    assert plan_batches(items, max_items=3, max_tokens=10_000) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert plan_batches(items, max_items=10, max_tokens=250) == [[0, 1], [2, 3], [4, 5], [6]]
+    assert plan_batches([], max_items=3, max_tokens=100) == []
+
+    # 单个片段超过 token 上限时仍然评审，独占一批
+    items = [JudgeItem("短" * 10), JudgeItem("长" * 5000), JudgeItem("短" * 10)]
+    assert plan_batches(items, max_items=8, max_tokens=1000) == [[0], [1], [2]]
+    # 只计算实际发送的部分
+    assert estimate_tokens(items[1].text[:SECTION_CHARS]) == SECTION_CHARS
+    assert plan_batches(items, max_items=8, max_tokens=SECTION_CHARS + 20) == [[0, 1, 2]]
+
+    # 英文按四个字符一个 token 估计
+    assert estimate_tokens("abcdefgh") == 2 and estimate_tokens("你好ab") == 3
+    print("✅ 分批正常")
+
+
+def test_token_budget():
+    """测试预留不超过剩余额度，结算时按实际用量计入"""
+    print("=== 测试 token 预算 ===")
+    budget = TokenBudget(1000)
+    assert budget.reserve(600)
+    assert budget.remaining == 400
+    # 并发的第二个请求不能超额预留
+    assert not budget.reserve(500)
+    assert budget.reserve(400)
+    assert budget.remaining == 0
+
+    budget.settle(600, 450)
+    assert (budget.used, budget.reserved, budget.remaining) == (450, 400, 150)
+    # 请求失败时预留全部归还
+    budget.settle(400, 0)
+    assert (budget.used, budget.reserved, budget.remaining) == (450, 0, 550)
+    assert budget.reserve(550) and not budget.reserve(1)
+    budget.settle(550, 700)
+    assert budget.used == 1150 and budget.remaining == -150
+    assert not budget.reserve(1)
+    print("✅ token 预算正常")
+
+
+if __name__ == "__main__":
+    print("开始测试批量 LLM 评审...")
+
+    try:
+        test_load_json_repair()
+        test_parse_judgement()
+        test_plan_batches()
+        test_token_budget()
+        print("\n✅ 所有批量评审测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
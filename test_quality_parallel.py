@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试质量评分的多进程路径
+验证单进程和 ProcessPoolExecutor 分片评分得到相同的结果（processing_time 除外）
+"""
+
+import sys
+import os
+import random
+import asyncio
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import utils.quality as quality
+from utils.quality import QualityScorer
+
+SENTENCES = [
+    "林逸握紧手中的长剑，望向远处燃烧的城墙。",
+    "“我们必须在天亮前离开这里。”苏晴低声说道。",
+    "然而，魔法结界的光芒正在一点点暗淡下去。",
+    "他想起师父临终前的嘱托，心中涌起一阵酸楚。",
+    "因此，众人决定穿过北方的森林，寻找失落的神殿。",
+    "夜风吹过山谷，带来远方野兽的低吼。",
+    "突然，一道金光从天而降，照亮了整片废墟。",
+    "“你真的相信那个预言吗？”老人问道。",
+]
+
+
+def _make_chapters(count=12, seed=7):
+    """生成长度和内容各不相同的章节"""
+    rng = random.Random(seed)
+    chapters = []
+    for idx in range(1, count + 1):
+        paragraphs = []
+        for _ in range(rng.randint(8, 20)):
+            paragraphs.append("".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 8))))
+        chapters.append((idx, "\n\n".join(paragraphs)))
+    return chapters
+
+
+def _without_timing(score):
+    return (score.overall, score.readability, score.coherence, score.canon_consistency,
+            score.genre_fit, score.rewrite_suggestion, score.word_count)
+
+
+def _normalize(document):
+    """文档评分结果中除 processing_time 以外的全部内容"""
+    return (
+        document.overall_score,
+        document.total_word_count,
+        [
+            (
+                chapter.idx,
+                _without_timing(chapter.score),
+                [(s.idx, s.start_pos, s.end_pos, s.text, _without_timing(s.score)) for s in chapter.sections],
+            )
+            for chapter in document.chapters
+        ],
+    )
+
+
+class _WarningCollector(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_serial_and_parallel_equal():
+    """测试单进程和多进程评分结果一致，且多进程路径确实被使用"""
+    print("=== 测试单进程与多进程评分一致 ===")
+    chapters = _make_chapters()
+    serial = asyncio.run(QualityScorer(max_workers=1).evaluate_document("doc", chapters, "奇幻"))
+
+    # 降低阈值，让测试文档走多进程分片
+    original_min_chars = quality.PARALLEL_MIN_CHARS
+    quality.PARALLEL_MIN_CHARS = 1000
+    collector = _WarningCollector()
+    quality.quality_logger.addHandler(collector)
+    try:
+        assert sum(len(text) for _, text in chapters) >= quality.PARALLEL_MIN_CHARS
+        parallel = asyncio.run(QualityScorer(max_workers=3).evaluate_document("doc", chapters, "奇幻"))
+    finally:
+        quality.PARALLEL_MIN_CHARS = original_min_chars
+        quality.quality_logger.removeHandler(collector)
+
+    assert not collector.messages, collector.messages
+    assert len(serial.chapters) == len(chapters)
+    assert [c.idx for c in parallel.chapters] == [idx for idx, _ in chapters]
+    assert _normalize(parallel) == _normalize(serial)
+    # 多进程结果重新引用本地章节文本
+    assert all(c.text == text for c, (_, text) in zip(parallel.chapters, chapters))
+    print("✅ 单进程与多进程评分一致")
+
+
+if __name__ == "__main__":
+    print("开始测试质量评分多进程路径...")
+
+    try:
+        test_serial_and_parallel_equal()
+        print("\n✅ 所有多进程评分测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试 LLM 评估规划
+验证 t 分布临界值、按章节比例分配抽样、临界段落的选择顺序，
+以及文档得分估计在没有样本、只有一个样本和有限总体校正时的结果
+"""
+
+import sys
+import os
+import math
+import random
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.quality_planner import (
+    t_quantile_95, allocate_sample, plan_llm_evaluation, estimate_document_score,
+)
+
+
+def test_t_quantile():
+    """测试小自由度使用精确值，更大的自由度与查表值一致并单调下降"""
+    print("=== 测试 t 分布临界值 ===")
+    assert [t_quantile_95(df) for df in range(1, 6)] == [12.706, 4.303, 3.182, 2.776, 2.571]
+    for df, expected in ((6, 2.447), (8, 2.306), (10, 2.228), (20, 2.086), (30, 2.042)):
+        assert abs(t_quantile_95(df) - expected) < 0.002, (df, t_quantile_95(df))
+    values = [t_quantile_95(df) for df in range(1, 100)]
+    assert all(a > b for a, b in zip(values, values[1:]))
+    assert values[-1] > 1.959964
+    print("✅ t 分布临界值正常")
+
+
+def test_allocate_sample():
+    """测试按比例分配、最大余数补齐，以及超过总数和非正数的情况"""
+    print("=== 测试按比例分配抽样 ===")
+    assert allocate_sample([10, 20, 30], 6) == [1, 2, 3]
+    # 余数最大的章节多分到一个
+    assert allocate_sample([5, 3, 2], 4) == [2, 1, 1]
+    allocation = allocate_sample([1, 1, 1], 2)
+    assert sum(allocation) == 2 and max(allocation) == 1
+    # 不超过每章的段落数
+    assert allocate_sample([2, 3], 100) == [2, 3]
+    assert allocate_sample([4, 4], 0) == [0, 0]
+    assert allocate_sample([4, 4], -1) == [0, 0]
+    for n in range(0, 31):
+        allocation = allocate_sample([7, 1, 12, 3, 7], n)
+        assert sum(allocation) == n
+        assert all(a <= size for a, size in zip(allocation, [7, 1, 12, 3, 7]))
+    print("✅ 按比例分配抽样正常")
+
+
+def test_plan_capacity_covers_all():
+    """测试容量足够时全部段落都作为随机样本，容量为 0 时不评估"""
+    print("=== 测试容量足够和容量为 0 ===")
+    scores = [80, 40, 65, 90]
+    strata = [1, 1, 2, 2]
+    plan = plan_llm_evaluation(scores, strata, capacity=4, threshold=60)
+    assert plan.sampled == [0, 1, 2, 3] and plan.targeted == []
+    plan = plan_llm_evaluation(scores, strata, capacity=10, threshold=60)
+    assert plan.selected == [0, 1, 2, 3]
+    plan = plan_llm_evaluation(scores, strata, capacity=0, threshold=60)
+    assert plan.sampled == [] and plan.targeted == [] and plan.selected == []
+    print("✅ 容量足够和容量为 0 正常")
+
+
+def test_plan_borderline_ordering():
+    """测试随机样本按章节分层，其余容量按与阈值的距离选择临界和低分段落"""
+    print("=== 测试临界段落顺序 ===")
+    # 阈值 60，临界带为 [60, 70)；90 分的段落不是候选
+    scores = [90, 61, 95, 30, 69, 58, 90, 90, 50, 90, 90, 90]
+    strata = [1] * 6 + [2] * 6
+    plan = plan_llm_evaluation(scores, strata, capacity=8, threshold=60, rng=random.Random(3))
+
+    # 至少一半容量用于随机样本，两章各抽一半
+    assert len(plan.sampled) == 4
+    assert sum(1 for i in plan.sampled if strata[i] == 1) == 2
+    assert sum(1 for i in plan.sampled if strata[i] == 2) == 2
+    assert plan.sampled == sorted(plan.sampled)
+
+    candidates = sorted((i for i, s in enumerate(scores) if s < 70), key=lambda i: abs(scores[i] - 60))
+    assert candidates == [1, 5, 4, 8, 3]
+    expected = [i for i in candidates if i not in plan.sampled][:4]
+    assert plan.targeted == expected
+    assert not set(plan.targeted) & set(plan.sampled)
+    assert len(plan.selected) == len(plan.sampled) + len(plan.targeted) <= 8
+
+    # 候选不足时剩余容量都用于随机样本
+    plan = plan_llm_evaluation([90] * 10 + [61], [1] * 11, capacity=6, threshold=60, rng=random.Random(1))
+    assert len(plan.sampled) + len(plan.targeted) == 6
+    assert len(plan.sampled) >= 5
+    # 相同种子得到相同的计划
+    a = plan_llm_evaluation(scores, strata, capacity=8, threshold=60, rng=random.Random(9))
+    b = plan_llm_evaluation(scores, strata, capacity=8, threshold=60, rng=random.Random(9))
+    assert (a.sampled, a.targeted) == (b.sampled, b.targeted)
+    print("✅ 临界段落顺序正常")
+
+
+def test_estimate_without_sample():
+    """测试没有随机样本时返回启发式均值，定向评估的段落不参与校正"""
+    print("=== 测试没有样本的估计 ===")
+    heuristic = [60, 80, 70]
+    strata = [1, 1, 2]
+    # 文档得分是各章均值的平均：(70 + 70) / 2
+    result = estimate_document_score(heuristic, {}, strata, [])
+    assert (result.estimate, result.low, result.high) == (70.0, 70.0, 70.0)
+    assert result.sample_size == 0 and result.judged == 0
+
+    result = estimate_document_score(heuristic, {0: 20.0}, strata, [])
+    assert result.estimate == 70.0 and result.sample_size == 0 and result.judged == 1
+    # 抽中但没有评估结果的段落不计入样本
+    result = estimate_document_score(heuristic, {}, strata, [1])
+    assert result.sample_size == 0
+    print("✅ 没有样本的估计正常")
+
+
+def test_estimate_single_sample():
+    """测试只有一个样本时按差值校正，但区间为整个评分范围"""
+    print("=== 测试单个样本的估计 ===")
+    heuristic = [60, 80, 70]
+    strata = [1, 1, 2]
+    result = estimate_document_score(heuristic, {1: 90.0, 2: 10.0}, strata, [1])
+    assert result.estimate == 70.0 + 10.0
+    assert (result.low, result.high) == (0.0, 100.0)
+    assert result.sample_size == 1 and result.judged == 2
+    print("✅ 单个样本的估计正常")
+
+
+def test_estimate_finite_population_correction():
+    """测试方差乘以有限总体校正系数，全部段落都抽中时区间收缩为一点"""
+    print("=== 测试有限总体校正 ===")
+    heuristic = [50.0 + i for i in range(10)]
+    strata = [1] * 10
+    diffs = {0: 4.0, 3: -2.0, 6: 6.0, 9: 0.0}
+    judged = {i: heuristic[i] + d for i, d in diffs.items()}
+    sampled = sorted(diffs)
+
+    result = estimate_document_score(heuristic, judged, strata, sampled)
+    n, total = len(diffs), len(heuristic)
+    mean_diff = sum(diffs.values()) / n
+    assert abs(result.estimate - (sum(heuristic) / total + mean_diff)) < 1e-9
+    variance = sum((d - mean_diff) ** 2 for d in diffs.values()) / (n * (n - 1)) * (1 - n / total)
+    half_width = 3.182 * math.sqrt(variance)
+    assert abs(result.low - (result.estimate - half_width)) < 1e-9
+    assert abs(result.high - (result.estimate + half_width)) < 1e-9
+    assert result.sample_size == 4
+
+    # 全部抽中：没有抽样误差
+    diffs_all = {i: (i % 3) * 2.0 - 2.0 for i in range(10)}
+    judged = {i: heuristic[i] + d for i, d in diffs_all.items()}
+    result = estimate_document_score(heuristic, judged, strata, list(range(10)))
+    assert abs(result.estimate - (sum(heuristic) / 10 + sum(diffs_all.values()) / 10)) < 1e-9
+    assert result.low == result.high == result.estimate
+
+    # 区间限制在 0～100 分之内
+    result = estimate_document_score([99.0] * 6, {0: 100.0, 1: 90.0}, [1] * 6, [0, 1])
+    assert 0.0 <= result.low <= result.estimate <= result.high == 100.0
+    print("✅ 有限总体校正正常")
+
+
+if __name__ == "__main__":
+    print("开始测试 LLM 评估规划...")
+
+    try:
+        test_t_quantile()
+        test_allocate_sample()
+        test_plan_capacity_covers_all()
+        test_plan_borderline_ordering()
+        test_estimate_without_sample()
+        test_estimate_single_sample()
+        test_estimate_finite_population_correction()
+        print("\n✅ 所有评估规划测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
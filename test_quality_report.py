@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试质量报告的保存和读取
+验证列式报告（v2）的往返结果、旧版单个 JSON 报告的读取，
+以及读取时传入或不传入章节正文时段落文本的取值
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.quality import QualityScorer, REPORT_FORMAT, REPORT_VERSION, SCORE_COLUMNS
+from test_quality_parallel import _make_chapters, _normalize
+
+
+def _evaluate(chapters):
+    scorer = QualityScorer(max_workers=1)
+    document = asyncio.run(scorer.evaluate_document("doc-1", chapters, "奇幻"))
+    document.overall_interval = (61.5, 78.25)
+    return scorer, document
+
+
+def _scores(document):
+    """包括 processing_time 在内的全部分数"""
+    return [
+        (chapter.idx, [getattr(chapter.score, name) for name in SCORE_COLUMNS], chapter.score.rewrite_suggestion,
+         [(s.idx, s.start_pos, s.end_pos, [getattr(s.score, name) for name in SCORE_COLUMNS],
+           s.score.rewrite_suggestion) for s in chapter.sections])
+        for chapter in document.chapters
+    ]
+
+
+def _round_time(document):
+    for chapter in document.chapters:
+        chapter.score.processing_time = round(chapter.score.processing_time, 6)
+        for section in chapter.sections:
+            section.score.processing_time = round(section.score.processing_time, 6)
+
+
+def test_columnar_round_trip():
+    """测试列式报告保存后读取得到相同的文档评分"""
+    print("=== 测试列式报告往返 ===")
+    chapters = _make_chapters(count=4)
+    scorer, document = _evaluate(chapters)
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "report.jsonl")
+        scorer.save_quality_report(document, path)
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        loaded = scorer.load_quality_report(path, chapters)
+
+    # 一行文件头，每章一行，不保存正文
+    header = json.loads(lines[0])
+    assert header["format"] == REPORT_FORMAT and header["version"] == REPORT_VERSION
+    assert header["score_columns"] == list(SCORE_COLUMNS)
+    assert len(header["suggestions"]) == len(set(header["suggestions"]))
+    assert len(lines) == 1 + len(chapters)
+    assert chapters[0][1][:20] not in "\n".join(lines)
+
+    _round_time(document)
+    assert _normalize(loaded) == _normalize(document)
+    assert _scores(loaded) == _scores(document)
+    assert (loaded.doc_id, loaded.genre, loaded.language, loaded.created_at) == (
+        document.doc_id, document.genre, document.language, document.created_at)
+    assert loaded.overall_interval == (61.5, 78.25)
+    print("✅ 列式报告往返正常")
+
+
+def test_legacy_json_fallback():
+    """测试旧版单个 JSON 文档格式的报告（多行和单行）仍能读取"""
+    print("=== 测试旧版报告 ===")
+    chapters = _make_chapters(count=3, seed=11)
+    scorer, document = _evaluate(chapters)
+    legacy = scorer.to_dict(document)
+    # 旧版报告没有置信区间
+    del legacy["overall_interval"]
+
+    with tempfile.TemporaryDirectory() as root:
+        for name, indent in (("pretty.json", 2), ("compact.json", None)):
+            path = os.path.join(root, name)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(legacy, f, ensure_ascii=False, indent=indent)
+            loaded = scorer.load_quality_report(path, chapters)
+            assert _normalize(loaded) == _normalize(document)
+            assert _scores(loaded) == _scores(document)
+            assert loaded.overall_interval is None
+    print("✅ 旧版报告读取正常")
+
+
+def test_lazy_text():
+    """测试传入章节正文时段落文本引用正文，不传或缺少章节时为空字符串"""
+    print("=== 测试段落文本 ===")
+    chapters = _make_chapters(count=3, seed=5)
+    scorer, document = _evaluate(chapters)
+    texts = dict(chapters)
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "report.jsonl")
+        scorer.save_quality_report(document, path)
+
+        loaded = scorer.load_quality_report(path, chapters)
+        for chapter in loaded.chapters:
+            assert chapter.text is texts[chapter.idx]
+            assert "".join(s.text for s in chapter.sections)
+            for section in chapter.sections:
+                assert section.source is texts[chapter.idx]
+                assert section.text == texts[chapter.idx][section.start_pos:section.end_pos]
+                assert section.text.strip()
+
+        # 不传正文：分数完整，文本为空
+        bare = scorer.load_quality_report(path)
+        assert _scores(bare) == _scores(loaded)
+        for chapter in bare.chapters:
+            assert chapter.text == ""
+            assert all(section.source is None and section.text == "" for section in chapter.sections)
+
+        # 只传部分章节：其他章节文本为空
+        partial = scorer.load_quality_report(path, chapters[1:2])
+        with_text = [chapter.idx for chapter in partial.chapters
+                     if chapter.text and all(s.text for s in chapter.sections)]
+        assert with_text == [chapters[1][0]]
+        assert all(s.text == "" for s in partial.chapters[0].sections)
+
+        # 之后再附加正文也可以
+        bare.chapters[0].attach_text(texts[bare.chapters[0].idx])
+        assert [s.text for s in bare.chapters[0].sections] == [s.text for s in loaded.chapters[0].sections]
+    print("✅ 段落文本正常")
+
+
+if __name__ == "__main__":
+    print("开始测试质量报告...")
+
+    try:
+        test_columnar_round_trip()
+        test_legacy_json_fallback()
+        test_lazy_text()
+        print("\n✅ 所有质量报告测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试质量评分的分段偏移
+验证相同段落重复出现时段落、句子和小节的偏移仍然正确，
+以及每个小节的上下文不超过 context_window
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.quality import QualityScorer, _paragraph_spans, _sentence_spans
+
+PASSAGE = "林逸握紧手中的长剑，望向远处燃烧的城墙。“我们必须在天亮前离开这里。”苏晴低声说道。"
+
+
+def _assert_ordered(spans, text):
+    """偏移递增、互不重叠，并且都在文本范围内"""
+    previous_end = 0
+    for start, end in spans:
+        assert previous_end <= start < end <= len(text), (previous_end, start, end)
+        previous_end = end
+
+
+def test_paragraph_spans_repeated():
+    """测试重复的段落各自对应自己的位置，首尾空白被去掉"""
+    print("=== 测试重复段落的偏移 ===")
+    text = f"  {PASSAGE}\n\n{PASSAGE}  \n \n\n\t{PASSAGE}\n\n   \n\n{PASSAGE}"
+    spans = _paragraph_spans(text)
+    assert len(spans) == 4
+    _assert_ordered(spans, text)
+    assert all(text[start:end] == PASSAGE for start, end in spans)
+    assert spans[0][0] == 2
+    assert spans[-1][1] == len(text)
+    assert _paragraph_spans("") == [] and _paragraph_spans(" \n\n \n") == []
+    print("✅ 重复段落的偏移正常")
+
+
+def test_sentence_spans_repeated():
+    """测试由重复句子组成的长段落按句子边界切分，偏移连续并覆盖整段"""
+    print("=== 测试句子切分偏移 ===")
+    sentence = "夜风吹过山谷，带来远方野兽的低吼。"
+    prefix = "第一章\n\n"
+    text = prefix + sentence * 40
+    start, end = len(prefix), len(text)
+    spans = _sentence_spans(text, start, end, 100)
+
+    assert spans[0][0] == start and spans[-1][1] == end
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+    assert all(e - s <= 100 for s, e in spans)
+    # 在句子结尾处切分：每个小节都是完整句子的重复
+    per_span = 100 // len(sentence)
+    assert all(text[s:e] == sentence * ((e - s) // len(sentence)) for s, e in spans)
+    assert all((e - s) // len(sentence) == per_span for s, e in spans[:-1])
+
+    # 超过长度上限的单个句子按固定长度切开
+    long_sentence = "长" * 250 + "。"
+    spans = _sentence_spans(long_sentence + sentence, 0, len(long_sentence) + len(sentence), 100)
+    assert spans[:2] == [(0, 100), (100, 200)]
+    assert spans[-1][1] == len(long_sentence) + len(sentence)
+    assert all(e - s <= 100 for s, e in spans)
+    print("✅ 句子切分偏移正常")
+
+
+def test_split_text_repeated_passages():
+    """测试整章由重复段落组成时，小节偏移与文本一一对应"""
+    print("=== 测试重复段落的小节偏移 ===")
+    scorer = QualityScorer()
+    long_paragraph = PASSAGE * 40  # 超过 1.5 倍上限，单独按句子切分
+    paragraphs = [PASSAGE] * 30 + [long_paragraph] + [PASSAGE] * 30
+    text = "\n\n".join(paragraphs)
+
+    spans = scorer.split_text_into_spans(text, max_section_length=500)
+    _assert_ordered(spans, text)
+    sections = [text[start:end] for start, end in spans]
+    assert sections == scorer.split_text_into_sections(text, max_section_length=500)
+    # 内容相同的小节偏移不同
+    repeated = [span for span, section in zip(spans, sections) if section == sections[0]]
+    assert len(repeated) > 1 and len({start for start, _ in repeated}) == len(repeated)
+
+    # 去掉段落分隔后，小节依次拼接还原全文
+    assert "".join(section.replace("\n\n", "") for section in sections) == text.replace("\n\n", "")
+    for start, end in spans:
+        assert text[start:end].strip() == text[start:end]
+        assert end - start <= 500 or "\n\n" not in text[start:end]
+    # 超长段落不与相邻段落合并
+    long_start = text.index(long_paragraph)
+    long_spans = [(s, e) for s, e in spans if long_start <= s < long_start + len(long_paragraph)]
+    assert long_spans[0][0] == long_start
+    assert long_spans[-1][1] == long_start + len(long_paragraph)
+    print("✅ 重复段落的小节偏移正常")
+
+
+def test_section_context_window():
+    """测试小节上下文不超过 context_window，前文不足时用前几章的上下文补足"""
+    print("=== 测试小节上下文长度 ===")
+    window = 300
+    scorer = QualityScorer(context_window=window)
+    text = "\n\n".join([PASSAGE] * 40)
+    previous = "\n\n第1章: " + PASSAGE * 50 + "..."
+    spans = scorer.split_text_into_spans(text, max_section_length=200)
+    assert len(spans) > 5
+
+    assert scorer._section_context(text, None, 0, spans[0][0]) is None
+    for i, (start, _) in enumerate(spans):
+        for context in (None, "", previous):
+            section_context = scorer._section_context(text, context, i, start)
+            if i == 0 and not context:
+                continue
+            assert len(section_context) <= window, (i, len(section_context))
+            # 紧邻小节的前文在末尾
+            preceding = text[max(0, start - window):start].rstrip()
+            assert section_context.endswith(preceding)
+            if context and start < window:
+                # 前文不足时由前几章的上下文（取其末尾）补足
+                assert section_context == previous[-(window - start):] + preceding
+            elif not context:
+                assert section_context == preceding
+
+    # 前几章的上下文本身超过窗口时只取末尾
+    section_context = scorer._section_context(text, previous, 0, 0)
+    assert section_context == previous[-window:]
+    print("✅ 小节上下文长度正常")
+
+
+if __name__ == "__main__":
+    print("开始测试分段偏移...")
+
+    try:
+        test_paragraph_spans_repeated()
+        test_sentence_spans_repeated()
+        test_split_text_repeated_passages()
+        test_section_context_window()
+        print("\n✅ 所有分段偏移测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试低分小节批量重写
+验证乱序目标的定位和补丁应用、原文已变化的小节被跳过、重叠补丁被拒绝，
+写入后撤销恢复原始字节、文件再次修改后拒绝撤销，
+以及生成器未运行时单独重写和批量生成都能发起请求并关闭会话
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.generator import NovelGenerator
+from core.section_rewriter import (
+    BatchRewriter, locate_sections, apply_patches, write_patched, undo_last_rewrite, journal_path_for,
+)
+from utils.novel_index import NovelIndex
+from utils.quality import QualityScorer
+
+SENTENCES = [
+    "林逸握紧手中的长剑，望向远处燃烧的城墙。",
+    "“我们必须在天亮前离开这里。”苏晴低声说道。",
+    "然而，魔法结界的光芒正在一点点暗淡下去。",
+    "他想起师父临终前的嘱托，心中涌起一阵酸楚。",
+    "夜风吹过山谷，带来远方野兽的低吼。",
+]
+
+
+def _novel():
+    """三章、每章若干长段落的小说"""
+    parts = []
+    for number in range(1, 4):
+        parts.append(f"第{number}章 旅程之{number}\n\n")
+        paragraphs = [
+            "".join(SENTENCES[(number + p + i) % len(SENTENCES)] for i in range(30))
+            for p in range(4)
+        ]
+        parts.append("\n\n".join(paragraphs) + "\n\n")
+    return "".join(parts)
+
+
+def _write_bytes(path, text, newline):
+    with open(path, 'w', encoding='utf-8', newline=newline) as f:
+        f.write(text)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _analyze(path):
+    """按界面的方式分析小说：结构索引切章，启发式评分"""
+    text = _read(path)
+    index = NovelIndex.for_novel(path, text)
+    chapters = index.split_chapters(text)
+    doc = asyncio.run(QualityScorer(max_workers=1).evaluate_document("novel", chapters, "奇幻"))
+    return text, index, doc
+
+
+def _targets(doc):
+    """每章各选一个小节，按倒序给出"""
+    targets = []
+    for chapter in doc.chapters:
+        assert len(chapter.sections) >= 2
+        targets.append((chapter, chapter.sections[len(chapter.sections) // 2]))
+    return list(reversed(targets))
+
+
+def test_locate_and_apply_out_of_order():
+    """测试乱序目标定位为按偏移排序的补丁，应用后只有这些范围被替换"""
+    print("=== 测试定位和应用补丁 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "奇幻_1.txt")
+        _write_bytes(path, _novel(), None)
+        text, index, doc = _analyze(path)
+        targets = _targets(doc)
+
+        patches, skipped = locate_sections(text, index, targets)
+        assert skipped == []
+        assert [p.chapter_idx for p in patches] == [1, 2, 3]
+        assert [p.start for p in patches] == sorted(p.start for p in patches)
+        for patch in patches:
+            assert text[patch.start:patch.end] == patch.original
+
+        for patch in patches:
+            patch.replacement = f"【第{patch.chapter_idx}章重写的小节】"
+        new_text, spans = apply_patches(text, patches)
+
+        expected = text
+        for patch in reversed(patches):
+            expected = expected[:patch.start] + patch.replacement + expected[patch.end:]
+        assert new_text == expected
+        for patch, (start, end) in zip(patches, spans):
+            assert new_text[start:end] == patch.replacement
+    print("✅ 定位和应用补丁正常")
+
+
+def test_skip_changed_sections():
+    """测试分析之后原文被改动的小节被跳过，其余小节照常定位"""
+    print("=== 测试跳过已变化的小节 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "奇幻_1.txt")
+        _write_bytes(path, _novel(), None)
+        text, index, doc = _analyze(path)
+        targets = _targets(doc)
+        patches, _ = locate_sections(text, index, targets)
+
+        # 第 2 章被选中的小节在分析后改了一个字
+        chapter, section = next(t for t in targets if t[0].idx == 2)
+        patch = next(p for p in patches if p.chapter_idx == 2)
+        changed_text = (text[:patch.start] + patch.original.replace("长剑", "短剑", 1)
+                        + text[patch.end:])
+        assert changed_text != text and len(changed_text) == len(text)
+
+        patches, skipped = locate_sections(changed_text, NovelIndex.build(changed_text), targets)
+        assert skipped == [(2, section.idx)]
+        assert [p.chapter_idx for p in patches] == [1, 3]
+    print("✅ 跳过已变化的小节正常")
+
+
+def test_reject_overlapping_patches():
+    """测试重叠的补丁被拒绝"""
+    print("=== 测试拒绝重叠补丁 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "奇幻_1.txt")
+        _write_bytes(path, _novel(), None)
+        text, index, doc = _analyze(path)
+        chapter = doc.chapters[0]
+        targets = [(chapter, chapter.sections[0]), (chapter, chapter.sections[1]), (chapter, chapter.sections[0])]
+        try:
+            locate_sections(text, index, targets)
+            assert False, "应当拒绝重叠的补丁"
+        except ValueError as e:
+            assert "重叠" in str(e)
+    print("✅ 拒绝重叠补丁正常")
+
+
+def test_write_and_undo_restore_bytes():
+    """测试写入补丁集后撤销，文件恢复为原始字节（LF 和 CRLF）"""
+    print("=== 测试撤销恢复原始字节 ===")
+    with tempfile.TemporaryDirectory() as root:
+        for newline in ("\n", "\r\n"):
+            path = os.path.join(root, f"奇幻_{len(newline)}.txt")
+            original_bytes = _write_bytes(path, _novel(), newline)
+            text, index, doc = _analyze(path)
+            patches, _ = locate_sections(text, index, _targets(doc))
+            for patch in patches:
+                patch.replacement = f"第{patch.chapter_idx}章的新内容。\n第二行。"
+
+            new_text, new_index = write_patched(path, text, patches)
+            assert _read(path) == new_text
+            with open(path, 'rb') as f:
+                written = f.read()
+            assert written != original_bytes
+            # 保留文件原有的换行符，结构索引按它计算字节偏移
+            assert written.count(b"\r\n") == (new_text.count("\n") if newline == "\r\n" else 0)
+            assert new_index.newline == newline and new_index.is_current(path)
+            assert new_index.read_chapter(path, 2) == new_index.split_chapters(new_text)[1][1]
+            assert os.path.exists(journal_path_for(path))
+
+            assert undo_last_rewrite(path) == len(patches)
+            with open(path, 'rb') as f:
+                assert f.read() == original_bytes
+            assert not os.path.exists(journal_path_for(path))
+            assert NovelIndex.load(path).is_current(path)
+    print("✅ 撤销恢复原始字节正常")
+
+
+def test_undo_refused_after_later_edit():
+    """测试重写之后文件又被修改时拒绝撤销，文件和撤销记录保持不变"""
+    print("=== 测试修改后拒绝撤销 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "奇幻_1.txt")
+        _write_bytes(path, _novel(), None)
+        text, index, doc = _analyze(path)
+        patches, _ = locate_sections(text, index, _targets(doc))
+        for patch in patches:
+            patch.replacement = "重写后的内容。"
+        new_text, _ = write_patched(path, text, patches)
+
+        edited = new_text + "后来又续写了一段。\n"
+        _write_bytes(path, edited, None)
+        with open(journal_path_for(path), 'rb') as f:
+            journal = f.read()
+        try:
+            undo_last_rewrite(path)
+            assert False, "应当拒绝撤销"
+        except ValueError as e:
+            assert "已被修改" in str(e)
+        assert _read(path) == edited
+        with open(journal_path_for(path), 'rb') as f:
+            assert f.read() == journal
+
+        # 没有撤销记录时同样拒绝
+        os.remove(journal_path_for(path))
+        try:
+            undo_last_rewrite(path)
+            assert False, "应当拒绝撤销"
+        except ValueError:
+            pass
+    print("✅ 修改后拒绝撤销正常")
+
+
+def _idle_generator():
+    """未在生成中的生成器：和真实接口一样，不在运行状态时不发起请求"""
+    generator = NovelGenerator(api_key="test-key-for-testing", status_callback=lambda message: None)
+    assert not generator.running
+    calls = {"prompts": [], "closed": 0}
+
+    async def fake_generate_content(prompt, novel_setup):
+        if not generator.running:
+            return ""
+        calls["prompts"].append(prompt)
+        return f"  重写后的第{len(calls['prompts'])}个小节。  "
+
+    async def fake_close_session():
+        calls["closed"] += 1
+
+    generator._generate_content = fake_generate_content
+    generator.close_session = fake_close_session
+    return generator, calls
+
+
+def test_rewrite_one_when_idle():
+    """测试生成器未运行时单独重写一个小节也能生成内容，结束后恢复状态并关闭会话"""
+    print("=== 测试单独重写小节 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "奇幻_1.txt")
+        _write_bytes(path, _novel(), None)
+        _, _, doc = _analyze(path)
+        section = doc.chapters[0].sections[0]
+
+        generator, calls = _idle_generator()
+        result = asyncio.run(BatchRewriter(generator).rewrite_one(section))
+        assert result == "重写后的第1个小节。"
+        assert section.score.rewrite_suggestion in calls["prompts"][0]
+        assert not generator.running
+        assert calls["closed"] == 1
+    print("✅ 单独重写小节正常")
+
+
+def test_generate_batch_when_idle():
+    """测试批量生成在生成器未运行时为每个补丁生成内容，只关闭一次会话"""
+    print("=== 测试批量生成重写内容 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "奇幻_1.txt")
+        _write_bytes(path, _novel(), None)
+        text, index, doc = _analyze(path)
+        targets = _targets(doc)
+        patches, _ = locate_sections(text, index, targets)
+        sections = {(chapter.idx, section.idx): section for chapter, section in targets}
+
+        generator, calls = _idle_generator()
+        progress = []
+        asyncio.run(BatchRewriter(generator, concurrency=2).generate(
+            patches, sections, lambda done, total: progress.append((done, total))))
+        assert all(p.replacement and p.replacement.startswith("重写后的") for p in patches)
+        assert len(calls["prompts"]) == len(patches)
+        assert progress[-1] == (len(patches), len(patches))
+        assert not generator.running and calls["closed"] == 1
+
+        # 生成器正在运行时不改变状态，也不关闭它的会话
+        generator.running = True
+        asyncio.run(BatchRewriter(generator).rewrite_one(sections[(1, patches[0].section_idx)]))
+        assert generator.running and calls["closed"] == 1
+    print("✅ 批量生成重写内容正常")
+
+
+if __name__ == "__main__":
+    print("开始测试小节批量重写...")
+
+    try:
+        test_locate_and_apply_out_of_order()
+        test_skip_changed_sections()
+        test_reject_overlapping_patches()
+        test_write_and_undo_restore_bytes()
+        test_undo_refused_after_later_edit()
+        test_rewrite_one_when_idle()
+        test_generate_batch_when_idle()
+        print("\n✅ 所有小节重写测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试生成流水线追踪
+验证并发 asyncio 任务中 span 各自嵌套并继承标签、追踪关闭时的空 span、
+Chrome trace 转换，以及读取追踪文件时跳过写了一半的行
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.tracing import Tracer, NOOP_SPAN, current_span, load_trace, to_chrome_trace, main
+
+
+def test_nesting_across_tasks():
+    """测试并发的小说各自嵌套，子 span 继承父 span 的标签和行"""
+    print("=== 测试并发任务中的嵌套 ===")
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "trace.jsonl")
+        tracer = Tracer(path)
+
+        async def novel(novel_id, genre):
+            with tracer.span("novel", novel=novel_id, genre=genre):
+                for chunk in range(2):
+                    with tracer.span("chunk", chunk=chunk):
+                        await asyncio.sleep(0.01)
+                        with tracer.span("prompt", model="gpt-4o") as prompt:
+                            await asyncio.sleep(0.01)
+                            prompt.set_tag(attempts=1)
+                        # 子 span 结束后当前 span 回到父 span
+                        assert current_span().name == "chunk"
+                        assert current_span().tags["novel"] == novel_id
+
+        async def run():
+            await asyncio.gather(novel("1", "奇幻"), novel("2", "都市"))
+            assert current_span() is None
+
+        asyncio.run(run())
+        tracer.close()
+        records = load_trace(path)
+
+    assert len(records) == 2 * (1 + 2 * 2)
+    by_id = {r["id"]: r for r in records}
+    assert len(by_id) == len(records)
+    for record in records:
+        novel_id = record["tags"]["novel"]
+        assert record["track"] == f"小说 {novel_id}"
+        assert record["tags"]["genre"] == {"1": "奇幻", "2": "都市"}[novel_id]
+        assert record["dur"] >= 0
+        if record["name"] == "novel":
+            assert record["parent"] is None
+            continue
+        parent = by_id[record["parent"]]
+        # 父 span 属于同一部小说，并且在时间上包含子 span
+        assert parent["tags"]["novel"] == novel_id
+        assert parent["name"] == {"chunk": "novel", "prompt": "chunk"}[record["name"]]
+        assert parent["ts"] <= record["ts"] and record["ts"] + record["dur"] <= parent["ts"] + parent["dur"] + 1
+        if record["name"] == "prompt":
+            assert record["tags"]["chunk"] == parent["tags"]["chunk"]
+            assert record["tags"]["model"] == "gpt-4o" and record["tags"]["attempts"] == 1
+    print("✅ 并发任务中的嵌套正常")
+
+
+def test_errors_and_decorator():
+    """测试异常记录在标签中、指定的行不被覆盖，装饰器记录整个调用"""
+    print("=== 测试异常和装饰器 ===")
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "trace.jsonl")
+        tracer = Tracer(path)
+
+        @tracer.traced("summary", kind="novel")
+        async def summarize():
+            await asyncio.sleep(0)
+            return "摘要"
+
+        @tracer.traced()
+        def write():
+            return current_span().name
+
+        with tracer.span("novel", novel="3"):
+            try:
+                with tracer.span("save"):
+                    raise OSError("磁盘已满")
+            except OSError:
+                pass
+            assert asyncio.run(summarize()) == "摘要"
+            with tracer.span("write", track="写入器"):
+                assert write() == "write"
+        tracer.close()
+        records = {r["name"]: r for r in load_trace(path)}
+
+    assert records["save"]["tags"]["error"] == "OSError"
+    assert "error" not in records["novel"]["tags"]
+    assert records["summary"]["tags"] == {"novel": "3", "kind": "novel"}
+    assert records["write"]["track"] == "写入器"
+    print("✅ 异常和装饰器正常")
+
+
+def test_disabled_is_noop():
+    """测试追踪关闭时返回共享的空 span，不写文件，装饰器直接调用原函数"""
+    print("=== 测试追踪关闭 ===")
+    tracer = Tracer()
+    assert not tracer.enabled
+    span = tracer.span("novel", novel="1")
+    assert span is NOOP_SPAN and tracer.span("chunk") is NOOP_SPAN
+    with span as entered:
+        assert entered is NOOP_SPAN
+        assert current_span() is None
+        entered.set_tag(outcome="ok")
+    assert span.start() is NOOP_SPAN
+    span.finish(RuntimeError("忽略"))
+
+    @tracer.traced()
+    def work(x):
+        assert current_span() is None
+        return x * 2
+
+    assert work(21) == 42
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "trace.jsonl")
+        tracer.open(path)
+        real = tracer.span("novel")
+        tracer.close()
+        # 关闭后新建的 span 为空 span，已创建的 span 结束时不再写入
+        assert tracer.span("novel") is NOOP_SPAN
+        with real:
+            pass
+        tracer.flush()
+        assert not os.path.exists(path)
+    print("✅ 追踪关闭时为空操作")
+
+
+def test_chrome_trace():
+    """测试转换为 Chrome trace：每行一个线程，span 为完整事件"""
+    print("=== 测试 Chrome trace 转换 ===")
+    records = [
+        {"name": "prompt", "id": 3, "parent": 2, "track": "小说 1", "ts": 1000, "dur": 50, "tags": {"novel": "1"}},
+        {"name": "write", "id": 4, "parent": None, "track": "写入器", "ts": 1040, "dur": 5, "tags": {}},
+        {"name": "novel", "id": 1, "parent": None, "track": "小说 1", "ts": 900, "dur": 500, "tags": {"novel": "1"}},
+        {"name": "chunk", "id": 2, "parent": 1, "track": "小说 1", "ts": 1000, "dur": 80, "tags": {"novel": "1"}},
+        {"name": "orphan", "id": 5, "parent": None, "ts": 2000, "dur": 1},
+    ]
+    trace = to_chrome_trace(records)
+    assert trace["displayTimeUnit"] == "ms"
+    events = trace["traceEvents"]
+
+    threads = {e["tid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert threads == {1: "小说 1", 2: "写入器", 3: "orphan"}
+    assert all(e["name"] == "thread_name" and e["pid"] == 1 for e in events if e["ph"] == "M")
+
+    spans = [e for e in events if e["ph"] == "X"]
+    # 按开始时间排序，同时开始的长 span 在前，保证嵌套显示
+    assert [e["name"] for e in spans] == ["novel", "chunk", "prompt", "write", "orphan"]
+    chunk = spans[1]
+    assert (chunk["ts"], chunk["dur"], chunk["tid"], chunk["pid"]) == (1000, 80, 1, 1)
+    assert chunk["args"] == {"novel": "1"} and chunk["cat"] == "novel"
+    assert spans[3]["tid"] == 2 and spans[4]["args"] == {}
+    # 线程名事件出现在该线程的第一个 span 之前
+    names = [(e["ph"], e["tid"]) for e in events]
+    for tid in threads:
+        assert names.index(("M", tid)) < names.index(("X", tid))
+    json.dumps(trace)
+    print("✅ Chrome trace 转换正常")
+
+
+def test_load_trace_skips_partial_line():
+    """测试读取追踪文件时跳过空行和写了一半的最后一行，命令行转换使用相同的读取"""
+    print("=== 测试读取追踪文件 ===")
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "trace.jsonl")
+        tracer = Tracer(path, buffer_size=1)
+        with tracer.span("novel", novel="1"):
+            with tracer.span("chunk", chunk=0):
+                pass
+        tracer.close()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n")
+            f.write('{"name": "chunk", "id": 9, "parent": 1, "tr')
+
+        records = load_trace(path)
+        assert [r["name"] for r in records] == ["chunk", "novel"]
+
+        output = os.path.join(root, "out.json")
+        assert main([path, "-o", output]) == 0
+        with open(output, "r", encoding="utf-8") as f:
+            trace = json.load(f)
+        assert sum(1 for e in trace["traceEvents"] if e["ph"] == "X") == 2
+        assert main([os.path.join(root, "missing.jsonl")]) == 1
+    print("✅ 读取追踪文件正常")
+
+
+if __name__ == "__main__":
+    print("开始测试流水线追踪...")
+
+    try:
+        test_nesting_across_tasks()
+        test_errors_and_decorator()
+        test_disabled_is_noop()
+        test_chrome_trace()
+        test_load_trace_skips_partial_line()
+        print("\n✅ 所有流水线追踪测试通过")
+    except Exception as e:
+        print(f"❌ 测试失败: {str(e)}")
+        import traceback
+        traceback.print_exc()
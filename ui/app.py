@@ -2,10 +2,10 @@ import os
 import sys
 import time
 import threading
+import contextlib
 import tkinter as tk
 import asyncio
 from tkinter import ttk, scrolledtext, messagebox, filedialog
-from typing import List, Tuple
 
 # from PIL import Image, ImageTk  # Not used in current implementation
 import webbrowser
@@ -35,6 +35,8 @@ except Exception:
 try:
     # 1) 作为包被导入（ui 隶属于 novel_generator 包）
     from ..core.generator import NovelGenerator
+    from ..core.events import EventBus, LoggerSink
+    from ..core.progress import ProgressChannel, PHASE_LABELS
     from ..core.model_manager import get_model_list, fetch_models_from_url
     from ..utils.config import save_config, load_config
     from ..utils.common import open_directory
@@ -44,10 +46,13 @@ try:
         __version__,
     )
     from .dialogs import AdvancedSettingsDialog, AboutDialog, MultiTypeDialog
+    from .log_view import LogSink, VERBOSITY_LEVELS, guess_level
 except Exception:
     try:
         # 2) 顶层包名可用（novel_generator.*）
         from novel_generator.core.generator import NovelGenerator
+        from novel_generator.core.events import EventBus, LoggerSink
+        from novel_generator.core.progress import ProgressChannel, PHASE_LABELS
         from novel_generator.core.model_manager import (
             get_model_list,
             fetch_models_from_url,
@@ -64,18 +69,24 @@ except Exception:
             AboutDialog,
             MultiTypeDialog,
         )
+        from novel_generator.ui.log_view import LogSink, VERBOSITY_LEVELS, guess_level
     except Exception:
         try:
             # 3) 模块直导（sys.path 指向各子目录：core/utils/templates/ui）
             from generator import NovelGenerator
+            from events import EventBus, LoggerSink
+            from progress import ProgressChannel, PHASE_LABELS
             from model_manager import get_model_list, fetch_models_from_url
             from config import save_config, load_config
             from common import open_directory
             from prompts import MODEL_DESCRIPTIONS, GENRE_SPECIFIC_PROMPTS, __version__
             from dialogs import AdvancedSettingsDialog, AboutDialog, MultiTypeDialog
+            from log_view import LogSink, VERBOSITY_LEVELS, guess_level
         except Exception:
             # 4) 目录直导（sys.path 包含项目根，使 core/utils/templates 可用为包）
             from core.generator import NovelGenerator
+            from core.events import EventBus, LoggerSink
+            from core.progress import ProgressChannel, PHASE_LABELS
             from core.model_manager import get_model_list, fetch_models_from_url
             from utils.config import save_config, load_config
             from utils.common import open_directory
@@ -85,6 +96,7 @@ except Exception:
                 __version__,
             )
     from ui.dialogs import AdvancedSettingsDialog, AboutDialog, MultiTypeDialog
+    from ui.log_view import LogSink, VERBOSITY_LEVELS, guess_level
 
 # 兜底导入：若上述路径均失败，动态扩展 sys.path 并重试
 if "NovelGenerator" not in globals():
@@ -96,6 +108,8 @@ if "NovelGenerator" not in globals():
             if os.path.isdir(d) and d not in sys.path:
                 sys.path.insert(0, d)
         from core.generator import NovelGenerator
+        from core.events import EventBus, LoggerSink
+        from core.progress import ProgressChannel, PHASE_LABELS
         from core.model_manager import get_model_list, fetch_models_from_url
         from utils.config import save_config, load_config
         from utils.common import open_directory
@@ -105,13 +119,20 @@ if "NovelGenerator" not in globals():
             __version__,
         )
         from ui.dialogs import AdvancedSettingsDialog, AboutDialog, MultiTypeDialog
+        from ui.log_view import LogSink, VERBOSITY_LEVELS, guess_level
     except Exception:
         from generator import NovelGenerator
+        from events import EventBus, LoggerSink
+        from progress import ProgressChannel, PHASE_LABELS
         from model_manager import get_model_list, fetch_models_from_url
         from config import save_config, load_config
         from common import open_directory
         from prompts import MODEL_DESCRIPTIONS, GENRE_SPECIFIC_PROMPTS, __version__
         from dialogs import AdvancedSettingsDialog, AboutDialog, MultiTypeDialog
+        from log_view import LogSink, VERBOSITY_LEVELS, guess_level
+
+# 进度显示刷新间隔（毫秒）
+PROGRESS_POLL_MS = 250
 
 
 def run_asyncio_event_loop(coro):
@@ -187,6 +208,9 @@ class NovelGeneratorApp:
         self.generate_cover_var = tk.BooleanVar(value=False)  # 默认不生成封面
         self.generate_music_var = tk.BooleanVar(value=False)  # 默认不生成音乐
         self.num_cover_images_var = tk.IntVar(value=1)  # 默认生成1张封面
+        self.media_reuse_policy_var = tk.StringVar(value="reuse")  # 相同提示词复用已生成的媒体
+        self.quality_gate_var = tk.BooleanVar(value=False)  # 默认不启用生成时质量把关
+        self.quality_gate_threshold_var = tk.DoubleVar(value=55.0)
         self.base_url_var = tk.StringVar(
             value="https://api.openai.com/v1/chat/completions"
         )
@@ -222,6 +246,10 @@ class NovelGeneratorApp:
             "writing_style": "平衡",
             "paragraph_length_preference": "适中",
             "dialogue_frequency": "适中",
+            "metrics_port": 0,
+            "metrics_snapshot_interval": 60,
+            "trace": False,
+            "loop_lag_threshold": 0.0,
         }
 
         # 加载模型列表
@@ -230,6 +258,7 @@ class NovelGeneratorApp:
         # 状态变量
         self.is_generating = False
         self.generator = None
+        self.progress_channel = None
 
         # 创建UI组件
         self.create_widgets()
@@ -243,6 +272,10 @@ class NovelGeneratorApp:
         # 初始检查刷新模型按钮状态
         self.check_refresh_button_state()
 
+        # 启动后在后台恢复上次未完成的媒体任务
+        self.media_generator = None
+        self.root.after(2000, self._start_media_reconciler)
+
         # 欢迎对话框已被禁用，用户可直接使用或在设置中配置API密钥
         # if not self.api_key_var.get():
         #     self.show_welcome_dialog()
@@ -256,6 +289,7 @@ class NovelGeneratorApp:
         file_menu = tk.Menu(menu, tearoff=0)
         menu.add_cascade(label="文件", menu=file_menu)
         file_menu.add_command(label="打开输出目录", command=self.open_output_dir)
+        file_menu.add_command(label="媒体任务管理", command=self.open_media_tasks_dialog)
         file_menu.add_separator()
         file_menu.add_command(label="退出", command=self.on_closing)
 
@@ -761,12 +795,58 @@ class NovelGeneratorApp:
         )
         media_info_label.grid(row=4, column=1, sticky="w", padx=5, pady=2)
 
+        # 媒体复用策略
+        ttk.Label(auto_summary_frame, text="相同提示词:").grid(
+            row=5, column=0, sticky="w", padx=5, pady=2
+        )
+        reuse_labels = {"reuse": "复用已生成", "variants": "多个变体轮换", "new": "总是重新生成"}
+        self.media_reuse_combo = ttk.Combobox(
+            auto_summary_frame,
+            values=list(reuse_labels.values()),
+            state="readonly",
+            width=14,
+        )
+        self.media_reuse_combo.set(reuse_labels.get(self.media_reuse_policy_var.get(), "复用已生成"))
+        self.media_reuse_combo.grid(row=5, column=1, sticky="w", padx=5, pady=2)
+        self.media_reuse_combo.bind(
+            "<<ComboboxSelected>>",
+            lambda e: self.media_reuse_policy_var.set(
+                {label: key for key, label in reuse_labels.items()}[self.media_reuse_combo.get()]
+            ),
+        )
+        self.media_reuse_policy_var.trace(
+            "w",
+            lambda *args: self.media_reuse_combo.set(
+                reuse_labels.get(self.media_reuse_policy_var.get(), "复用已生成")
+            ),
+        )
+
+        # 生成时质量把关
+        quality_gate_check = ttk.Checkbutton(
+            auto_summary_frame, text="生成时质量把关", variable=self.quality_gate_var
+        )
+        quality_gate_check.grid(row=6, column=0, sticky="w", padx=5, pady=2)
+
+        quality_gate_frame = ttk.Frame(auto_summary_frame)
+        quality_gate_frame.grid(row=6, column=1, sticky="w", padx=5, pady=2)
+
+        ttk.Label(quality_gate_frame, text="最低评分: ").pack(side=tk.LEFT)
+        quality_gate_entry = ttk.Spinbox(
+            quality_gate_frame,
+            from_=30,
+            to=90,
+            increment=5,
+            width=5,
+            textvariable=self.quality_gate_threshold_var,
+        )
+        quality_gate_entry.pack(side=tk.LEFT)
+
         # 高级设置按钮
         advanced_settings_btn = ttk.Button(
             auto_summary_frame, text="更多高级设置", command=self.open_advanced_settings
         )
         advanced_settings_btn.grid(
-            row=5, column=0, columnspan=2, sticky="ew", padx=5, pady=5
+            row=7, column=0, columnspan=2, sticky="ew", padx=5, pady=5
         )
 
         # 结尾生成设置
@@ -945,6 +1025,18 @@ class NovelGeneratorApp:
         self.time_left_label = ttk.Label(status_grid, text="--:--")
         self.time_left_label.grid(row=3, column=3, sticky=tk.W, padx=5, pady=2)
 
+        ttk.Label(status_grid, text="生成速度:").grid(
+            row=4, column=0, sticky=tk.W, padx=5, pady=2
+        )
+        self.rate_label = ttk.Label(status_grid, text="--")
+        self.rate_label.grid(row=4, column=1, sticky=tk.W, padx=5, pady=2)
+
+        ttk.Label(status_grid, text="进行中:").grid(
+            row=4, column=2, sticky=tk.W, padx=5, pady=2
+        )
+        self.active_novels_label = ttk.Label(status_grid, text="0")
+        self.active_novels_label.grid(row=4, column=3, sticky=tk.W, padx=5, pady=2)
+
         # 进度条
         self.progress = ttk.Progressbar(
             log_frame, orient=tk.HORIZONTAL, length=100, mode="determinate"
@@ -956,15 +1048,42 @@ class NovelGeneratorApp:
         self.log_text.pack(fill=tk.BOTH, expand=True, pady=5, padx=10)
         self.log_text.config(state=tk.DISABLED)
 
+        # 日志管道：后台线程只入队，界面线程按帧批量写入并限制行数
+        self.log_sink = LogSink(self.root, self.log_text, self.status_label)
+        self.log_sink.start()
+
+        # 生成器事件总线：界面日志按当前详细程度订阅（事件在界面线程刷新时才格式化），
+        # 普通及以上级别同时写入日志文件
+        self.event_bus = EventBus()
+        self.log_subscription = self.event_bus.subscribe(
+            self.log_sink.post_event, level=self.log_sink.level
+        )
+        self.event_bus.subscribe(LoggerSink(), level=logging.INFO)
+
+        log_controls = ttk.Frame(log_frame)
+        log_controls.pack(fill=tk.X, padx=10, pady=5)
+
+        # 日志详细程度
+        ttk.Label(log_controls, text="日志级别:").pack(side=tk.LEFT)
+        self.log_level_var = tk.StringVar(value="普通")
+        log_level_combo = ttk.Combobox(
+            log_controls,
+            textvariable=self.log_level_var,
+            values=list(VERBOSITY_LEVELS),
+            state="readonly",
+            width=8,
+        )
+        log_level_combo.pack(side=tk.LEFT, padx=5)
+        log_level_combo.bind(
+            "<<ComboboxSelected>>",
+            lambda e: self._set_log_verbosity(VERBOSITY_LEVELS[self.log_level_var.get()]),
+        )
+
         # 清空日志按钮
         clear_log_button = ttk.Button(
-            log_frame,
-            text="清空日志",
-            command=lambda: self.log_text.config(state=tk.NORMAL)
-            or self.log_text.delete(1.0, tk.END)
-            or self.log_text.config(state=tk.DISABLED),
+            log_controls, text="清空日志", command=self.log_sink.clear
         )
-        clear_log_button.pack(anchor=tk.E, padx=10, pady=5)
+        clear_log_button.pack(side=tk.RIGHT)
 
         # 质量面板
         self.create_quality_panel(right_frame)
@@ -1059,30 +1178,66 @@ class NovelGeneratorApp:
         )
         self.report_btn.pack(side=tk.LEFT, padx=2)
 
-        # Quality display area
-        self.quality_canvas = tk.Canvas(self.quality_frame, highlightthickness=0)
-        quality_scrollbar = ttk.Scrollbar(
-            self.quality_frame, orient=tk.VERTICAL, command=self.quality_canvas.yview
+        self.undo_rewrite_btn = ttk.Button(
+            controls_frame,
+            text="撤销重写",
+            command=self.undo_last_rewrite,
+            state=tk.DISABLED,
         )
-        self.quality_canvas.configure(yscrollcommand=quality_scrollbar.set)
+        self.undo_rewrite_btn.pack(side=tk.LEFT, padx=2)
+
+        # Overall score area
+        self.quality_summary_frame = ttk.Frame(self.quality_frame)
+        self.quality_summary_frame.pack(fill=tk.X, padx=10)
+
+        # Results tree: chapter rows are inserted up front, section rows only
+        # when a chapter is expanded, so large novels render in one widget
+        tree_frame = ttk.Frame(self.quality_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, pady=5, padx=10)
+
+        columns = ("overall", "readability", "coherence", "canon", "genre", "words", "status")
+        self.quality_tree = ttk.Treeview(tree_frame, columns=columns, height=15)
+        self.quality_tree.heading("#0", text="章节/小节")
+        self.quality_tree.column("#0", width=110, stretch=False)
+        headings = {
+            "overall": ("综合", 50),
+            "readability": ("可读性", 55),
+            "coherence": ("连贯性", 55),
+            "canon": ("设定一致", 60),
+            "genre": ("类型贴合", 60),
+            "words": ("字数", 60),
+            "status": ("状态", 70),
+        }
+        for column, (heading, width) in headings.items():
+            self.quality_tree.heading(column, text=heading)
+            self.quality_tree.column(column, width=width, anchor=tk.CENTER)
+        for tag, score in (("good", 80), ("fair", 60), ("poor", 0)):
+            self.quality_tree.tag_configure(tag, foreground=self._get_score_color(score))
 
-        quality_scrollable_frame = ttk.Frame(self.quality_canvas)
-        quality_scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.quality_canvas.configure(
-                scrollregion=self.quality_canvas.bbox("all")
-            ),
+        quality_scrollbar = ttk.Scrollbar(
+            tree_frame, orient=tk.VERTICAL, command=self.quality_tree.yview
         )
+        self.quality_tree.configure(yscrollcommand=quality_scrollbar.set)
+        self.quality_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        quality_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        self.quality_canvas.create_window(
-            (0, 0), window=quality_scrollable_frame, anchor="nw"
-        )
-        self.quality_canvas.pack(
-            side=tk.LEFT, fill=tk.BOTH, expand=True, pady=5, padx=10
-        )
-        quality_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
+        self.quality_tree.bind("<<TreeviewOpen>>", self._on_quality_tree_open)
+        self.quality_tree.bind("<Double-1>", self._on_quality_tree_activate)
+        self._quality_loaded_chapters = set()
 
-        self.quality_content_frame = quality_scrollable_frame
+        # Section actions (double-click a section: rewrite if low, otherwise view)
+        section_actions = ttk.Frame(self.quality_frame)
+        section_actions.pack(fill=tk.X, padx=10, pady=(0, 5))
+        ttk.Button(
+            section_actions,
+            text="查看小节",
+            command=lambda: self._with_selected_section(self._view_section),
+        ).pack(side=tk.LEFT, padx=2)
+        ttk.Button(
+            section_actions,
+            text="重写小节",
+            command=lambda: self._with_selected_section(self._rewrite_section),
+        ).pack(side=tk.LEFT, padx=2)
 
         # Initialize quality data
         self.current_quality_data = None
@@ -1090,7 +1245,7 @@ class NovelGeneratorApp:
 
         # Add initial message
         welcome_label = ttk.Label(
-            self.quality_content_frame,
+            self.quality_summary_frame,
             text='点击"分析质量"按钮来评估小说质量\n请先完成小说生成或选择已有的小说文件',
             justify=tk.CENTER,
             font=("Arial", 10),
@@ -1109,29 +1264,19 @@ class NovelGeneratorApp:
             messagebox.showwarning("警告", "请设置有效的输出目录")
             return
 
-        # Find novel files
-        novel_files = []
-        for root, dirs, files in os.walk(output_dir):
-            for file in files:
-                if file.endswith(".txt") and not file.startswith("summary"):
-                    novel_files.append(os.path.join(root, file))
+        # Find novel files via the output catalog
+        novel_count, selected_file = self._find_latest_novel(output_dir)
 
-        if not novel_files:
+        if not selected_file:
             messagebox.showwarning("警告", "输出目录中没有找到小说文件")
             return
 
         # Let user select file or analyze the latest
-        if len(novel_files) == 1:
-            selected_file = novel_files[0]
-        else:
-            # Sort by modification time, pick the latest
-            novel_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-            selected_file = novel_files[0]
-
+        if novel_count > 1:
             # Ask user if they want to analyze the latest or choose
             result = messagebox.askyesno(
                 "选择文件",
-                f"找到 {len(novel_files)} 个小说文件\n\n"
+                f"找到 {novel_count} 个小说文件\n\n"
                 f"最新文件: {os.path.basename(selected_file)}\n\n"
                 f"是否分析最新文件？\n"
                 f'点击"否"可选择其他文件',
@@ -1151,6 +1296,61 @@ class NovelGeneratorApp:
         self.selected_file_path = selected_file
         self._perform_quality_analysis(selected_file)
 
+    def _get_media_generator(self):
+        """获取界面使用的媒体生成器（用于恢复和管理媒体任务）"""
+        if self.media_generator is None:
+            from core.media_generator import MediaGenerator
+
+            self.media_generator = MediaGenerator(
+                api_key=self.api_key_var.get().strip(),
+                status_callback=self.log_status,
+                base_url=self.base_url_var.get().strip() or None,
+                output_root=self.output_dir_entry.get().strip() or None,
+            )
+        return self.media_generator
+
+    def _start_media_reconciler(self):
+        """存在未完成的媒体任务时在后台恢复，不阻塞界面"""
+        if not self.api_key_var.get().strip():
+            return
+        try:
+            from core.media_task_manager import MediaTaskManager
+
+            task_manager = MediaTaskManager()
+            if not task_manager.get_pending_tasks():
+                task_manager.close()
+                return
+            task_manager.close()
+            self._get_media_generator().start_reconciler()
+        except Exception as e:
+            self.log_message(f"恢复媒体任务失败: {e}")
+
+    def open_media_tasks_dialog(self):
+        """打开媒体任务管理对话框"""
+        try:
+            from ui.dialogs import MediaTasksDialog
+        except ImportError:
+            from dialogs import MediaTasksDialog
+        try:
+            MediaTasksDialog(self.root, self._get_media_generator())
+        except Exception as e:
+            messagebox.showerror("错误", f"打开媒体任务管理失败: {e}")
+
+    def _find_latest_novel(self, output_dir):
+        """Return (novel count, most recently updated novel path) from the output catalog"""
+        try:
+            from utils.catalog import open_catalog
+
+            catalog = open_catalog(output_dir)
+            catalog.reconcile(output_dir)
+            latest = catalog.latest_novel(output_dir)
+            if not latest:
+                return 0, None
+            return catalog.count(output_dir), latest["path"]
+        except Exception as e:
+            self.log_message(f"读取输出目录索引失败: {e}")
+            return 0, None
+
     def _perform_quality_analysis(self, file_path):
         """Perform quality analysis in background thread"""
 
@@ -1173,6 +1373,12 @@ class NovelGeneratorApp:
                     sys.path.insert(0, current_dir)
 
                 from utils.quality import QualityScorer
+                from utils.quality_cache import QualityCache
+                from utils.novel_index import NovelIndex
+
+                # Section scores are cached next to the novel; only new or
+                # changed sections are re-scored
+                cache = QualityCache.for_document(file_path)
 
                 # Create quality scorer
                 scorer = QualityScorer(
@@ -1182,26 +1388,38 @@ class NovelGeneratorApp:
                     base_url=(
                         self.base_url_var.get() if self.base_url_var.get() else None
                     ),
+                    cache=cache,
                 )
 
-                # Split into chapters (simple split by chapter markers)
-                chapters = self._split_novel_into_chapters(content)
+                # Chapter offsets come from the structure index next to the
+                # novel; it is rebuilt only when the file changed outside the generator
+                chapters = NovelIndex.for_novel(file_path, content).split_chapters(content)
 
                 if not chapters:
                     self.log_message("未能识别章节结构，将全文作为一章分析")
                     chapters = [(1, content)]
+                # Results reference the chapter texts; keep them as the only copy
+                del content
 
                 # Run async analysis
                 import asyncio
 
-                doc_quality = asyncio.run(
-                    scorer.evaluate_document(
-                        doc_id=os.path.basename(file_path),
-                        chapters=chapters,
-                        genre=self.novel_type_var.get(),
-                        language=self.language_var.get(),
+                try:
+                    doc_quality = asyncio.run(
+                        scorer.evaluate_document(
+                            doc_id=os.path.basename(file_path),
+                            chapters=chapters,
+                            genre=self.novel_type_var.get(),
+                            language=self.language_var.get(),
+                        )
+                    )
+                finally:
+                    cache.close()
+
+                if cache.hits:
+                    self.log_message(
+                        f"复用 {cache.hits} 个未变化小节的评分，重新评分 {cache.misses} 个小节"
                     )
-                )
 
                 self.current_quality_data = doc_quality
 
@@ -1226,43 +1444,14 @@ class NovelGeneratorApp:
         # Run in background thread
         threading.Thread(target=analyze_thread, daemon=True).start()
 
-    def _split_novel_into_chapters(self, content: str) -> List[Tuple[int, str]]:
-        """Split novel content into chapters"""
-        import re
-
-        # Common chapter patterns
-        chapter_patterns = [
-            r"第[一二三四五六七八九十百千万\d]+章[^\n]*\n",
-            r"Chapter\s+\d+[^\n]*\n",
-            r"第\d+章[^\n]*\n",
-            r"^\d+\.[^\n]*\n",
-        ]
-
-        chapters = []
-
-        for pattern in chapter_patterns:
-            matches = list(re.finditer(pattern, content, re.MULTILINE | re.IGNORECASE))
-            if len(matches) > 1:  # Found multiple chapters
-                for i, match in enumerate(matches):
-                    start_pos = match.start()
-                    end_pos = (
-                        matches[i + 1].start() if i + 1 < len(matches) else len(content)
-                    )
-                    chapter_content = content[start_pos:end_pos].strip()
-                    if chapter_content:
-                        chapters.append((i + 1, chapter_content))
-                break
-
-        return chapters
-
     def _update_quality_display(self, doc_quality):
         """Update quality display with analysis results"""
         # Clear existing content
-        for widget in self.quality_content_frame.winfo_children():
+        for widget in self.quality_summary_frame.winfo_children():
             widget.destroy()
 
         # Overall score
-        overall_frame = ttk.Frame(self.quality_content_frame)
+        overall_frame = ttk.Frame(self.quality_summary_frame)
         overall_frame.pack(fill=tk.X, pady=10, padx=5)
 
         ttk.Label(overall_frame, text="总体评分:", font=("Arial", 12, "bold")).pack(
@@ -1278,11 +1467,14 @@ class NovelGeneratorApp:
         )
         score_label.pack(side=tk.LEFT)
 
-        # Score bar
-        score_bar_frame = ttk.Frame(self.quality_content_frame)
-        score_bar_frame.pack(fill=tk.X, pady=5, padx=5)
+        if doc_quality.overall_interval:
+            low, high = doc_quality.overall_interval
+            ttk.Label(
+                overall_frame, text=f"  (95% 置信区间 {low:.1f} - {high:.1f})"
+            ).pack(side=tk.LEFT)
 
-        canvas = tk.Canvas(score_bar_frame, height=20, highlightthickness=0)
+        # Score bar
+        canvas = tk.Canvas(self.quality_summary_frame, height=20, highlightthickness=0)
         canvas.pack(fill=tk.X, padx=10)
 
         width = 400  # Fixed width for score bar
@@ -1295,24 +1487,41 @@ class NovelGeneratorApp:
         score_width = int(width * doc_quality.overall_score / 100)
         canvas.create_rectangle(0, 5, score_width, 15, fill=score_color, outline="")
 
-        # Chapter breakdown
-        ttk.Separator(self.quality_content_frame, orient=tk.HORIZONTAL).pack(
-            fill=tk.X, pady=10, padx=5
-        )
-
-        ttk.Label(
-            self.quality_content_frame, text="章节评分详情", font=("Arial", 11, "bold")
-        ).pack(anchor=tk.W, padx=5, pady=(0, 5))
+        # Chapter rows; sections are loaded when a chapter is expanded
+        tree = self.quality_tree
+        tree.delete(*tree.get_children())
+        self._quality_loaded_chapters = set()
 
         threshold = float(self.threshold_var.get())
 
-        for chapter in doc_quality.chapters:
-            self._create_chapter_display(chapter, threshold)
+        for ci, chapter in enumerate(doc_quality.chapters):
+            low_count = sum(1 for s in chapter.sections if s.score.overall < threshold)
+            iid = f"c{ci}"
+            tree.insert(
+                "",
+                tk.END,
+                iid=iid,
+                text=f"第{chapter.idx}章",
+                values=self._quality_row_values(
+                    chapter.score, f"低分({low_count})" if low_count else ""
+                ),
+                tags=(self._score_tag(chapter.score.overall),),
+            )
+            if chapter.sections:
+                # Placeholder child so the chapter shows an expand marker
+                tree.insert(iid, tk.END, iid=f"{iid}_", text="")
 
         # Enable buttons
         self.rewrite_low_btn.config(state=tk.NORMAL)
         self.report_btn.config(state=tk.NORMAL)
 
+        from core.section_rewriter import journal_path_for
+
+        has_journal = self.selected_file_path and os.path.exists(
+            journal_path_for(self.selected_file_path)
+        )
+        self.undo_rewrite_btn.config(state=tk.NORMAL if has_journal else tk.DISABLED)
+
     def _get_score_color(self, score: float) -> str:
         """Get color based on score"""
         if score >= 80:
@@ -1322,152 +1531,76 @@ class NovelGeneratorApp:
         else:
             return "#F44336"  # Red
 
-    def _create_chapter_display(self, chapter, threshold: float):
-        """Create display for a single chapter"""
-        chapter_frame = ttk.Frame(self.quality_content_frame)
-        chapter_frame.pack(fill=tk.X, pady=5, padx=5, relief=tk.RIDGE, borderwidth=1)
-
-        # Chapter header
-        header_frame = ttk.Frame(chapter_frame)
-        header_frame.pack(fill=tk.X, padx=5, pady=5)
-
-        # Chapter info
-        ttk.Label(
-            header_frame, text=f"第{chapter.idx}章", font=("Arial", 10, "bold")
-        ).pack(side=tk.LEFT, padx=(0, 10))
-
-        # Score bar
-        score_color = self._get_score_color(chapter.score.overall)
-        score_text = f"{chapter.score.overall:.0f}"
-
-        score_canvas = tk.Canvas(
-            header_frame, width=150, height=16, highlightthickness=0
-        )
-        score_canvas.pack(side=tk.LEFT, padx=(0, 10))
-
-        # Background
-        score_canvas.create_rectangle(0, 2, 150, 14, fill="#e0e0e0", outline="")
-
-        # Score bar
-        score_width = int(150 * chapter.score.overall / 100)
-        score_canvas.create_rectangle(
-            0, 2, score_width, 14, fill=score_color, outline=""
-        )
-
-        # Score text
-        ttk.Label(
-            header_frame,
-            text=score_text,
-            font=("Arial", 9, "bold"),
-            foreground=score_color,
-        ).pack(side=tk.LEFT, padx=(0, 5))
-
-        # Expand/Collapse button
-        is_low_score = chapter.score.overall < threshold
-        btn_text = (
-            "展开"
-            if not is_low_score
-            else f"低分({len([s for s in chapter.sections if s.score.overall < threshold])})"
-        )
-        expand_btn = ttk.Button(
-            header_frame,
-            text=btn_text,
-            width=12,
-            command=lambda cf=chapter_frame, ch=chapter: self._toggle_chapter_sections(
-                cf, ch
-            ),
-        )
-        expand_btn.pack(side=tk.RIGHT)
-
-        # Sections frame (initially hidden unless low score)
-        sections_frame = ttk.Frame(chapter_frame)
-        if is_low_score:
-            sections_frame.pack(fill=tk.X, padx=20, pady=(0, 5))
-            self._show_sections(sections_frame, chapter.sections, threshold)
-        else:
-            sections_frame.pack_forget()
-
-        # Store reference for toggle
-        chapter_frame.sections_frame = sections_frame
-        chapter_frame.expand_btn = expand_btn
-        chapter_frame.chapter = chapter
-
-    def _toggle_chapter_sections(self, chapter_frame, chapter):
-        """Toggle chapter sections visibility"""
-        if (
-            hasattr(chapter_frame, "sections_visible")
-            and chapter_frame.sections_visible
-        ):
-            # Hide sections
-            chapter_frame.sections_frame.pack_forget()
-            chapter_frame.expand_btn.config(text="展开")
-            chapter_frame.sections_visible = False
+    @staticmethod
+    def _score_tag(score: float) -> str:
+        """Treeview tag matching _get_score_color"""
+        if score >= 80:
+            return "good"
+        elif score >= 60:
+            return "fair"
         else:
-            # Show sections
-            chapter_frame.sections_frame.pack(fill=tk.X, padx=20, pady=(0, 5))
-            threshold = float(self.threshold_var.get())
-            self._show_sections(
-                chapter_frame.sections_frame, chapter.sections, threshold
-            )
-            chapter_frame.expand_btn.config(text="收起")
-            chapter_frame.sections_visible = True
-
-    def _show_sections(self, parent_frame, sections, threshold: float):
-        """Show sections in a frame"""
-        # Clear existing content
-        for widget in parent_frame.winfo_children():
-            widget.destroy()
-
-        for section in sections:
-            section_frame = ttk.Frame(parent_frame)
-            section_frame.pack(fill=tk.X, pady=2)
-
-            # Section info
-            ttk.Label(
-                section_frame, text=f"  小节{section.idx}:", font=("Arial", 9)
-            ).pack(side=tk.LEFT, padx=(0, 5))
-
-            # Score bar
-            score_color = self._get_score_color(section.score.overall)
-            score_canvas = tk.Canvas(
-                section_frame, width=100, height=12, highlightthickness=0
-            )
-            score_canvas.pack(side=tk.LEFT, padx=(0, 5))
-
-            # Background
-            score_canvas.create_rectangle(0, 1, 100, 11, fill="#e0e0e0", outline="")
+            return "poor"
+
+    @staticmethod
+    def _quality_row_values(score, status: str = "") -> tuple:
+        """Treeview column values for a chapter or section score"""
+        return (
+            f"{score.overall:.0f}",
+            f"{score.readability:.0f}",
+            f"{score.coherence:.0f}",
+            f"{score.canon_consistency:.0f}",
+            f"{score.genre_fit:.0f}",
+            score.word_count,
+            status,
+        )
+
+    def _on_quality_tree_open(self, event):
+        """Insert the section rows of a chapter the first time it is expanded"""
+        iid = self.quality_tree.focus()
+        if not iid or "s" in iid or iid in self._quality_loaded_chapters:
+            return
+        chapter = self.current_quality_data.chapters[int(iid[1:])]
+        threshold = float(self.threshold_var.get())
 
-            # Score bar
-            score_width = int(100 * section.score.overall / 100)
-            score_canvas.create_rectangle(
-                0, 1, score_width, 11, fill=score_color, outline=""
+        tree = self.quality_tree
+        tree.delete(f"{iid}_")
+        for si, section in enumerate(chapter.sections):
+            tree.insert(
+                iid,
+                tk.END,
+                iid=f"{iid}s{si}",
+                text=f"小节{section.idx}",
+                values=self._quality_row_values(
+                    section.score, "低分" if section.score.overall < threshold else ""
+                ),
+                tags=(self._score_tag(section.score.overall),),
             )
+        self._quality_loaded_chapters.add(iid)
+
+    def _quality_section_for_item(self, iid):
+        """Section object of a tree item, or None for chapter rows"""
+        if not iid or "s" not in iid or not self.current_quality_data:
+            return None
+        ci, si = iid[1:].split("s")
+        return self.current_quality_data.chapters[int(ci)].sections[int(si)]
+
+    def _with_selected_section(self, action):
+        """Run action on the selected section row"""
+        section = self._quality_section_for_item(self.quality_tree.focus())
+        if section is None:
+            messagebox.showinfo("提示", "请先展开章节并选择一个小节")
+            return
+        action(section)
 
-            # Score text and rewrite button
-            score_text = f"{section.score.overall:.0f}"
-            ttk.Label(
-                section_frame,
-                text=score_text,
-                font=("Arial", 8),
-                foreground=score_color,
-            ).pack(side=tk.LEFT, padx=(0, 5))
-
-            if section.score.overall < threshold:
-                rewrite_btn = ttk.Button(
-                    section_frame,
-                    text="重写",
-                    width=6,
-                    command=lambda s=section: self._rewrite_section(s),
-                )
-                rewrite_btn.pack(side=tk.LEFT, padx=2)
-            else:
-                view_btn = ttk.Button(
-                    section_frame,
-                    text="查看",
-                    width=6,
-                    command=lambda s=section: self._view_section(s),
-                )
-                view_btn.pack(side=tk.LEFT, padx=2)
+    def _on_quality_tree_activate(self, event):
+        """Double-click on a section: rewrite low-score sections, view the others"""
+        section = self._quality_section_for_item(self.quality_tree.identify_row(event.y))
+        if section is None:
+            return
+        if section.score.overall < float(self.threshold_var.get()):
+            self._rewrite_section(section)
+        else:
+            self._view_section(section)
 
     def _rewrite_section(self, section):
         """Rewrite a specific section"""
@@ -1480,7 +1613,11 @@ class NovelGeneratorApp:
 
         doc_id = os.path.basename(self.selected_file_path)
         log_rewrite_event(
-            doc_id, 0, section.idx, section.score.overall, "rewrite_requested"
+            doc_id,
+            self._chapter_of_section(section).idx,
+            section.idx,
+            section.score.overall,
+            "rewrite_requested",
         )
 
         # Show rewrite dialog
@@ -1578,104 +1715,72 @@ class NovelGeneratorApp:
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill=tk.X)
 
+        def show_rewritten(content, editable=True):
+            rewritten_text.config(state=tk.NORMAL)
+            rewritten_text.delete(1.0, tk.END)
+            rewritten_text.insert(tk.END, content)
+            if not editable:
+                rewritten_text.config(state=tk.DISABLED)
+
         def generate_rewrite():
             """Generate rewritten content"""
             if self.is_generating:
                 messagebox.showwarning("警告", "正在生成中，请稍后再试")
                 return
 
+            show_rewritten("正在生成重写内容...", editable=False)
+
             def rewrite_thread():
                 try:
-                    rewritten_text.config(state=tk.NORMAL)
-                    rewritten_text.delete(1.0, tk.END)
-                    rewritten_text.insert(tk.END, "正在生成重写内容...")
-                    rewritten_text.config(state=tk.DISABLED)
-
-                    # Use the generator to rewrite
-                    if not self.generator:
-                        self._setup_generator()
-
-                    rewrite_prompt = f"""
-请根据以下改进建议重写这段小说内容：
-
-改进建议：{section.score.rewrite_suggestion}
-
-原文内容：
-{section.text}
-
-要求：
-1. 保持原文的主要情节和人物设定
-2. 根据改进建议进行优化
-3. 保持字数相近（{section.score.word_count}字左右）
-4. 提高可读性和连贯性
-"""
-
-                    # Generate rewrite
-                    import asyncio
-
-                    result = asyncio.run(
-                        self.generator._generate_content_with_retry(rewrite_prompt)
-                    )
-
-                    # Update UI
-                    rewritten_text.config(state=tk.NORMAL)
-                    rewritten_text.delete(1.0, tk.END)
-                    rewritten_text.insert(tk.END, result)
-                    rewritten_text.config(state=tk.NORMAL)
-
+                    rewriter = self._create_rewriter()
+                    result = asyncio.run(rewriter.rewrite_one(section))
+                    if result is None:
+                        raise ValueError("没有生成内容")
+                    self.root.after(0, lambda: show_rewritten(result))
                 except Exception as e:
-                    rewritten_text.config(state=tk.NORMAL)
-                    rewritten_text.delete(1.0, tk.END)
-                    rewritten_text.insert(tk.END, f"重写失败: {str(e)}")
-                    rewritten_text.config(state=tk.DISABLED)
+                    error_msg = f"重写失败: {str(e)}"
+                    self.root.after(
+                        0, lambda: show_rewritten(error_msg, editable=False)
+                    )
 
             threading.Thread(target=rewrite_thread, daemon=True).start()
 
         def apply_rewrite():
-            """Apply the rewrite to the file"""
+            """Apply the rewrite to the file at the section's offsets"""
             rewritten_content = rewritten_text.get(1.0, tk.END).strip()
             if not rewritten_content or rewritten_content == "正在生成重写内容...":
                 messagebox.showwarning("警告", "请先生成重写内容")
                 return
 
             if messagebox.askyesno(
-                "确认", "确定要应用重写内容到文件吗？\n这将替换原文。"
+                "确认", "确定要应用重写内容到文件吗？\n这将替换原文（可撤销）。"
             ):
                 try:
-                    # Read the current file
-                    with open(self.selected_file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
+                    from core.section_rewriter import locate_sections
+                    from utils.novel_index import NovelIndex
 
-                    # Replace the section (simplified - in practice, need more precise replacement)
-                    if section.text in content:
-                        new_content = content.replace(
-                            section.text, rewritten_content, 1
-                        )
-
-                        # Write back to file
-                        with open(self.selected_file_path, "w", encoding="utf-8") as f:
-                            f.write(new_content)
+                    path = self.selected_file_path
+                    with open(path, "r", encoding="utf-8") as f:
+                        content = f.read()
 
-                        # Log rewrite applied
-                        from utils.quality import log_rewrite_event
+                    patches, _ = locate_sections(
+                        content,
+                        NovelIndex.for_novel(path, content),
+                        [(self._chapter_of_section(section), section)],
+                    )
+                    if not patches:
+                        messagebox.showerror("错误", "无法在文件中找到原文内容")
+                        return
+                    patches[0].replacement = rewritten_content
 
-                        doc_id = os.path.basename(self.selected_file_path)
-                        log_rewrite_event(
-                            doc_id,
-                            0,
-                            section.idx,
-                            section.score.overall,
-                            "rewrite_applied",
+                    with self._rewrite_scoring() as scorer:
+                        doc_quality = self._create_rewriter(scorer).apply(
+                            path, content, self.current_quality_data, patches
                         )
 
-                        messagebox.showinfo("成功", "重写内容已应用到文件")
-
-                        # Re-analyze quality
-                        self._perform_quality_analysis(self.selected_file_path)
-
-                        dialog.destroy()
-                    else:
-                        messagebox.showerror("错误", "无法在文件中找到原文内容")
+                    messagebox.showinfo("成功", "重写内容已应用到文件")
+                    self._show_rescored(doc_quality)
+                    dialog.destroy()
 
                 except Exception as e:
                     messagebox.showerror("错误", f"应用重写失败: {str(e)}")
@@ -1695,57 +1800,120 @@ class NovelGeneratorApp:
         if not self.current_quality_data:
             messagebox.showwarning("警告", "请先进行质量分析")
             return
+        if self.is_generating:
+            messagebox.showwarning("警告", "正在生成中，请稍后再试")
+            return
 
         threshold = float(self.threshold_var.get())
-        low_sections = []
-
-        for chapter in self.current_quality_data.chapters:
-            for section in chapter.sections:
-                if section.score.overall < threshold:
-                    low_sections.append(section)
+        targets = [
+            (chapter, section)
+            for chapter in self.current_quality_data.chapters
+            for section in chapter.sections
+            if section.score.overall < threshold
+        ]
 
-        if not low_sections:
+        if not targets:
             messagebox.showinfo("提示", f"没有低于 {threshold} 分的小节需要重写")
             return
 
         if messagebox.askyesno(
             "确认",
-            f"找到 {len(low_sections)} 个低分小节需要重写\n是否开始批量重写？\n这可能需要一些时间。",
+            f"找到 {len(targets)} 个低分小节需要重写\n是否开始批量重写？\n"
+            "所有小节并发生成后一次性写入文件，可以整批撤销。",
         ):
-            self._batch_rewrite_sections(low_sections)
+            self._batch_rewrite_sections(targets)
+
+    def _batch_rewrite_sections(self, targets):
+        """Rewrite sections concurrently and apply them in one atomic patch
 
-    def _batch_rewrite_sections(self, sections):
-        """Batch rewrite sections"""
+        Args:
+            targets: List of (ChapterQuality, SectionQuality) pairs
+        """
+        path = self.selected_file_path
+        doc_quality = self.current_quality_data
+        self.rewrite_low_btn.config(state=tk.DISABLED)
+
+        def progress(done, total):
+            self.root.after(0, lambda: self.log_message(f"重写进度: {done}/{total}"))
 
         def rewrite_thread():
             try:
-                total = len(sections)
-                for i, section in enumerate(sections):
-                    self.root.after(
-                        0,
-                        lambda i=i, total=total: self.log_message(
-                            f"重写进度: {i+1}/{total}"
-                        ),
+                with self._rewrite_scoring() as scorer:
+                    rewriter = self._create_rewriter(scorer)
+                    result = asyncio.run(
+                        rewriter.run(path, doc_quality, targets, progress)
                     )
 
-                    # Show rewrite dialog for each section
-                    self.root.after(0, lambda s=section: self._show_rewrite_dialog(s))
-
-                    # Wait for dialog to close (simplified - in practice, need better sync)
-                    time.sleep(1)
-
-                self.root.after(
-                    0,
-                    lambda: messagebox.showinfo("完成", f"已完成 {total} 个小节的重写"),
-                )
-                self.root.after(0, lambda: self.log_message("批量重写完成"))
+                summary = f"已重写 {len(result.applied)} 个小节"
+                if result.failed:
+                    summary += f"，{len(result.failed)} 个生成失败"
+                if result.skipped:
+                    summary += f"，{len(result.skipped)} 个原文已变化被跳过"
+                self.root.after(0, lambda: self.log_message(summary))
+                self.root.after(0, lambda: self._show_rescored(result.doc_quality))
+                self.root.after(0, lambda: messagebox.showinfo("完成", summary))
 
             except Exception as e:
                 error_msg = f"批量重写失败: {str(e)}"
+                self.root.after(0, lambda: self.log_message(error_msg))
                 self.root.after(0, lambda: messagebox.showerror("错误", error_msg))
+            finally:
+                self.root.after(0, lambda: self.rewrite_low_btn.config(state=tk.NORMAL))
 
         threading.Thread(target=rewrite_thread, daemon=True).start()
 
+    def undo_last_rewrite(self):
+        """Restore the sections replaced by the last applied rewrite"""
+        if not self.selected_file_path:
+            return
+        if not messagebox.askyesno("确认", "确定要撤销最近一次重写吗？"):
+            return
+
+        from core.section_rewriter import undo_last_rewrite
+
+        try:
+            restored = undo_last_rewrite(self.selected_file_path)
+        except Exception as e:
+            messagebox.showerror("错误", f"撤销失败: {str(e)}")
+            return
+
+        self.log_message(f"已撤销重写，恢复 {restored} 个小节")
+        self._perform_quality_analysis(self.selected_file_path)
+
+    def _chapter_of_section(self, section):
+        """Chapter result that contains a section result"""
+        for chapter in self.current_quality_data.chapters:
+            if any(s is section for s in chapter.sections):
+                return chapter
+        raise ValueError(f"小节{section.idx}不在当前分析结果中")
+
+    def _create_rewriter(self, scorer=None):
+        """Batch rewriter using the generator's API settings"""
+        from core.section_rewriter import BatchRewriter
+
+        self._setup_generator()
+        return BatchRewriter(self.generator, scorer)
+
+    @contextlib.contextmanager
+    def _rewrite_scoring(self):
+        """Heuristic scorer for re-scoring rewritten chapters (uses the section cache)"""
+        from utils.quality import QualityScorer
+        from utils.quality_cache import QualityCache
+
+        cache = QualityCache.for_document(self.selected_file_path)
+        try:
+            yield QualityScorer(use_llm_evaluation=False, cache=cache)
+        finally:
+            cache.close()
+
+    def _show_rescored(self, doc_quality):
+        """Show the incrementally re-scored result after a rewrite"""
+        if doc_quality is None:
+            return
+        self.current_quality_data = doc_quality
+        self._update_quality_display(doc_quality)
+        self.log_message(f"重写后总体评分: {doc_quality.overall_score:.1f}/100")
+
     def generate_quality_report(self):
         """Generate quality report"""
         if not self.current_quality_data:
@@ -1796,7 +1964,7 @@ class NovelGeneratorApp:
                 custom_prompt=self.custom_prompt_text.get(1.0, tk.END).strip() or None,
                 temperature=0.7,  # Lower temperature for rewriting
                 max_workers=1,  # Single thread for rewriting
-                status_callback=self.update_status,
+                event_bus=self.event_bus,
             )
 
     def browse_continue_file(self):
@@ -1866,52 +2034,73 @@ class NovelGeneratorApp:
         # 语言变更时更新小说类型列表
         self.update_novel_types()
 
-    def log_message(self, message):
-        """向日志添加消息"""
-        self.log_text.config(state=tk.NORMAL)
-        timestamp = time.strftime("%H:%M:%S", time.localtime())
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
+    def log_message(self, message, level=logging.INFO):
+        """向日志添加消息（任意线程均可调用，由日志管道按帧写入控件）"""
+        self.log_sink.post(message, level)
+
+    def _set_log_verbosity(self, level):
+        """修改日志详细程度：同时调整日志控件和事件订阅，低于该级别的事件不再创建"""
+        self.log_sink.set_level(level)
+        self.log_subscription.set_level(level)
 
-        # 更新状态标签
-        self.status_label.config(text=message)
+    def log_status(self, message):
+        """媒体任务等纯文本状态回调：按内容推断级别后写入日志"""
+        self.log_sink.post(message, guess_level(message))
 
-    def update_progress(self, progress_data):
-        """更新进度信息"""
-        if not progress_data:
+    def _poll_progress(self):
+        """界面线程中定时取出进度通道的变化，两次刷新之间的多次更新合并为一次"""
+        channel = self.progress_channel
+        if channel is None:
             return
+        changes = channel.take_changes()
+        if changes:
+            self.update_progress(channel.aggregate(), changes)
+        if self.is_generating:
+            self.root.after(PROGRESS_POLL_MS, self._poll_progress)
 
-        # 更新字数统计
-        if "word_count" in progress_data:
-            self.word_count_label.config(text=str(progress_data["word_count"]))
-
-        if "target_length" in progress_data:
-            self.target_word_label.config(text=str(progress_data["target_length"]))
-
-        # 更新进度条和百分比
-        if "percentage" in progress_data:
-            percentage = progress_data["percentage"]
-            self.progress["value"] = percentage
-            self.percent_label.config(text=f"{percentage:.1f}%")
-
-        # 更新预计剩余时间
-        if "estimated_time" in progress_data:
-            est_time = progress_data["estimated_time"]
-            if est_time > 0:
-                # 格式化为时:分:秒
-                hours = int(est_time / 3600)
-                minutes = int((est_time % 3600) / 60)
-                seconds = int(est_time % 60)
-
-                if hours > 0:
-                    time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
-                else:
-                    time_str = f"{minutes:02d}:{seconds:02d}"
+    def update_progress(self, total, changes):
+        """显示所有小说的汇总进度
+
+        Args:
+            total: AggregateProgress
+            changes: 本次刷新期间有变化的 ProgressRecord 列表
+        """
+        self.word_count_label.config(text=str(total.word_count))
+        self.target_word_label.config(text=str(total.target_length))
+
+        percentage = total.percentage
+        self.progress["value"] = percentage
+        self.percent_label.config(text=f"{percentage:.1f}%")
 
-                self.time_left_label.config(text=time_str)
+        self.rate_label.config(
+            text=f"{total.rate * 60:.0f} 字/分钟" if total.rate > 0 else "--"
+        )
+        self.active_novels_label.config(text=f"{total.active}/{total.novels}")
+
+        # 预计剩余时间取最慢的一部小说
+        est_time = total.eta
+        if est_time:
+            # 格式化为时:分:秒
+            hours = int(est_time / 3600)
+            minutes = int((est_time % 3600) / 60)
+            seconds = int(est_time % 60)
+
+            if hours > 0:
+                time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
             else:
-                self.time_left_label.config(text="--:--")
+                time_str = f"{minutes:02d}:{seconds:02d}"
+
+            self.time_left_label.config(text=time_str)
+        else:
+            self.time_left_label.config(text="--:--")
+
+        # 阶段变化（摘要、暂停、完成等）显示在状态栏
+        for record in changes:
+            if record.phase != "generating":
+                name = record.genre or record.novel_id
+                self.status_label.config(
+                    text=f"{name}: {PHASE_LABELS.get(record.phase, record.phase)}"
+                )
 
     def open_advanced_settings(self):
         """打开高级设置对话框"""
@@ -1935,6 +2124,12 @@ class NovelGeneratorApp:
                 "paragraph_length_preference", "适中"
             ),
             dialogue_frequency=self.advanced_settings.get("dialogue_frequency", "适中"),
+            metrics_port=self.advanced_settings.get("metrics_port", 0),
+            metrics_snapshot_interval=self.advanced_settings.get(
+                "metrics_snapshot_interval", 60
+            ),
+            trace=self.advanced_settings.get("trace", False),
+            loop_lag_threshold=self.advanced_settings.get("loop_lag_threshold", 0.0),
         )
 
         result = dialog.show()
@@ -2011,6 +2206,9 @@ class NovelGeneratorApp:
             "generate_cover": self.generate_cover_var.get(),
             "generate_music": self.generate_music_var.get(),
             "num_cover_images": self.num_cover_images_var.get(),
+            "media_reuse_policy": self.media_reuse_policy_var.get(),
+            "quality_gate": self.quality_gate_var.get(),
+            "quality_gate_threshold": self.quality_gate_threshold_var.get(),
         }
         save_config(config)
         self.log_message("配置已保存")
@@ -2098,6 +2296,10 @@ class NovelGeneratorApp:
                 "writing_style": "平衡",
                 "paragraph_length_preference": "适中",
                 "dialogue_frequency": "适中",
+                "metrics_port": 0,
+                "metrics_snapshot_interval": 60,
+                "trace": False,
+                "loop_lag_threshold": 0.0,
             }
 
         if "auto_summary" in config:
@@ -2115,6 +2317,15 @@ class NovelGeneratorApp:
         if "num_cover_images" in config:
             self.num_cover_images_var.set(config["num_cover_images"])
 
+        if "media_reuse_policy" in config:
+            self.media_reuse_policy_var.set(config["media_reuse_policy"])
+
+        if "quality_gate" in config:
+            self.quality_gate_var.set(config["quality_gate"])
+
+        if "quality_gate_threshold" in config:
+            self.quality_gate_threshold_var.set(config["quality_gate_threshold"])
+
     def start_generation(self):
         """开始生成小说"""
         try:
@@ -2170,6 +2381,9 @@ class NovelGeneratorApp:
                     messagebox.showerror("错误", f"续写目录不存在: {continue_from_dir}")
                     return
 
+            # 本次运行的进度通道（汇总所有并发小说）
+            self.progress_channel = ProgressChannel()
+
             # 获取批量生成的小说类型
             novel_types_for_batch = None
             if hasattr(self, "novel_types_for_batch") and self.novel_types_for_batch:
@@ -2189,13 +2403,13 @@ class NovelGeneratorApp:
                 "top_p": self.top_p,
                 "max_tokens": self.max_tokens,
                 "context_length": self.context_length,
-                "status_callback": self.log_message,
+                "event_bus": self.event_bus,
                 "num_novels": self.num_novels_var.get(),
                 "random_types": self.random_types_var.get(),
                 "create_ending": self.create_ending_var.get(),
                 "continue_from_file": continue_from_file,
                 "continue_from_dir": continue_from_dir,
-                "progress_callback": self.update_progress,
+                "progress_channel": self.progress_channel,
                 "autosave_interval": (
                     self.auto_summary_interval_var.get()
                     if self.auto_summary_var.get()
@@ -2211,6 +2425,20 @@ class NovelGeneratorApp:
                 "generate_cover": self.generate_cover_var.get(),
                 "generate_music": self.generate_music_var.get(),
                 "num_cover_images": self.num_cover_images_var.get(),
+                "media_reuse_policy": self.media_reuse_policy_var.get(),
+                # 媒体缓存放在输出目录下，与各小说的媒体目录同一分区
+                "output_root": output_dir,
+                "quality_gate": self.quality_gate_var.get(),
+                "quality_gate_threshold": self.quality_gate_threshold_var.get(),
+                # 运行诊断：端口为 0 时不开启指标接口，快照间隔为 0 时不写快照
+                "metrics_port": self.advanced_settings.get("metrics_port") or None,
+                "metrics_snapshot_interval": self.advanced_settings.get(
+                    "metrics_snapshot_interval", 60
+                ),
+                "trace": bool(self.advanced_settings.get("trace", False)),
+                # 阈值为 0 时不监视事件循环
+                "loop_lag_threshold": self.advanced_settings.get("loop_lag_threshold")
+                or None,
                 # 结尾阈值
                 # 阈值在创建生成器后设置，避免构造参数不匹配
             }
@@ -2236,6 +2464,7 @@ class NovelGeneratorApp:
             self.generation_thread = threading.Thread(target=self.run_generation)
             self.generation_thread.daemon = True
             self.generation_thread.start()
+            self.root.after(PROGRESS_POLL_MS, self._poll_progress)
 
         except Exception as e:
             messagebox.showerror("错误", f"启动生成时发生错误: {str(e)}")
@@ -2297,6 +2526,8 @@ class NovelGeneratorApp:
     def generation_completed(self):
         """生成完成后的处理"""
         self.is_generating = False
+        # 显示最后一次进度
+        self._poll_progress()
         self.generator = None
 
         # 更新UI状态
@@ -2322,18 +2553,10 @@ class NovelGeneratorApp:
         if not output_dir or not os.path.exists(output_dir):
             return
 
-        # Find the most recent novel file
-        novel_files = []
-        for root, dirs, files in os.walk(output_dir):
-            for file in files:
-                if file.endswith(".txt") and not file.startswith("summary"):
-                    novel_files.append(os.path.join(root, file))
-
-        if novel_files:
-            # Sort by modification time, get the latest
-            novel_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-            latest_file = novel_files[0]
+        # Find the most recent novel file via the output catalog
+        _, latest_file = self._find_latest_novel(output_dir)
 
+        if latest_file:
             # Ask user if they want to analyze quality
             result = messagebox.askyesno(
                 "质量分析",
@@ -29,7 +29,9 @@ class AdvancedSettingsDialog(tk.Toplevel):
     def __init__(self, parent, temperature=0.7, top_p=0.9, max_tokens=8000, context_length=240000, 
                  autosave_interval=60, auto_summary=True, auto_summary_interval=10000, language="中文",
                  creativity=0.7, formality=0.5, detail_level=0.6, writing_style="平衡",
-                 paragraph_length_preference="适中", dialogue_frequency="适中"):
+                 paragraph_length_preference="适中", dialogue_frequency="适中",
+                 metrics_port=0, metrics_snapshot_interval=60, trace=False,
+                 loop_lag_threshold=0.0):
         super().__init__(parent)
         self.parent = parent
         self.title("高级设置")
@@ -60,6 +62,12 @@ class AdvancedSettingsDialog(tk.Toplevel):
         self.paragraph_length_preference = tk.StringVar(value=paragraph_length_preference)
         self.dialogue_frequency = tk.StringVar(value=dialogue_frequency)
         
+        # 运行诊断选项变量
+        self.metrics_port = tk.IntVar(value=metrics_port)
+        self.metrics_snapshot_interval = tk.IntVar(value=metrics_snapshot_interval)
+        self.trace = tk.BooleanVar(value=trace)
+        self.loop_lag_threshold = tk.DoubleVar(value=loop_lag_threshold)
+        
         self.result = None
         self.create_widgets()
         
@@ -228,6 +236,55 @@ class AdvancedSettingsDialog(tk.Toplevel):
         self.dialogue_style['values'] = ["适中", "对话较少", "对话较多"]
         self.dialogue_style.grid(row=1, column=1, sticky="w", padx=5, pady=5)
         
+        # 运行诊断选项
+        diagnostics_frame = ttk.LabelFrame(content, text="运行诊断")
+        diagnostics_frame.grid(row=14, column=0, columnspan=3, sticky="ew", pady=10)
+        
+        # 指标接口端口
+        ttk.Label(diagnostics_frame, text="指标接口端口:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        metrics_port_entry = ttk.Spinbox(
+            diagnostics_frame,
+            from_=0,
+            to=65535,
+            increment=1,
+            width=10,
+            textvariable=self.metrics_port
+        )
+        metrics_port_entry.grid(row=0, column=1, sticky="w", padx=5, pady=5)
+        ttk.Label(diagnostics_frame, text="在本机 http://127.0.0.1:端口/metrics 提供运行指标，0 表示不开启").grid(row=1, column=1, sticky="w", padx=5)
+        
+        # 指标快照间隔
+        ttk.Label(diagnostics_frame, text="指标快照间隔（秒）:").grid(row=2, column=0, sticky="w", padx=5, pady=5)
+        snapshot_entry = ttk.Spinbox(
+            diagnostics_frame,
+            from_=0,
+            to=3600,
+            increment=10,
+            width=10,
+            textvariable=self.metrics_snapshot_interval
+        )
+        snapshot_entry.grid(row=2, column=1, sticky="w", padx=5, pady=5)
+        ttk.Label(diagnostics_frame, text="定期把指标写入输出目录的 metrics.json，0 表示不写").grid(row=3, column=1, sticky="w", padx=5)
+        
+        # 流水线追踪
+        trace_check = ttk.Checkbutton(diagnostics_frame, text="记录流水线追踪",
+                                      variable=self.trace)
+        trace_check.grid(row=4, column=0, sticky="w", padx=5, pady=5)
+        ttk.Label(diagnostics_frame, text="各阶段耗时写入输出目录的 trace.jsonl，可转换后用 Perfetto 查看").grid(row=5, column=1, sticky="w", padx=5)
+        
+        # 事件循环阻塞检测
+        ttk.Label(diagnostics_frame, text="阻塞检测阈值（秒）:").grid(row=6, column=0, sticky="w", padx=5, pady=5)
+        loop_lag_entry = ttk.Spinbox(
+            diagnostics_frame,
+            from_=0.0,
+            to=10.0,
+            increment=0.05,
+            width=10,
+            textvariable=self.loop_lag_threshold
+        )
+        loop_lag_entry.grid(row=6, column=1, sticky="w", padx=5, pady=5)
+        ttk.Label(diagnostics_frame, text="事件循环停顿超过该时长时记录阻塞位置到日志，0 表示不检测").grid(row=7, column=1, sticky="w", padx=5)
+        
         # 创建底部按钮区域（放在主窗口而非滚动区域内）
         button_frame = ttk.Frame(self)
         button_frame.pack(fill="x", pady=10, padx=10)
@@ -299,6 +356,12 @@ class AdvancedSettingsDialog(tk.Toplevel):
         self.paragraph_length_preference.set("适中")
         self.dialogue_frequency.set("适中")
         
+        # 重置运行诊断选项
+        self.metrics_port.set(0)
+        self.metrics_snapshot_interval.set(60)
+        self.trace.set(False)
+        self.loop_lag_threshold.set(0.0)
+        
         # 更新所有显示
         self.update_value_label('temperature')
         self.update_value_label('top_p')
@@ -328,7 +391,12 @@ class AdvancedSettingsDialog(tk.Toplevel):
             "writing_style": self.writing_style.get(),
             # 添加排版选项
             "paragraph_length_preference": self.paragraph_length_preference.get(),
-            "dialogue_frequency": self.dialogue_frequency.get()
+            "dialogue_frequency": self.dialogue_frequency.get(),
+            # 运行诊断选项
+            "metrics_port": self.metrics_port.get(),
+            "metrics_snapshot_interval": self.metrics_snapshot_interval.get(),
+            "trace": self.trace.get(),
+            "loop_lag_threshold": self.loop_lag_threshold.get()
         }
         self.destroy_safely()
         
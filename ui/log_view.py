@@ -0,0 +1,164 @@
+"""
+界面日志管道
+
+生成器、媒体任务和质量分析在后台线程产生日志，Tk 控件只能在界面线程操作：
+- 任意线程调用 LogSink.post()，消息追加到 deque（append/popleft 是原子操作，不需要加锁）
+- 界面线程用 root.after 按固定帧率取出积压的消息，拼成一段文本一次插入
+- 控件最多保留 max_lines 行，超出时删除最旧的行；积压超过上限时丢弃最旧的消息并提示
+- 低于当前详细程度的消息在入队时就被丢弃，不占用队列和控件
+- 生成器事件（core.events）原样入队，在界面线程写入时才格式化；被挤出队列或裁掉的事件从不格式化
+"""
+
+import time
+import logging
+import itertools
+import tkinter as tk
+from collections import deque
+
+try:
+    from ..core.events import guess_level
+except ImportError:
+    try:
+        from core.events import guess_level
+    except ImportError:
+        from events import guess_level
+
+# 详细程度选项（界面显示名 -> 最低日志级别）
+VERBOSITY_LEVELS = {
+    "详细": logging.DEBUG,
+    "普通": logging.INFO,
+    "仅警告": logging.WARNING,
+}
+
+
+class LogSink:
+    """线程安全、按帧批量刷新的日志控件写入器"""
+
+    def __init__(self, root: tk.Misc, text_widget: tk.Text, status_label=None,
+                 max_lines: int = 5000, fps: int = 10, level: int = logging.INFO,
+                 max_pending: int = 20000, max_message_chars: int = 1000):
+        """
+        Args:
+            root: Tk 根窗口（用于 after 调度）
+            text_widget: 显示日志的 Text/ScrolledText 控件
+            status_label: 显示最新一条消息的标签，可为 None
+            max_lines: 控件最多保留的行数
+            fps: 每秒刷新次数
+            level: 最低显示级别
+            max_pending: 两次刷新之间最多积压的消息数
+            max_message_chars: 单条消息最多显示的字符数
+        """
+        self.root = root
+        self.text_widget = text_widget
+        self.status_label = status_label
+        self.max_lines = max_lines
+        self.interval_ms = max(1, int(1000 / fps))
+        self.level = level
+        self.max_message_chars = max_message_chars
+        self._pending = deque(maxlen=max_pending)
+        # 消息序号（next() 是原子的），序号不连续说明有消息被挤出了队列
+        self._seq = itertools.count()
+        self._next_seq = 0
+        self._lines = 0
+        self._after_id = None
+
+    def post(self, message: str, level: int = logging.INFO):
+        """提交一条消息（任意线程均可调用）"""
+        if level < self.level:
+            return
+        self._pending.append((next(self._seq), time.time(), level, message))
+
+    def post_event(self, event):
+        """提交一个生成器事件（作为 EventBus 订阅者，任意线程均可调用）"""
+        if event.level < self.level:
+            return
+        self._pending.append((next(self._seq), time.time(), event.level, event))
+
+    def set_level(self, level: int):
+        """修改最低显示级别（只影响之后提交的消息）"""
+        self.level = level
+
+    def start(self):
+        """开始定时刷新"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        """停止定时刷新"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def clear(self):
+        """清空控件"""
+        widget = self.text_widget
+        widget.config(state=tk.NORMAL)
+        widget.delete("1.0", tk.END)
+        widget.config(state=tk.DISABLED)
+        self._lines = 0
+
+    def _take_pending(self):
+        """取出积压的消息，返回 (消息列表, 丢弃条数)"""
+        pending = self._pending
+        batch = []
+        while True:
+            try:
+                batch.append(pending.popleft())
+            except IndexError:
+                break
+        if not batch:
+            return batch, 0
+        last_seq = max(item[0] for item in batch)
+        dropped = max(0, last_seq + 1 - self._next_seq - len(batch))
+        self._next_seq = last_seq + 1
+        # 超出控件容量的部分插入后也会被立即删除
+        if len(batch) > self.max_lines:
+            dropped += len(batch) - self.max_lines
+            batch = batch[-self.max_lines:]
+        return batch, dropped
+
+    def _drain(self):
+        """界面线程中：批量写入积压的消息"""
+        self._after_id = None
+        try:
+            batch, dropped = self._take_pending()
+            if batch or dropped:
+                self._write(batch, dropped)
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _write(self, batch, dropped: int):
+        limit = self.max_message_chars
+        lines = []
+        if dropped:
+            lines.append(f"[{time.strftime('%H:%M:%S')}] （日志过多，省略 {dropped} 条）")
+        messages = []
+        for _, created, level, message in batch:
+            if not isinstance(message, str):
+                message = message.format()
+            messages.append(message)
+            if len(message) > limit:
+                message = message[:limit] + "…"
+            prefix = time.strftime("%H:%M:%S", time.localtime(created))
+            if level >= logging.WARNING:
+                prefix += f" {logging.getLevelName(level)}"
+            lines.append(f"[{prefix}] {message}")
+        chunk = "\n".join(lines) + "\n"
+
+        widget = self.text_widget
+        # 用户向上翻看时不自动滚动到底部
+        at_bottom = widget.yview()[1] >= 0.999
+        widget.config(state=tk.NORMAL)
+        widget.insert(tk.END, chunk)
+        self._lines += chunk.count("\n")
+        if self._lines > self.max_lines:
+            excess = self._lines - self.max_lines
+            widget.delete("1.0", f"{excess + 1}.0")
+            self._lines = self.max_lines
+        widget.config(state=tk.DISABLED)
+        if at_bottom:
+            widget.see(tk.END)
+
+        if self.status_label is not None and messages:
+            status = messages[-1]
+            self.status_label.config(text=status[:200])
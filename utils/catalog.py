@@ -0,0 +1,415 @@
+"""
+小说输出目录索引（SQLite）
+
+每次保存小说时更新索引，记录路径、类型、字数、状态、时间戳、开头/结尾片段和最新摘要。
+续写加载、汇总文件和质量分析都直接查询索引，不再反复读取整个输出目录。
+索引之外也可能有文件被新增、修改或删除，使用前调用 reconcile()：只遍历目录并比较文件大小和修改时间，
+只重新读取有变化的文件。
+
+重建索引（并行扫描磁盘）：
+    python -m utils.catalog rebuild <输出目录> [--workers N]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger("novel_generator")
+
+# 索引数据库文件名，位于输出根目录
+CATALOG_FILENAME = "novel_catalog.db"
+
+# 开头/结尾片段长度（字符）
+EXCERPT_LENGTH = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS novels (
+    path TEXT PRIMARY KEY,
+    meta_path TEXT,
+    novel_id TEXT,
+    genre TEXT,
+    language TEXT,
+    word_count INTEGER DEFAULT 0,
+    target_length INTEGER DEFAULT 0,
+    status TEXT,
+    created_at REAL,
+    updated_at REAL,
+    head TEXT,
+    tail TEXT,
+    latest_summary TEXT,
+    file_size INTEGER,
+    file_mtime REAL
+);
+CREATE INDEX IF NOT EXISTS idx_novels_updated ON novels(updated_at);
+CREATE INDEX IF NOT EXISTS idx_novels_novel_id ON novels(novel_id);
+"""
+
+_COLUMNS = (
+    "path", "meta_path", "novel_id", "genre", "language", "word_count",
+    "target_length", "status", "created_at", "updated_at", "head", "tail",
+    "latest_summary", "file_size", "file_mtime",
+)
+
+# 旧版本索引缺少的列（打开时补上）
+_ADDED_COLUMNS = {"file_size": "INTEGER", "file_mtime": "REAL"}
+
+_catalogs: Dict[str, "NovelCatalog"] = {}
+_catalogs_lock = threading.Lock()
+
+
+# 生成器写入输出目录的摘要文件：summary.txt、summary_*.txt 和汇总的 summaries_{类型}.txt
+SUMMARY_PREFIX = 'summar'
+
+
+def is_novel_file(filename: str) -> bool:
+    """判断文件名是否为小说正文（排除摘要文件）"""
+    return filename.endswith('.txt') and not filename.startswith(SUMMARY_PREFIX)
+
+
+def meta_path_for(txt_path: str) -> str:
+    """小说正文对应的元数据文件路径"""
+    return txt_path.replace('.txt', '_meta.json')
+
+
+def _derive_status(word_count: int, novel_setup: Optional[Dict[str, Any]]) -> str:
+    """根据字数和目标长度推断状态"""
+    target_length = (novel_setup or {}).get("target_length") or 0
+    if target_length and word_count >= target_length:
+        return "completed"
+    return "generating"
+
+
+def _latest_summary(novel_setup: Optional[Dict[str, Any]]) -> Optional[str]:
+    """取元数据中最新的一条摘要"""
+    summaries = (novel_setup or {}).get("summaries") or []
+    if summaries and isinstance(summaries[-1], dict):
+        return summaries[-1].get("summary")
+    return None
+
+
+class NovelCatalog:
+    """输出目录的小说索引"""
+
+    def __init__(self, db_path: str):
+        self.db_path = os.path.abspath(db_path)
+        self.root_dir = os.path.dirname(self.db_path)
+        self._lock = threading.Lock()
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            try:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
+            self._conn.executescript(_SCHEMA)
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(novels)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE novels ADD COLUMN {column} {column_type}")
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with _catalogs_lock:
+            if _catalogs.get(self.db_path) is self:
+                del _catalogs[self.db_path]
+        with self._lock:
+            self._conn.close()
+
+    # ---- 写入 ----
+
+    def _row_for(self, txt_path: str, text: str, novel_setup: Optional[Dict[str, Any]],
+                 status: Optional[str], updated_at: Optional[float] = None) -> Dict[str, Any]:
+        """构造一行索引记录"""
+        novel_setup = novel_setup or {}
+        word_count = len(text)
+        meta_path = meta_path_for(txt_path)
+        try:
+            stat = os.stat(txt_path)
+            file_size, file_mtime = stat.st_size, stat.st_mtime
+        except OSError:
+            file_size = file_mtime = None
+        return {
+            "path": txt_path,
+            "meta_path": meta_path if novel_setup else None,
+            "novel_id": str(novel_setup["id"]) if novel_setup.get("id") else None,
+            "genre": novel_setup.get("genre"),
+            "language": novel_setup.get("language"),
+            "word_count": word_count,
+            "target_length": novel_setup.get("target_length") or 0,
+            "status": status or _derive_status(word_count, novel_setup),
+            "created_at": updated_at or time.time(),
+            "updated_at": updated_at or time.time(),
+            "head": text[:EXCERPT_LENGTH],
+            "tail": text[-EXCERPT_LENGTH:] if len(text) > EXCERPT_LENGTH else "",
+            "latest_summary": _latest_summary(novel_setup),
+            "file_size": file_size,
+            "file_mtime": file_mtime,
+        }
+
+    def _upsert(self, rows: List[Dict[str, Any]]):
+        """插入或更新记录，保留首次创建时间；未提供摘要时保留原有摘要"""
+        sql = (
+            f"INSERT INTO novels ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _COLUMNS)}) "
+            "ON CONFLICT(path) DO UPDATE SET "
+            + ", ".join(
+                f"{c}=excluded.{c}" for c in _COLUMNS
+                if c not in ("path", "created_at", "latest_summary")
+            )
+            + ", latest_summary=COALESCE(excluded.latest_summary, novels.latest_summary)"
+        )
+        with self._lock:
+            self._conn.executemany(sql, [tuple(r[c] for c in _COLUMNS) for r in rows])
+            self._conn.commit()
+
+    def record_novel(self, txt_path: str, text: str, novel_setup: Optional[Dict[str, Any]] = None,
+                     status: Optional[str] = None):
+        """保存小说后更新索引
+
+        Args:
+            txt_path: 小说正文路径
+            text: 小说完整内容
+            novel_setup: 小说元数据
+            status: 状态（generating/paused/stopped/completed），为空时根据字数推断
+        """
+        txt_path = os.path.abspath(txt_path)
+        self._upsert([self._row_for(txt_path, text, novel_setup, status)])
+
+    def record_summary(self, novel_id: str, summary: str) -> int:
+        """按小说ID更新最新摘要，返回更新的记录数"""
+        if not novel_id:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE novels SET latest_summary=?, updated_at=? WHERE novel_id=?",
+                (summary, time.time(), str(novel_id)),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def remove(self, txt_path: str):
+        """从索引中删除一条记录（文件已被删除时使用）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM novels WHERE path=?", (os.path.abspath(txt_path),))
+            self._conn.commit()
+
+    # ---- 查询 ----
+
+    def list_novels(self, directory: Optional[str] = None, order_by: str = "path",
+                    require_meta: bool = False) -> List[Dict[str, Any]]:
+        """列出目录（含子目录）下的小说
+
+        Args:
+            directory: 目录，为空时返回全部
+            order_by: "path" 按路径排序，"updated" 按更新时间倒序
+            require_meta: 是否只返回有元数据文件的小说
+        """
+        sql = "SELECT * FROM novels"
+        clauses, params = [], []
+        if directory:
+            prefix = os.path.join(os.path.abspath(directory), "")
+            clauses.append("substr(path, 1, ?) = ?")
+            params.extend([len(prefix), prefix])
+        if require_meta:
+            clauses.append("meta_path IS NOT NULL")
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY updated_at DESC" if order_by == "updated" else " ORDER BY path"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest_novel(self, directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """返回目录下最近更新且仍存在于磁盘上的小说"""
+        for row in self.list_novels(directory, order_by="updated"):
+            if os.path.exists(row["path"]):
+                return row
+            self.remove(row["path"])
+        return None
+
+    def count(self, directory: Optional[str] = None) -> int:
+        """目录下的小说数量"""
+        return len(self.list_novels(directory))
+
+    # ---- 重建 ----
+
+    def _scan_file(self, txt_path: str) -> Optional[Dict[str, Any]]:
+        """读取单个小说文件及其元数据，生成索引记录"""
+        try:
+            with open(txt_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            novel_setup = None
+            meta_path = meta_path_for(txt_path)
+            if os.path.exists(meta_path):
+                try:
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        novel_setup = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"读取元数据失败 {meta_path}: {e}")
+                    novel_setup = None
+            return self._row_for(txt_path, text, novel_setup, None,
+                                 updated_at=os.path.getmtime(txt_path))
+        except Exception as e:
+            logger.warning(f"索引文件失败 {txt_path}: {e}")
+            return None
+
+    @staticmethod
+    def _walk_novel_files(directory: str) -> List[str]:
+        """目录（含子目录）下的小说正文路径"""
+        txt_files = []
+        for root, dirs, files in os.walk(directory):
+            for file in files:
+                if is_novel_file(file):
+                    txt_files.append(os.path.join(root, file))
+        return txt_files
+
+    def reconcile(self, directory: Optional[str] = None, max_workers: int = 8) -> Dict[str, int]:
+        """让目录下的索引与磁盘一致
+
+        删除文件已不存在的记录；新增未索引的小说；文件大小、修改时间或元数据文件有无与记录不一致时重新读取。
+
+        Returns:
+            {"added": 新增数, "updated": 重新读取数, "removed": 删除数}
+        """
+        directory = os.path.abspath(directory or self.root_dir)
+        on_disk = {}
+        for txt_path in self._walk_novel_files(directory):
+            try:
+                on_disk[txt_path] = os.stat(txt_path)
+            except OSError:
+                continue
+        rows = {row["path"]: row for row in self.list_novels(directory)}
+
+        removed = [path for path in rows if path not in on_disk]
+        stale = []
+        for txt_path, stat in on_disk.items():
+            row = rows.get(txt_path)
+            if (row is None
+                    or row["file_size"] != stat.st_size
+                    or row["file_mtime"] != stat.st_mtime
+                    or bool(row["meta_path"]) != os.path.exists(meta_path_for(txt_path))):
+                stale.append(txt_path)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                scanned = [row for row in executor.map(self._scan_file, stale) if row]
+            if scanned:
+                self._upsert(scanned)
+        if removed:
+            with self._lock:
+                self._conn.executemany("DELETE FROM novels WHERE path=?", [(path,) for path in removed])
+                self._conn.commit()
+
+        added = sum(1 for path in stale if path not in rows)
+        result = {"added": added, "updated": len(stale) - added, "removed": len(removed)}
+        if stale or removed:
+            logger.info(f"索引已与磁盘同步 {directory}: {result}")
+        return result
+
+    def rebuild(self, directory: Optional[str] = None, max_workers: int = 8) -> int:
+        """从磁盘并行重建目录下的索引，返回索引的小说数量"""
+        directory = os.path.abspath(directory or self.root_dir)
+        txt_files = self._walk_novel_files(directory)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            rows = [row for row in executor.map(self._scan_file, txt_files) if row]
+
+        prefix = os.path.join(directory, "")
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM novels WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            )
+            self._conn.commit()
+        if rows:
+            self._upsert(rows)
+        logger.info(f"已重建索引 {directory}: {len(rows)} 篇小说")
+        return len(rows)
+
+
+def _is_within(path: str, root: str) -> bool:
+    """path 是否为 root 本身或其下的路径"""
+    return path == root or path.startswith(os.path.join(root, ""))
+
+
+def find_catalog_path(directory: str, root: Optional[str] = None) -> Optional[str]:
+    """从目录开始向上查找已有的索引数据库，最多查到输出根目录 root
+
+    Args:
+        root: 输出根目录；为空或目录不在其下时只查找目录本身
+    """
+    current = os.path.abspath(directory)
+    root = os.path.abspath(root) if root else current
+    if not _is_within(current, root):
+        root = current
+    while True:
+        candidate = os.path.join(current, CATALOG_FILENAME)
+        if os.path.exists(candidate):
+            return candidate
+        parent = os.path.dirname(current)
+        if current == root or parent == current:
+            return None
+        current = parent
+
+
+def open_catalog(directory: str, max_workers: int = 8, root: Optional[str] = None) -> NovelCatalog:
+    """打开目录所属的索引
+
+    优先使用目录或其上级目录（最多到输出根目录 root）中已有的索引；都没有时在该目录创建新索引，
+    并从磁盘重建一次。已有索引可能落后于磁盘，查询前应对要用的目录调用 reconcile()。
+    """
+    db_path = find_catalog_path(directory, root)
+    created = db_path is None
+    if created:
+        db_path = os.path.join(os.path.abspath(directory), CATALOG_FILENAME)
+
+    with _catalogs_lock:
+        catalog = _catalogs.get(db_path)
+        if catalog is None:
+            catalog = NovelCatalog(db_path)
+            _catalogs[db_path] = catalog
+
+    if created:
+        catalog.rebuild(directory, max_workers=max_workers)
+    return catalog
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="小说输出目录索引")
+    subparsers = parser.add_subparsers(dest="command")
+    rebuild_parser = subparsers.add_parser("rebuild", help="从磁盘重建索引")
+    rebuild_parser.add_argument("directory", help="输出根目录")
+    rebuild_parser.add_argument("--workers", type=int, default=8, help="并行读取线程数")
+    args = parser.parse_args(argv)
+
+    if args.command != "rebuild":
+        parser.print_help()
+        return 1
+
+    if not os.path.isdir(args.directory):
+        print(f"错误：{args.directory} 不是有效目录")
+        return 1
+
+    start = time.time()
+    db_path = find_catalog_path(args.directory) or os.path.join(
+        os.path.abspath(args.directory), CATALOG_FILENAME
+    )
+    catalog = NovelCatalog(db_path)
+    count = catalog.rebuild(args.directory, max_workers=args.workers)
+    catalog.close()
+    print(f"已索引 {count} 篇小说，用时 {time.time() - start:.1f} 秒: {db_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import os
 import json
 import time
+import threading
 import webbrowser
 from typing import Optional
 
@@ -85,6 +86,32 @@ def ensure_directory_exists(directory: str) -> None:
     if not os.path.exists(directory):
         os.makedirs(directory, exist_ok=True)
 
+def atomic_write_text(filepath: str, text: str, newline: Optional[str] = None) -> None:
+    """原子写入文本文件：先写临时文件并 fsync，再用 rename 替换，崩溃时不会留下截断的文件
+
+    Args:
+        newline: 写入的换行符，默认为本机换行符（与 open 的 newline 参数相同）
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(filepath)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline=newline) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def atomic_write_json(filepath: str, data, indent: int = 2) -> None:
+    """原子写入 JSON 文件"""
+    atomic_write_text(filepath, json.dumps(data, ensure_ascii=False, indent=indent))
+
 def export_custom_prompt(prompt, filename=None):
     """导出自定义提示词到文件
     
@@ -0,0 +1,184 @@
+"""
+事件循环阻塞检测
+
+所有小说共用一个 asyncio 事件循环，同步的文件读写、sleep 或长时间计算会让整个循环停下：
+- 心跳协程每 interval 秒醒来一次，实际醒来时间比预期晚多少就是调度延迟，计入 event_loop_lag_seconds
+- 监视线程发现心跳迟迟不来（超过 threshold）时，采样事件循环线程当前的调用栈
+- 阻塞结束后按采样中最常出现的项目内函数归因，计入 event_loop_blocked_seconds{site} 并写一条警告日志
+  （同一位置第一次出现时附带调用栈）
+- summary() 按累计阻塞时间列出各位置，测试中可以据此发现新引入的阻塞调用
+
+只用于诊断，默认不开启。
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter as _Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .metrics import get_registry
+except ImportError:
+    from utils.metrics import get_registry
+
+logger = logging.getLogger("novel_generator")
+
+# 项目根目录：调用栈中位于其下的帧才作为阻塞位置
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_metrics = get_registry()
+LOOP_LAG_SECONDS = _metrics.histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟（秒）", buckets=LAG_BUCKETS)
+LOOP_BLOCKED_SECONDS = _metrics.histogram(
+    "event_loop_blocked_seconds", "超过阈值的事件循环阻塞时长（秒），按阻塞位置区分", ("site",),
+    buckets=LAG_BUCKETS)
+
+
+class _BlockedSite:
+    """一个阻塞位置的累计统计"""
+
+    __slots__ = ("blocks", "seconds", "max_seconds", "stack")
+
+    def __init__(self, stack: str):
+        self.blocks = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.stack = stack
+
+
+class LoopMonitor:
+    """事件循环调度延迟监视器（在事件循环中 start，结束前 stop）"""
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1,
+                 sample_interval: Optional[float] = None, root: str = PROJECT_ROOT):
+        """
+        Args:
+            threshold: 调度延迟超过多少秒算作阻塞
+            interval: 心跳间隔（秒）
+            sample_interval: 阻塞期间采样调用栈的间隔，默认为 threshold 的四分之一
+            root: 项目根目录，阻塞位置取调用栈中最内层的项目内帧
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.sample_interval = sample_interval or max(0.005, threshold / 4)
+        self.root = os.path.abspath(root) + os.sep
+        self.sites: Dict[str, _BlockedSite] = {}
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._samples: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> "LoopMonitor":
+        """在当前运行的事件循环中开始监视（必须在事件循环线程中调用）"""
+        if self._task is not None:
+            return self
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop_monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止监视，记录汇总日志"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+        if self.sites:
+            lines = [f"  {site}: {s.blocks} 次，共 {s.seconds:.2f} 秒，最长 {s.max_seconds:.2f} 秒"
+                     for site, s in sorted(self.sites.items(), key=lambda item: -item[1].seconds)]
+            logger.warning("事件循环阻塞汇总:\n" + "\n".join(lines))
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """各阻塞位置的统计，按累计阻塞时间降序"""
+        return [
+            {"site": site, "blocks": s.blocks, "seconds": s.seconds, "max_seconds": s.max_seconds}
+            for site, s in sorted(self.sites.items(), key=lambda item: -item[1].seconds)
+        ]
+
+    async def _heartbeat(self):
+        """心跳协程：测量每次醒来的调度延迟"""
+        interval = self.interval
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.monotonic() - self._beat - interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            with self._lock:
+                samples, self._samples = self._samples, []
+            if lag >= self.threshold:
+                self._record_block(lag, samples)
+
+    def _watch(self):
+        """监视线程：心跳迟到超过阈值时采样事件循环线程的调用栈"""
+        while not self._stop_event.wait(self.sample_interval):
+            if time.monotonic() - self._beat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            sample = self._describe(frame)
+            del frame
+            with self._lock:
+                self._samples.append(sample)
+
+    def _describe(self, frame) -> Tuple[str, str]:
+        """返回 (阻塞位置, 调用栈文本)；位置取最内层的项目内帧，形如 core/generator.py:_save_text"""
+        stack = traceback.extract_stack(frame)
+        site_frame = None
+        for entry in reversed(stack):
+            filename = os.path.abspath(entry.filename)
+            if filename.startswith(self.root) and filename != os.path.abspath(__file__):
+                site_frame = entry
+                break
+        if site_frame is None:
+            site_frame = stack[-1]
+            site = f"{os.path.basename(site_frame.filename)}:{site_frame.name}"
+        else:
+            relative = os.path.relpath(site_frame.filename, self.root).replace(os.sep, "/")
+            site = f"{relative}:{site_frame.name}"
+        return site, "".join(traceback.format_list(stack[-8:]))
+
+    def _record_block(self, lag: float, samples: List[Tuple[str, str]]):
+        """按采样中出现最多的位置记录一次阻塞"""
+        if samples:
+            site = _Counter(s for s, _ in samples).most_common(1)[0][0]
+            stack = next(st for s, st in samples if s == site)
+        else:
+            # 阻塞刚好落在两次采样之间
+            site, stack = "unknown", ""
+        LOOP_BLOCKED_SECONDS.observe(lag, site=site)
+
+        stats = self.sites.get(site)
+        first = stats is None
+        if first:
+            stats = self.sites[site] = _BlockedSite(stack)
+        stats.blocks += 1
+        stats.seconds += lag
+        stats.max_seconds = max(stats.max_seconds, lag)
+
+        if first and stack:
+            logger.warning(f"事件循环阻塞 {lag:.2f} 秒，位置: {site}\n{stack.rstrip()}")
+        else:
+            logger.warning(f"事件循环阻塞 {lag:.2f} 秒，位置: {site}")
@@ -0,0 +1,378 @@
+"""
+运行指标
+
+轻量的进程内指标注册表（计数器、仪表、直方图），各模块在导入时注册自己的指标：
+- 记录一次只是加锁后更新几个数字，不做格式化，长时间批量运行也可以一直开启
+- snapshot() 给出可序列化的快照（直方图附带均值和按桶估计的 p50/p95），可定期写入输出目录
+- MetricsServer 可选地在本机开放 /metrics（Prometheus 文本格式）和 /metrics.json
+"""
+
+import abc
+import time
+import math
+import json
+import bisect
+import logging
+import asyncio
+import threading
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from .common import atomic_write_json
+except ImportError:
+    from utils.common import atomic_write_json
+
+logger = logging.getLogger("novel_generator")
+
+# 默认直方图桶（秒）：从毫秒级的文本清理到分钟级的接口请求
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class _Metric(abc.ABC):
+    """指标基类：按标签值分别记录，子类实现 samples()"""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str = "", labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames) or not all(name in labels for name in self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abc.abstractmethod
+    def samples(self) -> List[Dict[str, Any]]:
+        """各标签组合的当前值，用于快照和 Prometheus 输出"""
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [{"labels": self._labels(key), "value": value} for key, value in items]
+
+
+class Gauge(Counter):
+    """可增可减的当前值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "count", "sum", "max")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram(_Metric):
+    """分桶统计的观测值（延迟、耗时等）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str = "", labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # 最后一格为超出所有上界的 +Inf 桶
+                entry = self._values[key] = _HistogramValue(len(self.bounds) + 1)
+            entry.buckets[index] += 1
+            entry.count += 1
+            entry.sum += value
+            if value > entry.max:
+                entry.max = value
+
+    def time(self, cpu: bool = False, **labels) -> "_Timer":
+        """计时上下文：with histogram.time(model=...): ...；cpu=True 时记录本线程 CPU 时间"""
+        return _Timer(self, labels, cpu)
+
+    def timed(self, cpu: bool = False, **labels) -> Callable:
+        """计时装饰器，同时支持普通函数和协程函数"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.time(cpu, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(cpu, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _quantile(self, entry: _HistogramValue, q: float) -> float:
+        """按桶线性插值估计分位数"""
+        rank = q * entry.count
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(entry.buckets):
+            upper = self.bounds[i] if i < len(self.bounds) else entry.max
+            if count and seen + count >= rank:
+                return min(entry.max, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+            lower = upper
+        return entry.max
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [(key, entry.count, entry.sum, entry.max, list(entry.buckets))
+                     for key, entry in self._values.items()]
+        samples = []
+        for key, count, total, maximum, buckets in items:
+            entry = _HistogramValue(0)
+            entry.count, entry.sum, entry.max, entry.buckets = count, total, maximum, buckets
+            samples.append({
+                "labels": self._labels(key),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "p50": self._quantile(entry, 0.5),
+                "p95": self._quantile(entry, 0.95),
+                "max": maximum,
+                "buckets": buckets,
+            })
+        return samples
+
+
+class _Timer:
+    """Histogram.time() 返回的计时上下文"""
+
+    __slots__ = ("histogram", "labels", "clock", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any], cpu: bool):
+        self.histogram = histogram
+        self.labels = labels
+        self.clock = time.thread_time if cpu else time.perf_counter
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = self.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(self.clock() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """指标注册表：同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str = "", labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str = "", labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str = "", labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """所有指标当前值的可序列化快照"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "metrics": {
+                metric.name: {"type": metric.kind, "help": metric.help, "samples": metric.samples()}
+                for metric in metrics
+            },
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample in metric.samples():
+                labels = sample["labels"]
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_number(sample['value'])}")
+                    continue
+                cumulative = 0
+                bounds = [_format_number(b) for b in metric.bounds] + ["+Inf"]
+                for bound, count in zip(bounds, sample["buckets"]):
+                    cumulative += count
+                    lines.append(f"{metric.name}_bucket{_format_labels(dict(labels, le=bound))} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_number(sample['sum'])}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, float) and (math.isinf(value) or math.isnan(value)):
+        return str(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """进程内共享的指标注册表"""
+    return _registry
+
+
+class MetricsServer:
+    """在后台线程中提供 /metrics 和 /metrics.json"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None, port: int = 9464,
+                 host: str = "127.0.0.1"):
+        """
+        Args:
+            port: 监听端口，0 表示由系统分配（启动后从 port 属性读取）
+            host: 监听地址，默认只对本机开放
+        """
+        self.registry = registry or get_registry()
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body = registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/metrics.json":
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不把每次抓取写进日志
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="metrics_server", daemon=True)
+        self._thread.start()
+        logger.info(f"指标接口已启动: http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+
+class SnapshotWriter:
+    """定期把指标快照原子写入 JSON 文件"""
+
+    def __init__(self, path: str, interval: float = 60.0,
+                 registry: Optional[MetricsRegistry] = None):
+        self.path = path
+        self.interval = interval
+        self.registry = registry or get_registry()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self):
+        """立即写入一次快照"""
+        try:
+            atomic_write_json(self.path, self.registry.snapshot())
+        except OSError as e:
+            logger.warning(f"写入指标快照失败: {e}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics_snapshot", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        """停止定期写入，并写入最后一次快照"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.write()
@@ -0,0 +1,368 @@
+"""
+小说结构索引
+
+每本小说旁边保存一个 <名称>_index.json，记录章节标题、章节和段落的字符/字节偏移以及每段的哈希：
+- 生成器每次保存时增量更新：只从最后一段的开头重新扫描新追加的内容
+- 质量分析、重写等直接按偏移取章节，不必再对全文反复跑章节正则
+- 按字节偏移可以直接 seek 读取任意一章，不读入整本小说
+- 文件被外部修改（大小或修改时间与索引记录不符）时自动全量重建
+- 字节偏移按文件实际使用的换行符计算（索引中记录 newline），其他平台写出的 CRLF/LF 文件也能直接 seek
+"""
+
+import os
+import re
+import json
+import bisect
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    from .common import atomic_write_json
+    from .quality_features import PARAGRAPH_SPLIT_RE
+except ImportError:
+    from utils.common import atomic_write_json
+    from utils.quality_features import PARAGRAPH_SPLIT_RE
+
+logger = logging.getLogger("novel_generator")
+
+INDEX_FORMAT = "novel-structure-index"
+INDEX_VERSION = 1
+
+# 章节标题模式，按优先级排列；取第一个匹配到多个标题的模式
+CHAPTER_PATTERNS = tuple(
+    re.compile(pattern, re.MULTILINE | re.IGNORECASE)
+    for pattern in (
+        r"第[一二三四五六七八九十百千万\d]+章[^\n]*\n",
+        r"Chapter\s+\d+[^\n]*\n",
+        r"第\d+章[^\n]*\n",
+        r"^\d+\.[^\n]*\n",
+    )
+)
+
+# 段落哈希长度（十六进制字符）
+HASH_LENGTH = 16
+
+# 判断换行符时读取的文件开头字节数
+_NEWLINE_PROBE_BYTES = 64 * 1024
+
+
+def index_path_for(txt_path: str) -> str:
+    """小说正文对应的结构索引文件路径"""
+    return txt_path.replace('.txt', '_index.json')
+
+
+def paragraph_hash(text: str) -> str:
+    """段落内容哈希"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def detect_newline(novel_path: str) -> str:
+    """文件实际使用的换行符（按开头一段内容判断），没有换行时为本机的换行符"""
+    with open(novel_path, "rb") as f:
+        head = f.read(_NEWLINE_PROBE_BYTES)
+    if b"\r\n" in head:
+        return "\r\n"
+    if b"\n" in head:
+        return "\n"
+    return os.linesep
+
+
+def _encoded_length(text: str, newline_extra: int) -> int:
+    """文本（换行已统一为 \\n）以 UTF-8 写入文件后占用的字节数
+
+    Args:
+        newline_extra: 文件中每个换行比 \\n 多占的字节数（CRLF 为 1）
+    """
+    return len(text.encode("utf-8")) + text.count("\n") * newline_extra
+
+
+@dataclass(frozen=True)
+class ChapterSpan:
+    """一章在小说中的位置（end 为下一章标题的开头或全文结尾）"""
+
+    number: int
+    title: str
+    start: int
+    end: int
+    byte_start: int
+    byte_end: int
+
+
+class NovelIndex:
+    """单本小说的结构索引"""
+
+    def __init__(self, newline: str = os.linesep):
+        """
+        Args:
+            newline: 小说文件中的换行符，默认为文本模式写入时使用的本机换行符
+        """
+        self.length = 0
+        self.byte_length = 0
+        # 最后一段（去掉空白后）的起点：追加内容后从这里重新扫描
+        self.resume = 0
+        self.resume_byte = 0
+        self.file_size: Optional[int] = None
+        self.file_mtime_ns: Optional[int] = None
+        self.newline = newline
+        # 段落（去掉首尾空白后的范围），按列存储
+        self.para_starts: List[int] = []
+        self.para_ends: List[int] = []
+        self.para_byte_starts: List[int] = []
+        self.para_byte_ends: List[int] = []
+        self.para_hashes: List[str] = []
+        # 每个章节模式匹配到的标题：(字符偏移, 字节偏移, 标题)
+        self.headings: List[List[Tuple[int, int, str]]] = [[] for _ in CHAPTER_PATTERNS]
+
+    # ---- 构建 ----
+
+    @classmethod
+    def build(cls, text: str, newline: str = os.linesep) -> "NovelIndex":
+        """从全文构建索引
+
+        Args:
+            text: 以文本模式读入（换行已统一为 \\n）的全文
+            newline: 文件中的换行符
+        """
+        index = cls(newline)
+        index.rebuild(text)
+        return index
+
+    def rebuild(self, text: str):
+        """丢弃现有内容，从头扫描全文（保留换行符设置）"""
+        self.__init__(self.newline)
+        self._scan(text, 0, 0)
+
+    def update(self, text: str) -> bool:
+        """用新的全文更新索引
+
+        生成器只在末尾追加内容（最多整理最后一段之后的空白），这时只需从最后一段的开头重新扫描；
+        倒数第二段的内容对不上时说明前文被改过，退回全量重建。
+
+        Returns:
+            是否为增量更新
+        """
+        if self._can_extend(text):
+            self._truncate(self.resume)
+            self._scan(text, self.resume, self.resume_byte)
+            return True
+        self.rebuild(text)
+        return False
+
+    def _can_extend(self, text: str) -> bool:
+        """text 是否只在索引覆盖的内容之后有变化"""
+        if not self.length or len(text) <= self.resume:
+            return False
+        # 最后一个不会再被重新扫描的段落
+        stable = len(self.para_starts) - 2
+        if stable < 0:
+            return True
+        start, end = self.para_starts[stable], self.para_ends[stable]
+        return paragraph_hash(text[start:end]) == self.para_hashes[stable]
+
+    def _truncate(self, pos: int):
+        """删除起点不早于 pos 的段落和标题"""
+        keep = bisect.bisect_left(self.para_starts, pos)
+        del self.para_starts[keep:]
+        del self.para_ends[keep:]
+        del self.para_byte_starts[keep:]
+        del self.para_byte_ends[keep:]
+        del self.para_hashes[keep:]
+        for headings in self.headings:
+            while headings and headings[-1][0] >= pos:
+                headings.pop()
+
+    def _scan(self, text: str, pos: int, byte_pos: int):
+        """扫描 text[pos:]，byte_pos 为 pos 处的字节偏移"""
+        # 段落：空行分隔，去掉首尾空白
+        paragraphs = []
+        raw_start = pos
+        for separator in PARAGRAPH_SPLIT_RE.finditer(text, pos):
+            paragraphs.append((raw_start, separator.start()))
+            raw_start = separator.end()
+        paragraphs.append((raw_start, len(text)))
+
+        trimmed = []
+        for start, end in paragraphs:
+            paragraph = text[start:end]
+            stripped = paragraph.strip()
+            if stripped:
+                start += len(paragraph) - len(paragraph.lstrip())
+                trimmed.append((start, start + len(stripped), paragraph_hash(stripped)))
+
+        # 标题：pos 之前开始的匹配都在 pos 前的换行处结束，从 pos 续扫与全文扫描结果相同
+        found = [
+            [(match.start(), match.group().strip()) for match in pattern.finditer(text, pos)]
+            for pattern in CHAPTER_PATTERNS
+        ]
+
+        # 按位置递增一次性换算字节偏移
+        positions = sorted(
+            {p for start, end, _ in trimmed for p in (start, end)}
+            | {start for matches in found for start, _ in matches}
+            | {len(text)}
+        )
+        byte_at: Dict[int, int] = {}
+        newline_extra = len(self.newline) - 1
+        cursor, cursor_byte = pos, byte_pos
+        for p in positions:
+            cursor_byte += _encoded_length(text[cursor:p], newline_extra)
+            cursor = p
+            byte_at[p] = cursor_byte
+
+        for start, end, digest in trimmed:
+            self.para_starts.append(start)
+            self.para_ends.append(end)
+            self.para_byte_starts.append(byte_at[start])
+            self.para_byte_ends.append(byte_at[end])
+            self.para_hashes.append(digest)
+        for headings, matches in zip(self.headings, found):
+            headings.extend((start, byte_at[start], title) for start, title in matches)
+
+        self.length = len(text)
+        self.byte_length = byte_at[len(text)]
+        if self.para_starts:
+            self.resume = self.para_starts[-1]
+            self.resume_byte = self.para_byte_starts[-1]
+
+    # ---- 查询 ----
+
+    def chapters(self) -> List[ChapterSpan]:
+        """章节列表；没有识别出章节结构时为空"""
+        for headings in self.headings:
+            if len(headings) > 1:
+                break
+        else:
+            return []
+        bounds = [(start, byte_start) for start, byte_start, _ in headings[1:]]
+        bounds.append((self.length, self.byte_length))
+        return [
+            ChapterSpan(i + 1, title, start, end, byte_start, byte_end)
+            for i, ((start, byte_start, title), (end, byte_end)) in enumerate(zip(headings, bounds))
+        ]
+
+    @property
+    def chapter_count(self) -> int:
+        return len(self.chapters())
+
+    def split_chapters(self, text: str) -> List[Tuple[int, str]]:
+        """按索引切分章节，返回 [(章节号, 章节文本)]"""
+        chapters = []
+        for chapter in self.chapters():
+            chapter_text = text[chapter.start:chapter.end].strip()
+            if chapter_text:
+                chapters.append((chapter.number, chapter_text))
+        return chapters
+
+    def read_chapter(self, novel_path: str, number: int) -> str:
+        """按字节偏移直接从文件读取一章（不读入整本小说）"""
+        chapter = self.chapters()[number - 1]
+        with open(novel_path, "rb") as f:
+            f.seek(chapter.byte_start)
+            data = f.read(chapter.byte_end - chapter.byte_start)
+        return data.decode("utf-8").replace("\r\n", "\n").strip()
+
+    def paragraphs_in(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """完全落在 [start, end) 内的段落范围"""
+        first = bisect.bisect_left(self.para_starts, start)
+        last = bisect.bisect_right(self.para_ends, end)
+        return list(zip(self.para_starts[first:last], self.para_ends[first:last]))
+
+    # ---- 持久化 ----
+
+    def is_current(self, novel_path: str) -> bool:
+        """索引是否对应文件当前的内容（大小和修改时间与保存索引时一致）"""
+        try:
+            stat = os.stat(novel_path)
+        except OSError:
+            return False
+        return self.file_size == stat.st_size and self.file_mtime_ns == stat.st_mtime_ns
+
+    def save(self, novel_path: str):
+        """记录小说文件当前的大小和修改时间，原子写入索引文件"""
+        stat = os.stat(novel_path)
+        self.file_size = stat.st_size
+        self.file_mtime_ns = stat.st_mtime_ns
+        atomic_write_json(index_path_for(novel_path), self.to_dict(), indent=None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "length": self.length,
+            "byte_length": self.byte_length,
+            "resume": self.resume,
+            "resume_byte": self.resume_byte,
+            "file_size": self.file_size,
+            "file_mtime_ns": self.file_mtime_ns,
+            "newline": self.newline,
+            "paragraphs": {
+                "start": self.para_starts,
+                "end": self.para_ends,
+                "byte_start": self.para_byte_starts,
+                "byte_end": self.para_byte_ends,
+                "hash": self.para_hashes,
+            },
+            "headings": [
+                {
+                    "start": [h[0] for h in headings],
+                    "byte_start": [h[1] for h in headings],
+                    "title": [h[2] for h in headings],
+                }
+                for headings in self.headings
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NovelIndex":
+        if data.get("format") != INDEX_FORMAT or data.get("version") != INDEX_VERSION:
+            raise ValueError("不支持的结构索引格式")
+        index = cls()
+        for key in ("length", "byte_length", "resume", "resume_byte",
+                    "file_size", "file_mtime_ns", "newline"):
+            setattr(index, key, data[key])
+        paragraphs = data["paragraphs"]
+        index.para_starts = paragraphs["start"]
+        index.para_ends = paragraphs["end"]
+        index.para_byte_starts = paragraphs["byte_start"]
+        index.para_byte_ends = paragraphs["byte_end"]
+        index.para_hashes = paragraphs["hash"]
+        if len(data["headings"]) != len(CHAPTER_PATTERNS):
+            raise ValueError("章节模式数量与索引不一致")
+        index.headings = [
+            list(zip(h["start"], h["byte_start"], h["title"])) for h in data["headings"]
+        ]
+        return index
+
+    @classmethod
+    def load(cls, novel_path: str) -> Optional["NovelIndex"]:
+        """读取小说旁的索引文件，不存在或损坏时返回 None"""
+        try:
+            with open(index_path_for(novel_path), "r", encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"结构索引无效，将重建: {e}")
+            return None
+
+    @classmethod
+    def for_novel(cls, novel_path: str, text: Optional[str] = None) -> "NovelIndex":
+        """取得与文件内容一致的索引：索引最新时直接使用，否则重建并保存
+
+        Args:
+            text: 调用方已读入的全文，省去重建时再读一次文件
+        """
+        index = cls.load(novel_path)
+        if index is not None and index.is_current(novel_path):
+            return index
+        if text is None:
+            with open(novel_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        index = cls.build(text, detect_newline(novel_path))
+        try:
+            index.save(novel_path)
+        except OSError as e:
+            logger.warning(f"保存结构索引失败: {e}")
+        return index
@@ -3,25 +3,98 @@ Quality scoring module for novel generation evaluation.
 Provides heuristic and LLM-based quality assessment for chapters and sections.
 """
 
-import re
+import os
 import time
+import random
 import logging
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
+from typing import AbstractSet, Dict, List, Optional, Tuple, Any
+from dataclasses import dataclass, asdict, field, fields
 import json
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
 
-# Optional imports for LLM evaluation
 try:
-    import aiohttp
-
-    HAS_AIOHTTP = True
+    from .quality_features import (
+        CONTRADICTION_WORDS,
+        GENRE_KEYWORDS,
+        PARAGRAPH_SPLIT_RE,
+        SENTENCE_SPLIT_RE,
+        TRANSITION_WORDS,
+        TextFeatures,
+        extract_features,
+        extract_names,
+    )
+    from .quality_cache import QualityCache, section_hash
+    from .common import atomic_write_text
+    from .quality_judge import CONTEXT_CHARS, JudgeItem, LLMJudge
+    from .quality_planner import (
+        ScoreEstimate,
+        estimate_document_score,
+        plan_llm_evaluation,
+    )
+    from .metrics import get_registry
 except ImportError:
-    HAS_AIOHTTP = False
+    from utils.quality_features import (
+        CONTRADICTION_WORDS,
+        GENRE_KEYWORDS,
+        PARAGRAPH_SPLIT_RE,
+        SENTENCE_SPLIT_RE,
+        TRANSITION_WORDS,
+        TextFeatures,
+        extract_features,
+        extract_names,
+    )
+    from utils.quality_cache import QualityCache, section_hash
+    from utils.common import atomic_write_text
+    from utils.quality_judge import CONTEXT_CHARS, JudgeItem, LLMJudge
+    from utils.quality_planner import (
+        ScoreEstimate,
+        estimate_document_score,
+        plan_llm_evaluation,
+    )
+    from utils.metrics import get_registry
 
 # Setup quality-specific logger
 quality_logger = logging.getLogger("novel_generator.quality")
 
+_metrics = get_registry()
+EVALUATION_SECONDS = _metrics.histogram(
+    "quality_evaluation_seconds", "Wall time of a quality evaluation", ("mode",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+EVALUATED_CHARS = _metrics.counter(
+    "quality_evaluated_chars_total", "Characters of text scored", ("mode",)
+)
+GATE_SCORE = _metrics.histogram(
+    "quality_gate_score", "Heuristic overall score behind each quality gate decision",
+    buckets=(10, 20, 30, 40, 50, 55, 60, 65, 70, 80, 90, 100),
+)
+GATE_OUTCOMES = _metrics.counter(
+    "quality_gate_outcomes_total",
+    "Quality gate decisions: accepted, retry (per regeneration) or kept_best",
+    ("outcome",),
+)
+
+# Documents shorter than this are scored in-process; process start-up would dominate
+PARALLEL_MIN_CHARS = 200_000
+
+# Bump when heuristic scoring or feature extraction changes; invalidates cached sections
+SCORER_VERSION = "2"
+HEURISTIC_MODE = "heuristic"
+
+# Columnar quality report (JSON Lines): a header line, then one line per chapter
+REPORT_FORMAT = "novel-quality-report"
+REPORT_VERSION = 2
+SCORE_COLUMNS = (
+    "overall",
+    "readability",
+    "coherence",
+    "canon_consistency",
+    "genre_fit",
+    "word_count",
+    "processing_time",
+)
+
 
 def log_quality_metrics(
     doc_id: str,
@@ -47,6 +120,82 @@ def log_rewrite_event(
     )
 
 
+def log_chunk_quality(
+    doc_id: str, chunk_idx: int, attempt: int, score: "QualityScore", action: str
+):
+    """Log and record the quality gate score of a generated chunk"""
+    GATE_SCORE.observe(score.overall)
+    GATE_OUTCOMES.inc(outcome=action)
+    quality_logger.info(
+        f"CHUNK_QUALITY - doc_id:{doc_id}, chunk:{chunk_idx}, attempt:{attempt}, "
+        f"score:{score.overall:.1f}, readability:{score.readability:.1f}, "
+        f"coherence:{score.coherence:.1f}, canon:{score.canon_consistency:.1f}, "
+        f"genre:{score.genre_fit:.1f}, action:{action}"
+    )
+
+
+def _paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of non-blank paragraphs, with surrounding whitespace trimmed"""
+    spans = []
+    pos = 0
+    for separator in PARAGRAPH_SPLIT_RE.finditer(text):
+        spans.append((pos, separator.start()))
+        pos = separator.end()
+    spans.append((pos, len(text)))
+
+    trimmed = []
+    for start, end in spans:
+        paragraph = text[start:end]
+        stripped = paragraph.strip()
+        if stripped:
+            start += len(paragraph) - len(paragraph.lstrip())
+            trimmed.append((start, start + len(stripped)))
+    return trimmed
+
+
+def _sentence_spans(
+    text: str, start: int, end: int, max_length: int
+) -> List[Tuple[int, int]]:
+    """Split text[start:end] at sentence boundaries into spans of at most max_length"""
+    spans = []
+    section_start = start
+    sentence_start = start
+    boundaries = [m.end() for m in SENTENCE_SPLIT_RE.finditer(text, start, end)]
+    if not boundaries or boundaries[-1] != end:
+        boundaries.append(end)
+
+    for boundary in boundaries:
+        if boundary - section_start > max_length and sentence_start > section_start:
+            spans.append((section_start, sentence_start))
+            section_start = sentence_start
+        # A single sentence longer than the limit is cut into fixed-size pieces
+        while boundary - section_start > max_length:
+            spans.append((section_start, section_start + max_length))
+            section_start += max_length
+        sentence_start = boundary
+
+    if section_start < end:
+        spans.append((section_start, end))
+    return spans
+
+
+def _slotted(cls):
+    """Rebuild a dataclass with __slots__ (dataclass(slots=True) needs Python 3.10)
+
+    Field defaults live in the generated __init__, so the class attributes
+    holding them can be dropped in favour of slots.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {
+        key: value
+        for key, value in cls.__dict__.items()
+        if key not in names and key not in ("__dict__", "__weakref__")
+    }
+    namespace["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+@_slotted
 @dataclass
 class QualityScore:
     """Quality score data structure"""
@@ -61,27 +210,47 @@ class QualityScore:
     processing_time: float = 0.0
 
 
+@_slotted
 @dataclass
 class SectionQuality:
-    """Section quality data"""
+    """Section quality data
+
+    The section text is not copied: source references the chapter text and
+    the text is sliced from it on access.
+    """
 
     idx: int
     score: QualityScore
-    text: str = ""
-    start_pos: int = 0
+    start_pos: int = 0  # offsets into the chapter text
     end_pos: int = 0
+    source: Optional[str] = field(default=None, repr=False, compare=False)
+
+    @property
+    def text(self) -> str:
+        """Section text, or "" if no chapter text is attached (e.g. a report loaded without chapters)"""
+        if self.source is None:
+            return ""
+        return self.source[self.start_pos : self.end_pos]
 
 
+@_slotted
 @dataclass
 class ChapterQuality:
-    """Chapter quality data"""
+    """Chapter quality data (text references the evaluated chapter, it is not a copy)"""
 
     idx: int
     score: QualityScore
     sections: List[SectionQuality]
-    text: str = ""
+    text: str = field(default="", repr=False)
 
+    def attach_text(self, text: str):
+        """Reference the chapter text for lazy section text retrieval"""
+        self.text = text
+        for section in self.sections:
+            section.source = text
 
+
+@_slotted
 @dataclass
 class DocumentQuality:
     """Document quality data"""
@@ -93,6 +262,7 @@ class DocumentQuality:
     genre: str = ""
     language: str = "中文"
     created_at: str = ""
+    overall_interval: Optional[Tuple[float, float]] = None  # 95% CI when LLM-sampled
 
 
 class QualityScorer:
@@ -105,6 +275,14 @@ class QualityScorer:
         model: str = "gpt-3.5-turbo",
         base_url: Optional[str] = None,
         llm_budget_limit: int = 10,
+        context_window: int = 2000,
+        llm_concurrency: int = 4,
+        max_workers: Optional[int] = None,
+        cache: Optional[QualityCache] = None,
+        llm_token_budget: int = 60_000,
+        llm_batch_size: int = 8,
+        rewrite_threshold: float = 70.0,
+        llm_sample_fraction: float = 0.5,
     ):
         """
         Initialize quality scorer
@@ -114,40 +292,97 @@ class QualityScorer:
             api_key: API key for LLM evaluation
             model: Model name for LLM evaluation
             base_url: Base URL for LLM API
-            llm_budget_limit: Maximum number of LLM evaluations
+            llm_budget_limit: Maximum number of LLM requests (each judges a batch of sections)
+            context_window: Characters of preceding text passed as section context
+            llm_concurrency: Maximum number of concurrent LLM evaluations
+            max_workers: Worker processes for heuristic document evaluation (default: CPU count)
+            cache: Persistent section cache; only new or changed sections are re-scored
+            llm_token_budget: Prompt and completion tokens the LLM judge may spend
+            llm_batch_size: Maximum sections judged per LLM request
+            rewrite_threshold: Score below which a section is a rewrite candidate;
+                the LLM budget favours sections near or below it
+            llm_sample_fraction: Minimum share of the LLM budget spent on a random
+                sample used to calibrate the document score
         """
         self.use_llm_evaluation = use_llm_evaluation
         self.api_key = api_key
         self.model = model
         self.base_url = base_url
         self.llm_budget_limit = llm_budget_limit
-        self.llm_usage_count = 0
+        self.llm_token_budget = llm_token_budget
+        self.llm_batch_size = llm_batch_size
+        self.rewrite_threshold = rewrite_threshold
+        self.llm_sample_fraction = llm_sample_fraction
+        self.context_window = context_window
+        self.llm_concurrency = llm_concurrency
+        self.max_workers = max_workers
+        self.cache = cache
+        self._judge: Optional[LLMJudge] = None
+
+    def _llm_enabled(self) -> bool:
+        """Whether section scoring goes through the LLM"""
+        return bool(self.use_llm_evaluation and self.api_key)
+
+    def _get_judge(self) -> LLMJudge:
+        """Batched LLM judge shared by all evaluations of this scorer"""
+        if self._judge is None:
+            self._judge = LLMJudge(
+                self.api_key,
+                self.model,
+                self.base_url,
+                token_budget=self.llm_token_budget,
+                max_requests=self.llm_budget_limit,
+                batch_size=self.llm_batch_size,
+                concurrency=self.llm_concurrency,
+            )
+        return self._judge
+
+    @property
+    def llm_usage_count(self) -> int:
+        """Number of LLM requests sent so far"""
+        return self._judge.requests if self._judge else 0
+
+    async def aclose(self):
+        """Close the pooled LLM session of the running event loop"""
+        if self._judge is not None:
+            await self._judge.close()
 
     def _calculate_readability_heuristic(self, text: str) -> float:
         """Calculate readability score using heuristic methods"""
-        if not text:
-            return 0.0
+        return self._readability_from_features(extract_features(text))
 
-        # Basic text statistics
-        sentences = re.split(r"[。！？.!?]+", text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+    def _calculate_coherence_heuristic(self, text: str) -> float:
+        """Calculate coherence score using heuristic methods"""
+        return self._coherence_from_features(extract_features(text))
 
-        if not sentences:
+    def _calculate_canon_consistency_heuristic(
+        self, text: str, context: Optional[str] = None
+    ) -> float:
+        """Calculate canon consistency score using heuristic methods"""
+        return self._canon_consistency_from_features(
+            extract_features(text), extract_names(context) if context else None
+        )
+
+    def _calculate_genre_fit_heuristic(self, text: str, genre: str) -> float:
+        """Calculate genre fit score using heuristic methods"""
+        return self._genre_fit_from_features(extract_features(text), genre)
+
+    @staticmethod
+    def _readability_from_features(features: TextFeatures) -> float:
+        """Readability score from sentence, paragraph and dialogue statistics"""
+        if not features.length or not features.sentence_lengths:
             return 0.0
 
+        sentence_lengths = features.sentence_lengths
+
         # Average sentence length
-        avg_sentence_length = len(text) / len(sentences)
+        avg_sentence_length = features.length / len(sentence_lengths)
 
         # Sentence length variation (good writing has variation)
-        sentence_lengths = [len(s) for s in sentences]
         length_variance = sum(
             (l - avg_sentence_length) ** 2 for l in sentence_lengths
         ) / len(sentence_lengths)
 
-        # Paragraph structure
-        paragraphs = re.split(r"\n\s*\n", text)
-        paragraphs = [p.strip() for p in paragraphs if p.strip()]
-
         # Scoring factors
         score = 50.0  # Base score
 
@@ -166,14 +401,13 @@ class QualityScorer:
             score -= 10
 
         # Paragraph structure (3-8 paragraphs per section is good)
-        if 3 <= len(paragraphs) <= 8:
+        if 3 <= features.paragraph_count <= 8:
             score += 10
-        elif len(paragraphs) > 15:
+        elif features.paragraph_count > 15:
             score -= 10
 
         # Dialogue balance (for fiction)
-        dialogue_matches = re.findall(r'["「『].*?["」』]', text)
-        dialogue_ratio = len("".join(dialogue_matches)) / len(text) if text else 0
+        dialogue_ratio = features.dialogue_chars / features.length
         if 0.1 <= dialogue_ratio <= 0.3:  # 10-30% dialogue is good
             score += 5
         elif dialogue_ratio > 0.5:
@@ -181,214 +415,84 @@ class QualityScorer:
 
         return min(100.0, max(0.0, score))
 
-    def _calculate_coherence_heuristic(self, text: str) -> float:
-        """Calculate coherence score using heuristic methods"""
-        if not text:
+    @staticmethod
+    def _coherence_from_features(features: TextFeatures) -> float:
+        """Coherence score from transitions, sentence length spread and repetition"""
+        if not features.length:
             return 0.0
 
-        sentences = re.split(r"[。！？.!?]+", text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-
-        if len(sentences) < 2:
+        sentence_lengths = features.sentence_lengths
+        if len(sentence_lengths) < 2:
             return 50.0
 
         score = 50.0
 
         # Check for transition words
-        transition_words = [
-            "但是",
-            "然而",
-            "因此",
-            "所以",
-            "接着",
-            "然后",
-            "首先",
-            "其次",
-            "最后",
-            "不过",
-            "另外",
-            "此外",
-            "总之",
-            "综上所述",
-            "由此可见",
-        ]
-        transition_count = sum(1 for word in transition_words if word in text)
-        transition_ratio = transition_count / len(sentences)
+        transition_count = len(features.keywords.intersection(TRANSITION_WORDS))
+        transition_ratio = transition_count / len(sentence_lengths)
 
         if 0.1 <= transition_ratio <= 0.3:
             score += 20
         elif transition_ratio < 0.05:
             score -= 15
 
-        # Check pronoun consistency (simplified)
-        pronoun_patterns = ["他", "她", "它", "他们", "她们", "它们", "我", "你", "您"]
-        pronoun_usage = [text.count(p) for p in pronoun_patterns]
-
-        # Basic coherence: avoid too many sudden topic changes
-        if len(sentences) > 0:
-            # Check sentence length consistency (extreme variations may indicate incoherence)
-            sentence_lengths = [len(s) for s in sentences]
-            avg_length = sum(sentence_lengths) / len(sentence_lengths)
-            extreme_variations = sum(
-                1
-                for length in sentence_lengths
-                if length < avg_length * 0.3 or length > avg_length * 3
-            )
+        # Check sentence length consistency (extreme variations may indicate incoherence)
+        avg_length = sum(sentence_lengths) / len(sentence_lengths)
+        extreme_variations = sum(
+            1
+            for length in sentence_lengths
+            if length < avg_length * 0.3 or length > avg_length * 3
+        )
 
-            if extreme_variations / len(sentences) < 0.2:
-                score += 10
-            else:
-                score -= 10
+        if extreme_variations / len(sentence_lengths) < 0.2:
+            score += 10
+        else:
+            score -= 10
 
         # Check for repeated phrases (may indicate poor flow)
-        words = re.findall(r"[\w]+", text)
-        if len(words) > 10:
-            word_freq = {}
-            for word in words:
-                word_freq[word] = word_freq.get(word, 0) + 1
-
+        if features.word_total > 10:
             # Penalize excessive repetition
-            repeated_words = sum(
-                1 for count in word_freq.values() if count > len(words) * 0.1
-            )
-            if repeated_words == 0:
+            if features.repeated_words == 0:
                 score += 10
-            elif repeated_words > 3:
+            elif features.repeated_words > 3:
                 score -= 15
 
         return min(100.0, max(0.0, score))
 
-    def _calculate_canon_consistency_heuristic(
-        self, text: str, context: Optional[str] = None
+    @staticmethod
+    def _canon_consistency_from_features(
+        features: TextFeatures, context_names: Optional[AbstractSet[str]] = None
     ) -> float:
-        """Calculate canon consistency score using heuristic methods"""
-        if not text:
+        """Canon consistency score from name overlap with context and contradictions"""
+        if not features.length:
             return 0.0
 
         score = 70.0  # Base score - assume consistency unless proven otherwise
 
-        # Check for consistency indicators
-        consistency_issues = []
-
-        # Time consistency (simplified check)
-        time_indicators = [
-            "早上",
-            "中午",
-            "下午",
-            "晚上",
-            "昨天",
-            "今天",
-            "明天",
-            "过去",
-            "未来",
-        ]
-        time_mentions = [
-            indicator for indicator in time_indicators if indicator in text
-        ]
-
-        # Character name consistency (basic check)
-        # This is a simplified version - in practice, you'd need NER
-        potential_names = re.findall(r"[\u4e00-\u9fff]{2,4}", text)
-        name_freq = {}
-        for name in potential_names:
-            if len(name) >= 2:  # Likely a name
-                name_freq[name] = name_freq.get(name, 0) + 1
-
-        # Look for potential inconsistencies (very basic)
-        if context:
-            # Check if key elements from context are maintained
-            context_names = set(re.findall(r"[\u4e00-\u9fff]{2,4}", context))
-            text_names = set(potential_names)
-
-            # If context has names but text doesn't, might be inconsistent
-            if context_names and not context_names.intersection(text_names):
-                score -= 20
+        # If context has names but text doesn't, might be inconsistent
+        if context_names and context_names.isdisjoint(features.names):
+            score -= 20
 
         # Check for contradictory statements (simplified)
-        contradictions = ["但是", "然而", "相反", "与此相反"]
-        contradiction_count = sum(1 for word in contradictions if word in text)
+        contradiction_count = len(features.keywords.intersection(CONTRADICTION_WORDS))
 
         # Some contradictions are fine for drama, too many may indicate inconsistency
-        if contradiction_count > len(text) / 1000:  # More than 1 per 1000 characters
+        if contradiction_count > features.length / 1000:  # More than 1 per 1000 characters
             score -= 15
 
         return min(100.0, max(0.0, score))
 
-    def _calculate_genre_fit_heuristic(self, text: str, genre: str) -> float:
-        """Calculate genre fit score using heuristic methods"""
-        if not text or not genre:
+    @staticmethod
+    def _genre_fit_from_features(features: TextFeatures, genre: str) -> float:
+        """Genre fit score from genre keyword presence and text shape"""
+        if not features.length or not genre:
             return 50.0
 
-        # Genre-specific keywords (simplified)
-        genre_keywords = {
-            "奇幻冒险": [
-                "魔法",
-                "龙",
-                "精灵",
-                "冒险",
-                "剑",
-                "法术",
-                "异世界",
-                "勇士",
-                "魔王",
-            ],
-            "科幻未来": [
-                "科技",
-                "未来",
-                "星际",
-                "机器人",
-                "人工智能",
-                "宇宙",
-                "时间",
-                "基因",
-            ],
-            "悬疑推理": [
-                "案件",
-                "谜题",
-                "线索",
-                "证据",
-                "凶手",
-                "真相",
-                "推理",
-                "嫌疑",
-            ],
-            "武侠江湖": [
-                "武功",
-                "江湖",
-                "侠客",
-                "剑法",
-                "内功",
-                "门派",
-                "师父",
-                "仇人",
-            ],
-            "都市言情": [
-                "爱情",
-                "感情",
-                "心动",
-                "约会",
-                "表白",
-                "分手",
-                "吃醋",
-                "浪漫",
-            ],
-            "历史传奇": [
-                "古代",
-                "皇帝",
-                "将军",
-                "战争",
-                "朝代",
-                "历史",
-                "传奇",
-                "天下",
-            ],
-        }
-
         score = 50.0  # Base score
 
-        if genre in genre_keywords:
-            keywords = genre_keywords[genre]
-            keyword_count = sum(1 for keyword in keywords if keyword in text)
+        if genre in GENRE_KEYWORDS:
+            keywords = GENRE_KEYWORDS[genre]
+            keyword_count = len(features.keywords.intersection(keywords))
             keyword_density = keyword_count / len(keywords)
 
             # Score based on keyword presence
@@ -399,146 +503,145 @@ class QualityScorer:
             elif keyword_density == 0:
                 score -= 20
 
-        # Check tone and style appropriateness
-        text_length = len(text)
-
         # Different genres have different optimal lengths
         if "奇幻" in genre or "科幻" in genre:
             # These genres typically need more descriptive text
-            if text_length > 500:
+            if features.length > 500:
                 score += 10
         elif "言情" in genre:
             # Romance can be more dialogue-heavy
-            dialogue_ratio = (
-                len(re.findall(r'["「『].*?["」』]', text)) / text_length if text else 0
-            )
+            dialogue_ratio = features.dialogue_count / features.length
             if 0.2 <= dialogue_ratio <= 0.4:
                 score += 10
 
         return min(100.0, max(0.0, score))
 
-    async def _evaluate_with_llm(
-        self,
-        text: str,
-        context: Optional[str] = None,
-        genre: str = "",
-        section_type: str = "section",
-    ) -> QualityScore:
-        """Evaluate text quality using LLM"""
-        if not HAS_AIOHTTP:
-            quality_logger.warning(
-                "aiohttp not available, falling back to heuristic evaluation"
-            )
-            return self._evaluate_heuristic(text, context, genre)
-
-        if self.llm_usage_count >= self.llm_budget_limit:
-            quality_logger.warning(
-                f"LLM budget limit reached ({self.llm_budget_limit}), falling back to heuristic"
-            )
-            return self._evaluate_heuristic(text, context, genre)
-
-        start_time = time.time()
-
-        prompt = f"""
-请评估以下{section_type}文本的质量，从4个维度打分（0-100分）：
-
-1. 可读性 (Readability) - 文字是否流畅易懂，句子结构是否合理
-2. 连贯性 (Coherence) - 逻辑是否清晰，段落间衔接是否自然  
-3. 设定一致性 (Canon Consistency) - 人物、时间、地点等设定是否前后一致
-4. 类型贴合度 (Genre Fit) - 是否符合{genre or '小说'}类型的特征和风格
-
-文本内容：
-{text[:2000]}  # Limit text length for API
-
-{'前文上下文：' + context[:500] if context else ''}
+    @staticmethod
+    def _weighted_overall(
+        readability: float, coherence: float, canon_consistency: float, genre_fit: float
+    ) -> float:
+        """Overall score as the weighted average of the four aspects"""
+        return (
+            readability * 0.3
+            + coherence * 0.3
+            + canon_consistency * 0.2
+            + genre_fit * 0.2
+        )
 
-请以JSON格式返回评分：
-{{
-    "readability": 分数,
-    "coherence": 分数, 
-    "canon_consistency": 分数,
-    "genre_fit": 分数,
-    "rewrite_suggestion": "改进建议（50字以内）"
-}}
-"""
+    @staticmethod
+    def _llm_cache_key(text: str, context: Optional[str]) -> str:
+        """Cache key of an LLM judgement: the section and the context the judge saw"""
+        return section_hash(f"{(context or '')[-CONTEXT_CHARS:]}\0{text}")
 
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            }
+    def _score_from_llm(self, entry: Dict[str, Any], text: str) -> QualityScore:
+        """QualityScore from a judged entry"""
+        return QualityScore(
+            overall=self._weighted_overall(
+                entry["readability"],
+                entry["coherence"],
+                entry["canon_consistency"],
+                entry["genre_fit"],
+            ),
+            readability=entry["readability"],
+            coherence=entry["coherence"],
+            canon_consistency=entry["canon_consistency"],
+            genre_fit=entry["genre_fit"],
+            rewrite_suggestion=entry.get("rewrite_suggestion", ""),
+            word_count=len(text),
+            processing_time=entry.get("processing_time", 0.0),
+        )
 
-            data = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.3,
-                "max_tokens": 500,
-            }
+    async def _judge_sections(
+        self, items: List[Tuple[str, Optional[str], bool]], genre: str = ""
+    ) -> List[Optional[QualityScore]]:
+        """Judge (text, context, follows_previous) sections with the batched LLM judge
 
-            url = (
-                f"{self.base_url}/chat/completions"
-                if self.base_url
-                else "https://api.openai.com/v1/chat/completions"
+        Cached judgements are reused. Entries are None where the judge could not
+        score the section (budget exhausted, failed request, missing from the response).
+        """
+        mode = f"llm:{self.model}"
+        keys = (
+            [self._llm_cache_key(text, context) for text, context, _ in items]
+            if self.cache is not None
+            else []
+        )
+        cached = self.cache.get_many(keys, SCORER_VERSION, genre, mode) if keys else {}
+
+        pending = [i for i in range(len(items)) if not keys or keys[i] not in cached]
+        judge_items = []
+        for n, i in enumerate(pending):
+            text, context, follows_previous = items[i]
+            judge_items.append(
+                JudgeItem(
+                    text,
+                    context or "",
+                    # Only true if the preceding section is judged in the same request
+                    follows_previous and n > 0 and pending[n - 1] == i - 1,
+                )
             )
+        judged = (
+            dict(zip(pending, await self._get_judge().judge(judge_items, genre)))
+            if judge_items
+            else {}
+        )
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url, headers=headers, json=data, timeout=30
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        content = result["choices"][0]["message"]["content"]
-
-                        # Parse JSON response
-                        try:
-                            evaluation = json.loads(content)
-                            self.llm_usage_count += 1
-
-                            processing_time = time.time() - start_time
-
-                            return QualityScore(
-                                overall=0,  # Will be calculated
-                                readability=evaluation.get("readability", 50),
-                                coherence=evaluation.get("coherence", 50),
-                                canon_consistency=evaluation.get(
-                                    "canon_consistency", 50
-                                ),
-                                genre_fit=evaluation.get("genre_fit", 50),
-                                rewrite_suggestion=evaluation.get(
-                                    "rewrite_suggestion", ""
-                                ),
-                                processing_time=processing_time,
-                            )
-                        except json.JSONDecodeError:
-                            quality_logger.error("Failed to parse LLM response as JSON")
-                            return self._evaluate_heuristic(text, context, genre)
-                    else:
-                        quality_logger.error(
-                            f"LLM API request failed: {response.status}"
-                        )
-                        return self._evaluate_heuristic(text, context, genre)
+        scores: List[Optional[QualityScore]] = []
+        new_entries = []
+        for i, (text, _, _) in enumerate(items):
+            entry = cached.get(keys[i]) if keys else None
+            if entry is None:
+                entry = judged.get(i)
+                if entry is not None and keys:
+                    stored = {k: v for k, v in entry.items() if k != "processing_time"}
+                    new_entries.append((keys[i], stored))
+            scores.append(self._score_from_llm(entry, text) if entry else None)
+
+        if new_entries:
+            self.cache.put_many(new_entries, SCORER_VERSION, genre, mode)
+        return scores
 
-        except Exception as e:
-            quality_logger.error(f"LLM evaluation failed: {str(e)}")
-            return self._evaluate_heuristic(text, context, genre)
+    async def _evaluate_with_llm(
+        self, items: List[Tuple[str, Optional[str], bool]], genre: str = ""
+    ) -> List[QualityScore]:
+        """Evaluate sections with the LLM judge, falling back to heuristics per section"""
+        scores = await self._judge_sections(items, genre)
+        return [
+            score or self._evaluate_heuristic(text, context, genre)
+            for score, (text, context, _) in zip(scores, items)
+        ]
 
     def _evaluate_heuristic(
-        self, text: str, context: Optional[str] = None, genre: str = ""
+        self,
+        text: str,
+        context: Optional[str] = None,
+        genre: str = "",
+        context_names: Optional[AbstractSet[str]] = None,
+        features: Optional[TextFeatures] = None,
     ) -> QualityScore:
-        """Evaluate text quality using heuristic methods"""
+        """Evaluate text quality using heuristic methods
+
+        All four scores are derived from a single feature extraction pass.
+        context_names may be passed instead of context when the caller already
+        tracks the name candidates of the preceding text; features may be
+        passed when they come from the quality cache.
+        """
         start_time = time.time()
 
-        readability = self._calculate_readability_heuristic(text)
-        coherence = self._calculate_coherence_heuristic(text)
-        canon_consistency = self._calculate_canon_consistency_heuristic(text, context)
-        genre_fit = self._calculate_genre_fit_heuristic(text, genre)
+        if features is None:
+            features = extract_features(text)
+        if context_names is None and context:
+            context_names = extract_names(context)
+
+        readability = self._readability_from_features(features)
+        coherence = self._coherence_from_features(features)
+        canon_consistency = self._canon_consistency_from_features(
+            features, context_names
+        )
+        genre_fit = self._genre_fit_from_features(features, genre)
 
         # Calculate overall score (weighted average)
-        overall = (
-            readability * 0.3
-            + coherence * 0.3
-            + canon_consistency * 0.2
-            + genre_fit * 0.2
+        overall = self._weighted_overall(
+            readability, coherence, canon_consistency, genre_fit
         )
 
         processing_time = time.time() - start_time
@@ -578,6 +681,7 @@ class QualityScorer:
         context: Optional[str] = None,
         genre: str = "",
         use_llm: Optional[bool] = None,
+        context_names: Optional[AbstractSet[str]] = None,
     ) -> QualityScore:
         """
         Evaluate text quality
@@ -587,6 +691,7 @@ class QualityScorer:
             context: Previous context for coherence checking
             genre: Genre of the text
             use_llm: Whether to use LLM evaluation (overrides instance setting)
+            context_names: Name candidates of the context, if already known
 
         Returns:
             QualityScore object
@@ -599,59 +704,161 @@ class QualityScorer:
         use_llm = use_llm if use_llm is not None else self.use_llm_evaluation
 
         if use_llm and self.api_key:
-            return await self._evaluate_with_llm(text, context, genre)
+            (score,) = await self._evaluate_with_llm([(text, context, False)], genre)
+            return score
         else:
-            return self._evaluate_heuristic(text, context, genre)
+            return self._evaluate_heuristic(text, context, genre, context_names)
+
+    def split_text_into_spans(
+        self, text: str, max_section_length: int = 1000
+    ) -> List[Tuple[int, int]]:
+        """Split text into sections, returning (start, end) offsets into text
+
+        Paragraphs are grouped up to max_section_length in a single pass.
+        A paragraph longer than 1.5x the limit is split at sentence
+        boundaries on its own instead of re-splitting the whole text.
+        """
+        spans = []
+        current_start = current_end = None
+
+        for para_start, para_end in _paragraph_spans(text):
+            if para_end - para_start > max_section_length * 1.5:
+                if current_start is not None:
+                    spans.append((current_start, current_end))
+                    current_start = None
+                spans.extend(
+                    _sentence_spans(text, para_start, para_end, max_section_length)
+                )
+            elif current_start is None:
+                current_start, current_end = para_start, para_end
+            elif para_end - current_start <= max_section_length:
+                current_end = para_end
+            else:
+                spans.append((current_start, current_end))
+                current_start, current_end = para_start, para_end
+
+        if current_start is not None:
+            spans.append((current_start, current_end))
+        return spans
 
     def split_text_into_sections(
         self, text: str, max_section_length: int = 1000
     ) -> List[str]:
         """Split text into sections for evaluation"""
-        if not text:
-            return []
-
-        # Try to split by paragraphs first
-        paragraphs = re.split(r"\n\s*\n", text)
-        sections = []
-        current_section = ""
+        return [
+            text[start:end]
+            for start, end in self.split_text_into_spans(text, max_section_length)
+        ]
 
-        for paragraph in paragraphs:
-            paragraph = paragraph.strip()
-            if not paragraph:
-                continue
+    def _section_context(
+        self, chapter_text: str, context: Optional[str], idx: int, start: int
+    ) -> Optional[str]:
+        """Context window for a section: the text preceding it, bounded to
+        context_window characters (previous chapters' context first, filling
+        whatever the chapter text leaves of the window)"""
+        if not context and idx == 0:
+            return None
+        window_start = max(0, start - self.context_window)
+        section_context = chapter_text[window_start:start].rstrip()
+        remaining = self.context_window - (start - window_start)
+        if context and remaining > 0:
+            section_context = context[-remaining:] + section_context
+        return section_context
+
+    @staticmethod
+    def _aggregate_chapter_score(sections: List[SectionQuality]) -> QualityScore:
+        """Chapter score as the mean of its section scores"""
+        return QualityScore(
+            overall=sum(s.score.overall for s in sections) / len(sections),
+            readability=sum(s.score.readability for s in sections) / len(sections),
+            coherence=sum(s.score.coherence for s in sections) / len(sections),
+            canon_consistency=sum(s.score.canon_consistency for s in sections)
+            / len(sections),
+            genre_fit=sum(s.score.genre_fit for s in sections) / len(sections),
+            word_count=sum(s.score.word_count for s in sections),
+            processing_time=sum(s.score.processing_time for s in sections),
+        )
 
-            if len(current_section + paragraph) <= max_section_length:
-                current_section += paragraph + "\n\n"
+    def evaluate_chapter_heuristic(
+        self,
+        chapter_text: str,
+        chapter_idx: int,
+        context: Optional[str] = None,
+        genre: str = "",
+    ) -> ChapterQuality:
+        """Evaluate a chapter with heuristics only (synchronous, CPU-bound)"""
+        sections = []
+        spans = self.split_text_into_spans(chapter_text)
+
+        # Features of unchanged sections come from the persistent cache
+        cached = {}
+        hashes = []
+        if self.cache is not None:
+            hashes = [section_hash(chapter_text[start:end]) for start, end in spans]
+            cached = self.cache.get_many(hashes, SCORER_VERSION, genre, HEURISTIC_MODE)
+        new_entries = []
+
+        # Name candidates of the context grow with each section instead of
+        # re-scanning the joined context for every section
+        context_names = set(extract_names(context)) if context else set()
+
+        for i, (start, end) in enumerate(spans):
+            section_text = chapter_text[start:end]
+            section_context = self._section_context(chapter_text, context, i, start)
+
+            payload = cached.get(hashes[i]) if hashes else None
+            if payload is not None:
+                features = TextFeatures.from_dict(payload)
             else:
-                if current_section:
-                    sections.append(current_section.strip())
-                current_section = paragraph + "\n\n"
-
-        if current_section:
-            sections.append(current_section.strip())
-
-        # If no paragraphs or sections too long, split by sentence
-        if not sections or any(len(s) > max_section_length * 1.5 for s in sections):
-            sections = []
-            sentences = re.split(r"[。！？.!?]+", text)
-            current_section = ""
+                features = extract_features(section_text)
+                if hashes:
+                    new_entries.append((hashes[i], features.to_dict()))
+
+            score = self._evaluate_heuristic(
+                section_text,
+                section_context,
+                genre,
+                context_names if section_context else None,
+                features,
+            )
+            context_names.update(features.names)
+
+            sections.append(
+                SectionQuality(
+                    idx=i + 1,
+                    score=score,
+                    start_pos=start,
+                    end_pos=end,
+                    source=chapter_text,
+                )
+            )
 
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if not sentence:
-                    continue
+        if new_entries:
+            self.cache.put_many(new_entries, SCORER_VERSION, genre, HEURISTIC_MODE)
 
-                if len(current_section + sentence) <= max_section_length:
-                    current_section += sentence + "。"
-                else:
-                    if current_section:
-                        sections.append(current_section)
-                    current_section = sentence + "。"
+        return self._chapter_quality(chapter_idx, chapter_text, sections, context, genre)
 
-            if current_section:
-                sections.append(current_section)
+    def _chapter_quality(
+        self,
+        chapter_idx: int,
+        chapter_text: str,
+        sections: List[SectionQuality],
+        context: Optional[str],
+        genre: str,
+    ) -> ChapterQuality:
+        """Chapter result from its scored sections"""
+        if sections:
+            chapter_score = self._aggregate_chapter_score(sections)
+        elif chapter_text:
+            chapter_score = self._evaluate_heuristic(chapter_text, context, genre)
+        else:
+            chapter_score = QualityScore(
+                overall=0, readability=0, coherence=0, canon_consistency=0, genre_fit=0
+            )
 
-        return sections
+        return ChapterQuality(
+            idx=chapter_idx, score=chapter_score, sections=sections, text=chapter_text
+        )
 
     async def evaluate_chapter(
         self,
@@ -672,64 +879,181 @@ class QualityScorer:
         Returns:
             ChapterQuality object
         """
-        sections_text = self.split_text_into_sections(chapter_text)
-        sections = []
-
-        for i, section_text in enumerate(sections_text):
-            # Get context for this section (previous sections)
-            section_context = (
-                context + "\n\n".join(sections_text[:i]) if context or i > 0 else None
+        if not self._llm_enabled():
+            return self.evaluate_chapter_heuristic(
+                chapter_text, chapter_idx, context, genre
             )
 
-            score = await self.evaluate_text(section_text, section_context, genre)
-
-            section = SectionQuality(
-                idx=i + 1,
-                score=score,
-                text=section_text,
-                start_pos=(
-                    chapter_text.find(section_text)
-                    if section_text in chapter_text
-                    else 0
-                ),
-                end_pos=(
-                    chapter_text.find(section_text) + len(section_text)
-                    if section_text in chapter_text
-                    else len(section_text)
-                ),
-            )
-            sections.append(section)
+        (chapter_quality,), _ = await self._evaluate_chapters_llm(
+            [(chapter_idx, chapter_text)], [context], genre, seed=chapter_idx
+        )
+        return chapter_quality
 
-        # Calculate chapter overall score
-        if sections:
-            chapter_overall = sum(s.score.overall for s in sections) / len(sections)
-            chapter_readability = sum(s.score.readability for s in sections) / len(
-                sections
-            )
-            chapter_coherence = sum(s.score.coherence for s in sections) / len(sections)
-            chapter_canon = sum(s.score.canon_consistency for s in sections) / len(
-                sections
-            )
-            chapter_genre = sum(s.score.genre_fit for s in sections) / len(sections)
-            chapter_word_count = sum(s.score.word_count for s in sections)
-            chapter_processing_time = sum(s.score.processing_time for s in sections)
+    async def _evaluate_chapters_llm(
+        self,
+        chapters: List[Tuple[int, str]],
+        contexts: List[Optional[str]],
+        genre: str,
+        seed: Any = None,
+    ) -> Tuple[List[ChapterQuality], ScoreEstimate]:
+        """LLM evaluation of all chapters, planned against the budget
+
+        Every section is scored heuristically first. The LLM then judges the
+        sections the planner selects: a stratified random sample across chapters
+        plus sections near or below the rewrite threshold. Judged sections take
+        the LLM score; the document score is estimated from the sample.
+        """
+        chapter_qualities = await self._evaluate_chapters_heuristic(
+            chapters, contexts, genre
+        )
+        positions = [
+            (c, s)
+            for c, chapter_quality in enumerate(chapter_qualities)
+            for s in range(len(chapter_quality.sections))
+        ]
+        heuristic = [
+            chapter_qualities[c].sections[s].score.overall for c, s in positions
+        ]
+        strata = [c for c, _ in positions]
 
-            chapter_score = QualityScore(
-                overall=chapter_overall,
-                readability=chapter_readability,
-                coherence=chapter_coherence,
-                canon_consistency=chapter_canon,
-                genre_fit=chapter_genre,
-                word_count=chapter_word_count,
-                processing_time=chapter_processing_time,
+        capacity = self._get_judge().capacity(
+            [chapter_qualities[c].sections[s].text for c, s in positions], genre
+        )
+        plan = plan_llm_evaluation(
+            heuristic,
+            strata,
+            capacity,
+            self.rewrite_threshold,
+            sample_fraction=self.llm_sample_fraction,
+            rng=random.Random(seed),
+        )
+
+        selected = plan.selected
+        items = []
+        for n, k in enumerate(selected):
+            c, s = positions[k]
+            section = chapter_qualities[c].sections[s]
+            items.append(
+                (
+                    section.text,
+                    self._section_context(
+                        chapters[c][1], contexts[c], s, section.start_pos
+                    ),
+                    n > 0 and selected[n - 1] == k - 1 and s > 0,
+                )
             )
-        else:
-            chapter_score = await self.evaluate_text(chapter_text, context, genre)
+        scores = await self._judge_sections(items, genre)
+
+        judged = {}
+        for k, score in zip(selected, scores):
+            if score is not None:
+                c, s = positions[k]
+                chapter_qualities[c].sections[s].score = score
+                judged[k] = score.overall
+
+        for chapter_quality in chapter_qualities:
+            if chapter_quality.sections:
+                chapter_quality.score = self._aggregate_chapter_score(
+                    chapter_quality.sections
+                )
 
-        return ChapterQuality(
-            idx=chapter_idx, score=chapter_score, sections=sections, text=chapter_text
+        quality_logger.info(
+            f"LLM judged {len(judged)}/{len(positions)} sections "
+            f"({len(plan.sampled)} sampled, {len(plan.targeted)} targeted)"
+        )
+        return chapter_qualities, estimate_document_score(
+            heuristic, judged, strata, plan.sampled
         )
 
+    @staticmethod
+    def _chapter_contexts(chapters: List[Tuple[int, str]]) -> List[str]:
+        """Context passed to each chapter (summary of the preceding chapters)"""
+        contexts = []
+        context = ""
+        for chapter_idx, chapter_text in chapters:
+            contexts.append(context)
+            # Update context for next chapter (use summary to avoid too much context)
+            if len(context) < 2000:  # Keep context manageable
+                context += f"\n\n第{chapter_idx}章: {chapter_text[:500]}..."
+            else:
+                context = f"...第{chapter_idx}章: {chapter_text[:500]}..."
+        return contexts
+
+    def _uncached_chars(self, chapters: List[Tuple[int, str]], genre: str) -> int:
+        """Number of characters in sections that are not in the cache yet"""
+        sections = {}
+        for _, chapter_text in chapters:
+            for start, end in self.split_text_into_spans(chapter_text):
+                text = chapter_text[start:end]
+                sections[section_hash(text)] = len(text)
+        hits = self.cache.get_many(sections, SCORER_VERSION, genre, HEURISTIC_MODE)
+        return sum(length for key, length in sections.items() if key not in hits)
+
+    async def _evaluate_chapters_heuristic(
+        self, chapters: List[Tuple[int, str]], contexts: List[str], genre: str
+    ) -> List[ChapterQuality]:
+        """Heuristic evaluation of all chapters, sharded across processes for large documents"""
+        total_chars = sum(len(text) for _, text in chapters)
+        workers = min(self.max_workers or os.cpu_count() or 1, len(chapters))
+
+        cache_counts = None
+        if self.cache is not None and workers > 1 and total_chars >= PARALLEL_MIN_CHARS:
+            # Only sections missing from the cache cost real work. Workers keep
+            # their own cache counters, so this lookup's counts stand for the
+            # document when the pool is used.
+            cache_counts = (self.cache.hits, self.cache.misses)
+            total_chars = self._uncached_chars(chapters, genre)
+
+        if workers > 1 and total_chars >= PARALLEL_MIN_CHARS:
+            # Contiguous shards of roughly equal size, a few per worker for load balancing
+            target = total_chars / (workers * 4)
+            shards, shard, shard_chars = [], [], 0
+            for (chapter_idx, chapter_text), context in zip(chapters, contexts):
+                shard.append((chapter_idx, chapter_text, context))
+                shard_chars += len(chapter_text)
+                if shard_chars >= target:
+                    shards.append(shard)
+                    shard, shard_chars = [], 0
+            if shard:
+                shards.append(shard)
+
+            try:
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = await asyncio.gather(
+                        *(
+                            loop.run_in_executor(
+                                pool,
+                                _evaluate_chapter_shard,
+                                self.context_window,
+                                genre,
+                                shard,
+                                self.cache.db_path if self.cache else None,
+                            )
+                            for shard in shards
+                        )
+                    )
+                # Shards are contiguous and gathered in order, so the merge is deterministic
+                chapter_qualities = [
+                    chapter for shard_result in results for chapter in shard_result
+                ]
+                # Workers return offsets only; reference the local chapter texts
+                for chapter_quality, (_, chapter_text) in zip(chapter_qualities, chapters):
+                    chapter_quality.attach_text(chapter_text)
+                return chapter_qualities
+            except Exception as e:
+                quality_logger.warning(
+                    f"Parallel evaluation failed, falling back to single process: {e}"
+                )
+
+        if cache_counts is not None:
+            # Scored in-process: the lookups below are counted again
+            self.cache.hits, self.cache.misses = cache_counts
+        return [
+            self.evaluate_chapter_heuristic(chapter_text, chapter_idx, context, genre)
+            for (chapter_idx, chapter_text), context in zip(chapters, contexts)
+        ]
+
     async def evaluate_document(
         self,
         doc_id: str,
@@ -740,6 +1064,13 @@ class QualityScorer:
         """
         Evaluate an entire document
 
+        Heuristic scoring is sharded across worker processes by chapter.
+        With LLM evaluation, heuristics triage every section and the LLM budget
+        goes to a stratified sample plus borderline and low sections; the
+        overall score is then the LLM-calibrated estimate, with its 95%
+        confidence interval in overall_interval. Chapter results keep the
+        input order.
+
         Args:
             doc_id: Document ID
             chapters: List of (chapter_idx, chapter_text) tuples
@@ -753,27 +1084,24 @@ class QualityScorer:
 
         start_time = time.time()
 
-        chapter_qualities = []
-        total_word_count = 0
-        total_processing_time = 0
-        context = ""
-
         quality_logger.info(f"Starting quality evaluation for document: {doc_id}")
 
-        for chapter_idx, chapter_text in chapters:
-            chapter_quality = await self.evaluate_chapter(
-                chapter_text, chapter_idx, context, genre
+        contexts = self._chapter_contexts(chapters)
+        estimate = None
+        mode = "llm" if self._llm_enabled() else "heuristic"
+        if mode == "llm":
+            try:
+                chapter_qualities, estimate = await self._evaluate_chapters_llm(
+                    chapters, contexts, genre, seed=doc_id
+                )
+            finally:
+                await self.aclose()
+        else:
+            chapter_qualities = await self._evaluate_chapters_heuristic(
+                chapters, contexts, genre
             )
-            chapter_qualities.append(chapter_quality)
 
-            total_word_count += chapter_quality.score.word_count
-            total_processing_time += chapter_quality.score.processing_time
-
-            # Update context for next chapter (use summary to avoid too much context)
-            if len(context) < 2000:  # Keep context manageable
-                context += f"\n\n第{chapter_idx}章: {chapter_text[:500]}..."
-            else:
-                context = f"...第{chapter_idx}章: {chapter_text[:500]}..."
+        total_word_count = sum(c.score.word_count for c in chapter_qualities)
 
         # Calculate document overall score
         if chapter_qualities:
@@ -782,8 +1110,14 @@ class QualityScorer:
             )
         else:
             doc_overall = 0
+        overall_interval = None
+        if estimate is not None and estimate.sample_size:
+            doc_overall = estimate.estimate
+            overall_interval = (estimate.low, estimate.high)
 
         total_time = time.time() - start_time
+        EVALUATION_SECONDS.observe(total_time, mode=mode)
+        EVALUATED_CHARS.inc(sum(len(text) for _, text in chapters), mode=mode)
 
         # Log quality metrics
         log_quality_metrics(doc_id, doc_overall, total_word_count, total_time)
@@ -801,6 +1135,74 @@ class QualityScorer:
             genre=genre,
             language=language,
             created_at=datetime.datetime.now().isoformat(),
+            overall_interval=overall_interval,
+        )
+
+    def rescore_document(
+        self, doc_quality: DocumentQuality, chapters: List[Tuple[int, str]]
+    ) -> DocumentQuality:
+        """
+        Re-score a document after an edit, reusing unaffected chapter results
+
+        Only chapters whose text or context (the preceding chapters' openings)
+        changed are evaluated again, with heuristics; within those, unchanged
+        sections still hit the feature cache. The LLM confidence interval is
+        dropped because the estimate no longer covers the edited text.
+
+        Args:
+            doc_quality: Previous result, with chapter texts attached
+            chapters: List of (chapter_idx, chapter_text) tuples after the edit
+
+        Returns:
+            New DocumentQuality object
+        """
+        import datetime
+
+        start_time = time.time()
+        previous = {chapter.idx: chapter for chapter in doc_quality.chapters}
+        previous_contexts = dict(
+            zip(
+                previous,
+                self._chapter_contexts([(c.idx, c.text) for c in doc_quality.chapters]),
+            )
+        )
+
+        chapter_qualities = []
+        rescored = 0
+        for (chapter_idx, chapter_text), context in zip(
+            chapters, self._chapter_contexts(chapters)
+        ):
+            chapter = previous.get(chapter_idx)
+            if (
+                chapter is None
+                or not chapter.text
+                or chapter.text != chapter_text
+                or previous_contexts[chapter_idx] != context
+            ):
+                chapter = self.evaluate_chapter_heuristic(
+                    chapter_text, chapter_idx, context, doc_quality.genre
+                )
+                rescored += 1
+                EVALUATED_CHARS.inc(len(chapter_text), mode="rescore")
+            chapter_qualities.append(chapter)
+        EVALUATION_SECONDS.observe(time.time() - start_time, mode="rescore")
+
+        quality_logger.info(
+            f"Re-scored {rescored} of {len(chapters)} chapters for {doc_quality.doc_id}"
+        )
+
+        return DocumentQuality(
+            doc_id=doc_quality.doc_id,
+            chapters=chapter_qualities,
+            overall_score=(
+                sum(c.score.overall for c in chapter_qualities) / len(chapter_qualities)
+                if chapter_qualities
+                else 0
+            ),
+            total_word_count=sum(c.score.word_count for c in chapter_qualities),
+            genre=doc_quality.genre,
+            language=doc_quality.language,
+            created_at=datetime.datetime.now().isoformat(),
         )
 
     def to_dict(self, doc_quality: DocumentQuality) -> Dict[str, Any]:
@@ -812,6 +1214,11 @@ class QualityScorer:
             "genre": doc_quality.genre,
             "language": doc_quality.language,
             "created_at": doc_quality.created_at,
+            "overall_interval": (
+                list(doc_quality.overall_interval)
+                if doc_quality.overall_interval
+                else None
+            ),
             "chapters": [
                 {
                     "idx": chapter.idx,
@@ -859,19 +1266,159 @@ class QualityScorer:
             genre=data.get("genre", ""),
             language=data.get("language", "中文"),
             created_at=data.get("created_at", ""),
+            overall_interval=(
+                tuple(data["overall_interval"])
+                if data.get("overall_interval")
+                else None
+            ),
         )
 
     def save_quality_report(self, doc_quality: DocumentQuality, filepath: str):
-        """Save quality report as JSON"""
-        data = self.to_dict(doc_quality)
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        """Save quality report in the columnar JSON Lines format
+
+        The first line holds the document fields and the table of rewrite
+        suggestions; each following line holds one chapter, with its section
+        scores and offsets stored column by column. No text is written.
+        """
+        suggestions: Dict[str, int] = {}
 
-    def load_quality_report(self, filepath: str) -> DocumentQuality:
-        """Load quality report from JSON"""
+        def suggestion_id(score: QualityScore) -> int:
+            return suggestions.setdefault(score.rewrite_suggestion, len(suggestions))
+
+        def score_row(score: QualityScore) -> List[float]:
+            row = [getattr(score, name) for name in SCORE_COLUMNS]
+            row[-1] = round(row[-1], 6)  # processing_time
+            return row
+
+        chapter_lines = []
+        for chapter in doc_quality.chapters:
+            rows = [score_row(section.score) for section in chapter.sections]
+            columns = {
+                "idx": [section.idx for section in chapter.sections],
+                "start_pos": [section.start_pos for section in chapter.sections],
+                "end_pos": [section.end_pos for section in chapter.sections],
+                "suggestion": [suggestion_id(section.score) for section in chapter.sections],
+            }
+            for i, name in enumerate(SCORE_COLUMNS):
+                columns[name] = [row[i] for row in rows]
+            chapter_lines.append(
+                json.dumps(
+                    {
+                        "idx": chapter.idx,
+                        "score": score_row(chapter.score),
+                        "suggestion": suggestion_id(chapter.score),
+                        "sections": columns,
+                    },
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+            )
+
+        header = {
+            "format": REPORT_FORMAT,
+            "version": REPORT_VERSION,
+            "doc_id": doc_quality.doc_id,
+            "overall_score": doc_quality.overall_score,
+            "total_word_count": doc_quality.total_word_count,
+            "genre": doc_quality.genre,
+            "language": doc_quality.language,
+            "created_at": doc_quality.created_at,
+            "overall_interval": (
+                list(doc_quality.overall_interval)
+                if doc_quality.overall_interval
+                else None
+            ),
+            "score_columns": list(SCORE_COLUMNS),
+            "suggestions": list(suggestions),
+        }
+        lines = [json.dumps(header, ensure_ascii=False)] + chapter_lines
+        atomic_write_text(filepath, "\n".join(lines) + "\n")
+
+    def load_quality_report(
+        self, filepath: str, chapters: Optional[List[Tuple[int, str]]] = None
+    ) -> DocumentQuality:
+        """Load a quality report (columnar JSON Lines, or the older single JSON document)
+
+        Section texts are not stored in the report. Pass the evaluated
+        (chapter_idx, chapter_text) list to make them available again; they
+        are referenced, not copied. Without it, or for chapters missing from
+        it, chapter.text and section.text are empty strings.
+        """
         with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return self.from_dict(data)
+            first_line = f.readline()
+            try:
+                header = json.loads(first_line)
+            except json.JSONDecodeError:
+                header = None
+            if not isinstance(header, dict) or header.get("format") != REPORT_FORMAT:
+                f.seek(0)
+                doc_quality = self.from_dict(json.load(f))
+            else:
+                doc_quality = self._read_columnar_report(header, f)
+
+        if chapters is not None:
+            texts = dict(chapters)
+            for chapter in doc_quality.chapters:
+                if chapter.idx in texts:
+                    chapter.attach_text(texts[chapter.idx])
+        return doc_quality
+
+    @staticmethod
+    def _read_columnar_report(header: Dict[str, Any], lines) -> DocumentQuality:
+        """Build a DocumentQuality from the header and chapter lines of a columnar report"""
+        names = header["score_columns"]
+        suggestions = header["suggestions"]
+
+        def make_score(values, suggestion: int) -> QualityScore:
+            score = QualityScore(**dict(zip(names, values)))
+            score.rewrite_suggestion = suggestions[suggestion]
+            return score
+
+        chapters = []
+        for line in lines:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            columns = data["sections"]
+            score_columns = [columns[name] for name in names]
+            sections = [
+                SectionQuality(
+                    idx=idx,
+                    score=make_score([column[i] for column in score_columns], suggestion),
+                    start_pos=start,
+                    end_pos=end,
+                )
+                for i, (idx, start, end, suggestion) in enumerate(
+                    zip(
+                        columns["idx"],
+                        columns["start_pos"],
+                        columns["end_pos"],
+                        columns["suggestion"],
+                    )
+                )
+            ]
+            chapters.append(
+                ChapterQuality(
+                    idx=data["idx"],
+                    score=make_score(data["score"], data["suggestion"]),
+                    sections=sections,
+                )
+            )
+
+        return DocumentQuality(
+            doc_id=header["doc_id"],
+            chapters=chapters,
+            overall_score=header["overall_score"],
+            total_word_count=header["total_word_count"],
+            genre=header.get("genre", ""),
+            language=header.get("language", "中文"),
+            created_at=header.get("created_at", ""),
+            overall_interval=(
+                tuple(header["overall_interval"])
+                if header.get("overall_interval")
+                else None
+            ),
+        )
 
     def generate_markdown_report(
         self, doc_quality: DocumentQuality, low_score_threshold: float = 70
@@ -885,6 +1432,9 @@ class QualityScorer:
         lines.append(f"**小说类型**: {doc_quality.genre}")
         lines.append(f"**总字数**: {doc_quality.total_word_count:,}")
         lines.append(f"**总体评分**: {doc_quality.overall_score:.1f}/100")
+        if doc_quality.overall_interval:
+            low, high = doc_quality.overall_interval
+            lines.append(f"**95% 置信区间**: {low:.1f} - {high:.1f}")
         lines.append("")
 
         # Chapter summary
@@ -1012,3 +1562,28 @@ class QualityScorer:
         lines.append("*此报告由 AI 小说生成器质量评估系统自动生成*")
 
         return "\n".join(lines)
+
+
+def _evaluate_chapter_shard(
+    context_window: int,
+    genre: str,
+    shard: List[Tuple[int, str, str]],
+    cache_path: Optional[str] = None,
+) -> List[ChapterQuality]:
+    """Process-pool worker: heuristic evaluation of a contiguous shard of chapters
+
+    Text references are dropped from the results to keep inter-process
+    transfer small; the caller re-attaches its own chapter texts.
+    """
+    cache = QualityCache(cache_path) if cache_path else None
+    scorer = QualityScorer(context_window=context_window, cache=cache)
+    results = []
+    for chapter_idx, chapter_text, context in shard:
+        chapter_quality = scorer.evaluate_chapter_heuristic(
+            chapter_text, chapter_idx, context, genre
+        )
+        chapter_quality.attach_text("")
+        results.append(chapter_quality)
+    if cache is not None:
+        cache.close()
+    return results
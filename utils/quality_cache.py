@@ -0,0 +1,124 @@
+"""
+Persistent quality cache keyed by section content hash, scorer version and genre.
+Re-analysis only scores sections whose text changed; chapter and document
+scores are re-aggregated from the cached entries.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Tuple
+
+quality_logger = logging.getLogger("novel_generator.quality")
+
+CACHE_FILENAME = "quality_cache.db"
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS section_quality (
+    section_hash TEXT NOT NULL,
+    scorer_version TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (section_hash, scorer_version, genre, mode)
+);
+"""
+
+
+def section_hash(text: str) -> str:
+    """Content hash identifying a section"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class QualityCache:
+    """SQLite-backed cache of per-section quality data (thread-safe)"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        # Worker processes may write concurrently; wait for the lock instead of failing
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    @classmethod
+    def for_document(cls, document_path: str) -> "QualityCache":
+        """Open the cache stored next to a novel file"""
+        directory = os.path.dirname(os.path.abspath(document_path))
+        return cls(os.path.join(directory, CACHE_FILENAME))
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def get_many(
+        self, hashes: Iterable[str], scorer_version: str, genre: str, mode: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """Look up cached payloads; returns {section_hash: payload} for hits"""
+        hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for i in range(0, len(hashes), _QUERY_CHUNK):
+                chunk = hashes[i : i + _QUERY_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT section_hash, payload FROM section_quality "
+                    f"WHERE section_hash IN ({','.join('?' * len(chunk))}) "
+                    "AND scorer_version = ? AND genre = ? AND mode = ?",
+                    (*chunk, scorer_version, genre, mode),
+                ).fetchall()
+                for key, payload in rows:
+                    found[key] = json.loads(payload)
+        self.hits += len(found)
+        self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(
+        self,
+        entries: List[Tuple[str, Dict[str, Any]]],
+        scorer_version: str,
+        genre: str,
+        mode: str,
+    ):
+        """Store payloads for newly scored sections"""
+        if not entries:
+            return
+        now = time.time()
+        rows = [
+            (key, scorer_version, genre, mode, json.dumps(payload, ensure_ascii=False), now)
+            for key, payload in entries
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO section_quality "
+                "(section_hash, scorer_version, genre, mode, payload, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def purge(self, keep_version: str) -> int:
+        """Delete entries written by other scorer versions; returns the number removed"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM section_quality WHERE scorer_version != ?", (keep_version,)
+            )
+        if cursor.rowcount:
+            quality_logger.info(f"Purged {cursor.rowcount} stale quality cache entries")
+        return cursor.rowcount
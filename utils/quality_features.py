@@ -0,0 +1,211 @@
+"""
+Single-pass text feature extraction for heuristic quality scoring.
+Each section is tokenized once; all heuristic scores are derived from the shared features.
+"""
+
+import re
+from functools import lru_cache
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+# Keyword lists used by the heuristic scorers
+TRANSITION_WORDS = (
+    "但是",
+    "然而",
+    "因此",
+    "所以",
+    "接着",
+    "然后",
+    "首先",
+    "其次",
+    "最后",
+    "不过",
+    "另外",
+    "此外",
+    "总之",
+    "综上所述",
+    "由此可见",
+)
+
+TIME_INDICATORS = (
+    "早上",
+    "中午",
+    "下午",
+    "晚上",
+    "昨天",
+    "今天",
+    "明天",
+    "过去",
+    "未来",
+)
+
+CONTRADICTION_WORDS = ("但是", "然而", "相反", "与此相反")
+
+GENRE_KEYWORDS: Dict[str, tuple] = {
+    "奇幻冒险": ("魔法", "龙", "精灵", "冒险", "剑", "法术", "异世界", "勇士", "魔王"),
+    "科幻未来": ("科技", "未来", "星际", "机器人", "人工智能", "宇宙", "时间", "基因"),
+    "悬疑推理": ("案件", "谜题", "线索", "证据", "凶手", "真相", "推理", "嫌疑"),
+    "武侠江湖": ("武功", "江湖", "侠客", "剑法", "内功", "门派", "师父", "仇人"),
+    "都市言情": ("爱情", "感情", "心动", "约会", "表白", "分手", "吃醋", "浪漫"),
+    "历史传奇": ("古代", "皇帝", "将军", "战争", "朝代", "历史", "传奇", "天下"),
+}
+
+SENTENCE_SPLIT_RE = re.compile(r"[。！？.!?]+")
+PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n")
+DIALOGUE_RE = re.compile(r'["「『].*?["」』]')
+WORD_RE = re.compile(r"[\w]+")
+NAME_CANDIDATE_RE = re.compile(r"[\u4e00-\u9fff]{2,4}")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting which keywords occur in a text.
+
+    Characters outside the keyword alphabet always return the automaton to its
+    root, so only runs of alphabet characters that begin with a keyword's first
+    character are fed through the state machine.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        keywords = sorted({k for k in keywords if k})
+        goto: List[Dict[str, int]] = [{}]
+        output: List[tuple] = [()]
+        for keyword in keywords:
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    goto.append({})
+                    output.append(())
+                    nxt = len(goto) - 1
+                    goto[state][ch] = nxt
+                state = nxt
+            output[state] += (keyword,)
+
+        # Breadth-first pass: failure links, merged outputs and a full transition table
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[nxt] = goto[fallback].get(ch, 0) if state else 0
+                output[nxt] += output[fail[nxt]]
+                queue.append(nxt)
+            transitions = dict(delta[fail[state]])
+            transitions.update(goto[state])
+            delta[state] = transitions
+
+        self.keywords = tuple(keywords)
+        self._delta = delta
+        self._output = output
+        # Candidate runs start with a keyword's first character and extend over the alphabet
+        alphabet = re.escape("".join(sorted({ch for k in keywords for ch in k})))
+        firsts = re.escape("".join(sorted({k[0] for k in keywords})))
+        self._runs = re.compile(f"[{firsts}][{alphabet}]*" if keywords else "(?!)")
+
+    def find(self, text: str) -> Set[str]:
+        """Return the set of keywords that occur in text"""
+        found: Set[str] = set()
+        delta = self._delta
+        output = self._output
+        for run in self._runs.findall(text):
+            state = 0
+            for ch in run:
+                state = delta[state].get(ch, 0)
+                if output[state]:
+                    found.update(output[state])
+        return found
+
+
+KEYWORD_AUTOMATON = KeywordAutomaton(
+    TRANSITION_WORDS
+    + TIME_INDICATORS
+    + CONTRADICTION_WORDS
+    + tuple(k for keywords in GENRE_KEYWORDS.values() for k in keywords)
+)
+
+
+@dataclass(frozen=True)
+class TextFeatures:
+    """Features shared by all heuristic scorers"""
+
+    length: int
+    sentence_lengths: Tuple[int, ...]  # stripped, non-empty sentences
+    paragraph_count: int
+    dialogue_chars: int
+    dialogue_count: int
+    word_total: int
+    repeated_words: int  # distinct words occurring in more than 10% of word tokens
+    keywords: FrozenSet[str]
+    names: FrozenSet[str]  # CJK name candidates (2-4 characters)
+
+    def to_dict(self) -> Dict[str, object]:
+        """JSON-serializable representation (used by the quality cache)"""
+        return {
+            "length": self.length,
+            "sentence_lengths": list(self.sentence_lengths),
+            "paragraph_count": self.paragraph_count,
+            "dialogue_chars": self.dialogue_chars,
+            "dialogue_count": self.dialogue_count,
+            "word_total": self.word_total,
+            "repeated_words": self.repeated_words,
+            "keywords": sorted(self.keywords),
+            "names": sorted(self.names),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "TextFeatures":
+        """Rebuild features from to_dict() output"""
+        return cls(
+            length=data["length"],
+            sentence_lengths=tuple(data["sentence_lengths"]),
+            paragraph_count=data["paragraph_count"],
+            dialogue_chars=data["dialogue_chars"],
+            dialogue_count=data["dialogue_count"],
+            word_total=data["word_total"],
+            repeated_words=data["repeated_words"],
+            keywords=frozenset(data["keywords"]),
+            names=frozenset(data["names"]),
+        )
+
+
+def extract_names(text: str) -> FrozenSet[str]:
+    """Extract CJK name candidates from text"""
+    return frozenset(NAME_CANDIDATE_RE.findall(text)) if text else frozenset()
+
+
+@lru_cache(maxsize=256)
+def extract_features(text: str) -> TextFeatures:
+    """Tokenize text once and collect all heuristic features
+
+    Results are memoized, so a section scored once can be reused as context
+    for the following sections without being tokenized again.
+    """
+    if not text:
+        return TextFeatures(0, (), 0, 0, 0, 0, 0, frozenset(), frozenset())
+
+    sentence_lengths = tuple(n for n in map(len, map(str.strip, SENTENCE_SPLIT_RE.split(text))) if n)
+    paragraph_count = sum(1 for p in map(str.strip, PARAGRAPH_SPLIT_RE.split(text)) if p)
+
+    dialogues = DIALOGUE_RE.findall(text)
+
+    words = WORD_RE.findall(text)
+    word_total = len(words)
+    threshold = word_total * 0.1
+    repeated_words = sum(1 for count in Counter(words).values() if count > threshold)
+
+    return TextFeatures(
+        length=len(text),
+        sentence_lengths=sentence_lengths,
+        paragraph_count=paragraph_count,
+        dialogue_chars=sum(map(len, dialogues)),
+        dialogue_count=len(dialogues),
+        word_total=word_total,
+        repeated_words=repeated_words,
+        keywords=frozenset(KEYWORD_AUTOMATON.find(text)),
+        names=extract_names(text),
+    )
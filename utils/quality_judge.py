@@ -0,0 +1,392 @@
+"""
+Batched LLM judge for section quality.
+Consecutive sections are packed into one chat request that returns a JSON array
+of scores. Sessions are pooled per event loop and the budget is spent in tokens.
+"""
+
+import re
+import json
+import math
+import time
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+# Optional imports for LLM evaluation
+try:
+    import aiohttp
+
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+quality_logger = logging.getLogger("novel_generator.quality")
+
+SCORE_FIELDS = ("readability", "coherence", "canon_consistency", "genre_fit")
+
+# Characters sent per section and of the preceding context
+SECTION_CHARS = 2000
+CONTEXT_CHARS = 500
+# Completion tokens reserved per judged section (four scores and a short suggestion)
+OUTPUT_TOKENS_PER_SECTION = 120
+
+CJK_RE = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+TRAILING_COMMA_RE = re.compile(r",\s*([\]}])")
+OBJECT_RE = re.compile(r"\{[^{}]*\}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per CJK character, one per four other characters"""
+    cjk = len(CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+@dataclass
+class JudgeItem:
+    """A section to judge"""
+
+    text: str
+    context: str = ""  # preceding text, sent unless the previous item in the batch precedes it
+    follows_previous: bool = False  # the previous item is the text immediately before this one
+
+
+class TokenBudget:
+    """Token budget shared by concurrent requests of one event loop
+
+    Requests reserve their estimated cost up front so concurrent batches cannot
+    overshoot; the reservation is settled with the actual usage afterwards.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.reserved = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self.used - self.reserved
+
+    def reserve(self, tokens: int) -> bool:
+        if tokens > self.remaining:
+            return False
+        self.reserved += tokens
+        return True
+
+    def settle(self, reserved: int, actual: int):
+        self.reserved -= reserved
+        self.used += actual
+
+
+def plan_batches(
+    items: Sequence[JudgeItem], max_items: int, max_tokens: int
+) -> List[List[int]]:
+    """Greedily pack consecutive items into batches by count and estimated tokens"""
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    batch_tokens = 0
+    for i, item in enumerate(items):
+        tokens = estimate_tokens(item.text[:SECTION_CHARS])
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def build_batch_prompt(items: Sequence[JudgeItem], genre: str) -> str:
+    """Prompt asking for one JSON object per section, in a single array"""
+    parts = []
+    for n, item in enumerate(items, 1):
+        lines = [f"[片段 {n}]"]
+        if n > 1 and item.follows_previous:
+            lines.append("（紧接上一片段）")
+        elif item.context:
+            lines.append(f"前文上下文：{item.context[-CONTEXT_CHARS:]}")
+        lines.append(f"正文：{item.text[:SECTION_CHARS]}")
+        parts.append("\n".join(lines))
+    sections = "\n\n".join(parts)
+
+    return f"""
+请评估以下{len(items)}个小说片段的质量，每个片段从4个维度打分（0-100分）：
+
+1. 可读性 (Readability) - 文字是否流畅易懂，句子结构是否合理
+2. 连贯性 (Coherence) - 逻辑是否清晰，段落间衔接是否自然
+3. 设定一致性 (Canon Consistency) - 人物、时间、地点等设定是否前后一致
+4. 类型贴合度 (Genre Fit) - 是否符合{genre or '小说'}类型的特征和风格
+
+{sections}
+
+请只返回一个JSON数组，每个片段一个对象，id 为片段编号：
+[
+    {{"id": 1, "readability": 分数, "coherence": 分数, "canon_consistency": 分数, "genre_fit": 分数, "rewrite_suggestion": "改进建议（50字以内）"}}
+]
+"""
+
+
+def _load_json(content: str) -> Any:
+    """Parse model output, repairing common formatting errors
+
+    Handles code fences, prose around the JSON, trailing commas and truncated
+    arrays (complete objects are salvaged). Returns None if nothing parses.
+    """
+    fenced = FENCE_RE.search(content)
+    if fenced:
+        content = fenced.group(1)
+    start = min((i for i in (content.find("["), content.find("{")) if i >= 0), default=-1)
+    if start < 0:
+        return None
+    content = content[start:]
+    end = max(content.rfind("]"), content.rfind("}"))
+    candidates = [content[: end + 1]] if end >= 0 else []
+
+    for candidate in candidates:
+        for text in (candidate, TRAILING_COMMA_RE.sub(r"\1", candidate)):
+            try:
+                return json.loads(text)
+            except json.JSONDecodeError:
+                pass
+
+    salvaged = []
+    for match in OBJECT_RE.finditer(content):
+        try:
+            salvaged.append(json.loads(TRAILING_COMMA_RE.sub(r"\1", match.group(0))))
+        except json.JSONDecodeError:
+            continue
+    return salvaged or None
+
+
+def _normalize_entry(entry: Any) -> Optional[Dict[str, Any]]:
+    """Validate one judged entry; scores are coerced to floats in 0-100"""
+    if not isinstance(entry, dict):
+        return None
+    scores: Dict[str, Any] = {}
+    for field in SCORE_FIELDS:
+        try:
+            value = float(entry[field])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if math.isnan(value):
+            return None
+        scores[field] = min(100.0, max(0.0, value))
+    suggestion = entry.get("rewrite_suggestion", "")
+    scores["rewrite_suggestion"] = suggestion if isinstance(suggestion, str) else ""
+    return scores
+
+
+def parse_judgement(content: str, count: int) -> Dict[int, Dict[str, Any]]:
+    """Parse a batch response into {item position: scores}
+
+    Entries are matched by their 1-based "id"; entries without a usable id are
+    matched by position. Invalid or missing entries are left out.
+    """
+    data = _load_json(content)
+    if isinstance(data, dict):
+        # Some models wrap the array in an object, or answer a single section bare
+        nested = next((v for v in data.values() if isinstance(v, list)), None)
+        data = nested if nested is not None else [data]
+    if not isinstance(data, list):
+        return {}
+
+    results: Dict[int, Dict[str, Any]] = {}
+    for position, entry in enumerate(data):
+        scores = _normalize_entry(entry)
+        if scores is None:
+            continue
+        try:
+            idx = int(entry.get("id")) - 1
+        except (TypeError, ValueError):
+            idx = position
+        if not 0 <= idx < count:
+            idx = position
+        if 0 <= idx < count and idx not in results:
+            results[idx] = scores
+    return results
+
+
+class LLMJudge:
+    """Scores sections in batches through an OpenAI-compatible chat API"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-3.5-turbo",
+        base_url: Optional[str] = None,
+        token_budget: int = 60_000,
+        max_requests: Optional[int] = None,
+        batch_size: int = 8,
+        batch_tokens: int = 6000,
+        concurrency: int = 4,
+        timeout: float = 60,
+    ):
+        """
+        Args:
+            api_key: API key for the chat API
+            model: Model name
+            base_url: Base URL of the API (default: OpenAI)
+            token_budget: Total prompt and completion tokens to spend
+            max_requests: Optional cap on the number of requests
+            batch_size: Maximum sections per request
+            batch_tokens: Maximum estimated section tokens per request
+            concurrency: Maximum concurrent requests per event loop
+            timeout: Request timeout in seconds
+        """
+        self.api_key = api_key
+        self.model = model
+        self.url = (
+            f"{base_url}/chat/completions"
+            if base_url
+            else "https://api.openai.com/v1/chat/completions"
+        )
+        self.budget = TokenBudget(token_budget)
+        self.max_requests = max_requests
+        self.batch_size = max(1, batch_size)
+        self.batch_tokens = batch_tokens
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.requests = 0
+        self.judged = 0
+        # Sessions and semaphores belong to the event loop they were created in
+        self._sessions = weakref.WeakKeyDictionary()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _session(self) -> "aiohttp.ClientSession":
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.concurrency, keepalive_timeout=60
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._sessions[loop] = session
+        return session
+
+    def capacity(self, texts: Sequence[str], genre: str = "") -> int:
+        """Approximate number of the given sections the remaining budget can judge
+
+        Sections picked for judging are usually not adjacent, so each one is
+        assumed to carry its own context.
+        """
+        if not texts:
+            return 0
+        overhead = estimate_tokens(build_batch_prompt([], genre)) / self.batch_size
+        per_section = (
+            sum(estimate_tokens(text[:SECTION_CHARS]) for text in texts) / len(texts)
+            + CONTEXT_CHARS  # mostly CJK, about one token per character
+            + OUTPUT_TOKENS_PER_SECTION
+            + overhead
+        )
+        # Keep a margin so estimation error does not starve the last batches
+        count = int(self.budget.remaining * 0.9 / per_section)
+        if self.max_requests is not None:
+            count = min(count, (self.max_requests - self.requests) * self.batch_size)
+        return max(0, count)
+
+    async def close(self):
+        """Close the pooled session of the running event loop"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def judge(
+        self, items: Sequence[JudgeItem], genre: str = ""
+    ) -> List[Optional[Dict[str, Any]]]:
+        """Score items; entries are None where the budget ran out or the request failed"""
+        if not HAS_AIOHTTP:
+            quality_logger.warning(
+                "aiohttp not available, falling back to heuristic evaluation"
+            )
+            return [None] * len(items)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        batches = plan_batches(items, self.batch_size, self.batch_tokens)
+
+        async def run(batch: List[int]):
+            scores = await self._judge_batch([items[i] for i in batch], genre)
+            for offset, i in enumerate(batch):
+                results[i] = scores.get(offset)
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return results
+
+    async def _judge_batch(
+        self, items: List[JudgeItem], genre: str
+    ) -> Dict[int, Dict[str, Any]]:
+        """Send one batch request; returns the parsed scores by position"""
+        prompt = build_batch_prompt(items, genre)
+        max_tokens = OUTPUT_TOKENS_PER_SECTION * len(items) + 50
+        reserved = estimate_tokens(prompt) + max_tokens
+
+        async with self._semaphore():
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                quality_logger.warning(
+                    f"LLM request limit reached ({self.max_requests}), falling back to heuristic"
+                )
+                return {}
+            if not self.budget.reserve(reserved):
+                quality_logger.warning(
+                    f"LLM token budget exhausted ({self.budget.used}/{self.budget.limit}), "
+                    "falling back to heuristic"
+                )
+                return {}
+            self.requests += 1
+
+            start_time = time.time()
+            spent = 0
+            try:
+                data = {
+                    "model": self.model,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "temperature": 0.3,
+                    "max_tokens": max_tokens,
+                }
+                headers = {
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                }
+                async with self._session().post(
+                    self.url, headers=headers, json=data
+                ) as response:
+                    if response.status != 200:
+                        quality_logger.error(
+                            f"LLM API request failed: {response.status}"
+                        )
+                        return {}
+                    result = await response.json()
+
+                content = result["choices"][0]["message"]["content"]
+                usage = result.get("usage") or {}
+                spent = usage.get("total_tokens") or (
+                    reserved - max_tokens + estimate_tokens(content)
+                )
+            except Exception as e:
+                quality_logger.error(f"LLM evaluation failed: {str(e)}")
+                return {}
+            finally:
+                self.budget.settle(reserved, spent)
+
+        scores = parse_judgement(content, len(items))
+        if len(scores) < len(items):
+            quality_logger.warning(
+                f"LLM response covered {len(scores)}/{len(items)} sections"
+            )
+        elapsed = (time.time() - start_time) / len(items)
+        for entry in scores.values():
+            entry["processing_time"] = elapsed
+        self.judged += len(scores)
+        return scores
@@ -0,0 +1,179 @@
+"""
+LLM evaluation planner for document quality scoring.
+Heuristics triage every section; the LLM budget goes to sections near or below
+the rewrite threshold plus a stratified random sample across chapters, which
+calibrates the heuristic document score and yields a confidence interval.
+"""
+
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+# Sections within this many points of the rewrite threshold are borderline
+BORDERLINE_MARGIN = 10.0
+# z value of the two-sided 95% confidence interval
+Z_95 = 1.959964
+# Exact two-sided 95% t critical values for small degrees of freedom
+T_95_TABLE = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571}
+
+
+@dataclass
+class EvaluationPlan:
+    """Sections (by position) selected for LLM judging"""
+
+    sampled: List[int] = field(default_factory=list)  # stratified random sample
+    targeted: List[int] = field(default_factory=list)  # borderline and low sections
+
+    @property
+    def selected(self) -> List[int]:
+        return sorted(set(self.sampled) | set(self.targeted))
+
+
+@dataclass
+class ScoreEstimate:
+    """Document score estimate on the LLM scale"""
+
+    estimate: float
+    low: float
+    high: float
+    sample_size: int
+    judged: int
+
+
+def t_quantile_95(df: int) -> float:
+    """Two-sided 95% Student-t critical value
+
+    Samples are small, so the normal quantile would make the interval too narrow.
+    Exact table values for df <= 5, where the Cornish-Fisher expansion used above
+    that is too inaccurate.
+    """
+    if df in T_95_TABLE:
+        return T_95_TABLE[df]
+    z = Z_95
+    return (
+        z
+        + (z**3 + z) / (4 * df)
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3)
+    )
+
+
+def allocate_sample(strata_sizes: Sequence[int], n: int) -> List[int]:
+    """Proportional allocation of n draws over strata (largest remainder)"""
+    total = sum(strata_sizes)
+    n = min(n, total)
+    if n <= 0:
+        return [0] * len(strata_sizes)
+    quotas = [n * size / total for size in strata_sizes]
+    allocation = [int(q) for q in quotas]
+    by_remainder = sorted(
+        range(len(quotas)), key=lambda i: quotas[i] - allocation[i], reverse=True
+    )
+    for i in by_remainder[: n - sum(allocation)]:
+        allocation[i] += 1
+    return allocation
+
+
+def plan_llm_evaluation(
+    scores: Sequence[float],
+    strata: Sequence[int],
+    capacity: int,
+    threshold: float,
+    margin: float = BORDERLINE_MARGIN,
+    sample_fraction: float = 0.5,
+    rng: Optional[random.Random] = None,
+) -> EvaluationPlan:
+    """Choose which sections the LLM judges
+
+    Args:
+        scores: Heuristic overall score of each section
+        strata: Chapter (stratum) of each section
+        capacity: Number of sections the LLM budget can judge
+        threshold: Rewrite threshold
+        margin: Width of the borderline band above the threshold
+        sample_fraction: Minimum share of the capacity spent on the random sample
+        rng: Random generator (seed it for reproducible reports)
+    """
+    total = len(scores)
+    if capacity >= total:
+        return EvaluationPlan(sampled=list(range(total)))
+    if capacity <= 0:
+        return EvaluationPlan()
+    rng = rng or random.Random()
+
+    # Closest to the threshold first: borderline sections, then the lowest ones
+    candidates = sorted(
+        (i for i, score in enumerate(scores) if score < threshold + margin),
+        key=lambda i: abs(scores[i] - threshold),
+    )
+    min_sample = min(capacity, max(2, math.ceil(capacity * sample_fraction)))
+    n_sample = max(min_sample, capacity - len(candidates))
+
+    members: Dict[int, List[int]] = {}
+    for i, stratum in enumerate(strata):
+        members.setdefault(stratum, []).append(i)
+    keys = list(members)
+    allocation = allocate_sample([len(members[k]) for k in keys], n_sample)
+    sampled = sorted(
+        i
+        for key, n in zip(keys, allocation)
+        for i in rng.sample(members[key], n)
+    )
+
+    chosen = set(sampled)
+    targeted = [i for i in candidates if i not in chosen][: capacity - len(sampled)]
+    return EvaluationPlan(sampled=sampled, targeted=targeted)
+
+
+def estimate_document_score(
+    heuristic: Sequence[float],
+    judged: Dict[int, float],
+    strata: Sequence[int],
+    sampled: Sequence[int],
+) -> ScoreEstimate:
+    """Difference estimator of the document score with a 95% confidence interval
+
+    The document score is the mean of chapter means, so each section weighs
+    1 / (chapters * sections in its chapter). The heuristic mean over all
+    sections is corrected by the weighted mean LLM-minus-heuristic difference
+    over the random sample; targeted sections are excluded from the correction
+    because they were not drawn at random.
+    """
+    sizes: Dict[int, int] = {}
+    for stratum in strata:
+        sizes[stratum] = sizes.get(stratum, 0) + 1
+    weights = [1 / (len(sizes) * sizes[stratum]) for stratum in strata]
+    heuristic_mean = sum(w * h for w, h in zip(weights, heuristic))
+
+    sample = [i for i in sampled if i in judged]
+    n = len(sample)
+    if n == 0:
+        return ScoreEstimate(heuristic_mean, heuristic_mean, heuristic_mean, 0, len(judged))
+
+    # Inclusion probability from the realized draws of each stratum
+    drawn: Dict[int, int] = {}
+    for i in sample:
+        drawn[strata[i]] = drawn.get(strata[i], 0) + 1
+    design = [weights[i] * sizes[strata[i]] / drawn[strata[i]] for i in sample]
+    total_weight = sum(design)
+    diffs = [judged[i] - heuristic[i] for i in sample]
+    mean_diff = sum(a * d for a, d in zip(design, diffs)) / total_weight
+    estimate = heuristic_mean + mean_diff
+
+    if n < 2:
+        return ScoreEstimate(estimate, 0.0, 100.0, n, len(judged))
+    variance = (
+        n
+        / (n - 1)
+        * sum((a / total_weight) ** 2 * (d - mean_diff) ** 2 for a, d in zip(design, diffs))
+        * (1 - n / len(heuristic))
+    )
+    half_width = t_quantile_95(n - 1) * math.sqrt(max(0.0, variance))
+    return ScoreEstimate(
+        estimate,
+        max(0.0, estimate - half_width),
+        min(100.0, estimate + half_width),
+        n,
+        len(judged),
+    )
@@ -0,0 +1,298 @@
+"""
+生成流水线追踪
+
+按小说、按段记录嵌套的耗时区间（span），用来定位一次运行变慢时是哪个阶段变长了：
+- 每个 span 记录名称、开始时间、耗时、父 span 和标签（小说 id、段序号、模型、接口等），子 span 继承父 span 的标签
+- 当前 span 保存在 contextvars 中，每个 asyncio 任务各自嵌套，并发的小说互不干扰
+- 结束的 span 以 JSONL 追加到追踪文件（缓冲后批量写入），to_chrome_trace() 转换为 Chrome trace / Perfetto 可打开的格式
+- 追踪关闭时 span() 返回共享的空 span，不计时、不分配记录
+
+转换命令：python -m utils.tracing trace.jsonl -o trace.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import itertools
+import threading
+import functools
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("novel_generator")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("novel_trace_span", default=None)
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空 span"""
+
+    __slots__ = ()
+
+    def start(self):
+        return self
+
+    def finish(self, error: Optional[BaseException] = None):
+        pass
+
+    def set_tag(self, **tags):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一段计时区间（可作为上下文管理器，也可手动 start/finish）"""
+
+    __slots__ = ("tracer", "name", "tags", "track", "id", "parent", "wall_start", "start_time", "finished")
+
+    def __init__(self, tracer: "Tracer", name: str, track: Optional[str], tags: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.tags = tags
+        self.track = track
+        self.id = None
+        self.parent = None
+        self.wall_start = 0.0
+        self.start_time = 0.0
+        self.finished = False
+
+    def start(self) -> "Span":
+        """开始计时，并成为当前上下文中的父 span"""
+        parent = _current_span.get()
+        self.parent = parent
+        if parent is not None:
+            self.tags = {**parent.tags, **self.tags}
+            if self.track is None:
+                self.track = parent.track
+        if self.track is None:
+            novel = self.tags.get("novel")
+            self.track = f"小说 {novel}" if novel is not None else self.name
+        self.id = self.tracer._next_id()
+        self.wall_start = time.time()
+        self.start_time = time.perf_counter()
+        _current_span.set(self)
+        return self
+
+    def finish(self, error: Optional[BaseException] = None):
+        """结束计时并写入记录（重复调用只记录第一次）"""
+        if self.finished:
+            return
+        self.finished = True
+        duration = time.perf_counter() - self.start_time
+        if _current_span.get() is self:
+            _current_span.set(self.parent)
+        if error is not None:
+            self.tags["error"] = type(error).__name__
+        self.tracer._record(self, duration)
+
+    def set_tag(self, **tags):
+        """补充标签（如请求结果）"""
+        self.tags.update(tags)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+
+class Tracer:
+    """span 记录器；没有打开追踪文件时所有 span 都是空操作"""
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 1.0, buffer_size: int = 256):
+        """
+        Args:
+            path: 追踪文件路径（JSONL），为 None 时关闭追踪
+            flush_interval: 缓冲的记录最多保留的秒数
+            buffer_size: 缓冲达到多少条记录时立即写入
+        """
+        self.path = None
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self._ids = itertools.count(1)
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        if path:
+            self.open(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def open(self, path: str):
+        """开始把 span 追加到 path（之前打开的文件会先写完关闭）"""
+        self.close()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+
+    def close(self):
+        """写出缓冲的记录并关闭追踪"""
+        with self._lock:
+            self._flush_locked()
+            self.path = None
+
+    def span(self, name: str, track: Optional[str] = None, **tags) -> Any:
+        """创建一个 span（需要 with 或 start() 才开始计时）
+
+        Args:
+            track: 在追踪视图中所在的行；默认继承父 span，根 span 按小说 id 分行
+        """
+        if self.path is None:
+            return NOOP_SPAN
+        return Span(self, name, track, tags)
+
+    def traced(self, name: Optional[str] = None, **tags):
+        """把整个函数调用记录为一个 span 的装饰器（同步和异步函数均可）"""
+
+        def decorator(func):
+            span_name = name or func.__name__
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if self.path is None:
+                        return await func(*args, **kwargs)
+                    with Span(self, span_name, None, dict(tags)):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.path is None:
+                    return func(*args, **kwargs)
+                with Span(self, span_name, None, dict(tags)):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def _next_id(self) -> int:
+        return next(self._ids)
+
+    def _record(self, span: Span, duration: float):
+        line = json.dumps({
+            "name": span.name,
+            "id": span.id,
+            "parent": span.parent.id if span.parent is not None else None,
+            "track": span.track,
+            "ts": int(span.wall_start * 1e6),
+            "dur": int(duration * 1e6),
+            "tags": span.tags,
+        }, ensure_ascii=False, default=str)
+        with self._lock:
+            if self.path is None:
+                return
+            self._buffer.append(line)
+            now = time.monotonic()
+            if len(self._buffer) >= self.buffer_size or now - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer or self.path is None:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning(f"写入追踪文件失败: {e}")
+
+    def flush(self):
+        """立即写出缓冲的记录"""
+        with self._lock:
+            self._flush_locked()
+
+
+# 进程内共享的追踪器，默认关闭
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """进程内共享的追踪器"""
+    return _tracer
+
+
+def current_span() -> Optional[Span]:
+    """当前上下文中正在计时的 span"""
+    return _current_span.get()
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """读取追踪文件中的 span 记录（跳过写了一半的行）"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def to_chrome_trace(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """转换为 Chrome trace event 格式（chrome://tracing、ui.perfetto.dev 均可打开）
+
+    每个 track 对应一个线程行，span 为完整事件（ph=X），标签放在 args 中。
+    """
+    tids: Dict[str, int] = {}
+    events = []
+    for record in sorted(records, key=lambda r: (r["ts"], -r["dur"])):
+        track = str(record.get("track") or record["name"])
+        tid = tids.get(track)
+        if tid is None:
+            tid = tids[track] = len(tids) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}})
+        events.append({
+            "name": record["name"],
+            "cat": "novel",
+            "ph": "X",
+            "ts": record["ts"],
+            "dur": record["dur"],
+            "pid": 1,
+            "tid": tid,
+            "args": record.get("tags") or {},
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口：把追踪文件转换为 Chrome trace JSON"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把生成追踪文件转换为 Chrome trace / Perfetto 格式")
+    parser.add_argument("trace", help="追踪文件（trace.jsonl）")
+    parser.add_argument("-o", "--output", help="输出文件，默认与追踪文件同名的 .json")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.trace):
+        print(f"错误：{args.trace} 不存在")
+        return 1
+
+    output = args.output or os.path.splitext(args.trace)[0] + ".json"
+    records = load_trace(args.trace)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(records), f, ensure_ascii=False)
+    print(f"已转换 {len(records)} 个 span: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())